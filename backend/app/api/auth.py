@@ -12,6 +12,7 @@ from ..config.settings import get_settings
 from ..models.user import User, UserCreate, UserResponse, UserProfileUpdate
 from ..models.session import UserSessionResponse
 from ..services.auth_service import AuthService
+from ..services.streak_service import effective_streak
 from ..database import get_db
 from ..models.session import UserSession
 
@@ -220,7 +221,7 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
         privacy_level=current_user.privacy_level,
         total_goals=current_user.total_goals,
         completed_goals=current_user.completed_goals,
-        streak_days=current_user.streak_days,
+        streak_days=effective_streak(current_user),
         is_verified=current_user.is_verified,
         is_active=current_user.is_active,
         created_at=current_user.created_at,
@@ -256,7 +257,7 @@ async def update_user_profile(
             privacy_level=current_user.privacy_level,
             total_goals=current_user.total_goals,
             completed_goals=current_user.completed_goals,
-            streak_days=current_user.streak_days,
+            streak_days=effective_streak(current_user),
             is_verified=current_user.is_verified,
             is_active=current_user.is_active,
             created_at=current_user.created_at,
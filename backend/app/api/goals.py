@@ -1,7 +1,7 @@
 """
 目标相关API
 """
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from typing import List, Optional
@@ -12,9 +12,17 @@ from ..models.user import User
 from ..api.auth import get_current_user
 from ..schemas import GoalCreate, GoalUpdate, GoalItem, GoalResponse, VoiceGoalCreate, VoiceGoalParseResponse, VoiceRecognitionResponse
 from ..models.goal import GoalCategory, GoalPriority
-from ..services.voice_recognition import voice_recognition_service
+from ..services.voice_recognition import voice_recognition_service, MAX_AUDIO_SIZE
+from ..services.audio_upload import receive_audio_upload, AUDIO_UPLOAD_OPENAPI
+from ..services.cloud_executor import raise_for_cloud_unavailable
 from ..utils.voice_parser import voice_goal_parser
 from ..utils.goal_validator import goal_validator
+from ..services.sync_service import SyncService
+from ..services.record_search_service import record_search_index
+from ..services.goal_match_index import goal_match_index_cache
+from ..services.recent_records_service import recent_records_cache
+from ..services.user_stats_service import UserStatsService
+from ..models.change_log import ChangeEntityType, ChangeOperation
 
 router = APIRouter(prefix="/api/goals", tags=["目标"])
 logger = logging.getLogger(__name__)
@@ -399,7 +407,10 @@ async def create_goal(
             "user_id": current_user.id
         })
         
+        SyncService(db).record_change(current_user.id, ChangeEntityType.goal, goal_id)
+        UserStatsService(db).goal_created(current_user.id)
         db.commit()
+        goal_match_index_cache.invalidate(current_user.id)
         
         print(f"✅ 目标创建成功: {goal_data.title}")
         print(f"✅ 提醒设置已保存: daily_reminder={goal_data.dailyReminder}, deadline_reminder={goal_data.deadlineReminder}")
@@ -806,7 +817,9 @@ def update_goal(goal_id: str, goal_data: dict, current_user: User = Depends(get_
             "user_id": current_user.id
         })
         
+        SyncService(db).record_change(current_user.id, ChangeEntityType.goal, goal_id)
         db.commit()
+        goal_match_index_cache.invalidate(current_user.id)
         
         return {"message": "目标更新成功"}
         
@@ -817,12 +830,13 @@ def update_goal(goal_id: str, goal_data: dict, current_user: User = Depends(get_
 
 # ==================== 语音目标创建相关API ====================
 
-@router.post("/test-voice-recognition", response_model=VoiceRecognitionResponse)
+@router.post("/test-voice-recognition", response_model=VoiceRecognitionResponse, openapi_extra=AUDIO_UPLOAD_OPENAPI)
 async def test_voice_recognition(
-    audio: UploadFile = File(...),
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """测试语音识别API - 不需要认证，用于开发测试"""
+    audio = None
     try:
         logger.info("🔍 测试语音识别请求")
         
@@ -833,23 +847,17 @@ async def test_voice_recognition(
                 detail="语音识别服务暂时不可用，请稍后重试"
             )
         
-        # 读取音频文件
-        audio_content = await audio.read()
-        
-        # 检查文件大小 (限制为10MB)
-        if len(audio_content) > 10 * 1024 * 1024:
-            raise HTTPException(
-                status_code=400, 
-                detail="音频文件过大，请控制在10MB以内"
-            )
+        # 分块接收音频文件，超过大小限制立即中止
+        audio = await receive_audio_upload(request, MAX_AUDIO_SIZE, "音频文件过大，请控制在5MB以内")
         
         # 获取音频格式
         audio_format = audio.filename.split('.')[-1].lower() if audio.filename else 'mp3'
         
-        logger.info(f"🎤 开始识别音频: 格式={audio_format}, 大小={len(audio_content)}字节")
+        logger.info(f"🎤 开始识别音频: 格式={audio_format}, 大小={audio.size}字节")
         
         # 调用语音识别服务
-        result = await voice_recognition_service.recognize_voice(audio_content, audio_format)
+        result = await voice_recognition_service.recognize_voice(audio.file, audio_format)
+        raise_for_cloud_unavailable(result)
         
         if result['success']:
             logger.info(f"✅ 语音识别成功: {result['text']}")
@@ -870,14 +878,18 @@ async def test_voice_recognition(
     except Exception as e:
         logger.error(f"语音识别处理失败: {str(e)}")
         raise HTTPException(status_code=500, detail="语音识别处理失败")
+    finally:
+        if audio:
+            await audio.close()
 
-@router.post("/recognize-voice", response_model=VoiceRecognitionResponse)
+@router.post("/recognize-voice", response_model=VoiceRecognitionResponse, openapi_extra=AUDIO_UPLOAD_OPENAPI)
 async def recognize_voice(
-    audio: UploadFile = File(...),
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """语音识别API - 上传音频文件进行识别"""
+    audio = None
     try:
         logger.info(f"🔍 语音识别请求 - 用户ID: {current_user.id}")
         
@@ -888,18 +900,12 @@ async def recognize_voice(
                 detail="语音识别服务暂时不可用，请稍后重试"
             )
         
-        # 读取音频文件
-        audio_content = await audio.read()
-        
-        # 检查文件大小 (限制为10MB)
-        if len(audio_content) > 10 * 1024 * 1024:
-            raise HTTPException(
-                status_code=400, 
-                detail="音频文件过大，请上传10MB以内的文件"
-            )
+        # 分块接收音频文件，超过大小限制立即中止
+        audio = await receive_audio_upload(request, MAX_AUDIO_SIZE, "音频文件过大，请上传5MB以内的文件")
         
         # 调用语音识别服务
-        recognition_result = await voice_recognition_service.recognize_voice(audio_content)
+        recognition_result = await voice_recognition_service.recognize_voice(audio.file)
+        raise_for_cloud_unavailable(recognition_result)
         
         if recognition_result['success']:
             logger.info(f"✅ 语音识别成功: {recognition_result['text']}")
@@ -927,6 +933,9 @@ async def recognize_voice(
             status_code=500, 
             detail=f"语音识别处理失败: {str(e)}"
         )
+    finally:
+        if audio:
+            await audio.close()
 
 @router.post("/test-parse-voice", response_model=VoiceGoalParseResponse)
 async def test_parse_voice_to_goal(
@@ -1105,7 +1114,10 @@ async def create_goal_from_voice(
             "deadline_reminder": parsed_goal.get('deadlineReminder', True)
         })
         
+        SyncService(db).record_change(current_user.id, ChangeEntityType.goal, goal_id)
+        UserStatsService(db).goal_created(current_user.id)
         db.commit()
+        goal_match_index_cache.invalidate(current_user.id)
         
         # 8. 构建响应数据
         created_goal = {
@@ -1226,7 +1238,7 @@ def delete_goal(goal_id: str, current_user: User = Depends(get_current_user), db
         
         # 检查目标是否存在且属于当前用户
         result = db.execute(text("""
-            SELECT id, title FROM goals 
+            SELECT id, title, status FROM goals 
             WHERE id = :goal_id AND user_id = :user_id
         """), {
             "goal_id": goal_id,
@@ -1240,6 +1252,16 @@ def delete_goal(goal_id: str, current_user: User = Depends(get_current_user), db
         
         logger.info(f"✅ 找到目标: {goal.title}")
         
+        # 记下将被级联删除的过程记录，用于生成同步墓碑
+        result = db.execute(text("""
+            SELECT id FROM process_records 
+            WHERE goal_id = :goal_id AND user_id = :user_id
+        """), {
+            "goal_id": goal_id,
+            "user_id": current_user.id
+        })
+        deleted_record_ids = [row[0] for row in result.fetchall()]
+        
         # 直接删除目标
         db.execute(text("""
             DELETE FROM goals 
@@ -1258,7 +1280,18 @@ def delete_goal(goal_id: str, current_user: User = Depends(get_current_user), db
             "user_id": current_user.id
         })
         
+        sync_service = SyncService(db)
+        sync_service.record_change(current_user.id, ChangeEntityType.goal, goal_id, ChangeOperation.delete)
+        sync_service.record_changes(
+            current_user.id, ChangeEntityType.process_record, deleted_record_ids, ChangeOperation.delete
+        )
+        UserStatsService(db).goal_deleted(current_user.id, was_completed=goal.status == 'completed')
         db.commit()
+        goal_match_index_cache.invalidate(current_user.id)
+        for record_id in deleted_record_ids:
+            record_search_index.remove_record(current_user.id, record_id)
+        if deleted_record_ids:
+            recent_records_cache.invalidate(current_user.id)
         
         logger.info(f"✅ 目标删除成功 - 目标ID: {goal_id}")
         return {
@@ -3,13 +3,15 @@
 Photo records API endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form, Path, Query, Request, status
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
+import asyncio
 import logging
 import base64
 import os
+import uuid
 
 from app.database import get_db
 from app.models.process_record import ProcessRecord, ProcessRecordType, ProcessRecordSource
@@ -18,8 +20,18 @@ from app.api.auth import get_current_user
 from app.schemas.process_record import ProcessRecordResponse
 # 延迟导入 ocr_service，避免在开发模式下初始化失败
 # from app.services.tencent_ocr_service import ocr_service
-from app.utils.process_analyzer import process_analyzer
+from app.services.analysis_executor import analysis_executor
 from app.services.goal_progress_service import GoalProgressService
+from app.services.sync_service import SyncService
+from app.services.record_search_service import record_search_index
+from app.services.user_stats_service import UserStatsService
+from app.models.change_log import ChangeEntityType
+from app.services.cloud_executor import CloudServiceBusy, CloudCallTimeout
+from app.services.image_preprocessor import image_preprocessor, ImagePreprocessError, sniff_image_format, HEADER_SIZE
+from app.services.photo_record_pipeline import PhotoRecordPipeline, PhotoRecognitionError, OCRNotConfigured
+from app.services.photo_storage import photo_uploader, LocalPhotoStorage, DIRECT_UPLOAD_TYPES, MAX_PHOTO_SIZE
+from app.services.recognition_job_service import RecognitionJobService, photo_record_job_worker, ACTIVE_STATUSES
+from app.models.recognition_job import RecognitionJobKind, RecognitionJobStatus
 from app.config.settings import get_settings
 from pydantic import BaseModel
 
@@ -43,6 +55,54 @@ class PhotoRecordCreateResponse(BaseModel):
     analysis: Optional[dict] = None
 
 
+class PhotoRecordJobResponse(BaseModel):
+    """拍照记录任务响应"""
+    success: bool
+    message: str
+    data: Optional[dict] = None
+    record: Optional[ProcessRecordResponse] = None
+
+
+class PhotoUploadResponse(BaseModel):
+    """照片直传地址响应"""
+    success: bool
+    message: str
+    object_key: str
+    upload_url: str
+    method: str
+    headers: Dict[str, str]
+    expires_in: int
+
+
+def _recognition_error(e: Exception) -> HTTPException:
+    """把识别流程的异常转换为接口错误"""
+    if isinstance(e, PhotoRecognitionError):
+        logger.warning(f"⚠️ {e}")
+        return HTTPException(status_code=400, detail=str(e))
+    if isinstance(e, OCRNotConfigured):
+        logger.error("❌ OCR客户端未初始化")
+        return HTTPException(
+            status_code=503,
+            detail="OCR服务未配置，请联系管理员"
+        )
+    if isinstance(e, CloudServiceBusy):
+        return HTTPException(status_code=503, detail="OCR服务繁忙，请稍后重试", headers={"Retry-After": str(e.retry_after)})
+    if isinstance(e, CloudCallTimeout):
+        return HTTPException(status_code=504, detail="OCR识别超时，请稍后重试")
+    logger.error(f"❌ OCR识别异常: {str(e)}")
+    logger.exception("详细堆栈:")
+    return HTTPException(
+        status_code=500,
+        detail=f"OCR识别失败: {str(e)}"
+    )
+
+
+def _save_photo(content: bytes, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+
+
 @router.post("/recognize", response_model=PhotoRecognitionResponse)
 async def recognize_photo(
     photo: UploadFile = File(...),
@@ -105,10 +165,16 @@ async def recognize_photo(
         # 真实OCR识别
         from app.services.tencent_ocr_service import ocr_service
         
+        # 摆正、转灰度、缩小并重新压缩，无法识别的图片不再调用云端
+        try:
+            ocr_image = await image_preprocessor.prepare(photo_content)
+        except ImagePreprocessError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
         # 将图片转换为base64
-        image_base64 = base64.b64encode(photo_content).decode('utf-8')
+        image_base64 = base64.b64encode(ocr_image).decode('utf-8')
         
-        logger.info(f"📸 开始识别图片: 大小={len(photo_content)}字节")
+        logger.info(f"📸 开始识别图片: 大小={len(ocr_image)}字节")
         
         # 调用OCR服务识别
         ocr_results = await ocr_service.general_basic_ocr(image_base64)
@@ -145,6 +211,10 @@ async def recognize_photo(
         
     except HTTPException:
         raise
+    except CloudServiceBusy as e:
+        raise HTTPException(status_code=503, detail="OCR服务繁忙，请稍后重试", headers={"Retry-After": str(e.retry_after)})
+    except CloudCallTimeout:
+        raise HTTPException(status_code=504, detail="OCR识别超时，请稍后重试")
     except Exception as e:
         logger.error(f"照片识别失败: {str(e)}")
         raise HTTPException(
@@ -177,12 +247,16 @@ async def create_photo_record(
     try:
         logger.info(f"📝 创建照片记录 - 用户ID: {current_user.id}")
         
-        # 分析照片文本内容
-        analysis = process_analyzer.analyze_content(photo_text)
+        # 创建记录前读取并检查照片大小，最多读取上限加1字节
+        photo_content = await photo.read(MAX_PHOTO_SIZE + 1)
+        if len(photo_content) > MAX_PHOTO_SIZE:
+            raise HTTPException(
+                status_code=400,
+                detail="图片文件过大，请上传5MB以内的文件"
+            )
         
-        # 保存照片文件（可选，这里简化处理）
-        # TODO: 将照片上传到COS或本地存储
-        photo_url = None  # 暂时不保存照片
+        # 分析照片文本内容
+        analysis = await analysis_executor.analyze_content(photo_text)
         
         # 创建记录
         db_record = ProcessRecord(
@@ -200,13 +274,17 @@ async def create_photo_record(
             is_milestone=analysis['is_milestone'],
             is_breakthrough=analysis['is_breakthrough'],
             confidence_score=analysis['confidence_score'],
-            user_id=current_user.id,
-            # 可以添加photo_url字段存储照片地址
+            analyzer_version=analysis['analyzer_version'],
+            user_id=current_user.id
         )
         
         db.add(db_record)
+        db.flush()
+        SyncService(db).record_change(current_user.id, ChangeEntityType.process_record, db_record.id)
+        UserStatsService(db).record_created(current_user.id, db_record)
         db.commit()
         db.refresh(db_record)
+        record_search_index.index_record(db_record)
         
         # 如果有关联目标，更新目标进度
         if goal_id:
@@ -218,6 +296,13 @@ async def create_photo_record(
                 logger.warning(f"⚠️ 更新目标进度失败: {str(e)}")
                 # 不影响记录创建
         
+        # 照片在后台上传到COS（或本地存储）并生成缩略图，完成后地址写入 attachments；
+        # 记录已经提交，暂存失败只记录日志，返回错误会让客户端重试并重复创建记录
+        try:
+            await photo_uploader.submit(db_record.id, photo_content)
+        except Exception as e:
+            logger.error(f"❌ 记录 {db_record.id} 的照片暂存失败: {e}")
+        
         logger.info(f"✅ 照片记录创建成功: {db_record.id}")
         
         return PhotoRecordCreateResponse(
@@ -227,6 +312,8 @@ async def create_photo_record(
             analysis=analysis
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"创建照片记录失败: {str(e)}")
         db.rollback()
@@ -272,132 +359,175 @@ async def recognize_and_create_photo_record(
         
         # 检查是否配置了OCR服务
         settings = get_settings()
-        is_dev_mode = settings.OCR_DEV_MODE
-        logger.info(f"🔍 OCR_DEV_MODE配置: {is_dev_mode}")
-        logger.info(f"🔍 开发模式状态: {is_dev_mode}")
+        logger.info(f"🔍 OCR_DEV_MODE配置: {settings.OCR_DEV_MODE}")
         
-        if is_dev_mode:
-            # 开发模式：使用模拟数据
-            photo_text = "今天完成了Python学习任务，进度80%。学习了装饰器和生成器的使用。"
-            logger.info("🔧 开发模式：使用模拟OCR识别")
-        else:
-            # 真实OCR识别
-            try:
-                # 懒加载 OCR 服务
-                logger.info("🔧 导入OCR服务...")
-                from app.services.tencent_ocr_service import ocr_service
-                
-                logger.info(f"🔧 OCR客户端状态: {ocr_service.client is not None}")
-                
-                if not ocr_service.client:
-                    logger.error("❌ OCR客户端未初始化")
-                    raise HTTPException(
-                        status_code=503,
-                        detail="OCR服务未配置，请联系管理员"
-                    )
-                
-                image_base64 = base64.b64encode(photo_content).decode('utf-8')
-                logger.info(f"📸 开始调用OCR识别，图片大小: {len(photo_content)} 字节")
-                
-                ocr_results = await ocr_service.general_basic_ocr(image_base64)
-                
-                logger.info(f"📸 OCR调用完成，结果: {ocr_results is not None}")
-                
-                if not ocr_results:
-                    logger.warning("⚠️ OCR识别返回空结果（可能图片中无文字）")
-                    raise HTTPException(
-                        status_code=400,
-                        detail="图片中未检测到文字，请拍摄包含清晰文字的图片"
-                    )
-                
-                photo_text = " ".join([block["text"] for block in ocr_results])
-                logger.info(f"✅ OCR识别成功: {photo_text[:50]}...")
-            except HTTPException:
-                raise
-            except Exception as e:
-                logger.error(f"❌ OCR识别异常: {str(e)}")
-                logger.exception("详细堆栈:")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"OCR识别失败: {str(e)}"
-                )
-        
-        # 第二步：分析内容
-        analysis = process_analyzer.analyze_content(photo_text)
-        
-        # 第三步：智能匹配目标（如果未指定goal_id）
-        if not goal_id:
-            try:
-                from app.models.goal import Goal
-                from app.services.goal_matcher import goal_matcher
-                
-                logger.info("🎯 开始智能匹配目标...")
-                
-                # 获取用户的所有活跃目标
-                goals = db.query(Goal).filter(
-                    Goal.user_id == current_user.id,
-                    Goal.status == 'active'
-                ).all()
-                
-                if goals:
-                    # 使用新的智能匹配服务
-                    match_result = goal_matcher.match_goal(
-                        content=photo_text,
-                        goals=goals,
-                        user_id=current_user.id,
-                        db=db
-                    )
-                    
-                    if match_result:
-                        goal_id = match_result['matched_goal'].id
-                        logger.info(
-                            f"✅ 自动匹配到目标: {match_result['matched_goal'].title} "
-                            f"(分数: {match_result['score']:.2f}, "
-                            f"置信度: {match_result['confidence']}, "
-                            f"原因: {match_result['reason']})"
-                        )
-                    else:
-                        logger.info("ℹ️ 未找到匹配的目标")
-                else:
-                    logger.info("ℹ️ 用户暂无活跃目标")
-                    
-            except Exception as e:
-                logger.warning(f"⚠️ 目标匹配失败: {str(e)}")
-                # 继续创建记录，不影响主流程
+        pipeline = PhotoRecordPipeline(db)
+        try:
+            photo_text = await pipeline.recognize(photo_content)
+        except Exception as e:
+            raise _recognition_error(e)
         
-        # 第四步：创建记录
-        db_record = ProcessRecord(
-            content=photo_text,
-            record_type=ProcessRecordType(analysis['record_type']),
-            source=ProcessRecordSource.photo,
-            goal_id=goal_id,
-            event_date=datetime.utcnow(),
-            sentiment=analysis['sentiment'],
-            energy_level=analysis['energy_level'],
-            difficulty_level=analysis['difficulty_level'],
-            keywords=analysis['keywords'],
-            tags=analysis['tags'],
-            is_important=analysis['is_important'],
-            is_milestone=analysis['is_milestone'],
-            is_breakthrough=analysis['is_breakthrough'],
-            confidence_score=analysis['confidence_score'],
-            user_id=current_user.id
+        # 第二步到第五步：分析内容、智能匹配目标（如果未指定goal_id）、创建记录、更新目标进度
+        db_record, analysis = await pipeline.create_record(current_user.id, photo_text, goal_id)
+        await photo_uploader.submit(db_record.id, photo_content)
+        
+        logger.info(f"✅ 照片记录创建成功: {db_record.id}, 各阶段耗时: {pipeline.timings}")
+        
+        return PhotoRecordCreateResponse(
+            success=True,
+            message="照片识别并记录成功",
+            record=ProcessRecordResponse.from_orm(db_record),
+            analysis=analysis
         )
         
-        db.add(db_record)
-        db.commit()
-        db.refresh(db_record)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ 照片记录处理失败: {str(e)}")
+        logger.exception("详细错误信息:")  # 打印完整的堆栈跟踪
+        db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"照片记录处理失败: {str(e)}"
+        )
+
+
+@router.post("/uploads", response_model=PhotoUploadResponse)
+async def create_photo_upload(
+    request: Request,
+    content_type: str = Form("image/jpeg"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    获取照片直传地址
+    
+    客户端用返回的 method、headers 把照片直接上传到 upload_url（COS预签名地址；未配置COS时为本服务的
+    验签上传地址），然后用 object_key 调用 /recognize-and-create-by-key。照片不经过应用服务器，
+    上传大小在识别时检查（5MB以内）。
+    
+    Args:
+        content_type: 照片类型，image/jpeg、image/png 或 image/bmp
+        current_user: 当前登录用户
         
-        # 第四步：更新目标进度
-        if goal_id:
+    Returns:
+        对象键和直传地址
+    """
+    extension = DIRECT_UPLOAD_TYPES.get(content_type)
+    if not extension:
+        raise HTTPException(status_code=400, detail="不支持的图片格式，请上传 jpg 或 png 图片")
+    
+    settings = get_settings()
+    object_key = (
+        f"{settings.PHOTO_DIRECT_UPLOAD_PREFIX}/{current_user.id}/"
+        f"{datetime.utcnow().strftime('%Y/%m/%d')}/{uuid.uuid4().hex}.{extension}"
+    )
+    upload = photo_uploader.storage.presign_put(object_key, content_type, settings.PHOTO_DIRECT_UPLOAD_EXPIRES_SECONDS)
+    if not upload:
+        raise HTTPException(status_code=503, detail="照片存储暂不可用，请稍后重试")
+    
+    upload_url = upload["url"]
+    if upload_url.startswith("/"):
+        # 本地存储的上传地址是本服务的路径
+        upload_url = str(request.base_url).rstrip("/") + upload_url
+    
+    logger.info(f"📤 签发照片直传地址 - 用户ID: {current_user.id}, 对象键: {object_key}")
+    return PhotoUploadResponse(
+        success=True,
+        message="获取上传地址成功",
+        object_key=object_key,
+        upload_url=upload_url,
+        method=upload["method"],
+        headers=upload["headers"],
+        expires_in=settings.PHOTO_DIRECT_UPLOAD_EXPIRES_SECONDS
+    )
+
+
+@router.put("/uploads/{object_key:path}", include_in_schema=False)
+async def put_local_photo(
+    request: Request,
+    object_key: str = Path(..., description="对象键"),
+    expires: int = Query(...),
+    signature: str = Query(...)
+):
+    """本地存储的直传地址：验证签名和过期时间后写入，与COS预签名上传的行为一致"""
+    storage = photo_uploader.storage
+    if not isinstance(storage, LocalPhotoStorage):
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not storage.verify_put(object_key, request.headers.get("content-type", ""), expires, signature):
+        raise HTTPException(status_code=403, detail="签名无效或已过期")
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > MAX_PHOTO_SIZE:
+        raise HTTPException(status_code=413, detail="图片文件过大，请上传5MB以内的文件")
+    
+    # Content-Length 可能缺失或与实际不符，边读边累计大小，超过上限立即停止
+    content = bytearray()
+    async for chunk in request.stream():
+        content += chunk
+        if len(content) > MAX_PHOTO_SIZE:
+            raise HTTPException(status_code=413, detail="图片文件过大，请上传5MB以内的文件")
+    await storage.put(object_key, bytes(content))
+    return {"success": True, "object_key": object_key}
+
+
+@router.post("/recognize-and-create-by-key", response_model=PhotoRecordCreateResponse)
+async def recognize_and_create_photo_record_by_key(
+    object_key: str = Form(...),
+    goal_id: Optional[str] = Form(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    识别已直传到存储的照片并创建记录
+    
+    与 /recognize-and-create 相同，只是照片由 object_key 指定（来自 /uploads）。COS存储时OCR服务
+    直接从COS下载照片；缩略图在后台生成。每个对象键只能创建一条记录，识别失败时可以用同一对象键重试。
+    
+    Args:
+        object_key: /uploads 返回的对象键
+        goal_id: 关联的目标ID（可选）
+        current_user: 当前登录用户
+        db: 数据库会话
+        
+    Returns:
+        创建结果
+    """
+    try:
+        logger.info(f"📷 直传照片记录 - 用户ID: {current_user.id}, 对象键: {object_key}")
+        
+        settings = get_settings()
+        if not object_key.startswith(f"{settings.PHOTO_DIRECT_UPLOAD_PREFIX}/{current_user.id}/") or ".." in object_key:
+            raise HTTPException(status_code=400, detail="对象键无效")
+        
+        storage = photo_uploader.storage
+        pipeline = PhotoRecordPipeline(db)
+        try:
+            info = await storage.stat(object_key)
+            if info is None:
+                raise HTTPException(status_code=404, detail="照片不存在或已使用，请重新上传")
+            if info["size"] > MAX_PHOTO_SIZE:
+                await storage.delete(object_key)
+                raise HTTPException(status_code=400, detail="图片文件过大，请上传5MB以内的文件")
+            # 对象键只能使用一次：登记使用记录并把照片移到记录专用的对象键，重复或并发提交时返回 404
+            stored_key = await photo_uploader.claim_stored(object_key, current_user.id)
+            if stored_key is None:
+                raise HTTPException(status_code=404, detail="照片不存在或已使用，请重新上传")
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise _recognition_error(e)
+        
+        try:
             try:
-                progress_service = GoalProgressService(db)
-                progress_service.update_goal_progress_from_record(goal_id, db_record)
-                logger.info(f"✅ 目标进度已更新: {goal_id}")
+                photo_text = await pipeline.recognize_stored(storage, stored_key)
             except Exception as e:
-                logger.warning(f"⚠️ 更新目标进度失败: {str(e)}")
+                raise _recognition_error(e)
+            db_record, analysis = await pipeline.create_record(current_user.id, photo_text, goal_id)
+        except Exception:
+            await photo_uploader.release_stored(stored_key, object_key)
+            raise
+        await photo_uploader.submit_stored(db_record.id, stored_key)
         
-        logger.info(f"✅ 照片记录创建成功: {db_record.id}")
+        logger.info(f"✅ 照片记录创建成功: {db_record.id}, 各阶段耗时: {pipeline.timings}")
         
         return PhotoRecordCreateResponse(
             success=True,
@@ -410,10 +540,105 @@ async def recognize_and_create_photo_record(
         raise
     except Exception as e:
         logger.error(f"❌ 照片记录处理失败: {str(e)}")
-        logger.exception("详细错误信息:")  # 打印完整的堆栈跟踪
+        logger.exception("详细错误信息:")
         db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"照片记录处理失败: {str(e)}"
         )
 
+
+@router.post("/jobs", response_model=PhotoRecordJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_photo_record_job(
+    photo: UploadFile = File(...),
+    goal_id: Optional[str] = Form(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    异步识别照片并创建记录
+    
+    保存照片后立即返回任务ID，识别、分析、匹配目标、创建记录和更新进度由后台 worker 完成；
+    客户端按 poll_after 秒后调用 GET /api/photo-records/jobs/{job_id} 查询结果。
+    
+    Args:
+        photo: 照片文件
+        goal_id: 关联的目标ID（可选，为空时自动匹配）
+        current_user: 当前登录用户
+        db: 数据库会话
+        
+    Returns:
+        任务状态
+    """
+    try:
+        photo_content = await photo.read()
+        logger.info(f"📷 拍照记录任务 - 用户ID: {current_user.id}, 大小: {len(photo_content)} 字节")
+        
+        # 检查文件大小
+        if len(photo_content) > 5 * 1024 * 1024:
+            raise HTTPException(
+                status_code=400,
+                detail="图片文件过大，请上传5MB以内的文件"
+            )
+        
+        image_format = sniff_image_format(photo_content[:HEADER_SIZE])
+        if image_format is None:
+            raise HTTPException(status_code=400, detail="不支持的图片格式，请上传 jpg 或 png 图片")
+        
+        settings = get_settings()
+        path = os.path.join(settings.PHOTO_JOB_STORAGE_DIR, f"{uuid.uuid4().hex}.{image_format}")
+        await asyncio.to_thread(_save_photo, photo_content, path)
+        
+        job = RecognitionJobService(db).create_photo_record_job(
+            current_user.id, path, image_format, len(photo_content), goal_id
+        )
+        photo_record_job_worker.wake()
+        
+        data = RecognitionJobService.to_dict(job)
+        data["poll_after"] = settings.PHOTO_JOB_POLL_AFTER_SECONDS
+        return PhotoRecordJobResponse(
+            success=True,
+            message="照片已接收，正在识别",
+            data=data
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ 创建拍照记录任务失败: {str(e)}")
+        db.rollback()
+        raise HTTPException(
+            status_code=500,
+            detail=f"创建拍照记录任务失败: {str(e)}"
+        )
+
+
+@router.get("/jobs/{job_id}", response_model=PhotoRecordJobResponse)
+async def get_photo_record_job(
+    job_id: int = Path(..., description="任务ID"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """查询拍照记录任务状态，status 为 succeeded 时返回创建的记录，stage_timings 为各阶段耗时（毫秒）"""
+    job = RecognitionJobService(db).get_job(current_user.id, job_id, kind=RecognitionJobKind.photo_record)
+    if not job:
+        raise HTTPException(status_code=404, detail="拍照记录任务不存在")
+    
+    data = RecognitionJobService.to_dict(job)
+    record = None
+    if job.status in ACTIVE_STATUSES:
+        data["poll_after"] = get_settings().PHOTO_JOB_POLL_AFTER_SECONDS
+    elif job.status == RecognitionJobStatus.succeeded.value and job.result:
+        db_record = db.query(ProcessRecord).filter(
+            ProcessRecord.id == job.result["record_id"],
+            ProcessRecord.user_id == current_user.id
+        ).first()
+        if db_record:
+            record = ProcessRecordResponse.from_orm(db_record)
+    
+    return PhotoRecordJobResponse(
+        success=True,
+        message="获取拍照记录任务成功",
+        data=data,
+        record=record
+    )
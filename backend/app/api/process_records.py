@@ -3,7 +3,7 @@
 Process records API endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Path, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Request
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta
@@ -16,18 +16,40 @@ from app.api.auth import get_current_user
 from app.schemas.process_record import (
     ProcessRecordCreate, ProcessRecordUpdate, ProcessRecordResponse,
     ProcessRecordListResponse, ProcessRecordTimelineResponse,
-    ProcessRecordStatsResponse, VoiceProcessRecordRequest, VoiceProcessRecordResponse
+    ProcessRecordStatsResponse, VoiceProcessRecordRequest, VoiceProcessRecordResponse,
+    AnalyzeBatchRequest, AnalyzeBatchResponse
 )
-from app.utils.process_analyzer import process_analyzer
+from app.services.analysis_executor import analysis_executor
 from app.utils.voice_parser import voice_goal_parser
-from app.services.voice_recognition import voice_recognition_service
+from app.services.voice_recognition import voice_recognition_service, MAX_AUDIO_SIZE
+from app.services.audio_upload import receive_audio_upload, AUDIO_UPLOAD_OPENAPI
+from app.services.cloud_executor import raise_for_cloud_unavailable
 from app.services.goal_progress_service import GoalProgressService
+from app.services.sync_service import SyncService
+from app.services.record_search_service import RecordSearchService, record_search_index
+from app.services.recent_records_service import recent_records_cache
+from app.services.user_stats_service import UserStatsService
+from app.services.photo_storage import photo_uploader
+from app.models.change_log import ChangeEntityType, ChangeOperation
 from app.schemas.goals import VoiceRecognitionResponse
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/process-records", tags=["process-records"])
 
+# 推荐目标接口返回的候选数：默认值与上限
+SUGGEST_TOP_K_DEFAULT = 3
+SUGGEST_TOP_K_MAX = 10
+
+
+def _suggest_top_k(value) -> int:
+    """把请求中的 top_k 转为整数并限制在 1~SUGGEST_TOP_K_MAX，无法转换时使用默认值"""
+    try:
+        top_k = int(value)
+    except (TypeError, ValueError, OverflowError):
+        return SUGGEST_TOP_K_DEFAULT
+    return min(max(top_k, 1), SUGGEST_TOP_K_MAX)
+
 
 @router.post("/", response_model=ProcessRecordResponse)
 async def create_process_record(
@@ -38,7 +60,7 @@ async def create_process_record(
     """创建过程记录"""
     try:
         # 分析内容
-        analysis = process_analyzer.analyze_content(record_data.content)
+        analysis = await analysis_executor.analyze_content(record_data.content)
         
         # 创建记录
         record_dict = record_data.dict()
@@ -59,14 +81,19 @@ async def create_process_record(
             'is_important': analysis['is_important'],
             'is_milestone': analysis['is_milestone'],
             'is_breakthrough': analysis['is_breakthrough'],
-            'confidence_score': analysis['confidence_score']
+            'confidence_score': analysis['confidence_score'],
+            'analyzer_version': analysis['analyzer_version']
         })
         
         db_record = ProcessRecord(**record_dict)
         
         db.add(db_record)
+        db.flush()
+        SyncService(db).record_change(current_user.id, ChangeEntityType.process_record, db_record.id)
+        UserStatsService(db).record_created(current_user.id, db_record)
         db.commit()
         db.refresh(db_record)
+        record_search_index.index_record(db_record)
         
         # 如果有关联目标，更新目标进度
         if record_data.goal_id:
@@ -91,7 +118,7 @@ async def create_voice_process_record(
     """通过语音创建过程记录"""
     try:
         # 分析语音内容
-        analysis = process_analyzer.analyze_content(request.voice_text)
+        analysis = await analysis_executor.analyze_content(request.voice_text)
         
         # 创建记录
         db_record = ProcessRecord(
@@ -109,12 +136,17 @@ async def create_voice_process_record(
             is_milestone=analysis['is_milestone'],
             is_breakthrough=analysis['is_breakthrough'],
             confidence_score=analysis['confidence_score'],
+            analyzer_version=analysis['analyzer_version'],
             user_id=current_user.id
         )
         
         db.add(db_record)
+        db.flush()
+        SyncService(db).record_change(current_user.id, ChangeEntityType.process_record, db_record.id)
+        UserStatsService(db).record_created(current_user.id, db_record)
         db.commit()
         db.refresh(db_record)
+        record_search_index.index_record(db_record)
         
         # 如果有关联目标，更新目标进度
         if request.goal_id:
@@ -162,7 +194,7 @@ async def update_process_record(
         
         # 如果内容有变化，重新分析
         if 'content' in update_data and update_data['content'] != record.content:
-            analysis = process_analyzer.analyze_content(update_data['content'])
+            analysis = await analysis_executor.analyze_content(update_data['content'])
             
             # 优先使用用户输入的标签，如果用户没有输入标签则不添加标签
             user_tags = update_data.get('tags', [])
@@ -179,7 +211,8 @@ async def update_process_record(
                 'is_important': analysis['is_important'],
                 'is_milestone': analysis['is_milestone'],
                 'is_breakthrough': analysis['is_breakthrough'],
-                'confidence_score': analysis['confidence_score']
+                'confidence_score': analysis['confidence_score'],
+                'analyzer_version': analysis['analyzer_version']
             })
         
         # 更新记录
@@ -189,8 +222,11 @@ async def update_process_record(
         
         record.updated_at = datetime.utcnow()
         
+        SyncService(db).record_change(current_user.id, ChangeEntityType.process_record, record.id)
         db.commit()
         db.refresh(record)
+        record_search_index.index_record(record)
+        recent_records_cache.invalidate(current_user.id)
         
         logger.info(f"更新过程记录成功: {record.id}")
         return ProcessRecordResponse.from_orm(record)
@@ -203,6 +239,26 @@ async def update_process_record(
         raise HTTPException(status_code=500, detail=f"更新过程记录失败: {str(e)}")
 
 
+@router.post("/analyze-batch", response_model=AnalyzeBatchResponse)
+async def analyze_batch(
+    request: AnalyzeBatchRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """批量分析内容（如导入历史记录、多页OCR），大批量时由进程池并行处理"""
+    try:
+        results = await analysis_executor.analyze_batch_async(request.contents)
+        
+        return AnalyzeBatchResponse(
+            success=True,
+            message=f"分析完成，共 {len(results)} 条",
+            results=results
+        )
+        
+    except Exception as e:
+        logger.error(f"批量分析失败: {e}")
+        raise HTTPException(status_code=500, detail=f"批量分析失败: {str(e)}")
+
+
 @router.post("/suggest-goal", response_model=dict)
 async def suggest_goal_for_content(
     request: dict,
@@ -212,7 +268,7 @@ async def suggest_goal_for_content(
     """根据内容智能推荐最相关的目标"""
     try:
         from app.models.goal import Goal
-        from app.services.goal_matcher import goal_matcher
+        from app.services.goal_matcher import goal_matcher, MATCH_THRESHOLD
         
         # 从请求中获取内容
         content = request.get('content', '')
@@ -236,13 +292,24 @@ async def suggest_goal_for_content(
                 "message": "没有可关联的目标"
             }
         
-        # 使用新的智能匹配服务
-        match_result = goal_matcher.match_goal(
+        # 一次打分得到前几个候选目标，最高分达到阈值才推荐
+        ranked = goal_matcher.rank_goals(
             content=content,
             goals=goals,
             user_id=current_user.id,
-            db=db
+            db=db,
+            top_k=_suggest_top_k(request.get('top_k', SUGGEST_TOP_K_DEFAULT))
         )
+        candidates = [
+            {
+                "id": candidate['matched_goal'].id,
+                "title": candidate['matched_goal'].title,
+                "score": candidate['score'],
+                "confidence": candidate['confidence']
+            }
+            for candidate in ranked
+        ]
+        match_result = ranked[0] if ranked and ranked[0]['score'] >= MATCH_THRESHOLD else None
         
         if match_result:
             matched_goal = match_result['matched_goal']
@@ -264,6 +331,7 @@ async def suggest_goal_for_content(
                 "confidence": min(confidence_value, 1.0),
                 "score": match_result['score'],
                 "reason": match_result['reason'],
+                "candidates": candidates,
                 "message": f"推荐关联目标: {matched_goal.title}"
             }
         else:
@@ -271,6 +339,7 @@ async def suggest_goal_for_content(
                 "success": True,
                 "suggested_goal": None,
                 "confidence": 0,
+                "candidates": candidates,
                 "message": "未找到相关目标"
             }
             
@@ -455,6 +524,38 @@ async def get_process_records_stats(
         raise HTTPException(status_code=500, detail=f"获取过程记录统计失败: {str(e)}")
 
 
+@router.get("/search", response_model=ProcessRecordListResponse)
+async def search_process_records(
+    q: str = Query(..., min_length=1, max_length=100, description="搜索关键词"),
+    goal_id: Optional[str] = Query(None, description="目标ID"),
+    page: int = Query(1, ge=1, description="页码"),
+    page_size: int = Query(20, ge=1, le=100, description="每页数量"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """按相关度搜索过程记录内容"""
+    try:
+        result = RecordSearchService(db).search(
+            user_id=current_user.id,
+            query=q,
+            goal_id=goal_id,
+            page=page,
+            page_size=page_size
+        )
+        
+        return ProcessRecordListResponse(
+            records=[ProcessRecordResponse.from_orm(record) for record in result['records']],
+            total=result['total'],
+            page=result['page'],
+            page_size=result['page_size'],
+            has_next=result['has_next']
+        )
+        
+    except Exception as e:
+        logger.error(f"搜索过程记录失败: {e}")
+        raise HTTPException(status_code=500, detail=f"搜索过程记录失败: {str(e)}")
+
+
 @router.get("/{record_id}", response_model=ProcessRecordResponse)
 async def get_process_record(
     record_id: int = Path(..., description="记录ID"),
@@ -508,7 +609,7 @@ async def update_process_record(
         
         # 如果内容有变化，重新分析
         if 'content' in update_dict:
-            analysis = process_analyzer.analyze_content(update_dict['content'])
+            analysis = await analysis_executor.analyze_content(update_dict['content'])
             record.sentiment = analysis['sentiment']
             record.energy_level = analysis['energy_level']
             record.difficulty_level = analysis['difficulty_level']
@@ -518,9 +619,13 @@ async def update_process_record(
             record.is_milestone = analysis['is_milestone']
             record.is_breakthrough = analysis['is_breakthrough']
             record.confidence_score = analysis['confidence_score']
+            record.analyzer_version = analysis['analyzer_version']
         
+        SyncService(db).record_change(current_user.id, ChangeEntityType.process_record, record.id)
         db.commit()
         db.refresh(record)
+        record_search_index.index_record(record)
+        recent_records_cache.invalidate(current_user.id)
         
         logger.info(f"更新过程记录成功: {record_id}")
         return ProcessRecordResponse.from_orm(record)
@@ -549,8 +654,15 @@ async def delete_process_record(
         if not record:
             raise HTTPException(status_code=404, detail="过程记录不存在")
         
+        attachments = record.attachments
         db.delete(record)
+        SyncService(db).record_change(
+            current_user.id, ChangeEntityType.process_record, record_id, ChangeOperation.delete
+        )
         db.commit()
+        record_search_index.remove_record(current_user.id, record_id)
+        recent_records_cache.invalidate(current_user.id)
+        await photo_uploader.remove(attachments)
         
         logger.info(f"删除过程记录成功: {record_id}")
         return {"message": "过程记录删除成功"}
@@ -563,13 +675,14 @@ async def delete_process_record(
         raise HTTPException(status_code=500, detail=f"删除过程记录失败: {str(e)}")
 
 
-@router.post("/recognize-voice", response_model=VoiceRecognitionResponse)
+@router.post("/recognize-voice", response_model=VoiceRecognitionResponse, openapi_extra=AUDIO_UPLOAD_OPENAPI)
 async def recognize_voice(
-    audio: UploadFile = File(...),
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """语音识别API - 上传音频文件进行识别"""
+    audio = None
     try:
         logger.info(f"🔍 过程记录语音识别请求 - 用户ID: {current_user.id}")
         
@@ -580,18 +693,12 @@ async def recognize_voice(
                 detail="语音识别服务暂时不可用，请稍后重试"
             )
         
-        # 读取音频文件
-        audio_content = await audio.read()
-        
-        # 检查文件大小 (限制为10MB)
-        if len(audio_content) > 10 * 1024 * 1024:
-            raise HTTPException(
-                status_code=400, 
-                detail="音频文件过大，请上传10MB以内的文件"
-            )
+        # 分块接收音频文件，超过大小限制立即中止
+        audio = await receive_audio_upload(request, MAX_AUDIO_SIZE, "音频文件过大，请上传5MB以内的文件")
         
         # 调用语音识别服务
-        recognition_result = await voice_recognition_service.recognize_voice(audio_content)
+        recognition_result = await voice_recognition_service.recognize_voice(audio.file)
+        raise_for_cloud_unavailable(recognition_result)
         
         if recognition_result.get("success"):
             logger.info(f"✅ 语音识别成功 - 用户ID: {current_user.id}")
@@ -605,10 +712,10 @@ async def recognize_voice(
                 }
             )
         else:
-            logger.warning(f"⚠️ 语音识别失败 - 用户ID: {current_user.id}, 错误: {recognition_result.get('message', '未知错误')}")
+            logger.warning(f"⚠️ 语音识别失败 - 用户ID: {current_user.id}, 错误: {recognition_result.get('error', '未知错误')}")
             raise HTTPException(
                 status_code=400,
-                detail=recognition_result.get("message", "语音识别失败")
+                detail=recognition_result.get("error", "语音识别失败")
             )
             
     except HTTPException:
@@ -619,6 +726,9 @@ async def recognize_voice(
             status_code=500,
             detail=f"语音识别服务异常: {str(e)}"
         )
+    finally:
+        if audio:
+            await audio.close()
 
 
 @router.get("/goal-progress/{goal_id}")
@@ -10,6 +10,7 @@ from sqlalchemy.orm import Session
 from ..api.auth import get_current_user
 from ..models.user import User
 from ..database import get_db
+from ..services.recent_records_service import RecentRecordsService
 
 router = APIRouter(prefix="/api/records", tags=["记录"])
 
@@ -27,36 +28,12 @@ class RecordResponse(BaseModel):
 
 @router.get("/recent", response_model=RecordResponse)
 async def get_recent_records(
+    current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """获取最近记录"""
+    """获取当前用户的最近记录"""
     try:
-        # 从过程记录表查询最近的记录
-        from sqlalchemy import text
-        
-        # 查询最近的过程记录
-        query = text("""
-            SELECT id, content, record_type, source, recorded_at, sentiment
-            FROM process_records 
-            WHERE is_deleted = FALSE 
-            ORDER BY recorded_at DESC 
-            LIMIT 10
-        """)
-        
-        result = db.execute(query)
-        records = result.fetchall()
-        
-        # 转换为前端需要的格式
-        recent_records = []
-        for record in records:
-            recent_records.append({
-                "id": str(record[0]),
-                "type": record[2],  # record_type
-                "content": record[1],  # content
-                "source": record[3],  # source
-                "sentiment": record[5],  # sentiment
-                "created_at": record[4].isoformat() if record[4] else None
-            })
+        recent_records = RecentRecordsService(db).get_recent(current_user.id)
         
         return RecordResponse(
             success=True,
@@ -0,0 +1,57 @@
+"""
+增量同步API
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import BaseModel
+from typing import Optional
+from sqlalchemy.orm import Session
+import logging
+
+from ..api.auth import get_current_user
+from ..models.user import User
+from ..database import get_db
+from ..schemas.process_record import ProcessRecordResponse
+from ..services.sync_service import SyncService
+
+router = APIRouter(prefix="/api/sync", tags=["同步"])
+logger = logging.getLogger(__name__)
+
+
+# 响应模型
+class SyncResponse(BaseModel):
+    success: bool
+    message: str
+    data: Optional[dict] = None
+
+
+@router.get("", response_model=SyncResponse)
+async def get_changes(
+    since: int = Query(0, ge=0, description="上次同步返回的游标，0表示从头开始"),
+    limit: int = Query(100, ge=1, le=500, description="每页最多读取的变更数"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    获取游标之后的增量变更
+
+    返回变更后的目标和过程记录、已删除实体的墓碑以及下一次请求使用的游标。
+    has_more 为 true 时客户端应继续用新游标拉取，直到取完。
+    """
+    try:
+        changes = SyncService(db).get_changes(current_user.id, since, limit)
+        changes["process_records"] = [
+            ProcessRecordResponse.from_orm(record) for record in changes["process_records"]
+        ]
+
+        return SyncResponse(
+            success=True,
+            message="获取增量数据成功",
+            data=changes
+        )
+
+    except Exception as e:
+        logger.error(f"获取增量数据失败: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"获取增量数据失败: {str(e)}"
+        )
@@ -9,6 +9,8 @@ from datetime import datetime
 from ..api.auth import get_current_user
 from ..models.user import User
 from ..database import get_db
+from ..services.sync_service import SyncService
+from ..services.user_stats_service import UserStatsService
 from sqlalchemy.orm import Session
 
 router = APIRouter(prefix="/api/user", tags=["用户"])
@@ -29,14 +31,8 @@ async def get_user_stats(
 ):
     """获取用户统计数据"""
     try:
-        # 这里应该从数据库查询实际的统计数据
-        # 目前返回模拟数据
-        stats = {
-            "totalGoals": "5",
-            "activeGoals": "3", 
-            "completedGoals": "2",
-            "completionRate": "40"
-        }
+        # 计数器随目标和记录写入增量维护，这里只读当前用户这一行
+        stats = UserStatsService.get_stats(current_user)
         
         return UserStatsResponse(
             success=True,
@@ -82,10 +78,14 @@ async def sync_user_data(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """同步用户数据"""
+    """
+    同步用户数据
+
+    返回当前最新的同步游标。客户端全量拉取目标和记录之前先取游标，
+    之后用 GET /api/sync?since=<cursor> 只拉取增量变更。
+    """
     try:
-        # 这里应该实现实际的数据同步逻辑
-        # 比如从第三方平台同步数据
+        cursor = SyncService(db).get_latest_cursor(current_user.id)
         
         # 更新最后同步时间
         current_user.updated_at = datetime.utcnow()
@@ -95,7 +95,8 @@ async def sync_user_data(
             "success": True,
             "message": "数据同步成功",
             "data": {
-                "sync_time": datetime.utcnow().isoformat()
+                "sync_time": datetime.utcnow().isoformat(),
+                "cursor": cursor
             }
         }
         
@@ -0,0 +1,117 @@
+"""
+长录音异步识别API
+"""
+from fastapi import APIRouter, Depends, HTTPException, Path, Request, status
+from pydantic import BaseModel
+from typing import Optional
+from sqlalchemy.orm import Session
+import asyncio
+import logging
+import os
+import shutil
+import uuid
+
+from ..api.auth import get_current_user
+from ..models.user import User
+from ..database import get_db
+from ..config.settings import get_settings
+from ..services.audio_upload import receive_audio_upload, AUDIO_UPLOAD_OPENAPI
+from ..services.audio_preprocessor import sniff_audio_format, HEADER_SIZE
+from ..models.recognition_job import RecognitionJobKind
+from ..services.recognition_job_service import (
+    RecognitionJobService, recognition_job_worker, DIRECT_UPLOAD_MAX_SIZE, ACTIVE_STATUSES
+)
+
+router = APIRouter(prefix="/api/voice-jobs", tags=["语音识别任务"])
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+# 响应模型
+class VoiceJobResponse(BaseModel):
+    success: bool
+    message: str
+    data: Optional[dict] = None
+
+
+def _save_upload(source, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    source.seek(0)
+    with open(path, "wb") as f:
+        shutil.copyfileobj(source, f)
+
+
+@router.post("", response_model=VoiceJobResponse, status_code=status.HTTP_202_ACCEPTED, openapi_extra=AUDIO_UPLOAD_OPENAPI)
+async def create_voice_job(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    上传长录音，创建异步识别任务
+
+    立即返回任务ID，识别由后台 worker 完成；客户端按 poll_after 秒后调用
+    GET /api/voice-jobs/{job_id} 查询结果。适用于超过一句话识别限制（60秒/5MB）的录音。
+    """
+    audio = None
+    try:
+        audio = await receive_audio_upload(
+            request,
+            settings.ASR_JOB_MAX_AUDIO_SIZE,
+            f"音频文件过大，请上传{settings.ASR_JOB_MAX_AUDIO_SIZE // (1024 * 1024)}MB以内的文件"
+        )
+
+        voice_format = sniff_audio_format(await audio.read(HEADER_SIZE))
+        if voice_format is None:
+            raise HTTPException(status_code=400, detail="不支持的音频格式，请使用 mp3、m4a 或 wav 录音")
+
+        if audio.size > DIRECT_UPLOAD_MAX_SIZE and not settings.COS_BUCKET_NAME:
+            raise HTTPException(status_code=400, detail="超过5MB的录音需要配置对象存储后才能识别")
+
+        path = os.path.join(settings.ASR_JOB_STORAGE_DIR, f"{uuid.uuid4().hex}.{voice_format}")
+        await asyncio.to_thread(_save_upload, audio.file, path)
+
+        job = RecognitionJobService(db).create_voice_job(current_user.id, path, voice_format, audio.size)
+        recognition_job_worker.wake()
+
+        data = RecognitionJobService.to_dict(job)
+        data["poll_after"] = settings.ASR_JOB_POLL_INITIAL_SECONDS
+        return VoiceJobResponse(
+            success=True,
+            message="录音已接收，正在识别",
+            data=data
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"创建录音识别任务失败: {e}")
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"创建录音识别任务失败: {str(e)}"
+        )
+    finally:
+        if audio:
+            await audio.close()
+
+
+@router.get("/{job_id}", response_model=VoiceJobResponse)
+async def get_voice_job(
+    job_id: int = Path(..., description="任务ID"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """查询识别任务状态，status 为 succeeded 时 result.text 为识别文本"""
+    job = RecognitionJobService(db).get_job(current_user.id, job_id, kind=RecognitionJobKind.voice)
+    if not job:
+        raise HTTPException(status_code=404, detail="识别任务不存在")
+
+    data = RecognitionJobService.to_dict(job)
+    if job.status in ACTIVE_STATUSES:
+        data["poll_after"] = settings.ASR_JOB_POLL_INITIAL_SECONDS
+    return VoiceJobResponse(
+        success=True,
+        message="获取识别任务成功",
+        data=data
+    )
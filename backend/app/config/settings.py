@@ -61,22 +61,122 @@ class Settings(BaseSettings):
     BAIDU_SPEECH_API_KEY: str = ""
     BAIDU_SPEECH_SECRET_KEY: str = ""
     
+    # 过程记录分析进程池配置
+    ANALYSIS_EXECUTOR_ENABLED: bool = True  # 关闭后所有分析在请求内同步执行
+    ANALYSIS_WORKERS: int = 0  # 进程数，0 表示使用CPU核数
+    ANALYSIS_OFFLOAD_MIN_CHARS: int = 2000  # 单条内容超过该长度才提交到进程池
+    ANALYSIS_BATCH_MIN_SIZE: int = 16  # 批量分析超过该条数才分发到进程池
+    
+    # 关键词词典配置
+    KEYWORD_DICTIONARY_PATH: str = ""  # 为空时使用 app/data/keyword_dictionaries.json
+    KEYWORD_DICTIONARY_RELOAD_SECONDS: int = 30  # 检查词典文件变化的间隔，0 表示不自动重新加载
+    
+    # 目标匹配配置
+    GOAL_MATCH_VECTORIZED_MIN_GOALS: int = 100  # 候选目标达到该数量时使用 NumPy 向量化打分，0 表示不使用
+    
     # 腾讯云配置
     TENCENT_SECRET_ID: str = ""
     TENCENT_SECRET_KEY: str = ""
     TENCENT_REGION: str = "ap-beijing"
     TENCENT_ASR_REGION: str = "ap-shanghai"
+    TENCENT_CLOUD_STUB_URL: str = ""  # 例如 http://127.0.0.1:9100，设置后 ASR/OCR/COS 客户端都指向 scripts/tencent_cloud_stub.py 启动的本地模拟服务
     
     # 语音识别开发模式配置
     ASR_DEV_MODE: bool = False  # 生产环境默认使用真实语音识别
+    ASR_MAX_CONCURRENCY: int = 4  # 同时进行的语音识别调用数
+    ASR_MAX_QUEUE: int = 0  # 并发已满时允许排队的调用数，超出后直接返回繁忙
+    ASR_TIMEOUT_SECONDS: int = 15  # 单次语音识别的截止时间
+    ASR_MAX_DURATION_SECONDS: int = 60  # 一句话识别支持的最长录音
+    ASR_HEDGE_ENABLED: bool = False  # 对冲请求会额外计费，默认关闭，见 CLOUD_HEDGE_PERCENTILE
+    
+    # 语音识别前的音频归一化（需要 pydub/librosa，mp3/m4a 还需要 ffmpeg）
+    AUDIO_PREPROCESS_ENABLED: bool = True  # 关闭后音频按识别出的格式原样发送
+    AUDIO_PREPROCESS_WORKERS: int = 1  # 归一化进程数
+    AUDIO_PREPROCESS_TIMEOUT_SECONDS: int = 10  # 归一化超时后使用原始音频
+    AUDIO_SILENCE_TOP_DB: int = 40  # 低于峰值该分贝数的首尾片段视为静音
+    AUDIO_NORMALIZED_BITRATE: str = "32k"  # 16kHz 单声道 mp3 的码率
+    
+    # 长录音异步识别（录音文件识别 CreateRecTask）
+    ASR_JOB_MAX_AUDIO_SIZE: int = 100 * 1024 * 1024  # 100MB，超过5MB的录音经COS以URL方式提交
+    ASR_JOB_STORAGE_DIR: str = "uploads/voice_jobs"  # 识别完成前录音的本地保存目录
+    ASR_JOB_WORKER_ENABLED: bool = True  # 关闭后本进程不处理识别任务（多实例部署时可只在部分实例开启）
+    ASR_JOB_WORKER_INTERVAL_SECONDS: int = 1  # 检查到期任务的间隔
+    ASR_JOB_MAX_CONCURRENCY: int = 2  # 同时进行的任务提交/查询数
+    ASR_JOB_POLL_INITIAL_SECONDS: int = 2  # 第一次查询前的等待，之后按2倍退避
+    ASR_JOB_POLL_MAX_SECONDS: int = 60  # 查询间隔上限
+    ASR_JOB_MAX_SUBMIT_ATTEMPTS: int = 5  # 提交识别任务的最大尝试次数
+    ASR_JOB_MAX_WAIT_SECONDS: int = 3 * 3600  # 超过该时间仍未完成的任务标记为失败
+    ASR_JOB_LEASE_SECONDS: int = 120  # 任务被取出处理期间不会被其他实例重复处理的时长
     
     # OCR识别开发模式配置
     OCR_DEV_MODE: bool = False  # 生产环境默认使用真实OCR
+    OCR_MAX_CONCURRENCY: int = 4  # 同时进行的OCR调用数
+    OCR_MAX_QUEUE: int = 4  # 并发已满时允许排队的调用数，超出后直接返回繁忙
+    OCR_TIMEOUT_SECONDS: int = 10  # 单次OCR识别的截止时间
+    OCR_HEDGE_ENABLED: bool = False  # 对冲请求会额外计费，默认关闭，见 CLOUD_HEDGE_PERCENTILE
+    
+    # 拍照识别前的图片预处理（需要 Pillow）
+    IMAGE_PREPROCESS_ENABLED: bool = True  # 关闭后照片原样发送
+    IMAGE_PREPROCESS_WORKERS: int = 1  # 预处理进程数
+    IMAGE_PREPROCESS_TIMEOUT_SECONDS: int = 10  # 预处理超时后使用原图
+    IMAGE_MAX_SIDE: int = 2048  # 长边超过该像素时等比缩小
+    IMAGE_JPEG_QUALITY: int = 85  # 重新编码的 JPEG 质量
+    IMAGE_JPEG_MIN_QUALITY: int = 60  # 超过 IMAGE_MAX_BYTES 时逐步降低质量的下限
+    IMAGE_MAX_BYTES: int = 1024 * 1024  # 预处理后的目标大小
+    IMAGE_GRAYSCALE: bool = True  # 转为灰度，文字识别不需要颜色
+    IMAGE_CROP_BORDERS: bool = False  # 裁掉纯色边框（扫描件、截图）
+    
+    # 拍照记录异步任务（/api/photo-records/jobs）
+    PHOTO_JOB_STORAGE_DIR: str = "uploads/photo_jobs"  # 处理完成前照片的本地保存目录
+    PHOTO_JOB_WORKER_ENABLED: bool = True  # 关闭后本进程不处理拍照记录任务
+    PHOTO_JOB_WORKER_INTERVAL_SECONDS: int = 1  # 检查到期任务的间隔
+    PHOTO_JOB_MAX_CONCURRENCY: int = 4  # 每批同时处理的任务数
+    PHOTO_JOB_POLL_AFTER_SECONDS: int = 1  # 建议客户端查询任务状态的间隔
+    PHOTO_JOB_RETRY_INITIAL_SECONDS: int = 2  # OCR繁忙或处理异常后第一次重试前的等待，之后按2倍退避
+    PHOTO_JOB_RETRY_MAX_SECONDS: int = 30  # 重试间隔上限
+    PHOTO_JOB_MAX_ATTEMPTS: int = 3  # 处理异常的最大尝试次数
+    PHOTO_JOB_MAX_WAIT_SECONDS: int = 600  # 超过该时间仍未完成的任务标记为失败
+    PHOTO_JOB_LEASE_SECONDS: int = 120  # 任务被取出处理期间不会被其他实例重复处理的时长
+    
+    # 拍照记录的照片存储（原图和缩略图，地址写入 process_records.attachments）
+    PHOTO_STORAGE_BACKEND: str = "auto"  # cos / local；auto 表示配置了 COS_BUCKET_NAME 时使用COS，否则保存到本地目录
+    PHOTO_STORAGE_LOCAL_DIR: str = "uploads/photos"  # 本地存储目录
+    PHOTO_STORAGE_LOCAL_URL: str = "/media/photos"  # 本地存储的访问路径
+    PHOTO_STORAGE_LOCAL_UPLOAD_URL: str = "/api/photo-records/uploads"  # 本地存储的客户端直传地址（验签后写入）
+    PHOTO_DIRECT_UPLOAD_PREFIX: str = "incoming"  # 客户端直传照片的对象键前缀，后接用户ID；未被识别的对象可在COS配置生命周期规则清理
+    PHOTO_DIRECT_UPLOAD_EXPIRES_SECONDS: int = 600  # 直传地址和OCR下载地址的有效期
+    PHOTO_UPLOAD_SPOOL_DIR: str = "uploads/photo_spool"  # 等待后台上传的照片，上传成功后删除，重启后继续上传
+    PHOTO_UPLOAD_WORKERS: int = 2  # 同时进行的后台上传数
+    PHOTO_UPLOAD_MAX_ATTEMPTS: int = 5  # 上传失败的最大尝试次数
+    PHOTO_UPLOAD_RETRY_INITIAL_SECONDS: int = 2  # 第一次重试前的等待，之后按2倍退避
+    PHOTO_UPLOAD_RETRY_MAX_SECONDS: int = 60  # 重试间隔上限
+    PHOTO_THUMBNAIL_SIZE: int = 320  # 缩略图长边像素
+    PHOTO_THUMBNAIL_QUALITY: int = 75  # 缩略图 JPEG 质量
     
     # 腾讯云COS配置
     COS_BUCKET_NAME: str = ""
     COS_REGION: str = "ap-beijing"
     COS_DOMAIN: str = ""
+    COS_MAX_CONCURRENCY: int = 8  # 同时进行的COS请求数
+    COS_MAX_QUEUE: int = 16  # 并发已满时允许排队的请求数
+    COS_TIMEOUT_SECONDS: int = 30  # 单次COS请求的截止时间
+
+    # 语音/OCR识别结果缓存（按媒体内容和识别参数的SHA-256寻址）
+    RECOGNITION_CACHE_ENABLED: bool = True
+    RECOGNITION_CACHE_MEMORY_SIZE: int = 512  # 进程内缓存条数
+    RECOGNITION_CACHE_PERSISTENT: bool = True  # 是否写入数据库 recognition_cache 表，多实例和重启后共享
+    RECOGNITION_CACHE_TTL_SECONDS: int = 7 * 24 * 3600  # 缓存有效期
+
+    # 云服务熔断、自适应截止时间和对冲请求（所有云服务共用）
+    CLOUD_BREAKER_FAILURE_THRESHOLD: int = 5  # 连续失败（超时、网络错误、服务端错误）达到该次数后熔断
+    CLOUD_BREAKER_OPEN_SECONDS: int = 30  # 熔断持续时间，之后放行一次探测调用
+    CLOUD_ADAPTIVE_TIMEOUT_ENABLED: bool = True  # 按近期P99延迟收紧截止时间，各服务配置的超时作为上限
+    CLOUD_ADAPTIVE_TIMEOUT_MULTIPLIER: float = 3.0  # 自适应截止时间 = P99延迟 × 倍数
+    CLOUD_ADAPTIVE_TIMEOUT_MIN_SECONDS: float = 2.0  # 自适应截止时间下限
+    # 对冲请求：开启 ASR_HEDGE_ENABLED / OCR_HEDGE_ENABLED 的服务，幂等调用超过该延迟分位仍未返回时再发一次，
+    # 取先返回的结果。一句话识别和OCR都按调用次数计费，先发出的请求即使被放弃也照常计费，
+    # 最多约有 (100 - 分位)% 的调用被计费两次（P95 时约5%），换取长尾延迟降低；默认都不开启
+    CLOUD_HEDGE_PERCENTILE: int = 95
     
     # 腾讯云CLS日志服务
     CLS_REGION: str = "ap-beijing"
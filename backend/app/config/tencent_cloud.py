@@ -1,69 +1,214 @@
 """
 腾讯云服务配置
-Tencent Cloud services configuration
+Lazily constructed registry of Tencent Cloud SDK clients
 """
 
-from tencentcloud.common import credential
-from tencentcloud.common.profile.client_profile import ClientProfile
-from tencentcloud.common.profile.http_profile import HttpProfile
-from tencentcloud.ocr.v20181119 import ocr_client
-from tencentcloud.asr.v20190614 import asr_client
-from qcloud_cos import CosConfig, CosS3Client
 import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlparse
 
 from app.config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# 各产品的 API 接入点，每个客户端使用自己的 HttpProfile
+CLIENT_ENDPOINTS = {
+    "ocr": "ocr.tencentcloudapi.com",
+    "asr": "asr.tencentcloudapi.com",
+}
 
-class TencentCloudConfig:
-    """腾讯云服务配置类"""
-    
-    def __init__(self):
-        self.cred = credential.Credential(
-            settings.TENCENT_SECRET_ID,
-            settings.TENCENT_SECRET_KEY
+
+class PooledConnection:
+    """
+    SDK HTTP 连接的替代实现
+
+    当前版本的 SDK 每次请求都调用 requests.request，每次都新建 TCP/TLS 连接；
+    这里改用客户端独占的 requests.Session，连接池大小与该服务的并发数一致，连接在请求之间复用。
+    """
+
+    def __init__(self, conn: Any, pool_size: int):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self._conn = conn
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._conn, name)
+
+    def request(self, method, url, body=None, headers=None):
+        headers.setdefault("Host", self._conn.request_host)
+        return self.session.request(
+            method=method,
+            url=url,
+            data=body,
+            headers=headers,
+            proxies=self._conn.proxy,
+            verify=self._conn.certification,
+            timeout=self._conn.timeout,
+            stream=True
         )
-        
-        # HTTP配置
-        self.http_profile = HttpProfile()
-        self.http_profile.endpoint = "ocr.tencentcloudapi.com"
-        
-        # 客户端配置
-        self.client_profile = ClientProfile()
-        self.client_profile.httpProfile = self.http_profile
-    
+
+
+class TencentCloudConfig:
+    """
+    腾讯云客户端注册表
+
+    客户端在第一次使用时才创建（导入本模块不加载任何产品的 SDK），创建后在进程内复用；
+    未配置凭证或创建失败时返回 None，记录错误和失败时间，按指数退避（retry_initial 秒起，
+    最长 retry_max 秒）之后再次尝试，临时故障恢复后不需要重启进程。stats() 记录各客户端的创建耗时。
+
+    配置 TENCENT_CLOUD_STUB_URL 时所有客户端改为访问本地模拟服务，压测走真实的SDK调用路径。
+    """
+
+    def __init__(self, retry_initial: float = 5, retry_max: float = 300):
+        self.retry_initial = retry_initial
+        self.retry_max = retry_max
+        self._clients: Dict[str, Any] = {}
+        self._build_ms: Dict[str, float] = {}
+        self._errors: Dict[str, str] = {}
+        self._failures: Dict[str, int] = {}
+        self._retry_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._factories: Dict[str, Callable[[], Any]] = {
+            "ocr": self._build_ocr_client,
+            "asr": self._build_asr_client,
+            "cos": self._build_cos_client,
+        }
+
+    def get_client(self, name: str) -> Optional[Any]:
+        """获取指定服务的客户端，第一次调用时创建；创建失败后在退避期内返回 None"""
+        client = self._clients.get(name)
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get(name)
+            if client is not None:
+                return client
+            if time.monotonic() < self._retry_at.get(name, 0):
+                return None
+
+            start = time.perf_counter()
+            try:
+                client = self._factories[name]()
+            except Exception as e:
+                failures = self._failures[name] = self._failures.get(name, 0) + 1
+                delay = min(self.retry_initial * (2 ** (failures - 1)), self.retry_max)
+                self._retry_at[name] = time.monotonic() + delay
+                self._errors[name] = str(e)
+                logger.error(f"创建{name.upper()}客户端失败，{delay:.0f}秒后重试: {e}")
+            self._build_ms[name] = (time.perf_counter() - start) * 1000
+            if client is not None:
+                self._clients[name] = client
+                self._failures.pop(name, None)
+                self._retry_at.pop(name, None)
+                self._errors.pop(name, None)
+                logger.info(f"✅ 创建{name.upper()}客户端 - 耗时: {self._build_ms[name]:.1f}ms")
+            return client
+
     def get_ocr_client(self):
         """获取OCR客户端"""
-        try:
-            client = ocr_client.OcrClient(self.cred, settings.TENCENT_REGION, self.client_profile)
-            return client
-        except Exception as e:
-            logger.error(f"创建OCR客户端失败: {e}")
-            return None
-    
+        return self.get_client("ocr")
+
     def get_asr_client(self):
         """获取ASR客户端"""
-        try:
-            client = asr_client.AsrClient(self.cred, settings.TENCENT_REGION, self.client_profile)
-            return client
-        except Exception as e:
-            logger.error(f"创建ASR客户端失败: {e}")
-            return None
-    
+        return self.get_client("asr")
+
     def get_cos_client(self):
         """获取COS客户端"""
-        try:
-            cos_config = CosConfig(
-                Region=settings.TENCENT_REGION,
-                SecretId=settings.TENCENT_SECRET_ID,
-                SecretKey=settings.TENCENT_SECRET_KEY
-            )
-            client = CosS3Client(cos_config)
-            return client
-        except Exception as e:
-            logger.error(f"创建COS客户端失败: {e}")
+        return self.get_client("cos")
+
+    @staticmethod
+    def _stub():
+        """本地模拟服务的 (协议, 地址)，未配置时为 None"""
+        if not settings.TENCENT_CLOUD_STUB_URL:
             return None
+        url = urlparse(settings.TENCENT_CLOUD_STUB_URL)
+        return url.scheme or "http", url.netloc
+
+    def _secret(self):
+        if settings.TENCENT_SECRET_ID and settings.TENCENT_SECRET_KEY:
+            return settings.TENCENT_SECRET_ID, settings.TENCENT_SECRET_KEY
+        if self._stub():
+            # 模拟服务不校验签名
+            return "stub", "stub"
+        raise ValueError("腾讯云凭证未配置")
+
+    def _credential(self):
+        from tencentcloud.common import credential
+
+        return credential.Credential(*self._secret())
+
+    def _client_profile(self, name: str, timeout: int):
+        from tencentcloud.common.profile.client_profile import ClientProfile
+        from tencentcloud.common.profile.http_profile import HttpProfile
+
+        # HTTP 超时与该服务的截止时间一致，超时的调用不会在线程池里长时间占用名额
+        protocol, endpoint = self._stub() or ("https", CLIENT_ENDPOINTS[name])
+        http_profile = HttpProfile(protocol=protocol, endpoint=endpoint, reqTimeout=timeout, keepAlive=True)
+        client_profile = ClientProfile()
+        client_profile.httpProfile = http_profile
+        return client_profile
+
+    @staticmethod
+    def _use_pooled_connection(client: Any, pool_size: int) -> Any:
+        request = getattr(client, "request", None)
+        if request is not None and hasattr(request, "conn"):
+            request.conn = PooledConnection(request.conn, pool_size)
+        return client
+
+    def _build_ocr_client(self):
+        from tencentcloud.ocr.v20181119 import ocr_client
+
+        client = ocr_client.OcrClient(
+            self._credential(), settings.TENCENT_REGION,
+            self._client_profile("ocr", settings.OCR_TIMEOUT_SECONDS)
+        )
+        return self._use_pooled_connection(client, settings.OCR_MAX_CONCURRENCY)
+
+    def _build_asr_client(self):
+        from tencentcloud.asr.v20190614 import asr_client
+
+        client = asr_client.AsrClient(
+            self._credential(), settings.TENCENT_ASR_REGION,
+            self._client_profile("asr", settings.ASR_TIMEOUT_SECONDS)
+        )
+        # 一句话识别和录音文件识别任务共用同一个客户端
+        return self._use_pooled_connection(client, settings.ASR_MAX_CONCURRENCY + settings.ASR_JOB_MAX_CONCURRENCY)
+
+    def _build_cos_client(self):
+        from qcloud_cos import CosConfig, CosS3Client
+
+        # COS SDK 自带连接池，按并发数设置连接池大小
+        options = dict(
+            Region=settings.COS_REGION,
+            Timeout=settings.COS_TIMEOUT_SECONDS,
+            PoolMaxSize=settings.COS_MAX_CONCURRENCY
+        )
+        stub = self._stub()
+        if stub:
+            secret_id, secret_key = self._secret()
+            options.update(Scheme=stub[0], Domain=stub[1])
+        else:
+            secret_id, secret_key = settings.TENCENT_SECRET_ID, settings.TENCENT_SECRET_KEY
+        return CosS3Client(CosConfig(SecretId=secret_id, SecretKey=secret_key, **options))
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": name,
+                "created": self._clients.get(name) is not None,
+                "endpoint": self._stub()[1] if self._stub() else CLIENT_ENDPOINTS.get(name),
+                "build_ms": round(self._build_ms[name], 2) if name in self._build_ms else None,
+                "error": self._errors.get(name)
+            }
+            for name in self._factories
+        ]
 
 
 # 全局实例
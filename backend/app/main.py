@@ -4,14 +4,27 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from fastapi.staticfiles import StaticFiles
 import uvicorn
 from contextlib import asynccontextmanager
 
-from .api import auth, user, goals, records, process_records, photo_records
+from .api import auth, user, goals, records, process_records, photo_records, sync, voice_jobs
 from .config.settings import get_settings
+from .config.tencent_cloud import tencent_cloud
+from .services.analysis_executor import analysis_executor
+from .services.cloud_executor import cloud_executor
+from .services.audio_preprocessor import audio_preprocessor
+from .services.image_preprocessor import image_preprocessor
+from .services.recognition_job_service import recognition_job_worker, photo_record_job_worker
+from .services.photo_storage import photo_uploader, LocalPhotoStorage
+from .services.recognition_cache import recognition_cache
+from .utils.process_analyzer import process_analyzer
+from .utils.voice_parser import voice_goal_parser
+from .utils.goal_validator import goal_validator
+from .utils.keyword_dictionaries import keyword_dictionaries
 
 # 导入所有模型以确保它们被正确初始化
-from .models import Base, User, Goal, Task, Progress, ProcessRecord
+from .models import Base, User, Goal, Task, Progress, ProcessRecord, ChangeLog
 
 # 获取配置
 settings = get_settings()
@@ -21,8 +34,22 @@ async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     # 启动时执行
     print("🚀 智能目标管理系统启动中...")
+    keyword_dictionaries.start_watcher(settings.KEYWORD_DICTIONARY_RELOAD_SECONDS)
+    if settings.ASR_JOB_WORKER_ENABLED:
+        recognition_job_worker.start()
+    if settings.PHOTO_JOB_WORKER_ENABLED:
+        photo_record_job_worker.start()
+    photo_uploader.start()
     yield
     # 关闭时执行
+    await recognition_job_worker.stop()
+    await photo_record_job_worker.stop()
+    await photo_uploader.stop()
+    keyword_dictionaries.stop_watcher()
+    analysis_executor.shutdown()
+    cloud_executor.shutdown()
+    audio_preprocessor.shutdown()
+    image_preprocessor.shutdown()
     print("👋 智能目标管理系统已关闭")
 
 # 创建FastAPI应用
@@ -51,6 +78,16 @@ app.include_router(goals.router, tags=["目标"])
 app.include_router(records.router, tags=["记录"])
 app.include_router(process_records.router, tags=["过程记录"])
 app.include_router(photo_records.router, tags=["拍照记录"])
+app.include_router(sync.router, tags=["同步"])
+app.include_router(voice_jobs.router, tags=["语音识别任务"])
+
+# 未配置COS时照片保存在本地目录，通过静态路径访问
+if isinstance(photo_uploader.storage, LocalPhotoStorage):
+    app.mount(
+        photo_uploader.storage.url_prefix,
+        StaticFiles(directory=photo_uploader.storage.root, check_dir=False),
+        name="photos"
+    )
 
 # 根路径
 @app.get("/")
@@ -74,6 +111,39 @@ async def health_check():
         "version": "1.0.0"
     }
 
+# 分析结果缓存统计
+@app.get("/health/cache")
+async def cache_stats():
+    """分析结果和识别结果缓存命中统计"""
+    return {
+        "caches": [
+            process_analyzer.cache.stats(),
+            voice_goal_parser.cache.stats(),
+            goal_validator.cache.stats(),
+            recognition_cache.stats()
+        ]
+    }
+
+# 关键词词典版本
+@app.get("/health/dictionaries")
+async def dictionary_stats():
+    """当前生效的关键词词典版本"""
+    return keyword_dictionaries.stats()
+
+# 云服务调用统计
+@app.get("/health/cloud")
+async def cloud_stats():
+    """各云服务的并发、排队、拒绝和超时统计，以及客户端创建耗时"""
+    return {
+        "services": cloud_executor.stats(),
+        "clients": tencent_cloud.stats(),
+        "audio_preprocess": audio_preprocessor.stats(),
+        "image_preprocess": image_preprocessor.stats(),
+        "recognition_jobs": recognition_job_worker.stats(),
+        "photo_record_jobs": photo_record_job_worker.stats(),
+        "photo_uploads": photo_uploader.stats()
+    }
+
 # 测试接口
 @app.get("/api/test")
 async def test_api():
@@ -111,9 +181,11 @@ async def create_tables():
                 email VARCHAR(100),
                 notification_enabled BOOLEAN DEFAULT TRUE,
                 privacy_level VARCHAR(20) DEFAULT 'public',
-                total_goals VARCHAR(10) DEFAULT '0',
-                completed_goals VARCHAR(10) DEFAULT '0',
-                streak_days VARCHAR(10) DEFAULT '0',
+                total_goals INT NOT NULL DEFAULT 0,
+                completed_goals INT NOT NULL DEFAULT 0,
+                streak_days INT NOT NULL DEFAULT 0,
+                longest_streak INT NOT NULL DEFAULT 0,
+                last_active_day DATE,
                 is_verified BOOLEAN DEFAULT FALSE,
                 is_active BOOLEAN DEFAULT TRUE,
                 is_locked BOOLEAN DEFAULT FALSE,
@@ -426,9 +498,11 @@ async def create_test_data():
                 email VARCHAR(100),
                 notification_enabled BOOLEAN DEFAULT TRUE,
                 privacy_level VARCHAR(20) DEFAULT 'public',
-                total_goals VARCHAR(10) DEFAULT '0',
-                completed_goals VARCHAR(10) DEFAULT '0',
-                streak_days VARCHAR(10) DEFAULT '0',
+                total_goals INT NOT NULL DEFAULT 0,
+                completed_goals INT NOT NULL DEFAULT 0,
+                streak_days INT NOT NULL DEFAULT 0,
+                longest_streak INT NOT NULL DEFAULT 0,
+                last_active_day DATE,
                 is_verified BOOLEAN DEFAULT FALSE,
                 is_active BOOLEAN DEFAULT TRUE,
                 is_locked BOOLEAN DEFAULT FALSE,
@@ -6,5 +6,9 @@ from .goal import Goal
 from .task import Task
 from .progress import Progress
 from .process_record import ProcessRecord
+from .change_log import ChangeLog
+from .recognition_job import RecognitionJob
+from .recognition_cache import RecognitionCacheEntry
+from .photo_upload_claim import PhotoUploadClaim
 
-__all__ = ["Base", "User", "Goal", "Task", "Progress", "ProcessRecord"]
\ No newline at end of file
+__all__ = ["Base", "User", "Goal", "Task", "Progress", "ProcessRecord", "ChangeLog", "RecognitionJob", "RecognitionCacheEntry", "PhotoUploadClaim"]
\ No newline at end of file
@@ -0,0 +1,46 @@
+"""
+数据变更日志模型
+Change log model for incremental sync
+"""
+
+from sqlalchemy import Column, String, Index
+import enum
+
+from .base import BaseModel
+
+
+class ChangeEntityType(enum.Enum):
+    """变更实体类型枚举"""
+    goal = "goal"                        # 目标
+    process_record = "process_record"    # 过程记录
+
+
+class ChangeOperation(enum.Enum):
+    """变更操作枚举"""
+    upsert = "upsert"    # 新增或修改
+    delete = "delete"    # 删除（墓碑）
+
+
+class ChangeLog(BaseModel):
+    """
+    数据变更日志
+
+    每次目标或过程记录的增删改都会追加一行，自增主键 id 即同步游标。
+    客户端携带上次拿到的游标调用 /api/sync，只取回之后发生的变更。
+    """
+
+    __tablename__ = "change_log"
+    __table_args__ = (
+        Index("idx_change_log_user_cursor", "user_id", "id"),
+    )
+
+    user_id = Column(String(36), nullable=False, comment="用户ID")
+    entity_type = Column(String(30), nullable=False, comment="实体类型：goal, process_record")
+    entity_id = Column(String(36), nullable=False, comment="实体ID")
+    operation = Column(String(10), nullable=False, comment="操作：upsert, delete")
+
+    def __repr__(self):
+        return (
+            f"<ChangeLog(id={self.id}, entity='{self.entity_type}:{self.entity_id}', "
+            f"op='{self.operation}')>"
+        )
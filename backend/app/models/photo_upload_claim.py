@@ -0,0 +1,27 @@
+"""
+直传照片使用记录模型
+Single-use claims on client direct-upload object keys
+"""
+
+from sqlalchemy import Column, String
+
+from .base import BaseModel
+
+
+class PhotoUploadClaim(BaseModel):
+    """
+    直传照片的使用记录
+
+    创建记录前先按直传对象键插入一行，唯一索引保证同一对象键只有一个请求能取得照片；
+    COS 的移动是复制后删除，不是原子操作，不能只靠对象是否还在判断。识别或保存失败时删除该行，
+    客户端可以用同一对象键重试。
+    """
+
+    __tablename__ = "photo_upload_claims"
+
+    object_key = Column(String(255), nullable=False, unique=True, comment="客户端直传的对象键")
+    user_id = Column(String(36), nullable=False, comment="用户ID")
+    stored_key = Column(String(255), nullable=False, comment="照片移动后的对象键")
+
+    def __repr__(self):
+        return f"<PhotoUploadClaim(object_key='{self.object_key}', stored_key='{self.stored_key}')>"
@@ -72,6 +72,7 @@ class ProcessRecord(BaseModel):
     # 数据来源详情
     source_data = Column(JSON, nullable=True, comment="源数据详情")
     confidence_score = Column(Integer, nullable=True, comment="置信度分数：0-100")
+    analyzer_version = Column(Integer, nullable=True, comment="分析时使用的关键词词典版本")
     
     # 关联字段
     user_id = Column(String(36), nullable=False, comment="用户ID")
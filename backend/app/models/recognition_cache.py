@@ -0,0 +1,30 @@
+"""
+识别结果缓存模型
+Persistent tier of the content-addressed ASR/OCR result cache
+"""
+
+from sqlalchemy import Column, String, DateTime, JSON, Index
+
+from .base import BaseModel
+
+
+class RecognitionCacheEntry(BaseModel):
+    """
+    识别结果缓存条目
+
+    cache_key 是媒体内容和识别参数的SHA-256，相同录音或照片重复提交时直接返回已有结果，
+    不再调用云端接口；过期条目在写入时顺带清理。
+    """
+
+    __tablename__ = "recognition_cache"
+    __table_args__ = (
+        Index("idx_recognition_cache_expires", "expires_at"),
+    )
+
+    cache_key = Column(String(64), nullable=False, unique=True, comment="媒体内容和识别参数的SHA-256")
+    kind = Column(String(40), nullable=False, comment="识别类型，如 asr、ocr.GeneralBasicOCR")
+    result = Column(JSON, nullable=True, comment="识别结果")
+    expires_at = Column(DateTime, nullable=False, comment="过期时间")
+
+    def __repr__(self):
+        return f"<RecognitionCacheEntry(kind='{self.kind}', cache_key='{self.cache_key[:12]}')>"
@@ -0,0 +1,62 @@
+"""
+识别任务模型
+Recognition job model for asynchronous long-audio recognition and photo records
+"""
+
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, JSON, Index
+import enum
+
+from .base import BaseModel
+
+
+class RecognitionJobKind(enum.Enum):
+    """识别任务类型枚举"""
+    voice = "voice"                  # 录音文件识别
+    photo_record = "photo_record"    # 照片识别并创建过程记录
+
+
+class RecognitionJobStatus(enum.Enum):
+    """识别任务状态枚举"""
+    pending = "pending"          # 已接收，等待提交到云端
+    processing = "processing"    # 云端识别中
+    succeeded = "succeeded"      # 识别完成
+    failed = "failed"            # 识别失败
+
+
+class RecognitionJob(BaseModel):
+    """
+    识别任务
+
+    上传接口保存文件后立即返回任务ID，由后台 worker 提交云端识别任务并按退避间隔查询结果，
+    客户端轮询任务状态，HTTP 请求不必等待识别完成。
+    """
+
+    __tablename__ = "recognition_jobs"
+    __table_args__ = (
+        Index("idx_recognition_jobs_due", "status", "next_poll_at"),
+        Index("idx_recognition_jobs_user", "user_id", "id"),
+    )
+
+    user_id = Column(String(36), nullable=False, comment="用户ID")
+    kind = Column(String(20), nullable=False, comment="任务类型：voice, photo_record")
+    status = Column(String(20), nullable=False, default=RecognitionJobStatus.pending.value, comment="状态：pending, processing, succeeded, failed")
+
+    # 输入文件
+    input_path = Column(String(500), nullable=True, comment="待识别文件的本地路径，完成后删除")
+    input_format = Column(String(20), nullable=True, comment="文件格式")
+    input_size = Column(Integer, nullable=True, comment="文件字节数")
+    params = Column(JSON, nullable=True, comment="任务参数，例如照片记录关联的目标ID")
+
+    # 云端任务
+    task_id = Column(BigInteger, nullable=True, comment="腾讯云识别任务ID")
+    attempts = Column(Integer, nullable=False, default=0, comment="提交/查询次数，用于计算退避间隔")
+    next_poll_at = Column(DateTime, nullable=True, comment="下一次提交或查询的时间")
+
+    # 结果
+    result = Column(JSON, nullable=True, comment="识别结果")
+    error = Column(String(500), nullable=True, comment="失败原因")
+    completed_at = Column(DateTime, nullable=True, comment="完成时间")
+    stage_timings = Column(JSON, nullable=True, comment="各处理阶段耗时（毫秒）")
+
+    def __repr__(self):
+        return f"<RecognitionJob(id={self.id}, kind='{self.kind}', status='{self.status}')>"
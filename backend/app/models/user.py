@@ -1,7 +1,7 @@
 """
 用户数据模型
 """
-from sqlalchemy import Column, String, DateTime, Boolean, Text
+from sqlalchemy import Column, String, DateTime, Date, Boolean, Text, Integer
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import uuid
@@ -27,9 +27,11 @@ class User(Base):
     privacy_level = Column(String(20), default="public")  # public, friends, private
     
     # 统计信息
-    total_goals = Column(String(10), default="0")
-    completed_goals = Column(String(10), default="0")
-    streak_days = Column(String(10), default="0")
+    total_goals = Column(Integer, default=0, nullable=False)
+    completed_goals = Column(Integer, default=0, nullable=False)
+    streak_days = Column(Integer, default=0, nullable=False)  # 当前连续打卡天数
+    longest_streak = Column(Integer, default=0, nullable=False)
+    last_active_day = Column(Date, nullable=True)
     
     # 安全相关
     is_verified = Column(Boolean, default=False)
@@ -105,9 +107,9 @@ class UserInDB(UserBase):
     id: str
     notification_enabled: bool
     privacy_level: str
-    total_goals: str
-    completed_goals: str
-    streak_days: str
+    total_goals: int
+    completed_goals: int
+    streak_days: int
     is_verified: bool
     is_active: bool
     is_locked: bool
@@ -131,9 +133,9 @@ class UserResponse(BaseModel):
     email: Optional[str] = None
     notification_enabled: bool
     privacy_level: str
-    total_goals: str
-    completed_goals: str
-    streak_days: str
+    total_goals: int
+    completed_goals: int
+    streak_days: int
     is_verified: bool
     is_active: bool
     created_at: datetime
@@ -152,8 +154,9 @@ class UserProfileUpdate(BaseModel):
     privacy_level: Optional[str] = None
 
 class UserStats(BaseModel):
-    total_goals: str
-    completed_goals: str
-    streak_days: str
+    total_goals: int
+    completed_goals: int
+    streak_days: int
+    longest_streak: int
     completion_rate: float
     current_streak: int
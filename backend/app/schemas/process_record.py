@@ -161,3 +161,15 @@ class VoiceProcessRecordResponse(BaseModel):
     message: str
     record: Optional[ProcessRecordResponse] = None
     analysis: Optional[Dict[str, Any]] = None
+
+
+class AnalyzeBatchRequest(BaseModel):
+    """批量内容分析请求模式"""
+    contents: List[str] = Field(..., min_length=1, max_length=500, description="待分析的内容列表")
+
+
+class AnalyzeBatchResponse(BaseModel):
+    """批量内容分析响应模式"""
+    success: bool
+    message: str
+    results: List[Dict[str, Any]] = []
@@ -0,0 +1,121 @@
+"""
+过程记录分析执行器
+Process pool executor for process record analysis
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Any, Dict, List, Optional
+
+from app.config.settings import get_settings
+from app.utils.keyword_dictionaries import keyword_dictionaries
+from app.utils.process_analyzer import process_analyzer
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def _analyze_chunk(contents: List[str], version: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    在子进程中执行的分析任务（必须是模块级函数才能被 pickle）
+
+    子进程在启动时加载词典，主进程热更新词典后，子进程在下一次任务时跟着重新加载
+    """
+    if version is not None and process_analyzer.version != version:
+        keyword_dictionaries.reload()
+    return process_analyzer.analyze_batch(contents)
+
+
+class AnalysisExecutor:
+    """
+    把CPU密集的内容分析移出事件循环
+
+    - 短文本直接在当前线程分析：耗时远小于进程间通信的开销
+    - 长文本（如拍照OCR得到的大段文字）提交到进程池，await 期间事件循环继续处理其他请求
+    - 大批量分析按进程数切块后分发到进程池并行执行
+
+    进程池在第一次使用时才创建，使用 spawn 方式启动子进程，避免 fork 继承服务进程里的线程和连接。
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        workers: int = 0,
+        offload_min_chars: int = 2000,
+        batch_min_size: int = 16
+    ):
+        self.enabled = enabled
+        self.workers = workers or os.cpu_count() or 1
+        self.offload_min_chars = offload_min_chars
+        self.batch_min_size = batch_min_size
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info(f"创建分析进程池 - 进程数: {self.workers}")
+            return self._pool
+
+    async def analyze_content(self, content: str) -> Dict[str, Any]:
+        """分析单条内容，长文本在进程池中执行"""
+        if not self.enabled or len(content or "") < self.offload_min_chars:
+            return process_analyzer.analyze_content(content)
+
+        # 先查主进程的结果缓存，命中时不必提交到进程池
+        key = process_analyzer.cache_key(content)
+        cached = process_analyzer.cache.get(key)
+        if cached is not None:
+            return cached
+
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(
+            self._get_pool(), _analyze_chunk, [content], process_analyzer.version
+        )
+        process_analyzer.cache.put(key, results[0])
+        return results[0]
+
+    def analyze_batch(self, contents: List[str]) -> List[Dict[str, Any]]:
+        """
+        批量分析，返回与输入顺序一致的结果
+
+        条数达到 batch_min_size 时按进程数切块分发到进程池，否则在当前线程顺序执行
+        """
+        if not self.enabled or len(contents) < self.batch_min_size:
+            return process_analyzer.analyze_batch(contents)
+
+        chunk_size = -(-len(contents) // self.workers)
+        chunks = [contents[i:i + chunk_size] for i in range(0, len(contents), chunk_size)]
+
+        results: List[Dict[str, Any]] = []
+        for chunk_results in self._get_pool().map(_analyze_chunk, chunks, repeat(process_analyzer.version)):
+            results.extend(chunk_results)
+        return results
+
+    async def analyze_batch_async(self, contents: List[str]) -> List[Dict[str, Any]]:
+        """在线程中等待批量分析，避免阻塞事件循环"""
+        return await asyncio.to_thread(self.analyze_batch, contents)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+
+# 全局分析执行器实例
+analysis_executor = AnalysisExecutor(
+    enabled=settings.ANALYSIS_EXECUTOR_ENABLED,
+    workers=settings.ANALYSIS_WORKERS,
+    offload_min_chars=settings.ANALYSIS_OFFLOAD_MIN_CHARS,
+    batch_min_size=settings.ANALYSIS_BATCH_MIN_SIZE
+)
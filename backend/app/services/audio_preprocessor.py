@@ -0,0 +1,343 @@
+"""
+语音识别前的音频预处理
+Audio normalization before ASR
+"""
+
+import asyncio
+import importlib.util
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, BinaryIO, Dict, Optional, Tuple, Union
+
+from app.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# 一句话识别引擎 16k_zh 要求的采样率
+TARGET_SAMPLE_RATE = 16000
+
+# 峰值低于 -50dBFS 的录音视为全程静音
+SILENCE_PEAK = 10 ** (-50 / 20)
+
+# 判断容器格式需要读取的头部字节数
+HEADER_SIZE = 64
+
+# 嗅探结果 -> pydub/ffmpeg 解码格式；silk、speex 等 ffmpeg 无法解码的格式原样发送
+DECODE_FORMATS = {
+    "wav": "wav",
+    "mp3": "mp3",
+    "m4a": "mp4",
+    "aac": "aac",
+    "amr": "amr",
+    "ogg-opus": "ogg",
+}
+
+
+class AudioPreprocessError(ValueError):
+    """音频内容不可用（无法识别的格式、静音、过长等），不再调用云端识别"""
+
+
+def sniff_audio_format(header: bytes) -> Optional[str]:
+    """
+    根据文件头判断音频格式，返回腾讯云 VoiceFormat 取值
+
+    不使用文件扩展名：小程序上传的文件名经常与实际编码不一致
+    """
+    if header.startswith(b"RIFF") and header[8:12] == b"WAVE":
+        return "wav"
+    if header[4:8] == b"ftyp":
+        return "m4a"
+    if header.startswith(b"ID3"):
+        return "mp3"
+    if header.startswith(b"#!AMR"):
+        return "amr"
+    if header.startswith(b"OggS"):
+        return "ogg-opus"
+    if header.startswith(b"#!SILK") or header.startswith(b"\x02#!SILK"):
+        return "silk"
+    if len(header) >= 2 and header[0] == 0xFF:
+        # ADTS 的 layer 位为 00，MP3 帧的 layer 位不为 00
+        if header[1] & 0xF6 == 0xF0:
+            return "aac"
+        if header[1] & 0xE0 == 0xE0:
+            return "mp3"
+    return None
+
+
+def _decoder_available(source_format: str) -> bool:
+    """wav 由 pydub 直接解析，其他格式需要 ffmpeg"""
+    from pydub.utils import which
+
+    return source_format == "wav" or bool(which("ffmpeg") or which("avconv"))
+
+
+def _normalize_worker(
+    input_path: str,
+    output_path: str,
+    source_format: str,
+    top_db: int,
+    max_duration_ms: int,
+    bitrate: str
+) -> Tuple[str, int]:
+    """
+    在子进程中执行的归一化任务（必须是模块级函数才能被 pickle）
+
+    解码 -> 下混为单声道 -> 重采样到16kHz -> 裁掉首尾静音 -> 编码。
+    有 ffmpeg 时编码为 16kHz 单声道 mp3，否则编码为 16位 PCM wav。
+    音频通过文件路径传入传出，进程间只传递路径，不 pickle 音频数据
+
+    Returns:
+        (VoiceFormat, 时长毫秒)；结果写入 output_path
+    """
+    import librosa
+    import numpy as np
+    from pydub import AudioSegment
+    from pydub.utils import which
+
+    try:
+        segment = AudioSegment.from_file(input_path, format=DECODE_FORMATS[source_format])
+    except Exception as e:
+        raise AudioPreprocessError(f"音频无法解码: {e}")
+
+    samples = np.array(segment.get_array_of_samples(), dtype=np.float32)
+    samples /= float(1 << (8 * segment.sample_width - 1))
+    if segment.channels > 1:
+        samples = samples.reshape(-1, segment.channels).mean(axis=1)
+
+    if segment.frame_rate != TARGET_SAMPLE_RATE:
+        samples = librosa.resample(samples, orig_sr=segment.frame_rate, target_sr=TARGET_SAMPLE_RATE)
+
+    # trim 以录音自身的峰值为参考，全程静音的录音需要先按绝对电平判断
+    if len(samples) == 0 or np.max(np.abs(samples)) < SILENCE_PEAK:
+        raise AudioPreprocessError("音频中没有检测到声音")
+
+    samples, _ = librosa.effects.trim(samples, top_db=top_db)
+    duration_ms = len(samples) * 1000 // TARGET_SAMPLE_RATE
+    if duration_ms > max_duration_ms:
+        raise AudioPreprocessError(f"音频时长超过{max_duration_ms // 1000}秒")
+
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    normalized = AudioSegment(pcm.tobytes(), sample_width=2, frame_rate=TARGET_SAMPLE_RATE, channels=1)
+
+    if which("ffmpeg") or which("avconv"):
+        normalized.export(output_path, format="mp3", bitrate=bitrate).close()
+        return "mp3", duration_ms
+    normalized.export(output_path, format="wav").close()
+    return "wav", duration_ms
+
+
+class AudioPreprocessor:
+    """
+    语音识别前的音频归一化
+
+    小程序录音有 mp3/m4a/wav 等多种格式、采样率和声道数。发送给云端前先在本地：
+    - 按文件头识别格式，无法识别的直接拒绝，不再付费调用云端
+    - 裁掉首尾静音、下混为单声道、重采样到16kHz，上传数据更小，识别更快
+    - 全程静音或超过时长限制的录音在本地拒绝
+
+    解码和重采样是CPU密集的，在独立进程池中执行；pydub/librosa 未安装或缺少 ffmpeg 时
+    跳过归一化，按识别出的格式原样发送。
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        workers: int = 1,
+        timeout: float = 10,
+        top_db: int = 40,
+        max_duration_seconds: int = 60,
+        bitrate: str = "32k"
+    ):
+        self.enabled = enabled and all(
+            importlib.util.find_spec(module) is not None for module in ("pydub", "librosa")
+        )
+        self.workers = workers
+        self.timeout = timeout
+        self.top_db = top_db
+        self.max_duration_ms = max_duration_seconds * 1000
+        self.bitrate = bitrate
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        self.normalized = 0
+        self.skipped = 0
+        self.rejected = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+        if enabled and not self.enabled:
+            logger.warning("未安装 pydub/librosa，语音识别前不做音频归一化")
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info(f"创建音频预处理进程池 - 进程数: {self.workers}")
+            return self._pool
+
+    async def prepare(self, audio: Union[bytes, BinaryIO]) -> Tuple[Union[bytes, BinaryIO], str]:
+        """
+        识别格式并归一化音频
+
+        Args:
+            audio: 音频字节数据或临时文件对象
+
+        Returns:
+            (发送给云端的音频, VoiceFormat)；归一化结果为已打开的临时文件对象，未做归一化时返回原始音频
+
+        Raises:
+            AudioPreprocessError: 格式无法识别、无法解码、静音或过长
+        """
+        header = self._read_header(audio)
+        source_format = sniff_audio_format(header)
+        if source_format is None:
+            self.rejected += 1
+            raise AudioPreprocessError("不支持的音频格式，请使用 mp3、m4a 或 wav 录音")
+
+        if not self.enabled or source_format not in DECODE_FORMATS or not _decoder_available(source_format):
+            self.skipped += 1
+            return audio, source_format
+
+        input_path, input_is_temp = await asyncio.to_thread(self._spool_to_disk, audio)
+        output_path = self._temp_path()
+
+        def cleanup(_=None):
+            if input_is_temp:
+                self._remove(input_path)
+            self._remove(output_path)
+
+        task = self._get_pool().submit(
+            _normalize_worker, input_path, output_path, source_format,
+            self.top_db, self.max_duration_ms, self.bitrate
+        )
+        try:
+            voice_format, duration_ms = await asyncio.wait_for(asyncio.wrap_future(task), self.timeout)
+            size_in = os.path.getsize(input_path)
+            normalized = self._open_and_unlink(output_path)
+        except AudioPreprocessError:
+            self.rejected += 1
+            raise
+        except asyncio.TimeoutError:
+            # 预处理超时不是音频的问题，按原始音频发送
+            logger.warning(f"⚠️ 音频归一化超时（{self.timeout}秒），使用原始音频")
+            self.skipped += 1
+            return audio, source_format
+        except Exception as e:
+            logger.warning(f"⚠️ 音频归一化失败，使用原始音频: {e}")
+            self.skipped += 1
+            return audio, source_format
+        finally:
+            # 超时后子进程仍可能在读写临时文件，等它结束后再删除
+            if task.done():
+                cleanup()
+            else:
+                task.add_done_callback(cleanup)
+
+        size_out = os.fstat(normalized.fileno()).st_size
+        self.normalized += 1
+        self.bytes_in += size_in
+        self.bytes_out += size_out
+        logger.info(
+            f"🎚️ 音频归一化: {source_format} {size_in}字节 -> {voice_format} {size_out}字节, "
+            f"时长 {duration_ms}ms"
+        )
+        return normalized, voice_format
+
+    @staticmethod
+    def _read_header(audio: Union[bytes, BinaryIO]) -> bytes:
+        if isinstance(audio, (bytes, bytearray)):
+            return bytes(audio[:HEADER_SIZE])
+        audio.seek(0)
+        header = audio.read(HEADER_SIZE)
+        audio.seek(0)
+        return header
+
+    @classmethod
+    def _spool_to_disk(cls, audio: Union[bytes, BinaryIO]) -> Tuple[str, bool]:
+        """
+        取得子进程可以直接打开的输入文件路径
+
+        已经在磁盘上的文件直接使用原路径；字节数据和内存/未命名的临时文件按块复制到临时文件，
+        不整体读入内存
+
+        Returns:
+            (文件路径, 是否为需要删除的临时文件)
+        """
+        name = getattr(audio, "name", None)
+        if isinstance(name, str) and os.path.isfile(name):
+            audio.flush()
+            return name, False
+
+        path = cls._temp_path()
+        try:
+            with open(path, "wb") as f:
+                if isinstance(audio, (bytes, bytearray)):
+                    f.write(audio)
+                else:
+                    audio.seek(0)
+                    shutil.copyfileobj(audio, f)
+                    audio.seek(0)
+        except BaseException:
+            cls._remove(path)
+            raise
+        return path, True
+
+    @staticmethod
+    def _temp_path() -> str:
+        fd, path = tempfile.mkstemp(prefix="asr-", suffix=".audio")
+        os.close(fd)
+        return path
+
+    @staticmethod
+    def _open_and_unlink(path: str) -> BinaryIO:
+        """打开归一化结果后立即删除目录项，文件在关闭后由系统回收"""
+        f = open(path, "rb")
+        try:
+            os.remove(path)
+        except OSError:
+            # Windows 上不能删除已打开的文件，留给系统临时目录清理
+            pass
+        return f
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "normalized": self.normalized,
+            "skipped": self.skipped,
+            "rejected": self.rejected,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+# 全局音频预处理实例
+audio_preprocessor = AudioPreprocessor(
+    enabled=settings.AUDIO_PREPROCESS_ENABLED,
+    workers=settings.AUDIO_PREPROCESS_WORKERS,
+    timeout=settings.AUDIO_PREPROCESS_TIMEOUT_SECONDS,
+    top_db=settings.AUDIO_SILENCE_TOP_DB,
+    max_duration_seconds=settings.ASR_MAX_DURATION_SECONDS,
+    bitrate=settings.AUDIO_NORMALIZED_BITRATE
+)
@@ -0,0 +1,101 @@
+"""
+音频上传接收
+Streaming audio upload handling with early size rejection
+"""
+
+import logging
+from typing import Dict, Any
+
+from fastapi import HTTPException, Request
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+logger = logging.getLogger(__name__)
+
+# 语音识别接口的请求体说明；接口直接读取请求流，FastAPI 无法从参数推断
+AUDIO_UPLOAD_OPENAPI: Dict[str, Any] = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["audio"],
+                    "properties": {"audio": {"type": "string", "format": "binary"}}
+                }
+            }
+        }
+    }
+}
+
+# 除文件内容外，multipart 边界和分段头部的余量
+MULTIPART_OVERHEAD = 16 * 1024
+
+
+class AudioUploadTooLarge(MultiPartException):
+    """上传的音频超过大小限制"""
+
+
+class LimitedMultiPartParser(MultiPartParser):
+    """
+    边接收边检查大小的 multipart 解析器
+
+    请求体按块从网络读取，文件内容写入 SpooledTemporaryFile（超过1MB落盘），
+    文件累计大小一旦超过限制立即中止解析，剩余的请求体不再读取
+    """
+
+    def __init__(self, headers, stream, max_file_bytes: int):
+        super().__init__(headers, stream, max_files=1, max_fields=10)
+        self.max_file_bytes = max_file_bytes
+        self.received_file_bytes = 0
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._current_part.file is not None:
+            self.received_file_bytes += end - start
+            if self.received_file_bytes > self.max_file_bytes:
+                raise AudioUploadTooLarge(f"文件超过 {self.max_file_bytes} 字节")
+        super().on_part_data(data, start, end)
+
+
+async def receive_audio_upload(request: Request, max_bytes: int, too_large_message: str, field: str = "audio") -> UploadFile:
+    """
+    从请求流中接收音频文件
+
+    不使用 `await audio.read()` 把整个文件读入内存：文件保存在临时文件中，
+    调用方直接把 UploadFile.file 交给语音识别服务
+
+    Args:
+        request: 请求对象
+        max_bytes: 音频文件大小上限
+        too_large_message: 超过上限时返回给用户的提示
+        field: 表单中音频文件的字段名
+
+    Raises:
+        HTTPException: 不是 multipart 请求、缺少音频或音频过大（400）
+    """
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("multipart/form-data"):
+        raise HTTPException(status_code=400, detail="请使用 multipart/form-data 上传音频文件")
+
+    # 声明的长度已经超过上限时不读取请求体
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + MULTIPART_OVERHEAD:
+        logger.warning(f"⚠️ 音频上传过大，按 Content-Length 拒绝: {content_length}字节")
+        raise HTTPException(status_code=400, detail=too_large_message)
+
+    parser = LimitedMultiPartParser(request.headers, request.stream(), max_file_bytes=max_bytes)
+    try:
+        form = await parser.parse()
+    except AudioUploadTooLarge:
+        logger.warning(f"⚠️ 音频上传过大，已在接收 {parser.received_file_bytes} 字节时中止")
+        raise HTTPException(status_code=400, detail=too_large_message)
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=f"上传数据格式错误: {e.message}")
+
+    audio = form.get(field)
+    if not isinstance(audio, UploadFile):
+        await form.close()
+        raise HTTPException(status_code=400, detail="缺少音频文件")
+
+    await audio.seek(0)
+    return audio
@@ -0,0 +1,495 @@
+"""
+云服务调用执行器
+Bounded executor for blocking cloud SDK calls with circuit breaking,
+adaptive deadlines and hedged retries
+"""
+
+import asyncio
+import functools
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from app.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# 这些错误码表示云端不可用（而不是请求本身有问题），计入熔断失败次数
+BREAKER_ERROR_CODE_PREFIXES = (
+    "InternalError",
+    "ClientNetworkError",
+    "ServerNetworkError",
+    "RequestLimitExceeded",
+    "ResourceUnavailable",
+    "ServiceUnavailable",
+)
+
+# 延迟样本少于该数量时不做自适应，使用配置的截止时间
+MIN_LATENCY_SAMPLES = 20
+
+
+class CloudServiceBusy(Exception):
+    """云服务并发已满，调用方应直接返回"繁忙，请稍后重试"，而不是排队等待"""
+
+    retry_after = 1
+
+
+class CircuitOpen(CloudServiceBusy):
+    """熔断中，直接失败不调用云端；是 CloudServiceBusy 的子类，调用方按繁忙处理"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CloudCallTimeout(Exception):
+    """云服务调用超过截止时间"""
+
+
+def is_breaker_failure(error: BaseException) -> bool:
+    """
+    判断异常是否说明云端不可用
+
+    只有超时、网络错误（连接、DNS、读写失败）和云端 5xx / 内部错误、限流计入熔断；
+    参数错误、识别失败以及调用方代码抛出的其他异常由请求本身导致，不计入。
+    """
+    # requests 和 socket 的网络异常都是 OSError
+    if isinstance(error, (CloudCallTimeout, OSError)):
+        return True
+    # COS SDK 的服务端错误带 HTTP 状态码
+    get_status_code = getattr(error, "get_status_code", None)
+    if callable(get_status_code):
+        try:
+            return int(get_status_code()) >= 500
+        except (TypeError, ValueError):
+            return False
+    code = getattr(error, "code", None)
+    if code:
+        return str(code).startswith(BREAKER_ERROR_CODE_PREFIXES)
+    # COS SDK 的客户端错误是请求没有发出或没有收到响应
+    return any(cls.__name__ == "CosClientError" for cls in type(error).__mro__)
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    - closed：正常调用，连续失败 failure_threshold 次后熔断
+    - open：open_seconds 内直接抛出 CircuitOpen，不再等待必然失败的调用
+    - half_open：熔断期结束后只放行一次探测调用，成功则恢复，失败则重新熔断
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, open_seconds: float = 30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+        self.consecutive_failures = 0
+        self.opened = 0
+        self.short_circuited = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+        return self._state
+
+    def retry_after(self) -> int:
+        remaining = self.open_seconds - (time.monotonic() - self._opened_at)
+        return max(1, math.ceil(remaining))
+
+    def before_call(self) -> bool:
+        """调用前检查，熔断中抛出 CircuitOpen；返回本次调用是否是半开状态下的探测调用"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return False
+            if state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.short_circuited += 1
+            raise CircuitOpen(f"{self.name} 服务熔断中", self.retry_after())
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"☁️ {self.name} 探测调用成功，恢复调用")
+            self._state = self.CLOSED
+            self._probing = False
+            self.consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self._state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened += 1
+                    logger.warning(
+                        f"☁️ {self.name} 熔断 {self.open_seconds}秒 - 连续失败: {self.consecutive_failures}"
+                    )
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release_probe(self) -> None:
+        """探测调用没有真正发出（例如本地繁忙拒绝），允许下一次调用探测"""
+        with self._lock:
+            self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self._current_state()
+            return {
+                "state": state,
+                "consecutive_failures": self.consecutive_failures,
+                "opened": self.opened,
+                "short_circuited": self.short_circuited,
+                "retry_after": self.retry_after() if state == self.OPEN else 0
+            }
+
+
+class LatencyTracker:
+    """最近 window 次成功调用的延迟，用于计算自适应截止时间和对冲延迟"""
+
+    def __init__(self, window: int = 200):
+        self._samples: "deque[float]" = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """样本不足时返回 None"""
+        with self._lock:
+            if len(self._samples) < MIN_LATENCY_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+
+class CloudServiceLimiter:
+    """
+    单个云服务的调用限制
+
+    腾讯云 SDK 的调用都是阻塞的，直接在 async 接口里调用会卡住整个事件循环。
+    这里把调用放到该服务专用的线程池中执行：
+    - max_concurrency 个线程同时调用，另外最多 max_queue 个调用排队，超出时立即抛出 CloudServiceBusy
+    - 每次调用有截止时间，超时抛出 CloudCallTimeout；SDK 调用本身无法中断，
+      它占用的名额在线程真正结束后才释放，避免超时的调用在后台越积越多
+    - 截止时间按近期成功调用的 P99 延迟自动收紧（配置的 timeout 是上限），云端变慢时不必每次都等满
+    - 超时和云端错误计入熔断器，熔断期间直接抛出 CircuitOpen
+    - 开启 hedge 时，幂等调用超过 P95 延迟仍未返回，且还有空闲名额，就再发一次，取先返回的结果
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        timeout: float,
+        max_queue: int = 0,
+        failure_threshold: int = 5,
+        open_seconds: float = 30,
+        adaptive_timeout: bool = True,
+        timeout_multiplier: float = 3.0,
+        min_timeout: float = 2.0,
+        hedge: bool = False,
+        hedge_percentile: float = 95
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.adaptive_timeout = adaptive_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.min_timeout = min_timeout
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.breaker = CircuitBreaker(name, failure_threshold, open_seconds)
+        self.latency = LatencyTracker()
+        self._slots = threading.BoundedSemaphore(max_concurrency + max_queue)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        self.in_flight = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.max_latency_ms = 0.0
+        self._total_latency_ms = 0.0
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency, thread_name_prefix=f"cloud-{self.name}"
+                )
+            return self._pool
+
+    def current_timeout(self) -> float:
+        """本次调用的截止时间：P99 延迟 × 倍数，限制在 [min_timeout, timeout] 之间"""
+        if not self.adaptive_timeout:
+            return self.timeout
+        p99 = self.latency.percentile(99)
+        if p99 is None:
+            return self.timeout
+        return min(self.timeout, max(self.min_timeout, p99 * self.timeout_multiplier))
+
+    async def call(
+        self,
+        func: Callable,
+        *args,
+        timeout: Optional[float] = None,
+        idempotent: bool = False,
+        **kwargs
+    ) -> Any:
+        """
+        在线程池中执行阻塞调用
+
+        Args:
+            func: 阻塞的 SDK 调用
+            timeout: 本次调用的截止时间（秒），默认使用自适应截止时间
+            idempotent: 调用可以安全地重复发送（查询、识别），开启 hedge 时才会对冲
+
+        Raises:
+            CircuitOpen: 熔断中（CloudServiceBusy 的子类）
+            CloudServiceBusy: 并发和排队名额都已用完
+            CloudCallTimeout: 超过截止时间
+        """
+        probe = self.breaker.before_call()
+        call = functools.partial(func, *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        try:
+            first = self._start(loop, call)
+        except CloudServiceBusy:
+            if probe:
+                self.breaker.release_probe()
+            raise
+
+        deadline = timeout or self.current_timeout()
+        try:
+            result = await self._wait_first_success(loop, call, first, deadline, idempotent)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            self.breaker.record_failure()
+            logger.warning(f"☁️ {self.name} 调用超时 - 截止时间: {deadline:.2f}秒")
+            raise CloudCallTimeout(f"{self.name} 调用超时")
+        except Exception as e:
+            if is_breaker_failure(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        except BaseException:
+            # 等待被取消（客户端断开、外层 wait_for 超时）：没有得到结果，不计成败，
+            # 但必须释放探测名额，否则半开状态下之后的调用会一直被拒绝
+            if probe:
+                self.breaker.release_probe()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def _start(self, loop: asyncio.AbstractEventLoop, call: Callable, count_rejection: bool = True) -> "asyncio.Future":
+        if not self._slots.acquire(blocking=False):
+            if count_rejection:
+                with self._lock:
+                    self.rejected += 1
+                logger.warning(f"☁️ {self.name} 调用繁忙，拒绝请求 - 进行中: {self.in_flight}")
+            raise CloudServiceBusy(f"{self.name} 服务繁忙")
+
+        with self._lock:
+            self.in_flight += 1
+        future = loop.run_in_executor(self._get_pool(), self._run, call)
+        future.add_done_callback(self._release)
+        return future
+
+    async def _wait_first_success(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        call: Callable,
+        first: "asyncio.Future",
+        deadline: float,
+        idempotent: bool
+    ) -> Any:
+        """
+        等待第一个成功的结果
+
+        asyncio.wait 超时只是不再等待，不取消线程中的调用，名额由 _release 在调用结束后归还。
+        """
+        started = loop.time()
+        pending = {first}
+        hedge_delay = self.latency.percentile(self.hedge_percentile) if self.hedge and idempotent else None
+        if hedge_delay is not None and hedge_delay < deadline:
+            done, _ = await asyncio.wait(pending, timeout=hedge_delay)
+            if not done:
+                try:
+                    pending.add(self._start(loop, call, count_rejection=False))
+                    with self._lock:
+                        self.hedged += 1
+                except CloudServiceBusy:
+                    # 没有空闲名额时不对冲，继续等待第一次调用
+                    pass
+
+        error: Optional[BaseException] = None
+        while pending:
+            remaining = deadline - (loop.time() - started)
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                raise asyncio.TimeoutError()
+            for future in done:
+                if future.exception() is None:
+                    if future is not first:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _run(self, call: Callable) -> Any:
+        with self._lock:
+            self.running += 1
+        start = time.perf_counter()
+        try:
+            result = call()
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            latency_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.running -= 1
+                self._total_latency_ms += latency_ms
+                self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+        # 超时后才完成的调用也计入，云端变慢时截止时间能随之放宽
+        self.latency.record(latency_ms / 1000)
+        with self._lock:
+            self.completed += 1
+        return result
+
+    def _release(self, future: "asyncio.Future") -> None:
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+        # 超时后没有人再等待结果，读取异常避免 "exception was never retrieved" 日志
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            finished = self.completed + self.failed
+            stats = {
+                "name": self.name,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "timeout": self.timeout,
+                "in_flight": self.in_flight,
+                "running": self.running,
+                "queued": self.in_flight - self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "avg_latency_ms": round(self._total_latency_ms / finished, 2) if finished else 0.0,
+                "max_latency_ms": round(self.max_latency_ms, 2)
+            }
+        for q in (50, 95, 99):
+            latency = self.latency.percentile(q)
+            stats[f"p{q}_latency_ms"] = round(latency * 1000, 2) if latency is not None else None
+        stats["current_timeout"] = round(self.current_timeout(), 3)
+        stats["breaker"] = self.breaker.stats()
+        return stats
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+
+
+class CloudExecutor:
+    """按服务名管理各云服务的调用限制"""
+
+    def __init__(self):
+        self._services: Dict[str, CloudServiceLimiter] = {}
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        name: str,
+        max_concurrency: int,
+        timeout: float,
+        max_queue: int = 0,
+        hedge: bool = False
+    ) -> CloudServiceLimiter:
+        """注册云服务，同名服务只创建一次；熔断和自适应截止时间使用全局配置"""
+        with self._lock:
+            if name not in self._services:
+                self._services[name] = CloudServiceLimiter(
+                    name, max_concurrency, timeout, max_queue,
+                    failure_threshold=settings.CLOUD_BREAKER_FAILURE_THRESHOLD,
+                    open_seconds=settings.CLOUD_BREAKER_OPEN_SECONDS,
+                    adaptive_timeout=settings.CLOUD_ADAPTIVE_TIMEOUT_ENABLED,
+                    timeout_multiplier=settings.CLOUD_ADAPTIVE_TIMEOUT_MULTIPLIER,
+                    min_timeout=settings.CLOUD_ADAPTIVE_TIMEOUT_MIN_SECONDS,
+                    hedge=hedge,
+                    hedge_percentile=settings.CLOUD_HEDGE_PERCENTILE
+                )
+            return self._services[name]
+
+    def get(self, name: str) -> Optional[CloudServiceLimiter]:
+        return self._services.get(name)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [limiter.stats() for limiter in self._services.values()]
+
+    def shutdown(self) -> None:
+        for limiter in self._services.values():
+            limiter.shutdown()
+
+
+def raise_for_cloud_unavailable(result: Dict[str, Any], retry_after: int = 1) -> None:
+    """
+    服务繁忙或熔断中返回 503（带 Retry-After），调用超时返回 504；其他结果不处理，由接口自行判断
+
+    Args:
+        result: 服务层返回的结果字典，繁忙时带 busy 标记（熔断时另带 retry_after），超时时带 timeout 标记
+    """
+    if result.get('busy'):
+        retry_after = result.get('retry_after', retry_after)
+        raise HTTPException(status_code=503, detail=result.get('error'), headers={"Retry-After": str(retry_after)})
+    if result.get('timeout'):
+        raise HTTPException(status_code=504, detail=result.get('error'))
+
+
+# 全局云服务执行器实例
+cloud_executor = CloudExecutor()
@@ -0,0 +1,323 @@
+"""
+目标匹配索引
+Precompiled per-user goal matching index
+"""
+
+import re
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.utils.keyword_automaton import KeywordAutomaton
+
+try:
+    import numpy as np
+except ImportError:  # 未安装 NumPy 时只使用逐目标打分
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# 标题中不参与匹配的修饰词
+TITLE_STOPWORDS = ('计划', '目标', '任务', '的')
+
+# 英文/数字按整词，中文按连续字符切分
+_SEGMENT = re.compile(r'[a-z0-9]+|[\u4e00-\u9fff]+')
+
+
+def match_terms(text: Optional[str]) -> Set[str]:
+    """
+    把标题/描述切成匹配词
+
+    中文没有空格，str.split() 得到的是整句，只有内容里原样出现整个标题才能命中；
+    这里中文按字符二元组切分，英文和数字保留整词，长度小于2的片段丢弃
+    """
+    terms: Set[str] = set()
+    if not text:
+        return terms
+
+    for segment in _SEGMENT.findall(text.lower()):
+        if segment.isascii():
+            if len(segment) >= 2:
+                terms.add(segment)
+        else:
+            terms.update(segment[i:i + 2] for i in range(len(segment) - 1))
+    return terms
+
+
+def goals_fingerprint(goals: list) -> Tuple:
+    """参与匹配的目标字段，与顺序无关；任何一个目标变化都会使索引失效"""
+    return tuple(sorted(
+        (str(goal.id), goal.title or "", goal.description or "", goal.category or "", goal.unit or "")
+        for goal in goals
+    ))
+
+
+class GoalMatchIndex:
+    """
+    单个用户的目标匹配索引
+
+    构建时把所有目标的标题词、描述词、单位及其变体，以及用到的类别关键词
+    编译进一个 Aho-Corasick 自动机；匹配时只扫描一遍记录内容，
+    再用命中的词一次算出全部目标的分数。
+
+    索引只保存目标ID，不保存ORM对象：缓存跨越多个请求，旧会话里的对象不能再使用。
+    """
+
+    def __init__(
+        self,
+        goals: list,
+        keyword_categories: Dict[str, Dict[str, List[str]]],
+        unit_variants: Dict[str, List[str]]
+    ):
+        self.fingerprint = goals_fingerprint(goals)
+        self.goal_ids: List[str] = []
+        self.categories: List[Optional[str]] = []
+        self.title_terms: List[Set[str]] = []
+        self.desc_terms: List[Set[str]] = []
+        self.units: List[List[Tuple[str, str]]] = []
+        self.keyword_categories: Dict[str, Dict[str, List[str]]] = {}
+
+        for goal in goals:
+            title = (goal.title or "").lower()
+            for stopword in TITLE_STOPWORDS:
+                title = title.replace(stopword, '')
+
+            category = (goal.category or "").strip()
+            if category in keyword_categories:
+                self.keyword_categories[category] = keyword_categories[category]
+
+            # 单位本身优先，其次按词典顺序的变体，显示名与匹配词成对保存
+            units: List[Tuple[str, str]] = []
+            if goal.unit:
+                unit_lower = goal.unit.lower()
+                units.append((unit_lower, goal.unit))
+                units.extend((variant, variant) for variant in unit_variants.get(unit_lower, []))
+
+            self.goal_ids.append(str(goal.id))
+            self.categories.append(category if category in keyword_categories else None)
+            self.title_terms.append(match_terms(title))
+            self.desc_terms.append(match_terms(goal.description))
+            self.units.append(units)
+
+        patterns: Set[str] = set()
+        for terms in self.title_terms + self.desc_terms:
+            patterns.update(terms)
+        for units in self.units:
+            patterns.update(term for term, _ in units)
+        for tiers in self.keyword_categories.values():
+            for words in tiers.values():
+                patterns.update(words)
+        self.automaton = KeywordAutomaton(patterns)
+        self.positions = {goal_id: i for i, goal_id in enumerate(self.goal_ids)}
+
+        # 向量化打分使用的稀疏矩阵，第一次使用时才构建
+        self._vectors: Optional["GoalScoreVectors"] = None
+
+    def __len__(self) -> int:
+        return len(self.goal_ids)
+
+    def find_terms(self, content: str) -> Set[str]:
+        """扫描一遍记录内容，返回命中的索引词"""
+        return self.automaton.find_all(content.lower())
+
+    def score_all(self, content: str) -> List[Tuple[float, List[str]]]:
+        """
+        逐个目标计算匹配分数
+
+        Returns:
+            与 goal_ids 顺序一致的 (分数, 匹配原因) 列表
+        """
+        hits = self.find_terms(content)
+
+        # 同类别的目标共用一次类别打分
+        category_scores = {
+            category: self._score_category(tiers, hits)
+            for category, tiers in self.keyword_categories.items()
+        }
+
+        return [self._score_goal(i, hits, category_scores) for i in range(len(self.goal_ids))]
+
+    def score_vector(self, content: str) -> Tuple["np.ndarray", Set[str]]:
+        """
+        一次稀疏矩阵乘法计算所有目标的匹配分数（需要 NumPy）
+
+        分数与 score_all 完全一致，但不生成匹配原因；需要原因时对排名靠前的目标调用 explain
+
+        Returns:
+            (与 goal_ids 顺序一致的分数向量, 命中的索引词)
+        """
+        hits = self.find_terms(content)
+        if self._vectors is None:
+            self._vectors = GoalScoreVectors(self)
+        category_scores = {
+            category: self._score_category(tiers, hits)[0]
+            for category, tiers in self.keyword_categories.items()
+        }
+        return self._vectors.score(hits, category_scores), hits
+
+    def explain(self, i: int, hits: Set[str]) -> Tuple[float, List[str]]:
+        """计算单个目标的分数和匹配原因"""
+        category = self.categories[i]
+        category_scores = {category: self._score_category(self.keyword_categories[category], hits)} if category else {}
+        return self._score_goal(i, hits, category_scores)
+
+    def _score_goal(
+        self,
+        i: int,
+        hits: Set[str],
+        category_scores: Dict[str, Tuple[float, List[str]]]
+    ) -> Tuple[float, List[str]]:
+        score = 0.0
+        reasons: List[str] = []
+
+        # 1. 类别关键词匹配
+        if self.categories[i]:
+            category_score, category_reasons = category_scores[self.categories[i]]
+            score += category_score
+            reasons.extend(category_reasons)
+
+        # 2. 标题词：每个 +0.5分，最多1.5分
+        title_matches = len(self.title_terms[i] & hits)
+        if title_matches:
+            score += min(title_matches * 0.5, 1.5)
+            reasons.append(f"标题词×{title_matches}")
+
+        # 3. 描述词：每个 +0.1分，最多0.5分
+        desc_matches = len(self.desc_terms[i] & hits)
+        if desc_matches:
+            score += min(desc_matches * 0.1, 0.5)
+            reasons.append(f"描述词×{desc_matches}")
+
+        # 4. 单位或其变体
+        for term, display in self.units[i]:
+            if term in hits:
+                score += 0.4
+                reasons.append(f"单位'{display}'")
+                break
+
+        return score, reasons
+
+    @staticmethod
+    def _score_category(tiers: Dict[str, List[str]], hits: Set[str]) -> Tuple[float, List[str]]:
+        score = 0.0
+        reasons: List[str] = []
+
+        # 主关键词匹配（权重 1.0，只计一次）
+        for keyword in tiers['primary']:
+            if keyword in hits:
+                score += 1.0
+                reasons.append(f"主关键词'{keyword}'")
+                break
+
+        # 相关关键词匹配（权重 0.3/个，最多0.9分）
+        related = sum(1 for keyword in tiers['related'] if keyword in hits)
+        if related:
+            score += min(related * 0.3, 0.9)
+            reasons.append(f"相关词×{related}")
+
+        # 上下文关键词匹配（权重 0.2/个，最多0.6分）
+        context = sum(1 for keyword in tiers['context'] if keyword in hits)
+        if context:
+            score += min(context * 0.2, 0.6)
+            reasons.append(f"上下文×{context}")
+
+        return score, reasons
+
+
+class GoalScoreVectors:
+    """
+    目标特征的稀疏矩阵
+
+    标题词、描述词、单位三个 (目标 × 词) 0/1 矩阵按列压缩存储：每个词对应包含它的目标下标数组。
+    记录内容的命中词向量与矩阵相乘，就是把命中词对应的列拼起来按目标计数（bincount），
+    计算量只与命中词的倒排长度有关，不随目标数逐个循环。
+    """
+
+    def __init__(self, index: GoalMatchIndex):
+        self.size = len(index)
+        self.title = self._columns(index.title_terms)
+        self.desc = self._columns(index.desc_terms)
+        self.unit = self._columns([{term for term, _ in units} for units in index.units])
+
+        # 类别分数按类别算一次，再按目标所属类别取值；最后一个位置对应没有类别
+        self.category_names = list(index.keyword_categories)
+        slots = {category: slot for slot, category in enumerate(self.category_names)}
+        self.category_slots = np.array(
+            [slots.get(category, len(self.category_names)) for category in index.categories], dtype=np.int64
+        )
+
+    @staticmethod
+    def _columns(goal_terms: List[Set[str]]) -> Dict[str, "np.ndarray"]:
+        postings: Dict[str, List[int]] = {}
+        for i, terms in enumerate(goal_terms):
+            for term in terms:
+                postings.setdefault(term, []).append(i)
+        return {term: np.array(goals, dtype=np.int64) for term, goals in postings.items()}
+
+    def _counts(self, columns: Dict[str, "np.ndarray"], hits: Set[str]) -> "np.ndarray":
+        matched = [columns[term] for term in hits if term in columns]
+        if not matched:
+            return np.zeros(self.size, dtype=np.int64)
+        return np.bincount(np.concatenate(matched), minlength=self.size)
+
+    def score(self, hits: Set[str], category_scores: Dict[str, float]) -> "np.ndarray":
+        # 各项相加的顺序与逐目标打分一致，保证浮点结果完全相同
+        category_values = np.array(
+            [category_scores[category] for category in self.category_names] + [0.0]
+        )
+        scores = category_values[self.category_slots]
+        scores = scores + np.minimum(self._counts(self.title, hits) * 0.5, 1.5)
+        scores = scores + np.minimum(self._counts(self.desc, hits) * 0.1, 0.5)
+        scores = scores + (self._counts(self.unit, hits) > 0) * 0.4
+        return scores
+
+
+class GoalMatchIndexCache:
+    """
+    按用户缓存目标匹配索引（LRU）
+
+    目标新增、修改、删除时调用 invalidate；此外每次读取都会核对目标指纹和词典，
+    遗漏失效调用时也不会用到过期的索引。
+    """
+
+    def __init__(self, max_users: int = 1024):
+        self.max_users = max_users
+        self._items: "OrderedDict[str, Tuple[object, GoalMatchIndex]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, user_id: str, goals: list, dictionaries: Tuple) -> GoalMatchIndex:
+        """
+        获取用户的匹配索引，不存在或已过期时重新构建
+
+        Args:
+            dictionaries: GoalMatcher 当前使用的词典（版本, 类别关键词, 单位变体），按对象身份比较
+        """
+        fingerprint = goals_fingerprint(goals)
+        with self._lock:
+            entry = self._items.get(user_id)
+            if entry is not None and entry[0] is dictionaries and entry[1].fingerprint == fingerprint:
+                self._items.move_to_end(user_id)
+                return entry[1]
+
+        index = GoalMatchIndex(goals, dictionaries[1], dictionaries[2])
+        logger.debug(f"构建目标匹配索引 - 用户: {user_id}, 目标数: {len(index)}")
+
+        with self._lock:
+            self._items[user_id] = (dictionaries, index)
+            self._items.move_to_end(user_id)
+            while len(self._items) > self.max_users:
+                self._items.popitem(last=False)
+        return index
+
+    def invalidate(self, user_id: str) -> None:
+        with self._lock:
+            self._items.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+# 全局目标匹配索引缓存实例
+goal_match_index_cache = GoalMatchIndexCache()
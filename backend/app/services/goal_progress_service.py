@@ -6,6 +6,9 @@ Goal progress update service
 from sqlalchemy.orm import Session
 from app.models.goal import Goal, GoalStatus
 from app.models.process_record import ProcessRecord, ProcessRecordType
+from app.models.change_log import ChangeEntityType
+from app.services.sync_service import SyncService
+from app.services.user_stats_service import UserStatsService
 from datetime import datetime
 import logging
 
@@ -71,6 +74,7 @@ class GoalProgressService:
                             "current_value": str(new_current_value),
                             "goal_id": goal_id
                         })
+                        UserStatsService(self.db).goal_completed(record.user_id)
                     else:
                         # 更新进度
                         self.db.execute(text("""
@@ -80,6 +84,7 @@ class GoalProgressService:
                             "goal_id": goal_id
                         })
                     
+                    SyncService(self.db).record_change(record.user_id, ChangeEntityType.goal, goal_id)
                     self.db.commit()
                     
                     logger.info(f"目标 {goal_id} 进度更新: {current_value} -> {new_current_value} ({new_progress:.1f}%)")
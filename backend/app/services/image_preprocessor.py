@@ -0,0 +1,319 @@
+"""
+拍照识别前的图片预处理
+Image downscale and recompression before OCR
+"""
+
+import asyncio
+import importlib.util
+import io
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from app.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# 判断图片格式需要读取的头部字节数
+HEADER_SIZE = 16
+
+# 与边框颜色相差超过该灰度值的像素视为内容，用于裁掉纯色边框
+BORDER_THRESHOLD = 24
+
+# 裁剪后在内容四周保留的边距（占内容尺寸的比例）
+BORDER_MARGIN = 0.02
+
+# 质量逐步下调的步长
+QUALITY_STEP = 10
+
+
+class ImagePreprocessError(ValueError):
+    """图片内容不可用（无法识别的格式、无法解码），不再调用云端识别"""
+
+
+def sniff_image_format(header: bytes) -> Optional[str]:
+    """
+    根据文件头判断图片格式
+
+    不使用文件扩展名和 Content-Type：小程序临时文件的扩展名与实际编码不一定一致
+    """
+    if header.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if header.startswith(b"BM"):
+        return "bmp"
+    if header.startswith(b"GIF87a") or header.startswith(b"GIF89a"):
+        return "gif"
+    if header.startswith(b"RIFF") and header[8:12] == b"WEBP":
+        return "webp"
+    if header[:4] in (b"II*\x00", b"MM\x00*"):
+        return "tiff"
+    return None
+
+
+def _content_box(image, threshold: int, margin: float) -> Optional[Tuple[int, int, int, int]]:
+    """以左上角像素为边框颜色，返回内容区域（含边距），没有边框时返回 None"""
+    from PIL import Image, ImageChops
+
+    background = Image.new(image.mode, image.size, image.getpixel((0, 0)))
+    mask = ImageChops.difference(image, background).point(lambda value: 255 if value > threshold else 0)
+    box = mask.getbbox()
+    if box is None:
+        return None
+
+    left, top, right, bottom = box
+    pad_x = int((right - left) * margin)
+    pad_y = int((bottom - top) * margin)
+    box = (max(0, left - pad_x), max(0, top - pad_y), min(image.width, right + pad_x), min(image.height, bottom + pad_y))
+    return None if box == (0, 0, image.width, image.height) else box
+
+
+def _preprocess_worker(
+    data: bytes,
+    max_side: int,
+    quality: int,
+    min_quality: int,
+    max_bytes: int,
+    grayscale: bool,
+    crop_borders: bool
+) -> Tuple[bytes, int, int]:
+    """
+    在子进程中执行的预处理任务（必须是模块级函数才能被 pickle）
+
+    按 EXIF 方向摆正 -> 转灰度 -> 裁掉纯色边框 -> 长边缩小到 max_side -> 编码为 JPEG。
+    编码结果超过 max_bytes 时逐步降低质量，最低到 min_quality
+
+    Returns:
+        (JPEG 数据, 宽, 高)
+    """
+    from PIL import Image, ImageOps
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        # JPEG 解码时直接按 1/2、1/4、1/8 缩小，大图不必先解码到原始分辨率
+        scale = max_side / max(image.size)
+        if scale < 1:
+            image.draft("L" if grayscale else "RGB", (int(image.width * scale), int(image.height * scale)))
+        image.load()
+    except Exception as e:
+        raise ImagePreprocessError(f"图片无法解码: {e}")
+
+    # draft 之后 EXIF 仍然保留，方向按原图处理
+    image = ImageOps.exif_transpose(image)
+    image = image.convert("L" if grayscale else "RGB")
+
+    if crop_borders:
+        box = _content_box(image.convert("L"), BORDER_THRESHOLD, BORDER_MARGIN)
+        if box:
+            image = image.crop(box)
+
+    if max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    while True:
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=quality)
+        if output.tell() <= max_bytes or quality <= min_quality:
+            return output.getvalue(), image.width, image.height
+        quality = max(min_quality, quality - QUALITY_STEP)
+
+
+def _thumbnail_worker(data: bytes, size: int, quality: int) -> Tuple[bytes, int, int]:
+    """
+    在子进程中生成缩略图：按 EXIF 方向摆正、保留颜色、长边缩小到 size，编码为 JPEG
+
+    Returns:
+        (JPEG 数据, 宽, 高)
+    """
+    from PIL import Image, ImageOps
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.draft("RGB", (size, size))
+        image.load()
+    except Exception as e:
+        raise ImagePreprocessError(f"图片无法解码: {e}")
+
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    image.thumbnail((size, size), Image.LANCZOS)
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=quality)
+    return output.getvalue(), image.width, image.height
+
+
+class ImagePreprocessor:
+    """
+    拍照识别前的图片缩放和重新压缩
+
+    手机照片通常是 4000 像素以上、3~5MB 的彩色 JPEG，而通用印刷体识别在长边 2000 像素左右
+    已经能得到同样的结果。发送给云端前先在本地：
+    - 按文件头识别格式，无法识别或无法解码的图片直接拒绝，不再付费调用云端
+    - 按 EXIF 方向摆正（手机竖拍的照片像素是横向存储的）
+    - 转为灰度、长边缩小到 max_side、可选裁掉纯色边框，重新编码为 JPEG；
+      超过 max_bytes 时逐步降低质量
+    上传数据通常缩小到原来的十分之一以下，OCR 请求的上传和识别耗时随之下降。
+
+    解码和缩放是CPU密集的，在独立进程池中执行；未安装 Pillow、预处理超时或结果反而更大时
+    按原图发送。
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        workers: int = 1,
+        timeout: float = 10,
+        max_side: int = 2048,
+        quality: int = 85,
+        min_quality: int = 60,
+        max_bytes: int = 1024 * 1024,
+        grayscale: bool = True,
+        crop_borders: bool = False
+    ):
+        self.pillow = importlib.util.find_spec("PIL") is not None
+        self.enabled = enabled and self.pillow
+        self.workers = workers
+        self.timeout = timeout
+        self.max_side = max_side
+        self.quality = quality
+        self.min_quality = min_quality
+        self.max_bytes = max_bytes
+        self.grayscale = grayscale
+        self.crop_borders = crop_borders
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        self.processed = 0
+        self.skipped = 0
+        self.rejected = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.total_ms = 0.0
+        self.thumbnails = 0
+
+        if enabled and not self.enabled:
+            logger.warning("未安装 Pillow，拍照识别前不做图片压缩")
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info(f"创建图片预处理进程池 - 进程数: {self.workers}")
+            return self._pool
+
+    async def prepare(self, image: bytes) -> bytes:
+        """
+        识别格式并缩放、压缩图片
+
+        Args:
+            image: 图片字节数据
+
+        Returns:
+            发送给云端的图片；未做预处理时返回原图
+
+        Raises:
+            ImagePreprocessError: 格式无法识别或无法解码
+        """
+        image_format = sniff_image_format(bytes(image[:HEADER_SIZE]))
+        if image_format is None:
+            self.rejected += 1
+            raise ImagePreprocessError("不支持的图片格式，请上传 jpg 或 png 图片")
+
+        if not self.enabled:
+            self.skipped += 1
+            return image
+
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._get_pool(), _preprocess_worker, bytes(image), self.max_side,
+            self.quality, self.min_quality, self.max_bytes, self.grayscale, self.crop_borders
+        )
+        try:
+            processed, width, height = await asyncio.wait_for(future, self.timeout)
+        except ImagePreprocessError:
+            self.rejected += 1
+            raise
+        except asyncio.TimeoutError:
+            # 预处理超时不是图片的问题，按原图发送
+            logger.warning(f"⚠️ 图片预处理超时（{self.timeout}秒），使用原图")
+            self.skipped += 1
+            return image
+        except Exception as e:
+            logger.warning(f"⚠️ 图片预处理失败，使用原图: {e}")
+            self.skipped += 1
+            return image
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if len(processed) >= len(image):
+            # 原图已经足够小（例如截图），重新编码没有收益
+            self.skipped += 1
+            return image
+
+        self.processed += 1
+        self.bytes_in += len(image)
+        self.bytes_out += len(processed)
+        self.total_ms += elapsed_ms
+        logger.info(
+            f"🖼️ 图片预处理: {image_format} {len(image)}字节 -> jpeg {len(processed)}字节, "
+            f"{width}x{height}, 耗时 {elapsed_ms:.0f}ms"
+        )
+        return processed
+
+    async def thumbnail(self, image: bytes, size: int, quality: int = 75) -> Optional[Tuple[bytes, int, int]]:
+        """
+        在预处理进程池中生成缩略图（与OCR预处理开关无关）
+
+        Returns:
+            (JPEG 数据, 宽, 高)；未安装 Pillow 或生成失败时返回 None
+        """
+        if not self.pillow:
+            return None
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._get_pool(), _thumbnail_worker, bytes(image), size, quality)
+        try:
+            result = await asyncio.wait_for(future, self.timeout)
+        except Exception as e:
+            logger.warning(f"⚠️ 生成缩略图失败: {e}")
+            return None
+        self.thumbnails += 1
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "processed": self.processed,
+            "skipped": self.skipped,
+            "rejected": self.rejected,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "avg_ms": round(self.total_ms / self.processed, 1) if self.processed else None,
+            "thumbnails": self.thumbnails
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+# 全局图片预处理实例
+image_preprocessor = ImagePreprocessor(
+    enabled=settings.IMAGE_PREPROCESS_ENABLED,
+    workers=settings.IMAGE_PREPROCESS_WORKERS,
+    timeout=settings.IMAGE_PREPROCESS_TIMEOUT_SECONDS,
+    max_side=settings.IMAGE_MAX_SIDE,
+    quality=settings.IMAGE_JPEG_QUALITY,
+    min_quality=settings.IMAGE_JPEG_MIN_QUALITY,
+    max_bytes=settings.IMAGE_MAX_BYTES,
+    grayscale=settings.IMAGE_GRAYSCALE,
+    crop_borders=settings.IMAGE_CROP_BORDERS
+)
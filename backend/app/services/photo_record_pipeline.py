@@ -0,0 +1,264 @@
+"""
+照片识别并创建过程记录的处理流程
+Photo record pipeline shared by the synchronous route and background jobs
+"""
+
+import asyncio
+import base64
+import logging
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config.settings import get_settings
+from app.models.change_log import ChangeEntityType
+from app.models.process_record import ProcessRecord, ProcessRecordType, ProcessRecordSource
+from app.services.analysis_executor import analysis_executor
+from app.services.goal_progress_service import GoalProgressService
+from app.services.image_preprocessor import image_preprocessor, ImagePreprocessError
+from app.services.record_search_service import record_search_index
+from app.services.sync_service import SyncService
+from app.services.user_stats_service import UserStatsService
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# 开发模式下的模拟识别结果
+MOCK_PHOTO_TEXT = "今天完成了Python学习任务，进度80%。学习了装饰器和生成器的使用。"
+
+
+class PhotoRecognitionError(ValueError):
+    """照片中没有可用的文字（图片无法识别、未检测到文字），重试也不会成功"""
+
+
+class OCRNotConfigured(RuntimeError):
+    """OCR客户端未初始化（未配置腾讯云凭证）"""
+
+
+class PhotoRecordPipeline:
+    """
+    照片识别并创建记录
+
+    依次执行：图片预处理 -> OCR -> 内容分析 -> 匹配目标 -> 保存记录 -> 更新目标进度，
+    每个阶段的耗时（毫秒）记录在 timings 中。数据库操作在线程中执行，不阻塞事件循环；
+    同一个会话只在一个线程中顺序使用。
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """记录一个阶段的耗时，阶段抛出异常时同样记录"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+    async def recognize(self, photo: bytes) -> str:
+        """
+        识别照片中的文字
+
+        Raises:
+            PhotoRecognitionError: 图片无法识别或未检测到文字
+            OCRNotConfigured: OCR客户端未初始化
+            CloudServiceBusy: OCR并发已满或熔断中
+            CloudCallTimeout: 超过截止时间
+        """
+        if settings.OCR_DEV_MODE:
+            logger.info("🔧 开发模式：使用模拟OCR识别")
+            return MOCK_PHOTO_TEXT
+
+        # 延迟导入：未配置腾讯云凭证时创建客户端会失败，不能影响应用启动
+        from app.services.tencent_ocr_service import ocr_service
+
+        if not ocr_service.client:
+            raise OCRNotConfigured("OCR客户端未初始化")
+
+        # 摆正、转灰度、缩小并重新压缩，无法识别的图片不再调用云端
+        with self.stage("preprocess"):
+            try:
+                ocr_image = await image_preprocessor.prepare(photo)
+            except ImagePreprocessError as e:
+                raise PhotoRecognitionError(str(e))
+
+        with self.stage("ocr"):
+            image_base64 = await asyncio.to_thread(lambda: base64.b64encode(ocr_image).decode('utf-8'))
+            logger.info(f"📸 开始调用OCR识别，图片大小: {len(ocr_image)} 字节")
+            ocr_results = await ocr_service.general_basic_ocr(image_base64)
+
+        return self._text(ocr_results)
+
+    async def recognize_stored(self, storage, key: str) -> str:
+        """
+        识别客户端已直传到存储的照片
+
+        COS存储时把预签名下载地址交给OCR服务直接下载，照片不经过应用服务器；
+        本地存储时读出照片后按 recognize() 的流程识别。
+
+        Raises:
+            与 recognize() 相同；照片不存在时抛出 PhotoRecognitionError
+        """
+        if settings.OCR_DEV_MODE:
+            logger.info("🔧 开发模式：使用模拟OCR识别")
+            return MOCK_PHOTO_TEXT
+
+        from app.services.tencent_ocr_service import ocr_service
+
+        if not ocr_service.client:
+            raise OCRNotConfigured("OCR客户端未初始化")
+
+        image_url = await storage.fetch_url(key, settings.PHOTO_DIRECT_UPLOAD_EXPIRES_SECONDS)
+        if image_url is None:
+            with self.stage("load"):
+                photo = await storage.get(key)
+            if photo is None:
+                raise PhotoRecognitionError("照片不存在，请重新上传")
+            return await self.recognize(photo)
+
+        with self.stage("ocr"):
+            logger.info(f"📸 开始调用OCR识别，对象键: {key}")
+            ocr_results = await ocr_service.general_basic_ocr(image_url=image_url)
+
+        return self._text(ocr_results)
+
+    @staticmethod
+    def _text(ocr_results) -> str:
+        if ocr_results is None:
+            raise RuntimeError("OCR识别失败")
+        if not ocr_results:
+            raise PhotoRecognitionError("图片中未检测到文字，请拍摄包含清晰文字的图片")
+
+        photo_text = " ".join([block["text"] for block in ocr_results])
+        logger.info(f"✅ OCR识别成功: {photo_text[:50]}...")
+        return photo_text
+
+    async def create_record(
+        self,
+        user_id: str,
+        photo_text: str,
+        goal_id: Optional[str] = None,
+        before_commit: Optional[Callable[[Session, ProcessRecord], None]] = None
+    ) -> Tuple[ProcessRecord, Dict[str, Any]]:
+        """
+        分析内容、匹配目标（未指定 goal_id 时）、保存记录并更新目标进度
+
+        Args:
+            user_id: 用户ID
+            photo_text: 识别出的文字
+            goal_id: 关联的目标ID，为空时自动匹配
+            before_commit: 在保存记录的同一事务中执行的回调，例如把任务标记为完成
+
+        Returns:
+            (过程记录, 分析结果)
+        """
+        with self.stage("analysis"):
+            analysis = await analysis_executor.analyze_content(photo_text)
+
+        if not goal_id:
+            with self.stage("match"):
+                goal_id = await asyncio.to_thread(self._match_goal, user_id, photo_text)
+
+        with self.stage("save"):
+            db_record = await asyncio.to_thread(self._save, user_id, photo_text, analysis, goal_id, before_commit)
+
+        if goal_id:
+            with self.stage("progress"):
+                await asyncio.to_thread(self._update_progress, goal_id, db_record)
+
+        return db_record, analysis
+
+    def _match_goal(self, user_id: str, photo_text: str) -> Optional[str]:
+        """智能匹配目标，匹配失败不影响创建记录"""
+        try:
+            from app.models.goal import Goal
+            from app.services.goal_matcher import goal_matcher
+
+            logger.info("🎯 开始智能匹配目标...")
+
+            # 获取用户的所有活跃目标
+            goals = self.db.query(Goal).filter(
+                Goal.user_id == user_id,
+                Goal.status == 'active'
+            ).all()
+
+            if not goals:
+                logger.info("ℹ️ 用户暂无活跃目标")
+                return None
+
+            match_result = goal_matcher.match_goal(
+                content=photo_text,
+                goals=goals,
+                user_id=user_id,
+                db=self.db
+            )
+            if not match_result:
+                logger.info("ℹ️ 未找到匹配的目标")
+                return None
+
+            logger.info(
+                f"✅ 自动匹配到目标: {match_result['matched_goal'].title} "
+                f"(分数: {match_result['score']:.2f}, "
+                f"置信度: {match_result['confidence']}, "
+                f"原因: {match_result['reason']})"
+            )
+            return match_result['matched_goal'].id
+
+        except Exception as e:
+            logger.warning(f"⚠️ 目标匹配失败: {str(e)}")
+            return None
+
+    def _save(
+        self,
+        user_id: str,
+        photo_text: str,
+        analysis: Dict[str, Any],
+        goal_id: Optional[str],
+        before_commit: Optional[Callable[[Session, ProcessRecord], None]]
+    ) -> ProcessRecord:
+        db_record = ProcessRecord(
+            content=photo_text,
+            record_type=ProcessRecordType(analysis['record_type']),
+            source=ProcessRecordSource.photo,
+            goal_id=goal_id,
+            event_date=datetime.utcnow(),
+            sentiment=analysis['sentiment'],
+            energy_level=analysis['energy_level'],
+            difficulty_level=analysis['difficulty_level'],
+            keywords=analysis['keywords'],
+            tags=analysis['tags'],
+            is_important=analysis['is_important'],
+            is_milestone=analysis['is_milestone'],
+            is_breakthrough=analysis['is_breakthrough'],
+            confidence_score=analysis['confidence_score'],
+            analyzer_version=analysis['analyzer_version'],
+            user_id=user_id
+        )
+
+        try:
+            self.db.add(db_record)
+            self.db.flush()
+            SyncService(self.db).record_change(user_id, ChangeEntityType.process_record, db_record.id)
+            UserStatsService(self.db).record_created(user_id, db_record)
+            if before_commit:
+                before_commit(self.db, db_record)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        self.db.refresh(db_record)
+        record_search_index.index_record(db_record)
+        return db_record
+
+    def _update_progress(self, goal_id: str, db_record: ProcessRecord) -> None:
+        """更新目标进度，失败不影响已创建的记录"""
+        try:
+            GoalProgressService(self.db).update_goal_progress_from_record(goal_id, db_record)
+            logger.info(f"✅ 目标进度已更新: {goal_id}")
+        except Exception as e:
+            logger.warning(f"⚠️ 更新目标进度失败: {str(e)}")
@@ -0,0 +1,123 @@
+"""
+过程记录重新分析
+Re-analyze process records after a dictionary upgrade
+"""
+
+import logging
+from typing import Callable, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.models.change_log import ChangeEntityType
+from app.models.process_record import ProcessRecord, ProcessRecordSource, ProcessRecordType
+from app.services.analysis_executor import analysis_executor
+from app.services.sync_service import SyncService
+from app.utils.process_analyzer import process_analyzer
+
+logger = logging.getLogger(__name__)
+
+# 重新分析时覆盖的字段
+ANALYSIS_FIELDS = [
+    'sentiment', 'energy_level', 'difficulty_level', 'keywords',
+    'is_important', 'is_milestone', 'is_breakthrough', 'confidence_score'
+]
+
+# 这些来源的记录类型和标签由分析结果决定；手动记录的类型和标签是用户选的，不覆盖
+ANALYZED_SOURCES = (ProcessRecordSource.voice, ProcessRecordSource.photo)
+
+
+class ReanalysisService:
+    """
+    过程记录重新分析
+
+    关键词词典升级后，按主键顺序分块扫描 analyzer_version 为空或低于当前版本的记录，
+    用当前词典重新分析并写回。每块单独提交，提交后通过 on_chunk 回调报告最后处理的主键，
+    中断后从该主键继续；即使没有保存检查点，已处理记录的版本号已经更新，从头重跑也只会跳过它们。
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _stale(self, version: int):
+        return or_(ProcessRecord.analyzer_version.is_(None), ProcessRecord.analyzer_version < version)
+
+    def pending_count(self, version: Optional[int] = None) -> int:
+        """需要重新分析的记录数"""
+        version = version or process_analyzer.version
+        return self.db.query(ProcessRecord).filter(self._stale(version)).count()
+
+    def run(
+        self,
+        chunk_size: int = 500,
+        start_after_id: int = 0,
+        on_chunk: Optional[Callable[[int, int], None]] = None
+    ) -> int:
+        """
+        重新分析所有版本落后的记录
+
+        Args:
+            chunk_size: 每块记录数
+            start_after_id: 从该主键之后开始（断点续跑）
+            on_chunk: 每块提交后回调 (最后处理的主键, 累计处理数)
+
+        Returns:
+            本次处理的记录数
+        """
+        version = process_analyzer.version
+        last_id = start_after_id
+        processed = 0
+
+        while True:
+            records = (
+                self.db.query(ProcessRecord)
+                .filter(ProcessRecord.id > last_id, self._stale(version))
+                .order_by(ProcessRecord.id)
+                .limit(chunk_size)
+                .all()
+            )
+            if not records:
+                break
+
+            analyses = analysis_executor.analyze_batch([record.content or "" for record in records])
+
+            sync_service = SyncService(self.db)
+            for record, analysis in zip(records, analyses):
+                if self._apply(record, analysis):
+                    sync_service.record_change(record.user_id, ChangeEntityType.process_record, record.id)
+
+            processed += len(records)
+            last_id = records[-1].id
+            self.db.commit()
+
+            # 提交后释放已处理的对象，内存占用只与块大小有关
+            self.db.expunge_all()
+
+            logger.info(f"重新分析过程记录: 已处理 {processed} 条，最后主键 {last_id}")
+            if on_chunk:
+                on_chunk(last_id, processed)
+
+        logger.info(f"重新分析完成: {processed} 条记录，词典版本 {version}")
+        return processed
+
+    @staticmethod
+    def _apply(record: ProcessRecord, analysis: dict) -> bool:
+        """
+        把分析结果写到记录上
+
+        Returns:
+            用户可见的字段是否有变化（有变化才需要通知客户端同步）
+        """
+        values = {field: analysis[field] for field in ANALYSIS_FIELDS}
+        if record.source in ANALYZED_SOURCES:
+            values['record_type'] = ProcessRecordType(analysis['record_type'])
+            values['tags'] = analysis['tags']
+
+        changed = False
+        for field, value in values.items():
+            if getattr(record, field) != value:
+                setattr(record, field, value)
+                changed = True
+
+        record.analyzer_version = analysis['analyzer_version']
+        return changed
@@ -0,0 +1,117 @@
+"""
+最近记录服务
+Per-user recent process records feed
+"""
+
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.services.sync_service import SyncService
+
+logger = logging.getLogger(__name__)
+
+# 首页"最近动态"展示的条数
+RECENT_LIMIT = 10
+
+
+class RecentRecordsCache:
+    """
+    按用户缓存最近动态
+
+    每个用户最多保存 per_user 条，最多缓存 max_users 个用户（LRU淘汰）。
+    每条缓存带有写入时该用户的 change_log 游标。新建、修改、删除记录都会写入变更日志，
+    读取时传入当前游标，不一致的缓存视为未命中并重新走索引查询；
+    多进程部署时其他进程的写入也能以此发现。
+    """
+
+    def __init__(self, max_users: int = 1024, per_user: int = RECENT_LIMIT):
+        self.max_users = max_users
+        self.per_user = per_user
+        self._items: "OrderedDict[str, Tuple[int, List[Dict]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str, version: Optional[int] = None) -> Optional[List[Dict]]:
+        """读取缓存；传入 version 时只返回游标一致的缓存"""
+        with self._lock:
+            entry = self._items.get(user_id)
+            if entry is None:
+                return None
+            if version is not None and entry[0] != version:
+                del self._items[user_id]
+                return None
+            self._items.move_to_end(user_id)
+            return list(entry[1])
+
+    def set(self, user_id: str, items: List[Dict], version: int = 0) -> None:
+        with self._lock:
+            self._items[user_id] = (version, list(items[:self.per_user]))
+            self._items.move_to_end(user_id)
+            while len(self._items) > self.max_users:
+                self._items.popitem(last=False)
+
+    def invalidate(self, user_id: str) -> None:
+        with self._lock:
+            self._items.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+# 全局最近动态缓存实例
+recent_records_cache = RecentRecordsCache()
+
+
+class RecentRecordsService:
+    """最近记录服务"""
+
+    def __init__(self, db: Session, cache: RecentRecordsCache = recent_records_cache):
+        self.db = db
+        self.cache = cache
+
+    def get_recent(self, user_id: str) -> List[Dict]:
+        """
+        获取用户最近的过程记录
+
+        未命中缓存时走 idx_process_records_user_recent (user_id, is_deleted, recorded_at) 索引，
+        只扫描该用户最新的 RECENT_LIMIT 行，不随全表数据量增长。
+        命中缓存前先按 (user_id, id) 索引取该用户最新的 change_log 游标，其他进程写入过时重新查询
+        """
+        # 先取游标再查询：查询期间的写入会使游标前进，下次读取时重新查询
+        version = SyncService(self.db).get_latest_cursor(user_id)
+        items = self.cache.get(user_id, version)
+        if items is not None:
+            return items
+
+        result = self.db.execute(text("""
+            SELECT id, content, record_type, source, recorded_at, sentiment
+            FROM process_records
+            WHERE user_id = :user_id AND is_deleted = FALSE
+            ORDER BY recorded_at DESC
+            LIMIT :limit
+        """), {"user_id": user_id, "limit": self.cache.per_user})
+
+        items = []
+        for record in result.fetchall():
+            recorded_at = record[4]
+            if isinstance(recorded_at, str):
+                # SQLite 原生查询返回字符串
+                created_at = recorded_at.replace(" ", "T")
+            else:
+                created_at = recorded_at.isoformat() if recorded_at else None
+            items.append({
+                "id": str(record[0]),
+                "type": record[2],  # record_type
+                "content": record[1],  # content
+                "source": record[3],  # source
+                "sentiment": record[5],  # sentiment
+                "created_at": created_at
+            })
+
+        self.cache.set(user_id, items, version)
+        return list(items)
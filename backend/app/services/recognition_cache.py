@@ -0,0 +1,231 @@
+"""
+识别结果缓存
+Content-addressed cache for ASR/OCR results with single-flight coalescing
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, Optional, Union
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config.settings import get_settings
+from app.models.recognition_cache import RecognitionCacheEntry
+from app.utils.result_cache import ResultCache
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# 计算摘要时每次读取的字节数
+DIGEST_CHUNK_SIZE = 1024 * 1024
+
+# 持久层清理过期条目的最小间隔
+PURGE_INTERVAL_SECONDS = 3600
+
+
+def recognition_cache_key(media: Union[bytes, BinaryIO], kind: str, **params: Any) -> str:
+    """
+    缓存键：识别类型、识别参数和媒体内容的SHA-256
+
+    media 可以是字节或文件对象（按块读取，不整体读入内存，读完后回到开头）。
+    参数按键排序序列化，引擎或格式不同的请求不会共用结果。
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([kind, params], ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    digest.update(b"\0")
+    if isinstance(media, (bytes, bytearray, memoryview)):
+        digest.update(media)
+    else:
+        media.seek(0)
+        while True:
+            chunk = media.read(DIGEST_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+        media.seek(0)
+    return digest.hexdigest()
+
+
+class RecognitionCache:
+    """
+    识别结果缓存
+
+    - 进程内 LRU：命中时不访问数据库
+    - 数据库 recognition_cache 表：多实例共享，重启后仍有效，按 TTL 过期
+    - 单飞：同一缓存键的识别正在进行时，后到的请求等待同一次调用的结果，不重复调用云端
+
+    只缓存 cacheable 判定为成功的结果；繁忙、超时等异常会抛给所有等待中的请求。
+    持久层读写失败只记录日志，按未命中处理，不影响识别本身。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl_seconds: int = 7 * 24 * 3600,
+        memory_size: int = 512,
+        persistent: bool = True,
+        enabled: bool = True,
+        session_factory: Optional[Callable[[], Session]] = None
+    ):
+        self.name = name
+        self.ttl = ttl_seconds
+        self.persistent = persistent
+        self.enabled = enabled
+        self.memory = ResultCache(name, memory_size)
+        self._session_factory = session_factory
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._last_purge = 0.0
+
+        self.calls = 0
+        self.coalesced = 0
+        self.persistent_hits = 0
+        self.persistent_errors = 0
+
+    @property
+    def session_factory(self) -> Callable[[], Session]:
+        if self._session_factory is None:
+            from app.database import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    async def get_or_call(
+        self,
+        key: str,
+        kind: str,
+        call: Callable[[], Awaitable[Any]],
+        cacheable: Callable[[Any], bool] = lambda result: result is not None
+    ) -> Any:
+        """
+        命中缓存则返回缓存结果，否则调用 call 并缓存结果
+
+        查内存和登记进行中的调用之间没有 await，同一事件循环内不会出现两次调用。
+        调用在独立任务中执行：发起请求的客户端断开，等待同一结果的其他请求不受影响。
+        """
+        if not self.enabled:
+            return await call()
+
+        cached = self._get_memory(key)
+        if cached is not None:
+            return cached
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._load(key, kind, call, cacheable))
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._on_done(key, done))
+        else:
+            self.coalesced += 1
+        result = await asyncio.shield(future)
+        return copy.deepcopy(result)
+
+    def _on_done(self, key: str, future: asyncio.Future) -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        # 所有等待者都已取消时，避免 "exception was never retrieved" 警告
+        if not future.cancelled():
+            future.exception()
+
+    async def _load(self, key: str, kind: str, call: Callable[[], Awaitable[Any]], cacheable: Callable[[Any], bool]) -> Any:
+        if self.persistent:
+            found, result = await asyncio.to_thread(self._get_persistent, key)
+            if found:
+                self.persistent_hits += 1
+                self._put_memory(key, result)
+                return result
+
+        self.calls += 1
+        result = await call()
+        if cacheable(result):
+            self._put_memory(key, result)
+            if self.persistent:
+                await asyncio.to_thread(self._put_persistent, key, kind, result)
+        return result
+
+    def _get_memory(self, key: str) -> Optional[Any]:
+        entry = self.memory.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at < time.time():
+            return None
+        return result
+
+    def _put_memory(self, key: str, result: Any) -> None:
+        self.memory.put(key, (time.time() + self.ttl, result))
+
+    def _get_persistent(self, key: str):
+        db = self.session_factory()
+        try:
+            entry = db.query(RecognitionCacheEntry).filter(
+                RecognitionCacheEntry.cache_key == key,
+                RecognitionCacheEntry.expires_at > datetime.utcnow()
+            ).first()
+            if entry is None:
+                return False, None
+            return True, entry.result
+        except Exception as e:
+            self.persistent_errors += 1
+            logger.warning(f"⚠️ 读取识别结果缓存失败: {e}")
+            return False, None
+        finally:
+            db.close()
+
+    def _put_persistent(self, key: str, kind: str, result: Any) -> None:
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+        db = self.session_factory()
+        try:
+            entry = db.query(RecognitionCacheEntry).filter(RecognitionCacheEntry.cache_key == key).first()
+            if entry is None:
+                db.add(RecognitionCacheEntry(cache_key=key, kind=kind, result=result, expires_at=expires_at))
+            else:
+                # 已过期的旧条目直接覆盖
+                entry.kind = kind
+                entry.result = result
+                entry.expires_at = expires_at
+
+            if time.time() - self._last_purge > PURGE_INTERVAL_SECONDS:
+                self._last_purge = time.time()
+                db.query(RecognitionCacheEntry).filter(
+                    RecognitionCacheEntry.expires_at <= now
+                ).delete(synchronize_session=False)
+            db.commit()
+        except IntegrityError:
+            # 其他实例同时写入了相同结果
+            db.rollback()
+        except Exception as e:
+            db.rollback()
+            self.persistent_errors += 1
+            logger.warning(f"⚠️ 写入识别结果缓存失败: {e}")
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.memory.stats()
+        stats.update({
+            "enabled": self.enabled,
+            "persistent": self.persistent,
+            "ttl": self.ttl,
+            "inflight": len(self._inflight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "persistent_hits": self.persistent_hits,
+            "persistent_errors": self.persistent_errors
+        })
+        return stats
+
+
+# 全局识别结果缓存实例，语音识别和OCR共用
+recognition_cache = RecognitionCache(
+    "recognition",
+    ttl_seconds=settings.RECOGNITION_CACHE_TTL_SECONDS,
+    memory_size=settings.RECOGNITION_CACHE_MEMORY_SIZE,
+    persistent=settings.RECOGNITION_CACHE_PERSISTENT,
+    enabled=settings.RECOGNITION_CACHE_ENABLED
+)
@@ -0,0 +1,595 @@
+"""
+识别任务服务
+Recognition job service and background workers for long-audio recognition and photo records
+"""
+
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config.settings import get_settings
+from app.models.recognition_job import RecognitionJob, RecognitionJobKind, RecognitionJobStatus
+from app.services.cloud_executor import CloudServiceBusy, CloudCallTimeout
+from app.services.photo_record_pipeline import PhotoRecordPipeline, PhotoRecognitionError
+from app.services.photo_storage import PhotoUploader, photo_uploader
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# 录音文件识别可直接随请求上传的数据上限，超过时需要先上传COS再提交URL
+DIRECT_UPLOAD_MAX_SIZE = 5 * 1024 * 1024
+
+# 录音文件识别任务状态：0 等待、1 识别中、2 成功、3 失败
+TASK_STATUS_SUCCESS = 2
+TASK_STATUS_FAILED = 3
+
+ACTIVE_STATUSES = (RecognitionJobStatus.pending.value, RecognitionJobStatus.processing.value)
+
+
+class JobLeaseLost(RuntimeError):
+    """租期已过期并被其他实例重新取走，或任务已经结束，本实例不能再更新该任务"""
+
+
+def backoff_seconds(attempts: int, initial: float, maximum: float) -> float:
+    """第 attempts 次重试前的等待时间：initial, 2*initial, 4*initial ... 不超过 maximum"""
+    return min(initial * (2 ** attempts), maximum)
+
+
+class RecognitionJobService:
+    """识别任务的创建和查询"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def create_voice_job(self, user_id: str, input_path: str, input_format: str, input_size: int) -> RecognitionJob:
+        """创建录音识别任务，立即到期，由后台 worker 提交到云端"""
+        job = RecognitionJob(
+            user_id=user_id,
+            kind=RecognitionJobKind.voice.value,
+            status=RecognitionJobStatus.pending.value,
+            input_path=input_path,
+            input_format=input_format,
+            input_size=input_size,
+            attempts=0,
+            next_poll_at=datetime.utcnow()
+        )
+        self.db.add(job)
+        self.db.commit()
+        self.db.refresh(job)
+        logger.info(f"🎙️ 创建录音识别任务 - 任务ID: {job.id}, 用户ID: {user_id}, 大小: {input_size}字节")
+        return job
+
+    def create_photo_record_job(
+        self,
+        user_id: str,
+        input_path: str,
+        input_format: str,
+        input_size: int,
+        goal_id: Optional[str] = None
+    ) -> RecognitionJob:
+        """创建拍照记录任务，立即到期，由后台 worker 识别照片并创建过程记录"""
+        job = RecognitionJob(
+            user_id=user_id,
+            kind=RecognitionJobKind.photo_record.value,
+            status=RecognitionJobStatus.pending.value,
+            input_path=input_path,
+            input_format=input_format,
+            input_size=input_size,
+            params={"goal_id": goal_id} if goal_id else None,
+            attempts=0,
+            next_poll_at=datetime.utcnow()
+        )
+        self.db.add(job)
+        self.db.commit()
+        self.db.refresh(job)
+        logger.info(f"📷 创建拍照记录任务 - 任务ID: {job.id}, 用户ID: {user_id}, 大小: {input_size}字节")
+        return job
+
+    def get_job(self, user_id: str, job_id: int, kind: Optional[RecognitionJobKind] = None) -> Optional[RecognitionJob]:
+        """获取用户自己的任务，指定 kind 时只返回该类型的任务"""
+        query = self.db.query(RecognitionJob).filter(
+            RecognitionJob.id == job_id,
+            RecognitionJob.user_id == user_id
+        )
+        if kind is not None:
+            query = query.filter(RecognitionJob.kind == kind.value)
+        return query.first()
+
+    @staticmethod
+    def to_dict(job: RecognitionJob) -> Dict[str, Any]:
+        """任务状态响应，不包含本地文件路径和云端任务ID"""
+        return {
+            "job_id": job.id,
+            "kind": job.kind,
+            "status": job.status,
+            "result": job.result,
+            "error": job.error,
+            "stage_timings": job.stage_timings,
+            "created_at": job.created_at,
+            "completed_at": job.completed_at
+        }
+
+
+class RecognitionJobWorker:
+    """
+    识别任务后台 worker
+
+    作为事件循环中的后台任务运行，每隔 interval 秒取出到期的任务：
+    - pending：提交录音文件识别任务（5MB以内直接上传数据，否则先上传COS再提交URL）
+    - processing：查询云端任务状态，未完成时按指数退避推迟下一次查询
+
+    取任务时用条件更新把 next_poll_at 推后一个租期，多个实例同时运行时同一任务只会被一个实例处理；
+    处理中途进程退出的任务在租期结束后重新到期。数据库操作在线程中执行，不阻塞事件循环。
+    """
+
+    # 本 worker 处理的任务类型
+    kinds = (RecognitionJobKind.voice.value,)
+    name = "识别任务"
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        asr=None,
+        cos=None,
+        interval: float = 1,
+        batch_size: int = 20,
+        poll_initial: float = 2,
+        poll_max: float = 60,
+        max_submit_attempts: int = 5,
+        max_wait_seconds: int = 3 * 3600,
+        lease_seconds: int = 120
+    ):
+        self._session_factory = session_factory
+        self._asr = asr
+        self._cos = cos
+        self.interval = interval
+        self.batch_size = batch_size
+        self.poll_initial = poll_initial
+        self.poll_max = poll_max
+        self.max_submit_attempts = max_submit_attempts
+        self.max_wait = timedelta(seconds=max_wait_seconds)
+        self.lease = timedelta(seconds=lease_seconds)
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+
+        self.submitted = 0
+        self.polled = 0
+        self.succeeded = 0
+        self.failed = 0
+
+    @property
+    def session_factory(self) -> Callable[[], Session]:
+        if self._session_factory is None:
+            from app.database import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    @property
+    def asr(self):
+        # 延迟导入：未配置腾讯云凭证时创建客户端会失败，不能影响应用启动
+        if self._asr is None:
+            from app.services.tencent_asr_service import asr_service
+            self._asr = asr_service
+        return self._asr
+
+    @property
+    def cos(self):
+        if self._cos is None:
+            from app.services.tencent_cos_service import cos_service
+            self._cos = cos_service
+        return self._cos
+
+    def start(self) -> None:
+        """在当前事件循环中启动后台任务"""
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logger.info(f"启动{self.name} worker - 检查间隔: {self.interval}秒, 每批任务数: {self.batch_size}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self) -> None:
+        """有新任务时立即检查，不必等到下一个检查间隔"""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"识别任务 worker 异常: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def run_once(self) -> int:
+        """处理一批到期任务，返回处理的任务数"""
+        jobs = await asyncio.to_thread(self._claim_due_jobs)
+        if jobs:
+            await asyncio.gather(*(self._process(job) for job in jobs))
+        return len(jobs)
+
+    def _claim_due_jobs(self) -> List[Dict[str, Any]]:
+        now = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            due = db.query(RecognitionJob.id, RecognitionJob.next_poll_at).filter(
+                RecognitionJob.kind.in_(self.kinds),
+                RecognitionJob.status.in_(ACTIVE_STATUSES),
+                RecognitionJob.next_poll_at <= now
+            ).order_by(RecognitionJob.next_poll_at).limit(self.batch_size).all()
+
+            claimed = []
+            for job_id, next_poll_at in due:
+                rows = db.query(RecognitionJob).filter(
+                    RecognitionJob.id == job_id,
+                    RecognitionJob.next_poll_at == next_poll_at
+                ).update({RecognitionJob.next_poll_at: now + self.lease}, synchronize_session=False)
+                if rows:
+                    claimed.append(job_id)
+            db.commit()
+
+            if not claimed:
+                return []
+            jobs = db.query(RecognitionJob).filter(RecognitionJob.id.in_(claimed)).all()
+            return [
+                {
+                    "id": job.id,
+                    "user_id": job.user_id,
+                    "status": job.status,
+                    "params": job.params or {},
+                    "task_id": job.task_id,
+                    "attempts": job.attempts or 0,
+                    "input_path": job.input_path,
+                    "input_format": job.input_format,
+                    "input_size": job.input_size or 0,
+                    "created_at": job.created_at,
+                    # 取任务时写入的租期，续租和提交结果时用它确认任务仍由本实例持有
+                    "lease_until": job.next_poll_at
+                }
+                for job in jobs
+            ]
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _update(self, job_id: int, **fields) -> None:
+        db = self.session_factory()
+        try:
+            db.query(RecognitionJob).filter(RecognitionJob.id == job_id).update(fields, synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _renew_lease(self, job: Dict[str, Any], **fields) -> None:
+        """
+        仍持有租期时把 next_poll_at 再推后一个租期，同时更新 fields
+
+        Raises:
+            JobLeaseLost: 租期已被其他实例取走或任务已结束
+        """
+        # 去掉微秒，数据库 DATETIME 精度不足时写入值与内存中的值仍然一致
+        lease_until = (datetime.utcnow() + self.lease).replace(microsecond=0)
+        db = self.session_factory()
+        try:
+            rows = db.query(RecognitionJob).filter(
+                RecognitionJob.id == job["id"],
+                RecognitionJob.status.in_(ACTIVE_STATUSES),
+                RecognitionJob.next_poll_at == job["lease_until"]
+            ).update({"next_poll_at": lease_until, **fields}, synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        if not rows:
+            raise JobLeaseLost(f"任务 {job['id']} 的租期已失效")
+        job["lease_until"] = lease_until
+
+    async def _process(self, job: Dict[str, Any]) -> None:
+        try:
+            if job["status"] == RecognitionJobStatus.pending.value:
+                await self._submit(job)
+            else:
+                await self._poll(job)
+        except (CloudServiceBusy, CloudCallTimeout) as e:
+            # 云端繁忙或超时不计入尝试次数，稍后重试
+            logger.warning(f"⚠️ 识别任务 {job['id']} 暂缓处理: {e}")
+            await self._retry_later(job, attempts=job["attempts"])
+        except Exception as e:
+            logger.error(f"❌ 识别任务 {job['id']} 处理异常: {e}")
+            await self._retry_later(job, attempts=job["attempts"] + 1)
+
+    async def _submit(self, job: Dict[str, Any]) -> None:
+        if job["input_size"] <= DIRECT_UPLOAD_MAX_SIZE:
+            data = await asyncio.to_thread(self._read_file, job["input_path"])
+            created = await self.asr.create_rec_task(audio_data=data)
+        else:
+            audio_url = await self._upload_to_cos(job)
+            created = await self.asr.create_rec_task(audio_url=audio_url) if audio_url else None
+
+        if not created:
+            attempts = job["attempts"] + 1
+            if attempts >= self.max_submit_attempts:
+                await self._finish(job, RecognitionJobStatus.failed, error="提交识别任务失败")
+            else:
+                await self._retry_later(job, attempts=attempts)
+            return
+
+        self.submitted += 1
+        logger.info(f"📤 识别任务 {job['id']} 已提交 - 云端任务ID: {created['task_id']}")
+        await asyncio.to_thread(
+            self._update, job["id"],
+            status=RecognitionJobStatus.processing.value,
+            task_id=created["task_id"],
+            attempts=0,
+            next_poll_at=datetime.utcnow() + timedelta(seconds=self.poll_initial)
+        )
+
+    async def _poll(self, job: Dict[str, Any]) -> None:
+        self.polled += 1
+        status = await self.asr.describe_task_status(job["task_id"])
+        if status and status["status"] == TASK_STATUS_SUCCESS:
+            await self._finish(job, RecognitionJobStatus.succeeded, result={
+                "text": status["text"],
+                "raw": status["result"],
+                "audio_duration": status.get("audio_duration")
+            })
+        elif status and status["status"] == TASK_STATUS_FAILED:
+            await self._finish(job, RecognitionJobStatus.failed, error=(status.get("error_msg") or "识别失败")[:500])
+        else:
+            # 排队中、识别中，或查询失败，按退避间隔再次查询
+            await self._retry_later(job, attempts=job["attempts"] + 1)
+
+    async def _retry_later(self, job: Dict[str, Any], attempts: int) -> None:
+        if job["created_at"] and datetime.utcnow() - job["created_at"] > self.max_wait:
+            await self._finish(job, RecognitionJobStatus.failed, error="识别超时")
+            return
+        delay = backoff_seconds(attempts, self.poll_initial, self.poll_max)
+        await asyncio.to_thread(
+            self._update, job["id"],
+            attempts=attempts,
+            next_poll_at=datetime.utcnow() + timedelta(seconds=delay)
+        )
+
+    async def _finish(
+        self,
+        job: Dict[str, Any],
+        status: RecognitionJobStatus,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+        **fields
+    ) -> None:
+        await asyncio.to_thread(
+            self._update, job["id"],
+            status=status.value,
+            result=result,
+            error=error,
+            input_path=None,
+            next_poll_at=None,
+            completed_at=datetime.utcnow(),
+            **fields
+        )
+        # 识别完成后不再保留录音文件
+        if job["input_path"]:
+            try:
+                os.remove(job["input_path"])
+            except OSError:
+                pass
+        cos_key = job["params"].get("cos_key")
+        if cos_key:
+            try:
+                await self.cos.delete_file(cos_key)
+            except Exception as e:
+                logger.warning(f"⚠️ 识别任务 {job['id']} 的COS录音删除失败: {cos_key} - {e}")
+
+        if status == RecognitionJobStatus.succeeded:
+            self.succeeded += 1
+            logger.info(f"✅ 识别任务 {job['id']} 完成")
+        else:
+            self.failed += 1
+            logger.warning(f"❌ 识别任务 {job['id']} 失败: {error}")
+
+    async def _upload_to_cos(self, job: Dict[str, Any]) -> Optional[str]:
+        """
+        上传COS并生成覆盖整个等待期的预签名URL
+
+        对象键记入任务的 params，任务结束时删除；提交重试时复用已上传的对象
+        """
+        cos_key = job["params"].get("cos_key")
+        if not cos_key:
+            uploaded = await self.cos.upload_from_local(job["input_path"])
+            if not uploaded:
+                return None
+            cos_key = uploaded["object_key"]
+            params = {**job["params"], "cos_key": cos_key}
+            await asyncio.to_thread(self._update, job["id"], params=params)
+            job["params"] = params
+        return await self.cos.get_file_url(cos_key, expires=int(self.max_wait.total_seconds()))
+
+    @staticmethod
+    def _read_file(path: str) -> bytes:
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "submitted": self.submitted,
+            "polled": self.polled,
+            "succeeded": self.succeeded,
+            "failed": self.failed
+        }
+
+
+class PhotoRecordJobWorker(RecognitionJobWorker):
+    """
+    拍照记录任务后台 worker
+
+    与录音识别任务共用任务表、取任务的租期和退避逻辑。每个到期任务依次执行照片记录流程：
+    读取照片 -> 图片预处理 -> OCR -> 内容分析 -> 匹配目标 -> 保存记录 -> 更新目标进度，
+    各阶段耗时写入任务的 stage_timings，并在 stats() 中汇总平均耗时。
+
+    - OCR繁忙或超时不计入尝试次数，按退避间隔稍后重试
+    - 图片无法识别或未检测到文字直接失败，重试也不会成功
+    - 其他异常按退避间隔重试，累计 max_submit_attempts 次后失败
+
+    记录与任务完成状态在同一个事务中提交，且提交时要求任务仍处于进行中并由本实例持有租期
+    （next_poll_at 与本实例写入的租期一致），否则回滚记录，处理中途进程退出或租期过期后
+    被其他实例重新执行的任务不会重复创建记录。OCR、内容分析等耗时阶段开始前续租。
+    """
+
+    kinds = (RecognitionJobKind.photo_record.value,)
+    name = "拍照记录任务"
+
+    def __init__(self, *args, uploader: Optional[PhotoUploader] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.uploader = uploader or photo_uploader
+        self.retried = 0
+        self._stage_total_ms: Dict[str, float] = defaultdict(float)
+        self._stage_count: Dict[str, int] = defaultdict(int)
+
+    async def _process(self, job: Dict[str, Any]) -> None:
+        db = self.session_factory()
+        pipeline = PhotoRecordPipeline(db)
+        saved = False
+
+        def mark_succeeded(session: Session, record) -> None:
+            # 与记录在同一个事务中提交
+            nonlocal saved
+            rows = session.query(RecognitionJob).filter(
+                RecognitionJob.id == job["id"],
+                RecognitionJob.status.in_(ACTIVE_STATUSES),
+                RecognitionJob.next_poll_at == job["lease_until"]
+            ).update({
+                RecognitionJob.status: RecognitionJobStatus.succeeded.value,
+                RecognitionJob.result: {"record_id": record.id, "goal_id": record.goal_id, "text": record.content},
+                RecognitionJob.error: None,
+                RecognitionJob.input_path: None,
+                RecognitionJob.next_poll_at: None,
+                RecognitionJob.completed_at: datetime.utcnow(),
+                RecognitionJob.stage_timings: dict(pipeline.timings)
+            }, synchronize_session=False)
+            if not rows:
+                # 抛出异常使记录随事务回滚
+                raise JobLeaseLost(f"任务 {job['id']} 的租期已失效")
+            saved = True
+
+        try:
+            await asyncio.to_thread(self._renew_lease, job, status=RecognitionJobStatus.processing.value)
+            with pipeline.stage("load"):
+                photo = await asyncio.to_thread(self._read_file, job["input_path"])
+            photo_text = await pipeline.recognize(photo)
+            # OCR可能接近租期，内容分析开始前续租
+            await asyncio.to_thread(self._renew_lease, job)
+            db_record, _ = await pipeline.create_record(
+                job["user_id"], photo_text, job["params"].get("goal_id"), before_commit=mark_succeeded
+            )
+            record_id = db_record.id
+        except (CloudServiceBusy, CloudCallTimeout) as e:
+            # 云端繁忙或超时不计入尝试次数，稍后重试
+            logger.warning(f"⚠️ 拍照记录任务 {job['id']} 暂缓处理: {e}")
+            self.retried += 1
+            await self._retry_later(job, attempts=job["attempts"])
+            return
+        except JobLeaseLost as e:
+            # 任务已由其他实例接管，不再更新任务，也不删除输入照片
+            logger.warning(f"⚠️ 拍照记录任务 {job['id']} 放弃处理: {e}")
+            return
+        except PhotoRecognitionError as e:
+            await self._finish(job, RecognitionJobStatus.failed, error=str(e), stage_timings=pipeline.timings)
+            return
+        except Exception as e:
+            if saved:
+                # 记录和任务状态已提交，之后的异常不影响结果
+                logger.warning(f"⚠️ 拍照记录任务 {job['id']} 已完成，后续处理异常: {e}")
+            else:
+                logger.error(f"❌ 拍照记录任务 {job['id']} 处理异常: {e}")
+                attempts = job["attempts"] + 1
+                if attempts >= self.max_submit_attempts:
+                    await self._finish(job, RecognitionJobStatus.failed, error=str(e)[:500], stage_timings=pipeline.timings)
+                else:
+                    self.retried += 1
+                    await self._retry_later(job, attempts=attempts)
+                return
+        finally:
+            await asyncio.to_thread(db.close)
+
+        # 保存之后的阶段（更新目标进度）耗时在提交后补写
+        await asyncio.to_thread(self._update, job["id"], stage_timings=pipeline.timings)
+        # 输入照片移入上传暂存目录，后台保存原图和缩略图
+        try:
+            await self.uploader.submit_file(record_id, job["input_path"], job["input_format"] or "jpeg")
+        except OSError as e:
+            logger.warning(f"⚠️ 拍照记录任务 {job['id']} 的照片保存失败: {e}")
+            self._remove_input(job)
+        self.succeeded += 1
+        for stage, elapsed_ms in pipeline.timings.items():
+            self._stage_total_ms[stage] += elapsed_ms
+            self._stage_count[stage] += 1
+        logger.info(f"✅ 拍照记录任务 {job['id']} 完成 - 各阶段耗时: {pipeline.timings}")
+
+    @staticmethod
+    def _remove_input(job: Dict[str, Any]) -> None:
+        if job["input_path"]:
+            try:
+                os.remove(job["input_path"])
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+            "stage_avg_ms": {
+                stage: round(self._stage_total_ms[stage] / count, 1)
+                for stage, count in self._stage_count.items()
+            }
+        }
+
+
+# 全局识别任务 worker 实例
+recognition_job_worker = RecognitionJobWorker(
+    interval=settings.ASR_JOB_WORKER_INTERVAL_SECONDS,
+    poll_initial=settings.ASR_JOB_POLL_INITIAL_SECONDS,
+    poll_max=settings.ASR_JOB_POLL_MAX_SECONDS,
+    max_submit_attempts=settings.ASR_JOB_MAX_SUBMIT_ATTEMPTS,
+    max_wait_seconds=settings.ASR_JOB_MAX_WAIT_SECONDS,
+    lease_seconds=settings.ASR_JOB_LEASE_SECONDS
+)
+
+# 全局拍照记录任务 worker 实例
+photo_record_job_worker = PhotoRecordJobWorker(
+    interval=settings.PHOTO_JOB_WORKER_INTERVAL_SECONDS,
+    batch_size=settings.PHOTO_JOB_MAX_CONCURRENCY,
+    poll_initial=settings.PHOTO_JOB_RETRY_INITIAL_SECONDS,
+    poll_max=settings.PHOTO_JOB_RETRY_MAX_SECONDS,
+    max_submit_attempts=settings.PHOTO_JOB_MAX_ATTEMPTS,
+    max_wait_seconds=settings.PHOTO_JOB_MAX_WAIT_SECONDS,
+    lease_seconds=settings.PHOTO_JOB_LEASE_SECONDS
+)
@@ -0,0 +1,350 @@
+"""
+过程记录全文搜索服务
+Full-text search over process record content
+"""
+
+import math
+import re
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models.change_log import ChangeLog, ChangeEntityType, ChangeOperation
+from app.models.process_record import ProcessRecord
+from app.services.sync_service import SyncService
+
+logger = logging.getLogger(__name__)
+
+# 与 MySQL ngram 解析器的默认 ngram_token_size 保持一致
+NGRAM_SIZE = 2
+
+# 分区落后的变更超过该条数时整体重建，不再逐条追赶
+CATCH_UP_LIMIT = 500
+
+_WORD_RUN = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(content: Optional[str]) -> List[str]:
+    """
+    把文本切成字符 n-gram
+
+    中文没有空格分词，按连续的文字/数字串切成二元组，
+    英文和数字同样处理，和 MySQL ngram 解析器的行为一致。
+    """
+    if not content:
+        return []
+
+    grams = []
+    for run in _WORD_RUN.findall(content.lower()):
+        if len(run) < NGRAM_SIZE:
+            continue
+        grams.extend(run[i:i + NGRAM_SIZE] for i in range(len(run) - NGRAM_SIZE + 1))
+    return grams
+
+
+class _UserPartition:
+    """单个用户的倒排索引分区"""
+
+    def __init__(self, version: int = 0):
+        # 分区已包含的 change_log 游标
+        self.version = version
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_terms: Dict[int, Tuple[str, ...]] = {}
+        self.doc_lengths: Dict[int, int] = {}
+        self.doc_goals: Dict[int, Optional[str]] = {}
+        self.total_length = 0
+
+    def add(self, record_id: int, goal_id: Optional[str], content: str) -> None:
+        self.remove(record_id)
+
+        grams = tokenize(content)
+        term_freqs: Dict[str, int] = {}
+        for gram in grams:
+            term_freqs[gram] = term_freqs.get(gram, 0) + 1
+
+        for gram, tf in term_freqs.items():
+            self.postings.setdefault(gram, {})[record_id] = tf
+
+        self.doc_terms[record_id] = tuple(term_freqs)
+        self.doc_lengths[record_id] = len(grams)
+        self.doc_goals[record_id] = goal_id
+        self.total_length += len(grams)
+
+    def remove(self, record_id: int) -> None:
+        length = self.doc_lengths.pop(record_id, None)
+        if length is None:
+            return
+        self.doc_goals.pop(record_id, None)
+        self.total_length -= length
+
+        for gram in self.doc_terms.pop(record_id, ()):
+            docs = self.postings.get(gram)
+            if docs is None:
+                continue
+            docs.pop(record_id, None)
+            if not docs:
+                del self.postings[gram]
+
+    def search(self, query: str, goal_id: Optional[str] = None) -> List[Tuple[int, float]]:
+        """BM25 打分，返回按相关度降序的 (record_id, score)"""
+        query_grams = set(tokenize(query))
+        doc_count = len(self.doc_lengths)
+        if not query_grams or doc_count == 0:
+            return []
+
+        k1, b = 1.2, 0.75
+        avg_length = self.total_length / doc_count if doc_count else 0
+        scores: Dict[int, float] = {}
+
+        for gram in query_grams:
+            docs = self.postings.get(gram)
+            if not docs:
+                continue
+            idf = math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for record_id, tf in docs.items():
+                if goal_id is not None and self.doc_goals.get(record_id) != goal_id:
+                    continue
+                length_norm = 1 - b + b * (self.doc_lengths[record_id] / avg_length if avg_length else 0)
+                scores[record_id] = scores.get(record_id, 0.0) + idf * tf * (k1 + 1) / (tf + k1 * length_norm)
+
+        return sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+
+
+class RecordSearchIndex:
+    """
+    进程内 n-gram 倒排索引
+
+    用于没有 MySQL FULLTEXT 的环境（本地/SQLite）。按用户分区，
+    分区在该用户第一次搜索时从数据库构建，之后随记录写入增量维护；
+    只保留最近使用的 max_users 个分区，控制内存占用。
+
+    每个分区记录构建时该用户的 change_log 游标。多进程部署时其他进程的写入不会调用本进程的
+    index_record，搜索前比较游标，落后时按 change_log 追赶（见 RecordSearchService）。
+    """
+
+    def __init__(self, max_users: int = 256):
+        self.max_users = max_users
+        self._partitions: "OrderedDict[str, _UserPartition]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def is_loaded(self, user_id: str) -> bool:
+        with self._lock:
+            return user_id in self._partitions
+
+    def version(self, user_id: str) -> Optional[int]:
+        """分区已包含的 change_log 游标，分区未加载时返回 None"""
+        with self._lock:
+            partition = self._partitions.get(user_id)
+            return partition.version if partition is not None else None
+
+    def load_user(self, user_id: str, rows, version: int = 0) -> None:
+        """用 (id, goal_id, title, content) 行构建一个用户的分区，version 为读取前的 change_log 游标"""
+        partition = _UserPartition(version)
+        for record_id, goal_id, title, content in rows:
+            partition.add(record_id, goal_id, self._document(title, content))
+
+        with self._lock:
+            self._partitions[user_id] = partition
+            self._partitions.move_to_end(user_id)
+            while len(self._partitions) > self.max_users:
+                self._partitions.popitem(last=False)
+
+    def index_record(self, record: ProcessRecord) -> None:
+        """记录新增或修改后调用；分区尚未加载时跳过，首次搜索时会从数据库构建"""
+        with self._lock:
+            partition = self._partitions.get(record.user_id)
+            if partition is not None:
+                partition.add(record.id, record.goal_id, self._document(record.title, record.content))
+
+    def remove_record(self, user_id: str, record_id: int) -> None:
+        """记录删除后调用"""
+        with self._lock:
+            partition = self._partitions.get(user_id)
+            if partition is not None:
+                partition.remove(int(record_id))
+
+    def apply_changes(self, user_id: str, rows, removed_ids, version: int) -> None:
+        """按 change_log 追赶：rows 为变更后的 (id, goal_id, title, content)，removed_ids 为已删除的记录"""
+        with self._lock:
+            partition = self._partitions.get(user_id)
+            if partition is None:
+                return
+            for record_id in removed_ids:
+                partition.remove(int(record_id))
+            for record_id, goal_id, title, content in rows:
+                partition.add(record_id, goal_id, self._document(title, content))
+            partition.version = max(partition.version, version)
+
+    def search(self, user_id: str, query: str, goal_id: Optional[str] = None) -> List[Tuple[int, float]]:
+        with self._lock:
+            partition = self._partitions.get(user_id)
+            if partition is None:
+                return []
+            self._partitions.move_to_end(user_id)
+            return partition.search(query, goal_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._partitions.clear()
+
+    @staticmethod
+    def _document(title: Optional[str], content: Optional[str]) -> str:
+        return f"{title or ''} {content or ''}"
+
+
+# 全局进程内索引实例
+record_search_index = RecordSearchIndex()
+
+
+class RecordSearchService:
+    """过程记录搜索服务"""
+
+    def __init__(self, db: Session, index: RecordSearchIndex = record_search_index):
+        self.db = db
+        self.index = index
+
+    def search(
+        self,
+        user_id: str,
+        query: str,
+        goal_id: Optional[str] = None,
+        page: int = 1,
+        page_size: int = 20
+    ) -> Dict:
+        """
+        按相关度分页搜索当前用户的过程记录
+
+        Returns:
+            {'records': [ProcessRecord], 'total': 总命中数, 'page', 'page_size', 'has_next'}
+        """
+        query = (query or "").strip()
+        if len(query) < NGRAM_SIZE:
+            return self._page([], 0, page, page_size)
+
+        if self.db.bind.dialect.name == "mysql":
+            record_ids, total = self._search_fulltext(user_id, query, goal_id, page, page_size)
+        else:
+            record_ids, total = self._search_in_process(user_id, query, goal_id, page, page_size)
+
+        return self._page(self._load_records(user_id, record_ids), total, page, page_size)
+
+    def _search_fulltext(
+        self, user_id: str, query: str, goal_id: Optional[str], page: int, page_size: int
+    ) -> Tuple[List[int], int]:
+        """MySQL FULLTEXT ... WITH PARSER ngram 索引检索"""
+        goal_filter = "AND goal_id = :goal_id" if goal_id else ""
+        params = {
+            "user_id": user_id,
+            "query": query,
+            "goal_id": goal_id,
+            "limit": page_size,
+            "offset": (page - 1) * page_size
+        }
+
+        total = self.db.execute(text(f"""
+            SELECT COUNT(*) FROM process_records
+            WHERE user_id = :user_id AND is_deleted = FALSE {goal_filter}
+            AND MATCH(title, content) AGAINST (:query IN NATURAL LANGUAGE MODE)
+        """), params).scalar() or 0
+
+        if total == 0:
+            return [], 0
+
+        result = self.db.execute(text(f"""
+            SELECT id, MATCH(title, content) AGAINST (:query IN NATURAL LANGUAGE MODE) AS score
+            FROM process_records
+            WHERE user_id = :user_id AND is_deleted = FALSE {goal_filter}
+            AND MATCH(title, content) AGAINST (:query IN NATURAL LANGUAGE MODE)
+            ORDER BY score DESC, id DESC
+            LIMIT :limit OFFSET :offset
+        """), params)
+
+        return [row[0] for row in result.fetchall()], total
+
+    def _search_in_process(
+        self, user_id: str, query: str, goal_id: Optional[str], page: int, page_size: int
+    ) -> Tuple[List[int], int]:
+        """进程内倒排索引检索"""
+        # 先取游标再读数据：读取期间的写入会使游标前进，下次搜索时追赶
+        latest = SyncService(self.db).get_latest_cursor(user_id)
+        version = self.index.version(user_id)
+        if version is None or not self._catch_up(user_id, version, latest):
+            rows = self.db.query(
+                ProcessRecord.id, ProcessRecord.goal_id, ProcessRecord.title, ProcessRecord.content
+            ).filter(
+                ProcessRecord.user_id == user_id
+            ).yield_per(1000)
+            self.index.load_user(user_id, rows, latest)
+            logger.info(f"构建搜索索引分区 - 用户ID: {user_id}")
+
+        hits = self.index.search(user_id, query, goal_id)
+        offset = (page - 1) * page_size
+        return [record_id for record_id, _ in hits[offset:offset + page_size]], len(hits)
+
+    def _catch_up(self, user_id: str, version: int, latest: int) -> bool:
+        """
+        把分区更新到 latest 游标
+
+        Returns:
+            是否完成；落后的变更超过 CATCH_UP_LIMIT 条时返回 False，由调用方整体重建
+        """
+        if version >= latest:
+            return True
+
+        changes = self.db.query(ChangeLog.entity_id, ChangeLog.operation).filter(
+            ChangeLog.user_id == user_id,
+            ChangeLog.id > version,
+            ChangeLog.id <= latest,
+            ChangeLog.entity_type == ChangeEntityType.process_record.value
+        ).order_by(ChangeLog.id.asc()).limit(CATCH_UP_LIMIT + 1).all()
+        if len(changes) > CATCH_UP_LIMIT:
+            return False
+
+        # 同一记录多次变更时只看最后一次操作
+        latest_ops = {entity_id: operation for entity_id, operation in changes}
+        upsert_ids = [
+            int(entity_id) for entity_id, operation in latest_ops.items()
+            if operation == ChangeOperation.upsert.value and entity_id.isdigit()
+        ]
+        rows = self.db.query(
+            ProcessRecord.id, ProcessRecord.goal_id, ProcessRecord.title, ProcessRecord.content
+        ).filter(
+            ProcessRecord.user_id == user_id,
+            ProcessRecord.id.in_(upsert_ids)
+        ).all() if upsert_ids else []
+
+        # 删除操作，以及 upsert 之后已经查不到的记录，都从分区中移除
+        found = {row[0] for row in rows}
+        removed_ids = [
+            int(entity_id) for entity_id in latest_ops
+            if entity_id.isdigit() and int(entity_id) not in found
+        ]
+        self.index.apply_changes(user_id, rows, removed_ids, latest)
+        logger.info(f"搜索索引分区追赶 {len(changes)} 条变更 - 用户ID: {user_id}")
+        return True
+
+    def _load_records(self, user_id: str, record_ids: List[int]) -> List[ProcessRecord]:
+        """按命中顺序读取记录"""
+        if not record_ids:
+            return []
+
+        records = self.db.query(ProcessRecord).filter(
+            ProcessRecord.user_id == user_id,
+            ProcessRecord.id.in_(record_ids)
+        ).all()
+        by_id = {record.id: record for record in records}
+        return [by_id[record_id] for record_id in record_ids if record_id in by_id]
+
+    @staticmethod
+    def _page(records: List[ProcessRecord], total: int, page: int, page_size: int) -> Dict:
+        return {
+            "records": records,
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "has_next": (page * page_size) < total
+        }
@@ -0,0 +1,226 @@
+"""
+连续打卡引擎
+Incremental streak engine
+"""
+
+import logging
+from datetime import datetime, timedelta, date
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+
+def _as_date(value) -> Optional[date]:
+    """数据库返回的日期/时间统一转为 date（SQLite 原生查询返回字符串）"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.fromisoformat(str(value)[:10]).date()
+
+
+def effective_streak(user: User, today: Optional[date] = None) -> int:
+    """
+    当前有效的连续天数
+
+    每日滚动任务运行之前，昨天之前就没有活跃的用户在库里仍有旧值，读取时按 last_active_day 修正
+    """
+    today = today or datetime.utcnow().date()
+    last_active_day = _as_date(user.last_active_day)
+    if last_active_day is None or last_active_day < today - timedelta(days=1):
+        return 0
+    return user.streak_days or 0
+
+
+class StreakService:
+    """
+    连续打卡引擎
+
+    每个用户在 users 表上保存 last_active_day / streak_days（当前连续天数）/ longest_streak：
+    - 新增记录时 record_activity 用一条 UPDATE 完成 O(1) 更新
+    - 每日 rollover 把昨天没有活跃的用户的当前连续天数清零
+    - backfill 按 (用户, 日期) 顺序流式扫描一遍 process_records，重算全部状态
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def record_activity(self, user_id: str, day: date) -> None:
+        """
+        记录用户某天有活跃（调用方负责 commit）
+
+        MySQL 的单表 UPDATE 按从左到右的顺序赋值，后面的表达式会看到前面已更新的值；
+        因此 longest_streak 放在最前、last_active_day 放在最后，
+        保证每个表达式读到的都是更新前的值，和 SQLite 等数据库的语义一致。
+        """
+        new_streak = """
+            CASE
+                WHEN last_active_day IS NULL THEN 1
+                WHEN last_active_day >= :day THEN
+                    CASE WHEN streak_days > 0 THEN streak_days ELSE 1 END
+                WHEN last_active_day = :yesterday THEN streak_days + 1
+                ELSE 1
+            END
+        """
+        self.db.execute(text(f"""
+            UPDATE users SET
+                longest_streak = CASE
+                    WHEN ({new_streak}) > longest_streak THEN ({new_streak})
+                    ELSE longest_streak
+                END,
+                streak_days = {new_streak},
+                last_active_day = CASE
+                    WHEN last_active_day IS NOT NULL AND last_active_day > :day THEN last_active_day
+                    ELSE :day
+                END
+            WHERE id = :user_id
+        """), {"user_id": user_id, "day": day, "yesterday": day - timedelta(days=1)})
+
+    def rollover(self, today: Optional[date] = None, chunk_size: int = 1000) -> int:
+        """
+        每日滚动：把最近一次活跃早于昨天的用户的当前连续天数清零
+
+        按主键分块处理，每块单独提交，避免长事务锁住整张 users 表
+
+        Returns:
+            被清零的用户数
+        """
+        today = today or datetime.utcnow().date()
+        cutoff = today - timedelta(days=1)
+        reset = 0
+        last_id = ""
+
+        while True:
+            user_ids = [row[0] for row in self.db.execute(text("""
+                SELECT id FROM users
+                WHERE id > :last_id AND streak_days > 0 AND last_active_day < :cutoff
+                ORDER BY id
+                LIMIT :limit
+            """), {"last_id": last_id, "cutoff": cutoff, "limit": chunk_size})]
+            if not user_ids:
+                break
+
+            self.db.execute(text("""
+                UPDATE users SET streak_days = 0
+                WHERE id = :user_id AND last_active_day < :cutoff
+            """), [{"user_id": user_id, "cutoff": cutoff} for user_id in user_ids])
+            self.db.commit()
+
+            reset += len(user_ids)
+            last_id = user_ids[-1]
+            logger.info(f"连续天数滚动: 已处理 {reset} 个用户")
+
+        return reset
+
+    def backfill(self, today: Optional[date] = None, batch_size: int = 1000) -> int:
+        """
+        从 process_records 重算所有用户的连续打卡状态
+
+        一次按 (user_id, day) 升序流式读取去重后的活跃日，每个用户只需维护当前连续段，
+        内存占用与用户数无关；每个有记录的用户只写一次，回填期间其他用户的状态保持可读。
+        最后按主键分块把没有任何记录、但状态不为空的用户清零。
+
+        回填期间新增记录的用户（库中 last_active_day 已是今天且晚于重算结果）保留增量更新的值，
+        不被较早读到的数据覆盖。
+
+        Returns:
+            更新的用户数
+        """
+        today = today or datetime.utcnow().date()
+
+        pending: List[Dict] = []
+        updated = 0
+        state = None
+
+        # 流式游标占用连接期间不能在同一连接上执行其他语句，读取单独使用一个连接
+        with self.db.get_bind().connect() as reader:
+            result = reader.execution_options(stream_results=True).execute(text("""
+                SELECT user_id, DATE(recorded_at) AS day
+                FROM process_records
+                WHERE is_deleted = FALSE AND recorded_at IS NOT NULL
+                GROUP BY user_id, DATE(recorded_at)
+                ORDER BY user_id, day
+            """))
+
+            for user_id, day in result:
+                day = _as_date(day)
+                if state is None or state["user_id"] != user_id:
+                    if state is not None:
+                        pending.append(self._finish(state, today))
+                    state = {"user_id": user_id, "last_day": day, "run": 1, "longest": 1}
+                else:
+                    state["run"] = state["run"] + 1 if day == state["last_day"] + timedelta(days=1) else 1
+                    state["longest"] = max(state["longest"], state["run"])
+                    state["last_day"] = day
+
+                if len(pending) >= batch_size:
+                    updated += self._write(pending, today)
+                    pending = []
+
+        if state is not None:
+            pending.append(self._finish(state, today))
+        updated += self._write(pending, today)
+        updated += self._reset_inactive(batch_size)
+
+        logger.info(f"连续天数回填完成: {updated} 个用户")
+        return updated
+
+    def _reset_inactive(self, chunk_size: int) -> int:
+        """按主键分块清零没有任何记录的用户，每块单独提交"""
+        reset = 0
+        last_id = ""
+        while True:
+            user_ids = [row[0] for row in self.db.execute(text("""
+                SELECT id FROM users
+                WHERE id > :last_id
+                    AND (streak_days > 0 OR longest_streak > 0 OR last_active_day IS NOT NULL)
+                    AND NOT EXISTS (
+                        SELECT 1 FROM process_records
+                        WHERE process_records.user_id = users.id
+                            AND process_records.is_deleted = FALSE
+                            AND process_records.recorded_at IS NOT NULL
+                    )
+                ORDER BY id
+                LIMIT :limit
+            """), {"last_id": last_id, "limit": chunk_size})]
+            if not user_ids:
+                return reset
+
+            self.db.execute(text("""
+                UPDATE users SET streak_days = 0, longest_streak = 0, last_active_day = NULL
+                WHERE id = :user_id
+            """), [{"user_id": user_id} for user_id in user_ids])
+            self.db.commit()
+            reset += len(user_ids)
+            last_id = user_ids[-1]
+
+    @staticmethod
+    def _finish(state: Dict, today: date) -> Dict:
+        active = state["last_day"] >= today - timedelta(days=1)
+        return {
+            "user_id": state["user_id"],
+            "last_active_day": state["last_day"],
+            "streak_days": state["run"] if active else 0,
+            "longest_streak": state["longest"]
+        }
+
+    def _write(self, rows: List[Dict], today: date) -> int:
+        if not rows:
+            return 0
+        self.db.execute(text("""
+            UPDATE users SET
+                last_active_day = :last_active_day,
+                streak_days = :streak_days,
+                longest_streak = :longest_streak
+            WHERE id = :user_id
+                AND (last_active_day IS NULL OR last_active_day <= :last_active_day OR last_active_day < :today)
+        """), [dict(row, today=today) for row in rows])
+        self.db.commit()
+        return len(rows)
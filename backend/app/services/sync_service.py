@@ -0,0 +1,180 @@
+"""
+增量同步服务
+Incremental sync service backed by the change log
+"""
+
+from sqlalchemy import text, bindparam, func
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from app.models.change_log import ChangeLog, ChangeEntityType, ChangeOperation
+from app.models.process_record import ProcessRecord
+
+logger = logging.getLogger(__name__)
+
+
+class SyncService:
+    """增量同步服务"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def record_change(
+        self,
+        user_id: str,
+        entity_type: ChangeEntityType,
+        entity_id,
+        operation: ChangeOperation = ChangeOperation.upsert
+    ) -> None:
+        """
+        追加一条变更日志
+
+        只加入会话，不提交：调用方在同一事务里写业务数据和变更日志，
+        由调用方统一 commit，保证两者要么都成功要么都回滚。
+        """
+        self.db.add(ChangeLog(
+            user_id=user_id,
+            entity_type=entity_type.value,
+            entity_id=str(entity_id),
+            operation=operation.value
+        ))
+
+    def record_changes(
+        self,
+        user_id: str,
+        entity_type: ChangeEntityType,
+        entity_ids: List,
+        operation: ChangeOperation = ChangeOperation.upsert
+    ) -> None:
+        """批量追加变更日志（例如删除目标时级联删除的过程记录）"""
+        for entity_id in entity_ids:
+            self.record_change(user_id, entity_type, entity_id, operation)
+
+    def get_latest_cursor(self, user_id: str) -> int:
+        """获取用户当前最新的同步游标"""
+        latest = self.db.query(func.max(ChangeLog.id)).filter(
+            ChangeLog.user_id == user_id
+        ).scalar()
+        return latest or 0
+
+    def get_changes(self, user_id: str, since: int, limit: int = 100) -> Dict:
+        """
+        获取游标之后的变更
+
+        Args:
+            user_id: 用户ID
+            since: 上次同步拿到的游标，0 表示从头开始
+            limit: 本页最多读取的变更日志条数
+
+        Returns:
+            {
+                'cursor': 下一次请求使用的游标,
+                'has_more': 是否还有下一页,
+                'goals': 变更后的目标数据,
+                'process_records': 变更后的过程记录,
+                'tombstones': 已删除实体 [{'entity_type', 'id'}]
+            }
+        """
+        rows = self.db.query(ChangeLog).filter(
+            ChangeLog.user_id == user_id,
+            ChangeLog.id > since
+        ).order_by(ChangeLog.id.asc()).limit(limit + 1).all()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = rows[-1].id if rows else since
+
+        # 同一实体在一页内多次变更时，只保留最后一次操作
+        latest_ops: Dict[Tuple[str, str], str] = {}
+        for row in rows:
+            latest_ops[(row.entity_type, row.entity_id)] = row.operation
+
+        goal_ids = [
+            entity_id for (entity_type, entity_id), op in latest_ops.items()
+            if entity_type == ChangeEntityType.goal.value and op == ChangeOperation.upsert.value
+        ]
+        record_ids = [
+            entity_id for (entity_type, entity_id), op in latest_ops.items()
+            if entity_type == ChangeEntityType.process_record.value and op == ChangeOperation.upsert.value
+        ]
+
+        goals = self._load_goals(user_id, goal_ids)
+        records = self._load_process_records(user_id, record_ids)
+
+        # 删除操作，以及 upsert 之后已经查不到的实体，都作为墓碑返回
+        tombstones = []
+        for (entity_type, entity_id), op in latest_ops.items():
+            if op == ChangeOperation.delete.value:
+                tombstones.append({"entity_type": entity_type, "id": entity_id})
+            elif entity_type == ChangeEntityType.goal.value and entity_id not in goals:
+                tombstones.append({"entity_type": entity_type, "id": entity_id})
+            elif entity_type == ChangeEntityType.process_record.value and entity_id not in records:
+                tombstones.append({"entity_type": entity_type, "id": entity_id})
+
+        logger.info(
+            f"增量同步 - 用户ID: {user_id}, 游标: {since} -> {next_cursor}, "
+            f"目标{len(goals)}个, 记录{len(records)}条, 墓碑{len(tombstones)}个"
+        )
+
+        return {
+            "cursor": next_cursor,
+            "has_more": has_more,
+            "goals": list(goals.values()),
+            "process_records": list(records.values()),
+            "tombstones": tombstones
+        }
+
+    def _load_goals(self, user_id: str, goal_ids: List[str]) -> Dict[str, dict]:
+        """批量读取目标当前数据"""
+        if not goal_ids:
+            return {}
+
+        # goals 表结构与 ORM 模型并不完全一致，沿用原生SQL读取
+        query = text("""
+            SELECT id, title, description, category, priority, status,
+                   target_date, start_date, end_date, target_value, current_value, unit,
+                   daily_reminder, deadline_reminder, created_at, updated_at
+            FROM goals
+            WHERE user_id = :user_id AND id IN :goal_ids
+        """).bindparams(bindparam("goal_ids", expanding=True))
+
+        result = self.db.execute(query, {"user_id": user_id, "goal_ids": goal_ids})
+
+        goals = {}
+        for goal_row in result.fetchall():
+            goals[str(goal_row[0])] = {
+                "id": str(goal_row[0]),
+                "title": goal_row[1],
+                "description": goal_row[2],
+                "category": goal_row[3],
+                "priority": goal_row[4],
+                "status": goal_row[5],
+                "targetDate": self._isoformat(goal_row[6]),
+                "startDate": self._isoformat(goal_row[7]),
+                "endDate": self._isoformat(goal_row[8]),
+                "targetValue": goal_row[9],
+                "currentValue": goal_row[10],
+                "unit": goal_row[11],
+                "dailyReminder": goal_row[12],
+                "deadlineReminder": goal_row[13],
+                "createdAt": self._isoformat(goal_row[14]),
+                "updatedAt": self._isoformat(goal_row[15])
+            }
+        return goals
+
+    def _load_process_records(self, user_id: str, record_ids: List[str]) -> Dict[str, ProcessRecord]:
+        """批量读取过程记录当前数据"""
+        ids = [int(record_id) for record_id in record_ids if record_id.isdigit()]
+        if not ids:
+            return {}
+
+        records = self.db.query(ProcessRecord).filter(
+            ProcessRecord.user_id == user_id,
+            ProcessRecord.id.in_(ids)
+        ).all()
+        return {str(record.id): record for record in records}
+
+    @staticmethod
+    def _isoformat(value) -> Optional[str]:
+        return value.isoformat() if value and hasattr(value, 'isoformat') else None
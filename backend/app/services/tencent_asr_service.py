@@ -5,20 +5,44 @@ Tencent Cloud ASR Service
 
 import base64
 import logging
+import re
 from typing import Optional, Dict
 from tencentcloud.asr.v20190614 import models
 from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
 
+from app.config.settings import settings
 from app.config.tencent_cloud import tencent_cloud
+from app.services.cloud_executor import cloud_executor, CloudServiceBusy, CloudCallTimeout
 
 logger = logging.getLogger(__name__)
 
+# 录音文件识别结果每句前的时间戳，例如 "[0:0.020,0:2.380]  "
+_TIMESTAMP_PREFIX = re.compile(r'^\[[^\]]*\]\s*', re.MULTILINE)
+
 
 class TencentASRService:
     """腾讯云语音识别服务类"""
     
     def __init__(self):
-        self.client = tencent_cloud.get_asr_client()
+        self._client = None
+        # 录音文件识别任务的提交和查询由后台 worker 发起，与一句话识别分开限流，互不占用名额
+        self.task_limiter = cloud_executor.register(
+            "asr_task",
+            max_concurrency=settings.ASR_JOB_MAX_CONCURRENCY,
+            timeout=settings.ASR_TIMEOUT_SECONDS,
+            max_queue=settings.ASR_JOB_MAX_CONCURRENCY
+        )
+    
+    @property
+    def client(self):
+        """ASR客户端，与一句话识别共用注册表中的同一个客户端"""
+        if self._client is not None:
+            return self._client
+        return tencent_cloud.get_asr_client()
+    
+    @client.setter
+    def client(self, value):
+        self._client = value
     
     async def sentence_recognition(self, audio_data: bytes, audio_format: str = "wav") -> Optional[Dict]:
         """
@@ -62,16 +86,21 @@ class TencentASRService:
             logger.error(f"语音识别服务异常: {e}")
             return None
     
-    async def create_rec_task(self, audio_url: str, callback_url: str = None) -> Optional[Dict]:
+    async def create_rec_task(self, audio_url: str = None, callback_url: str = None, audio_data: bytes = None) -> Optional[Dict]:
         """
         创建录音文件识别任务（适用于长音频）
         
         Args:
             audio_url: 音频文件URL
             callback_url: 回调URL
+            audio_data: 音频数据（5MB以内可直接随请求上传，不需要URL）
             
         Returns:
             任务信息
+            
+        Raises:
+            CloudServiceBusy: 并发已满
+            CloudCallTimeout: 超过截止时间
         """
         if not self.client:
             logger.error("ASR客户端未初始化")
@@ -82,13 +111,19 @@ class TencentASRService:
             req.EngineModelType = "16k_zh"
             req.ChannelNum = 1
             req.ResTextFormat = 0
-            req.SourceType = 0  # URL方式
-            req.Url = audio_url
+            
+            if audio_data is not None:
+                req.SourceType = 1  # 音频数据随请求传入
+                req.Data = base64.b64encode(audio_data).decode('utf-8')
+                req.DataLen = len(audio_data)
+            else:
+                req.SourceType = 0  # URL方式
+                req.Url = audio_url
             
             if callback_url:
                 req.CallbackUrl = callback_url
             
-            resp = self.client.CreateRecTask(req)
+            resp = await self.task_limiter.call(self.client.CreateRecTask, req)
             
             result = {
                 "task_id": resp.Data.TaskId,
@@ -98,6 +133,8 @@ class TencentASRService:
             logger.info(f"创建识别任务成功: {resp.Data.TaskId}")
             return result
             
+        except (CloudServiceBusy, CloudCallTimeout):
+            raise
         except TencentCloudSDKException as e:
             logger.error(f"创建识别任务失败: {e}")
             return None
@@ -113,7 +150,11 @@ class TencentASRService:
             task_id: 任务ID
             
         Returns:
-            任务状态信息
+            任务状态信息，text 为去掉时间戳后的识别文本
+            
+        Raises:
+            CloudServiceBusy: 并发已满
+            CloudCallTimeout: 超过截止时间
         """
         if not self.client:
             logger.error("ASR客户端未初始化")
@@ -123,13 +164,16 @@ class TencentASRService:
             req = models.DescribeTaskStatusRequest()
             req.TaskId = task_id
             
-            resp = self.client.DescribeTaskStatus(req)
+            resp = await self.task_limiter.call(self.client.DescribeTaskStatus, req, idempotent=True)
             
+            raw_result = resp.Data.Result if hasattr(resp.Data, 'Result') else None
             result = {
                 "task_id": task_id,
                 "status": resp.Data.Status,
                 "status_str": resp.Data.StatusStr,
-                "result": resp.Data.Result if hasattr(resp.Data, 'Result') else None,
+                "result": raw_result,
+                "text": _TIMESTAMP_PREFIX.sub('', raw_result or '').replace('\n', '').strip(),
+                "audio_duration": getattr(resp.Data, 'AudioDuration', None),
                 "error_msg": resp.Data.ErrorMsg if hasattr(resp.Data, 'ErrorMsg') else None,
                 "request_id": resp.RequestId
             }
@@ -137,6 +181,8 @@ class TencentASRService:
             logger.info(f"查询任务状态成功: {resp.Data.StatusStr}")
             return result
             
+        except (CloudServiceBusy, CloudCallTimeout):
+            raise
         except TencentCloudSDKException as e:
             logger.error(f"查询任务状态失败: {e}")
             return None
@@ -5,12 +5,14 @@ Tencent Cloud COS Service
 
 import os
 import uuid
+import asyncio
 import logging
 from typing import Optional, Dict
-from qcloud_cos import CosConfig, CosS3Client
-from qcloud_cos.cos_exception import CosException
+from qcloud_cos.cos_exception import CosException, CosServiceError
 
 from app.config.settings import settings
+from app.config.tencent_cloud import tencent_cloud
+from app.services.cloud_executor import cloud_executor, CloudServiceBusy, CloudCallTimeout
 
 logger = logging.getLogger(__name__)
 
@@ -19,15 +21,34 @@ class TencentCOSService:
     """腾讯云COS服务类"""
     
     def __init__(self):
-        self.config = CosConfig(
-            Region=settings.COS_REGION,
-            SecretId=settings.TENCENT_SECRET_ID,
-            SecretKey=settings.TENCENT_SECRET_KEY
-        )
-        self.client = CosS3Client(self.config)
+        self._client = None
         self.bucket_name = settings.COS_BUCKET_NAME
+        # SDK 请求是阻塞的，在COS专用线程池中执行；繁忙和超时异常直接抛给调用方
+        self.limiter = cloud_executor.register(
+            "cos",
+            max_concurrency=settings.COS_MAX_CONCURRENCY,
+            timeout=settings.COS_TIMEOUT_SECONDS,
+            max_queue=settings.COS_MAX_QUEUE
+        )
+    
+    @property
+    def client(self):
+        """COS客户端，第一次使用时由客户端注册表创建"""
+        if self._client is not None:
+            return self._client
+        return tencent_cloud.get_cos_client()
     
-    async def upload_file(self, file_data: bytes, file_name: str, content_type: str = None) -> Optional[Dict]:
+    @client.setter
+    def client(self, value):
+        self._client = value
+    
+    async def upload_file(
+        self,
+        file_data: bytes,
+        file_name: str,
+        content_type: str = None,
+        object_key: str = None
+    ) -> Optional[Dict]:
         """
         上传文件到COS
         
@@ -35,19 +56,21 @@ class TencentCOSService:
             file_data: 文件数据
             file_name: 文件名
             content_type: 文件类型
+            object_key: COS对象键，如果不指定则按日期自动生成
             
         Returns:
             上传结果
         """
         try:
-            # 生成唯一文件名
-            file_extension = os.path.splitext(file_name)[1]
-            unique_filename = f"{uuid.uuid4().hex}{file_extension}"
-            
-            # 按日期分目录
-            from datetime import datetime
-            date_path = datetime.now().strftime("%Y/%m/%d")
-            object_key = f"uploads/{date_path}/{unique_filename}"
+            if not object_key:
+                # 生成唯一文件名
+                file_extension = os.path.splitext(file_name)[1]
+                unique_filename = f"{uuid.uuid4().hex}{file_extension}"
+                
+                # 按日期分目录
+                from datetime import datetime
+                date_path = datetime.now().strftime("%Y/%m/%d")
+                object_key = f"uploads/{date_path}/{unique_filename}"
             
             # 上传参数
             upload_params = {
@@ -60,7 +83,7 @@ class TencentCOSService:
                 upload_params['ContentType'] = content_type
             
             # 执行上传
-            response = self.client.put_object(**upload_params)
+            response = await self.limiter.call(self.client.put_object, **upload_params)
             
             # 构建访问URL
             file_url = f"{settings.COS_DOMAIN}/{object_key}"
@@ -77,6 +100,8 @@ class TencentCOSService:
             logger.info(f"文件上传成功: {file_url}")
             return result
             
+        except (CloudServiceBusy, CloudCallTimeout):
+            raise
         except CosException as e:
             logger.error(f"COS上传失败: {e}")
             return None
@@ -95,7 +120,8 @@ class TencentCOSService:
             是否删除成功
         """
         try:
-            self.client.delete_object(
+            await self.limiter.call(
+                self.client.delete_object,
                 Bucket=self.bucket_name,
                 Key=object_key
             )
@@ -103,6 +129,8 @@ class TencentCOSService:
             logger.info(f"文件删除成功: {object_key}")
             return True
             
+        except (CloudServiceBusy, CloudCallTimeout):
+            raise
         except CosException as e:
             logger.error(f"COS删除失败: {e}")
             return False
@@ -110,6 +138,37 @@ class TencentCOSService:
             logger.error(f"文件删除异常: {e}")
             return False
     
+    async def copy_file(self, source_key: str, object_key: str) -> bool:
+        """
+        在同一存储桶内复制文件
+        
+        Args:
+            source_key: 源对象键
+            object_key: 目标对象键
+            
+        Returns:
+            是否复制成功，源文件不存在时返回False
+        """
+        try:
+            await self.limiter.call(
+                self.client.copy_object,
+                Bucket=self.bucket_name,
+                Key=object_key,
+                CopySource={"Bucket": self.bucket_name, "Key": source_key, "Region": settings.COS_REGION},
+                idempotent=True
+            )
+            
+            logger.info(f"文件复制成功: {source_key} -> {object_key}")
+            return True
+            
+        except (CloudServiceBusy, CloudCallTimeout):
+            raise
+        except CosServiceError as e:
+            if e.get_status_code() == 404:
+                return False
+            logger.error(f"复制文件失败: {e}")
+            raise
+    
     async def get_file_url(self, object_key: str, expires: int = 3600) -> Optional[str]:
         """
         生成文件的预签名URL
@@ -122,6 +181,7 @@ class TencentCOSService:
             预签名URL
         """
         try:
+            # 预签名只在本地计算签名，不发起网络请求，不需要进入线程池
             url = self.client.get_presigned_download_url(
                 Bucket=self.bucket_name,
                 Key=object_key,
@@ -138,6 +198,92 @@ class TencentCOSService:
             logger.error(f"生成预签名URL异常: {e}")
             return None
     
+    def get_upload_url(self, object_key: str, content_type: str, expires: int = 600) -> Optional[str]:
+        """
+        生成上传文件的预签名URL（PUT），客户端直接上传到COS，不经过应用服务器
+        
+        Args:
+            object_key: 对象键
+            content_type: 上传时必须使用的 Content-Type（参与签名）
+            expires: 过期时间（秒）
+            
+        Returns:
+            预签名URL
+        """
+        try:
+            # 预签名只在本地计算签名，不发起网络请求
+            return self.client.get_presigned_url(
+                Bucket=self.bucket_name,
+                Key=object_key,
+                Method="PUT",
+                Expired=expires,
+                Headers={"Content-Type": content_type}
+            )
+        except CosException as e:
+            logger.error(f"生成上传预签名URL失败: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"生成上传预签名URL异常: {e}")
+            return None
+    
+    async def head_file(self, object_key: str) -> Optional[Dict]:
+        """
+        查询文件的大小和类型
+        
+        Args:
+            object_key: 对象键
+            
+        Returns:
+            文件信息，文件不存在时返回None
+        """
+        try:
+            response = await self.limiter.call(
+                self.client.head_object,
+                Bucket=self.bucket_name,
+                Key=object_key,
+                idempotent=True
+            )
+            # 响应头的大小写与服务端一致
+            headers = {name.lower(): value for name, value in response.items()}
+            return {
+                "size": int(headers.get('content-length', 0)),
+                "content_type": headers.get('content-type')
+            }
+            
+        except (CloudServiceBusy, CloudCallTimeout):
+            raise
+        except CosServiceError as e:
+            if e.get_status_code() == 404:
+                return None
+            logger.error(f"查询文件失败: {e}")
+            raise
+    
+    async def download_file(self, object_key: str) -> Optional[bytes]:
+        """
+        下载文件内容
+        
+        Args:
+            object_key: 对象键
+            
+        Returns:
+            文件数据，文件不存在时返回None
+        """
+        try:
+            return await self.limiter.call(self._get_object, object_key, idempotent=True)
+            
+        except (CloudServiceBusy, CloudCallTimeout):
+            raise
+        except CosServiceError as e:
+            if e.get_status_code() == 404:
+                return None
+            logger.error(f"下载文件失败: {e}")
+            raise
+    
+    def _get_object(self, object_key: str) -> bytes:
+        # 响应体是流，在同一个线程中读完
+        response = self.client.get_object(Bucket=self.bucket_name, Key=object_key)
+        return response['Body'].get_raw_stream().read()
+    
     async def list_files(self, prefix: str = "", max_keys: int = 100) -> Optional[list]:
         """
         列出文件
@@ -150,7 +296,8 @@ class TencentCOSService:
             文件列表
         """
         try:
-            response = self.client.list_objects(
+            response = await self.limiter.call(
+                self.client.list_objects,
                 Bucket=self.bucket_name,
                 Prefix=prefix,
                 MaxKeys=max_keys
@@ -169,6 +316,8 @@ class TencentCOSService:
             logger.info(f"列出文件成功，共{len(files)}个文件")
             return files
             
+        except (CloudServiceBusy, CloudCallTimeout):
+            raise
         except CosException as e:
             logger.error(f"列出文件失败: {e}")
             return None
@@ -192,9 +341,8 @@ class TencentCOSService:
                 logger.error(f"本地文件不存在: {local_path}")
                 return None
             
-            # 读取文件
-            with open(local_path, 'rb') as f:
-                file_data = f.read()
+            # 读取文件（在线程中读取，不阻塞事件循环）
+            file_data = await asyncio.to_thread(self._read_file, local_path)
             
             # 获取文件名
             file_name = os.path.basename(local_path)
@@ -208,12 +356,20 @@ class TencentCOSService:
                 object_key = f"uploads/{date_path}/{unique_filename}"
             
             # 上传文件
-            return await self.upload_file(file_data, file_name)
+            return await self.upload_file(file_data, file_name, object_key=object_key)
             
+        except (CloudServiceBusy, CloudCallTimeout):
+            raise
         except Exception as e:
             logger.error(f"本地文件上传异常: {e}")
             return None
 
+    
+    @staticmethod
+    def _read_file(local_path: str) -> bytes:
+        with open(local_path, 'rb') as f:
+            return f.read()
+
 
 # 全局COS服务实例
 cos_service = TencentCOSService()
@@ -3,13 +3,17 @@
 Tencent Cloud OCR Service
 """
 
+import asyncio
 import base64
 import logging
 from typing import List, Dict, Optional
 from tencentcloud.ocr.v20181119 import models
 from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
 
+from app.config.settings import settings
 from app.config.tencent_cloud import tencent_cloud
+from app.services.cloud_executor import cloud_executor, CloudServiceBusy, CloudCallTimeout
+from app.services.recognition_cache import recognition_cache, recognition_cache_key
 
 logger = logging.getLogger(__name__)
 
@@ -18,17 +22,73 @@ class TencentOCRService:
     """腾讯云OCR服务类"""
     
     def __init__(self):
-        self.client = tencent_cloud.get_ocr_client()
+        self._client = None
+        # SDK 调用是阻塞的，在OCR专用线程池中执行；繁忙和超时异常直接抛给接口层
+        self.limiter = cloud_executor.register(
+            "ocr",
+            max_concurrency=settings.OCR_MAX_CONCURRENCY,
+            timeout=settings.OCR_TIMEOUT_SECONDS,
+            max_queue=settings.OCR_MAX_QUEUE,
+            hedge=settings.OCR_HEDGE_ENABLED
+        )
+        self.cache = recognition_cache
     
-    async def general_basic_ocr(self, image_base64: str) -> Optional[List[Dict]]:
+    @property
+    def client(self):
+        """OCR客户端，第一次使用时由客户端注册表创建"""
+        if self._client is not None:
+            return self._client
+        return tencent_cloud.get_ocr_client()
+    
+    @client.setter
+    def client(self, value):
+        self._client = value
+    
+    async def _detect(self, action: str, req) -> List[Dict]:
+        """
+        调用OCR接口并解析文本块
+        
+        相同图片和参数直接返回缓存结果，同时提交的相同图片只调用一次云端；繁忙、超时和SDK异常直接抛出。
+        按URL识别时用去掉查询参数的地址作为缓存键：对象键是唯一的，而预签名参数每次生成都不同。
+        """
+        kind = f"ocr.{action}"
+        language = getattr(req, "LanguageType", None)
+        if req.ImageBase64:
+            key = await asyncio.to_thread(
+                lambda: recognition_cache_key(base64.b64decode(req.ImageBase64), kind, LanguageType=language)
+            )
+        else:
+            key = recognition_cache_key(req.ImageUrl.split("?", 1)[0].encode("utf-8"), f"{kind}.url", LanguageType=language)
+        return await self.cache.get_or_call(key, kind, lambda: self._call(action, req))
+    
+    async def _call(self, action: str, req) -> List[Dict]:
+        resp = await self.limiter.call(getattr(self.client, action), req, idempotent=True)
+        return [
+            {
+                "text": detection.DetectedText,
+                "confidence": detection.Confidence,
+                "polygon": [
+                    {"x": point.X, "y": point.Y} 
+                    for point in detection.Polygon
+                ]
+            }
+            for detection in resp.TextDetections
+        ]
+    
+    async def general_basic_ocr(self, image_base64: str = None, image_url: str = None) -> Optional[List[Dict]]:
         """
         通用印刷体识别
         
         Args:
             image_base64: base64编码的图片数据
+            image_url: 图片地址（例如COS预签名下载地址），由OCR服务直接下载，图片不经过应用服务器
             
         Returns:
             识别结果列表
+            
+        Raises:
+            CloudServiceBusy: OCR并发已满或熔断中
+            CloudCallTimeout: 超过截止时间
         """
         if not self.client:
             logger.error("OCR客户端未初始化")
@@ -36,26 +96,19 @@ class TencentOCRService:
         
         try:
             req = models.GeneralBasicOCRRequest()
-            req.ImageBase64 = image_base64
+            if image_url:
+                req.ImageUrl = image_url
+            else:
+                req.ImageBase64 = image_base64
             req.LanguageType = "zh"  # 中文识别
             
-            resp = self.client.GeneralBasicOCR(req)
-            
-            # 解析结果
-            results = []
-            for detection in resp.TextDetections:
-                results.append({
-                    "text": detection.DetectedText,
-                    "confidence": detection.Confidence,
-                    "polygon": [
-                        {"x": point.X, "y": point.Y} 
-                        for point in detection.Polygon
-                    ]
-                })
+            results = await self._detect("GeneralBasicOCR", req)
             
             logger.info(f"OCR识别成功，识别到{len(results)}个文本块")
             return results
             
+        except (CloudServiceBusy, CloudCallTimeout):
+            raise
         except TencentCloudSDKException as e:
             logger.error(f"OCR识别失败: {e}")
             return None
@@ -72,6 +125,10 @@ class TencentOCRService:
             
         Returns:
             识别结果列表
+            
+        Raises:
+            CloudServiceBusy: OCR并发已满或熔断中
+            CloudCallTimeout: 超过截止时间
         """
         if not self.client:
             logger.error("OCR客户端未初始化")
@@ -82,22 +139,13 @@ class TencentOCRService:
             req.ImageBase64 = image_base64
             req.LanguageType = "zh"
             
-            resp = self.client.GeneralAccurateOCR(req)
-            
-            results = []
-            for detection in resp.TextDetections:
-                results.append({
-                    "text": detection.DetectedText,
-                    "confidence": detection.Confidence,
-                    "polygon": [
-                        {"x": point.X, "y": point.Y} 
-                        for point in detection.Polygon
-                    ]
-                })
+            results = await self._detect("GeneralAccurateOCR", req)
             
             logger.info(f"高精度OCR识别成功，识别到{len(results)}个文本块")
             return results
             
+        except (CloudServiceBusy, CloudCallTimeout):
+            raise
         except TencentCloudSDKException as e:
             logger.error(f"高精度OCR识别失败: {e}")
             return None
@@ -114,6 +162,10 @@ class TencentOCRService:
             
         Returns:
             识别结果列表
+            
+        Raises:
+            CloudServiceBusy: OCR并发已满或熔断中
+            CloudCallTimeout: 超过截止时间
         """
         if not self.client:
             logger.error("OCR客户端未初始化")
@@ -123,22 +175,13 @@ class TencentOCRService:
             req = models.GeneralHandwritingOCRRequest()
             req.ImageBase64 = image_base64
             
-            resp = self.client.GeneralHandwritingOCR(req)
-            
-            results = []
-            for detection in resp.TextDetections:
-                results.append({
-                    "text": detection.DetectedText,
-                    "confidence": detection.Confidence,
-                    "polygon": [
-                        {"x": point.X, "y": point.Y} 
-                        for point in detection.Polygon
-                    ]
-                })
+            results = await self._detect("GeneralHandwritingOCR", req)
             
             logger.info(f"手写体识别成功，识别到{len(results)}个文本块")
             return results
             
+        except (CloudServiceBusy, CloudCallTimeout):
+            raise
         except TencentCloudSDKException as e:
             logger.error(f"手写体识别失败: {e}")
             return None
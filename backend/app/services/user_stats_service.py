@@ -0,0 +1,114 @@
+"""
+用户统计服务
+Incrementally maintained user statistics counters
+"""
+
+import logging
+from datetime import datetime, date
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models.process_record import ProcessRecord
+from app.models.user import User
+from app.services.streak_service import StreakService, effective_streak
+
+logger = logging.getLogger(__name__)
+
+
+class UserStatsService:
+    """
+    用户统计计数器
+
+    users 表上的 total_goals / completed_goals / streak_days 随目标和记录的写入
+    在同一事务内增量更新（调用方负责 commit），统计接口只需读取用户这一行。
+    计数器与明细数据出现偏差时，用 reconcile 批量重算。
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def goal_created(self, user_id: str) -> None:
+        self.db.execute(text("""
+            UPDATE users SET total_goals = total_goals + 1 WHERE id = :user_id
+        """), {"user_id": user_id})
+
+    def goal_completed(self, user_id: str) -> None:
+        self.db.execute(text("""
+            UPDATE users SET completed_goals = completed_goals + 1 WHERE id = :user_id
+        """), {"user_id": user_id})
+
+    def goal_deleted(self, user_id: str, was_completed: bool = False) -> None:
+        completed_sql = (
+            ", completed_goals = CASE WHEN completed_goals > 0 THEN completed_goals - 1 ELSE 0 END"
+            if was_completed else ""
+        )
+        self.db.execute(text(f"""
+            UPDATE users SET
+                total_goals = CASE WHEN total_goals > 0 THEN total_goals - 1 ELSE 0 END
+                {completed_sql}
+            WHERE id = :user_id
+        """), {"user_id": user_id})
+
+    def record_created(self, user_id: str, record: ProcessRecord) -> None:
+        """新建过程记录后更新连续天数"""
+        record_day = (record.recorded_at or datetime.utcnow()).date()
+        StreakService(self.db).record_activity(user_id, record_day)
+
+    @staticmethod
+    def get_stats(user: User) -> Dict:
+        """由用户行上的计数器组装统计数据"""
+        total_goals = user.total_goals or 0
+        completed_goals = user.completed_goals or 0
+        return {
+            "totalGoals": total_goals,
+            "activeGoals": max(total_goals - completed_goals, 0),
+            "completedGoals": completed_goals,
+            "completionRate": round(completed_goals * 100 / total_goals) if total_goals else 0,
+            "streakDays": effective_streak(user),
+            "longestStreak": user.longest_streak or 0
+        }
+
+    def reconcile(self, batch_size: int = 1000, today: Optional[date] = None) -> int:
+        """
+        从 goals / process_records 批量重算所有用户的计数器
+
+        Returns:
+            更新的用户数
+        """
+        today = today or datetime.utcnow().date()
+
+        goal_counts: Dict[str, Tuple[int, int]] = {}
+        result = self.db.execute(text("""
+            SELECT user_id, COUNT(*),
+                   SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END)
+            FROM goals
+            GROUP BY user_id
+        """))
+        for user_id, total, completed in result:
+            goal_counts[user_id] = (int(total or 0), int(completed or 0))
+
+        user_ids = [row[0] for row in self.db.execute(text("SELECT id FROM users"))]
+        updated = 0
+        for start in range(0, len(user_ids), batch_size):
+            params = []
+            for user_id in user_ids[start:start + batch_size]:
+                total, completed = goal_counts.get(user_id, (0, 0))
+                params.append({
+                    "user_id": user_id,
+                    "total_goals": total,
+                    "completed_goals": completed
+                })
+            self.db.execute(text("""
+                UPDATE users SET
+                    total_goals = :total_goals,
+                    completed_goals = :completed_goals
+                WHERE id = :user_id
+            """), params)
+            self.db.commit()
+            updated += len(params)
+            logger.info(f"已重算用户统计: {updated}/{len(user_ids)}")
+
+        StreakService(self.db).backfill(today=today, batch_size=batch_size)
+        return updated
@@ -3,54 +3,110 @@
 集成腾讯云ASR服务，提供语音转文字功能
 """
 import os
+import asyncio
 import base64
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, BinaryIO, Tuple, Union
 import uuid
-from tencentcloud.common import credential
 from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
-from tencentcloud.asr.v20190614 import asr_client, models
+from tencentcloud.asr.v20190614 import models
 
 # 加载环境变量
 from dotenv import load_dotenv
 load_dotenv()
 
+from app.config.settings import get_settings
+from app.config.tencent_cloud import tencent_cloud
+from app.services.cloud_executor import cloud_executor, CloudServiceBusy, CloudCallTimeout
+from app.services.audio_preprocessor import audio_preprocessor, AudioPreprocessError
+from app.services.recognition_cache import recognition_cache, recognition_cache_key
+
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# 一句话识别的音频大小上限
+MAX_AUDIO_SIZE = 5 * 1024 * 1024
+
+# 每次编码的字节数，必须是3的倍数，分段编码的结果才能直接拼接
+BASE64_CHUNK_SIZE = 3 * 64 * 1024
+
+# 一句话识别的引擎参数，同时作为识别结果缓存键的一部分
+SENTENCE_RECOGNITION_PARAMS = {
+    "EngSerViceType": "16k_zh",  # 引擎服务类型
+    "FilterPunc": 0,  # 保留标点符号
+    "ConvertNumMode": 1,  # 中文数字转阿拉伯数字
+    "FilterModal": 0,  # 不过滤语气词
+    "FilterDirty": 0  # 不过滤脏话
+}
+
+
+def audio_size(audio: Union[bytes, BinaryIO]) -> int:
+    """音频字节数，文件对象不读取内容"""
+    if isinstance(audio, (bytes, bytearray)):
+        return len(audio)
+    position = audio.tell()
+    size = audio.seek(0, os.SEEK_END)
+    audio.seek(position)
+    return size
+
+
+def encode_audio_base64(audio: Union[bytes, BinaryIO]) -> Tuple[str, int]:
+    """
+    分段把音频编码为base64
+
+    一次性 b64encode 会同时持有原始数据、编码后的 bytes 和解码后的 str 三份数据；
+    这里从文件中按块读取编码，只保留编码后的文本
+
+    Returns:
+        (base64文本, 原始字节数)
+    """
+    if isinstance(audio, (bytes, bytearray)):
+        return base64.b64encode(audio).decode('ascii'), len(audio)
+
+    audio.seek(0)
+    parts = []
+    size = 0
+    while True:
+        chunk = audio.read(BASE64_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        parts.append(base64.b64encode(chunk).decode('ascii'))
+    return "".join(parts), size
 
 class VoiceRecognitionService:
     """语音识别服务类"""
     
     def __init__(self):
         """初始化语音识别服务"""
-        try:
-            # 从环境变量获取腾讯云凭证
-            secret_id = os.getenv('TENCENT_SECRET_ID')
-            secret_key = os.getenv('TENCENT_SECRET_KEY')
-            
-            logger.info(f"🔍 腾讯云凭证检查 - Secret ID: {'已设置' if secret_id else '未设置'}, Secret Key: {'已设置' if secret_key else '未设置'}")
-            
-            if not secret_id or not secret_key:
-                logger.warning("腾讯云凭证未配置，语音识别功能将不可用")
-                self.client = None
-                return
-            
-            # 创建腾讯云ASR客户端（地区可配置，默认 ap-shanghai）
-            cred = credential.Credential(secret_id, secret_key)
-            region = os.getenv('TENCENT_ASR_REGION', 'ap-shanghai')
-            self.client = asr_client.AsrClient(cred, region)
-            logger.info(f"✅ 语音识别服务初始化成功，区域: {region}")
-            logger.info("✅ 语音识别服务初始化成功")
-            
-        except Exception as e:
-            logger.error(f"语音识别服务初始化失败: {e}")
-            self.client = None
+        # SDK 调用是阻塞的，放到独立线程池执行，限制并发并设置截止时间
+        self.limiter = cloud_executor.register(
+            "asr",
+            max_concurrency=settings.ASR_MAX_CONCURRENCY,
+            timeout=settings.ASR_TIMEOUT_SECONDS,
+            max_queue=settings.ASR_MAX_QUEUE,
+            hedge=settings.ASR_HEDGE_ENABLED
+        )
+        self.cache = recognition_cache
+        self._client = None
     
-    async def recognize_voice(self, audio_file: bytes, audio_format: str = "mp3") -> Dict[str, Any]:
+    @property
+    def client(self):
+        """ASR客户端，第一次使用时由客户端注册表创建（地区由 TENCENT_ASR_REGION 配置），未配置凭证时为 None"""
+        if self._client is not None:
+            return self._client
+        return tencent_cloud.get_asr_client()
+    
+    @client.setter
+    def client(self, value):
+        self._client = value
+    
+    async def recognize_voice(self, audio_file: Union[bytes, BinaryIO], audio_format: str = "mp3") -> Dict[str, Any]:
         """
         识别语音文件
         
         Args:
-            audio_file: 音频文件字节数据
+            audio_file: 音频文件字节数据，或上传接口保存的临时文件对象（不会整体读入内存）
             audio_format: 音频格式 (mp3, wav, m4a等)
         
         Returns:
@@ -65,7 +121,7 @@ class VoiceRecognitionService:
         
         try:
             # 检查音频文件大小（限制为5MB）
-            if len(audio_file) > 5 * 1024 * 1024:
+            if audio_size(audio_file) > MAX_AUDIO_SIZE:
                 return {
                     'success': False,
                     'error': '音频文件过大，请控制在5MB以内',
@@ -81,52 +137,46 @@ class VoiceRecognitionService:
             )
             if is_dev_mode:
                 logger.info("🔧 开发模式：使用模拟语音识别")
-                return self._mock_voice_recognition(audio_file, audio_format)
-            
-            # 将音频文件转换为base64编码
-            audio_base64 = base64.b64encode(audio_file).decode('utf-8')
-            
-            logger.info(f"🎤 准备识别音频: 格式={audio_format}, 大小={len(audio_file)}字节, Base64长度={len(audio_base64)}")
-            
-            # 创建识别请求（短音频一次性识别）
-            req = models.SentenceRecognitionRequest()
-            
-            # 必填参数
-            req.EngSerViceType = "16k_zh"  # 引擎服务类型
-            req.SourceType = 1  # 语音数据随请求传入
-            req.VoiceFormat = "mp3" if audio_format.lower() in ["mp3", "m4a"] else "wav"  # 标准化格式
-            req.UsrAudioKey = str(uuid.uuid4())  # 本次音频唯一标识
-            
-            # 可选参数
-            req.FilterPunc = 0  # 保留标点符号
-            req.ConvertNumMode = 1  # 中文数字转阿拉伯数字
-            req.FilterModal = 0  # 不过滤语气词
-            req.FilterDirty = 0  # 不过滤脏话
-            
-            # 音频数据
-            req.Data = audio_base64
-            req.DataLen = len(audio_file)
-            
-            logger.info(f"🔍 发送识别请求: EngSerViceType={req.EngSerViceType}, VoiceFormat={req.VoiceFormat}")
-            
-            # 调用语音识别API
-            resp = self.client.SentenceRecognition(req)
+                return await self.limiter.call(self._mock_voice_recognition, audio_file, audio_format)
             
-            # 解析响应结果
-            if resp.Result:
-                return {
-                    'success': True,
-                    'text': resp.Result,
-                    'confidence': getattr(resp, 'Confidence', 0.8),
-                    'duration': getattr(resp, 'Duration', 0)
-                }
-            else:
+            # 按文件头识别格式并归一化为16kHz单声道，无法识别或没有声音的录音不再调用云端
+            try:
+                audio_file, voice_format = await audio_preprocessor.prepare(audio_file)
+            except AudioPreprocessError as e:
+                logger.warning(f"⚠️ 音频预处理拒绝: {e}")
                 return {
                     'success': False,
-                    'error': '语音识别结果为空',
+                    'rejected': True,
+                    'error': str(e),
                     'text': ''
                 }
+            
+            # 相同录音（归一化后的内容和引擎参数相同）直接返回缓存结果，同时提交的相同录音只调用一次云端
+            key = await asyncio.to_thread(
+                recognition_cache_key, audio_file, "asr", voice_format=voice_format, **SENTENCE_RECOGNITION_PARAMS
+            )
+            return await self.cache.get_or_call(
+                key, "asr",
+                lambda: self._recognize(audio_file, voice_format),
+                cacheable=lambda result: result['success']
+            )
                 
+        except CloudServiceBusy as e:
+            # 熔断中时 retry_after 为熔断剩余秒数
+            return {
+                'success': False,
+                'busy': True,
+                'retry_after': e.retry_after,
+                'error': '语音识别服务繁忙，请稍后重试',
+                'text': ''
+            }
+        except CloudCallTimeout:
+            return {
+                'success': False,
+                'timeout': True,
+                'error': '语音识别超时，请稍后重试',
+                'text': ''
+            }
         except TencentCloudSDKException as e:
             logger.error(f"腾讯云ASR调用失败: {e}")
             # 友好提示：未开通/未授权 等
@@ -163,7 +213,53 @@ class VoiceRecognitionService:
                 'text': ''
             }
     
-    def _mock_voice_recognition(self, audio_file: bytes, audio_format: str) -> Dict[str, Any]:
+    async def _recognize(self, audio_file: Union[bytes, BinaryIO], voice_format: str) -> Dict[str, Any]:
+        """调用一句话识别并解析结果，繁忙、超时和SDK异常直接抛出"""
+        # 在调用前编码一次：开启对冲时两次请求在不同线程中执行，不能同时读取同一个文件对象
+        audio_base64, size = await asyncio.to_thread(encode_audio_base64, audio_file)
+        resp = await self.limiter.call(self._sentence_recognition, audio_base64, size, voice_format, idempotent=True)
+        
+        # 解析响应结果
+        if resp.Result:
+            return {
+                'success': True,
+                'text': resp.Result,
+                'confidence': getattr(resp, 'Confidence', 0.8),
+                'duration': getattr(resp, 'Duration', 0)
+            }
+        else:
+            return {
+                'success': False,
+                'error': '语音识别结果为空',
+                'text': ''
+            }
+    
+    def _sentence_recognition(self, audio_base64: str, size: int, voice_format: str):
+        """调用一句话识别（阻塞，在线程池中执行）"""
+        logger.info(f"🎤 准备识别音频: 格式={voice_format}, 大小={size}字节, Base64长度={len(audio_base64)}")
+        
+        # 创建识别请求（短音频一次性识别）
+        req = models.SentenceRecognitionRequest()
+        
+        # 必填参数
+        req.SourceType = 1  # 语音数据随请求传入
+        req.VoiceFormat = voice_format  # 按文件头识别的格式，不依赖文件扩展名
+        req.UsrAudioKey = str(uuid.uuid4())  # 本次音频唯一标识
+        
+        # 引擎和可选参数
+        for name, value in SENTENCE_RECOGNITION_PARAMS.items():
+            setattr(req, name, value)
+        
+        # 音频数据
+        req.Data = audio_base64
+        req.DataLen = size
+        
+        logger.info(f"🔍 发送识别请求: EngSerViceType={req.EngSerViceType}, VoiceFormat={req.VoiceFormat}")
+        
+        # 调用语音识别API
+        return self.client.SentenceRecognition(req)
+    
+    def _mock_voice_recognition(self, audio_file: Union[bytes, BinaryIO], audio_format: str) -> Dict[str, Any]:
         """模拟语音识别（开发环境使用）"""
         import random
         import time
@@ -172,7 +268,7 @@ class VoiceRecognitionService:
         time.sleep(0.5)
         
         # 根据音频大小和时长模拟不同的识别结果
-        file_size = len(audio_file)
+        file_size = audio_size(audio_file)
         duration_ms = file_size // 10  # 粗略估算时长
         
         # 预设的测试语音内容
@@ -7,6 +7,8 @@ import re
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Tuple, Optional
 
+from .result_cache import ResultCache, content_digest
+
 logger = logging.getLogger(__name__)
 
 class GoalValidator:
@@ -62,17 +64,29 @@ class GoalValidator:
             'action_keywords': ['完成', '实现', '达到', '获得', '掌握', '学会'],
             'measurement_keywords': ['数量', '质量', '时间', '频率', '程度', '比例']
         }
+        
+        self.dictionary_version = content_digest(
+            self.time_rules, self.value_rules, self.smart_weights, self.analysis_patterns
+        )[:12]
+        self.cache = ResultCache('validate_goal')
     
     def validate_goal(self, goal_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         验证目标是否符合SMART原则
         
+        时间校验与当天日期有关，缓存键包含日期
+        
         Args:
             goal_data: 目标数据
         
         Returns:
             验证结果和建议
         """
+        key = content_digest('validate_goal', self.dictionary_version, datetime.now().date(), goal_data)
+        return self.cache.get_or_compute(key, lambda: self._validate_goal(goal_data))
+    
+    def _validate_goal(self, goal_data: Dict[str, Any]) -> Dict[str, Any]:
+        """验证目标（不经过缓存）"""
         logger.info(f"开始验证目标: {goal_data}")
         
         errors = []
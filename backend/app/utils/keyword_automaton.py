@@ -0,0 +1,92 @@
+"""
+多模式关键词匹配自动机
+Aho-Corasick keyword automaton
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick 多模式匹配
+
+    把所有关键词编译成一个自动机，对文本只扫描一遍即可找出出现过的全部关键词，
+    结果与对每个关键词分别做 `keyword in text` 完全一致。
+
+    构建时把失败链接预先展开成确定性转移表，扫描时每个字符只需查表，不再回溯；
+    每个状态只保存与根节点不同的转移，其余回落到根节点的转移表，避免转移表膨胀。
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._output: List[Tuple[str, ...]] = [()]
+
+        for pattern in set(patterns):
+            if pattern:
+                self._add(pattern)
+
+        self._build()
+
+    def _add(self, pattern: str) -> None:
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._output.append(())
+                self._goto[state][char] = next_state
+            state = next_state
+        self._output[state] = self._output[state] + (pattern,)
+
+    def _build(self) -> None:
+        """计算失败链接，并展开为确定性转移表"""
+        root = self._goto[0]
+        fail = [0] * len(self._goto)
+        self._delta: List[Dict[str, int]] = [{} for _ in self._goto]
+
+        queue = deque(root.values())
+
+        while queue:
+            state = queue.popleft()
+            failure = fail[state]
+            # 输出合并失败状态的输出：以当前位置结尾的较短关键词同样命中
+            self._output[state] = self._output[state] + self._output[failure]
+
+            # 失败状态的转移（已展开）与本状态自己的转移合并
+            transitions = dict(self._delta[failure])
+            transitions.update(self._goto[state])
+            self._delta[state] = {
+                char: next_state for char, next_state in transitions.items()
+                if root.get(char, 0) != next_state
+            }
+
+            for char, child in self._goto[state].items():
+                fail[child] = self._step(failure, char)
+                queue.append(child)
+
+        self._root = root
+
+    def _step(self, state: int, char: str) -> int:
+        next_state = self._delta[state].get(char)
+        return self._goto[0].get(char, 0) if next_state is None else next_state
+
+    def find_all(self, text: str) -> Set[str]:
+        """返回文本中出现过的全部关键词（去重）"""
+        hits: Set[str] = set()
+        if not text:
+            return hits
+
+        delta = self._delta
+        root = self._root
+        output = self._output
+        state = 0
+
+        for char in text:
+            next_state = delta[state].get(char)
+            state = root.get(char, 0) if next_state is None else next_state
+            if output[state]:
+                hits.update(output[state])
+
+        return hits
@@ -0,0 +1,207 @@
+"""
+关键词词典加载与热更新
+Versioned keyword dictionaries with hot reload
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+DEFAULT_DICTIONARY_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "keyword_dictionaries.json"
+)
+
+# 每个使用方需要的词典段落及其中必须存在的表
+REQUIRED_SECTIONS = {
+    "process_analyzer": [
+        "type_keywords", "sentiment_keywords", "energy_keywords", "difficulty_keywords",
+        "important_words", "tag_keywords", "flag_keywords"
+    ],
+    "goal_matcher": ["keyword_categories", "unit_variants"],
+    "voice_parser": ["quantification_patterns", "category_keywords"],
+}
+
+
+class KeywordDictionaryError(ValueError):
+    """词典文件格式错误"""
+
+
+class KeywordDictionaries:
+    """
+    一个版本的关键词词典
+
+    version 是单调递增的整数：分析结果和过程记录上保存的 analyzer_version 都以它为准，
+    修改词典内容时必须同时递增版本号，重新分析任务才会处理旧记录。
+    """
+
+    def __init__(self, version: int, sections: Dict[str, Dict[str, Any]], path: Optional[str] = None):
+        self.version = version
+        self.sections = sections
+        self.path = path
+        self.loaded_at = datetime.utcnow()
+
+    def section(self, name: str) -> Dict[str, Any]:
+        return self.sections[name]
+
+
+def validate_dictionaries(data: Any) -> KeywordDictionaries:
+    """校验词典文件内容，返回词典对象；格式错误时抛出 KeywordDictionaryError"""
+    if not isinstance(data, dict):
+        raise KeywordDictionaryError("词典文件顶层必须是对象")
+
+    version = data.get("version")
+    if not isinstance(version, int) or isinstance(version, bool) or version < 1:
+        raise KeywordDictionaryError(f"词典版本号必须是正整数: {version!r}")
+
+    sections = {}
+    for section_name, tables in REQUIRED_SECTIONS.items():
+        section = data.get(section_name)
+        if not isinstance(section, dict):
+            raise KeywordDictionaryError(f"缺少词典段落: {section_name}")
+        for table in tables:
+            if not section.get(table):
+                raise KeywordDictionaryError(f"词典段落 {section_name} 缺少 {table}")
+        sections[section_name] = section
+
+    return KeywordDictionaries(version, sections)
+
+
+def load_dictionaries(path: Optional[str] = None) -> KeywordDictionaries:
+    """从文件加载并校验词典"""
+    path = path or settings.KEYWORD_DICTIONARY_PATH or DEFAULT_DICTIONARY_PATH
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError as e:
+            raise KeywordDictionaryError(f"词典文件不是合法的JSON: {e}") from e
+
+    dictionaries = validate_dictionaries(data)
+    dictionaries.path = path
+    return dictionaries
+
+
+class DictionaryRegistry:
+    """
+    当前生效的关键词词典
+
+    分析器、目标匹配器、语音解析器在创建全局实例时注册到这里。重新加载分两步：
+    先让所有使用方用新词典编译出各自的内部状态，全部成功后再逐个替换，
+    任何一步失败（文件格式错误、正则无法编译等）都保留旧词典继续工作。
+    每个使用方的替换只是一次属性赋值，正在进行的分析要么完全使用旧词典，要么完全使用新词典。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._current: Optional[KeywordDictionaries] = None
+        self._consumers: List[Any] = []
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def current(self) -> KeywordDictionaries:
+        if self._current is None:
+            with self._lock:
+                if self._current is None:
+                    self._mtime = self._stat()
+                    self._current = load_dictionaries(self.path)
+                    logger.info(f"加载关键词词典 - 版本: {self._current.version}")
+        return self._current
+
+    @property
+    def version(self) -> int:
+        return self.current.version
+
+    def register(self, consumer: Any) -> None:
+        """
+        注册词典使用方
+
+        使用方需要实现 compile_dictionaries(dictionaries) -> 编译结果，
+        以及 install_dictionaries(编译结果)
+        """
+        with self._lock:
+            self._consumers.append(consumer)
+
+    def reload(self) -> bool:
+        """
+        重新加载词典文件
+
+        Returns:
+            是否切换到了新词典
+        """
+        with self._lock:
+            mtime = self._stat()
+            try:
+                dictionaries = load_dictionaries(self.path)
+                compiled = [(consumer, consumer.compile_dictionaries(dictionaries)) for consumer in self._consumers]
+            except Exception as e:
+                self._mtime = mtime
+                logger.error(f"关键词词典重新加载失败，继续使用旧词典: {e}")
+                return False
+
+            for consumer, state in compiled:
+                consumer.install_dictionaries(state)
+
+            previous = self._current.version if self._current else None
+            self._current = dictionaries
+            self._mtime = mtime
+            logger.info(f"关键词词典已切换 - 版本: {previous} -> {dictionaries.version}")
+            return True
+
+    def check_for_update(self) -> bool:
+        """词典文件修改时间变化时重新加载"""
+        if self._current is not None and self._stat() == self._mtime:
+            return False
+        return self.reload()
+
+    def start_watcher(self, interval: int) -> None:
+        """启动后台线程定期检查词典文件，interval 为 0 时不启动"""
+        if interval <= 0 or self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(
+            target=self._watch, args=(interval,), name="keyword-dictionary-watcher", daemon=True
+        )
+        self._watcher.start()
+
+    def stop_watcher(self) -> None:
+        if self._watcher is None:
+            return
+        self._stop.set()
+        self._watcher.join()
+        self._watcher = None
+
+    def _watch(self, interval: int) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.check_for_update()
+            except Exception as e:
+                logger.error(f"检查关键词词典失败: {e}")
+
+    def _stat(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.path or settings.KEYWORD_DICTIONARY_PATH or DEFAULT_DICTIONARY_PATH)
+        except OSError:
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        current = self.current
+        return {
+            "version": current.version,
+            "path": current.path,
+            "loaded_at": current.loaded_at.isoformat(),
+            "consumers": [type(consumer).__name__ for consumer in self._consumers]
+        }
+
+
+# 全局词典实例
+keyword_dictionaries = DictionaryRegistry()
@@ -8,105 +8,172 @@ import logging
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 
+from .keyword_automaton import KeywordAutomaton
+from .keyword_dictionaries import KeywordDictionaries, keyword_dictionaries
+from .result_cache import ResultCache, content_digest
+
 logger = logging.getLogger(__name__)
 
 
+class AnalyzerDictionaries:
+    """
+    编译后的分析器词典
+    
+    把所有词典编译进一个 Aho-Corasick 自动机，每个关键词映射到它所属的 (词典, 分组) 标签；
+    同一个词出现在多个分组里时（如"终于"同时属于 progress 和 milestone），各分组都会计数。
+    编译完成后只读，重新加载词典时整体替换。
+    """
+    
+    def __init__(self, version: int, tables: Dict[str, Any]):
+        self.version = version
+        self.type_keywords: Dict[str, List[str]] = tables['type_keywords']
+        self.sentiment_keywords: Dict[str, List[str]] = tables['sentiment_keywords']
+        self.energy_keywords: Dict[str, List[str]] = tables['energy_keywords']
+        self.difficulty_keywords: Dict[str, List[str]] = tables['difficulty_keywords']
+        self.important_words: List[str] = tables['important_words']
+        self.tag_keywords: Dict[str, List[str]] = tables['tag_keywords']
+        self.flag_keywords: Dict[str, List[str]] = tables['flag_keywords']
+        
+        groups = [('type', name, words) for name, words in self.type_keywords.items()]
+        groups += [('sentiment', name, words) for name, words in self.sentiment_keywords.items()]
+        groups += [('energy', name, words) for name, words in self.energy_keywords.items()]
+        groups += [('difficulty', name, words) for name, words in self.difficulty_keywords.items()]
+        groups += [('tag', name, words) for name, words in self.tag_keywords.items()]
+        groups += [('flag', name, words) for name, words in self.flag_keywords.items()]
+        groups.append(('keyword', 'important', self.important_words))
+        
+        self.labels: Dict[str, List[Tuple[str, str]]] = {}
+        for dictionary, name, words in groups:
+            for word in words:
+                self.labels.setdefault(word, []).append((dictionary, name))
+        
+        self.automaton = KeywordAutomaton(self.labels)
+        self.dictionary_version = content_digest(version, self.labels)[:12]
+
+
 class ProcessRecordAnalyzer:
     """过程记录智能分析器"""
     
-    def __init__(self):
-        """初始化分析器"""
-        # 记录类型关键词映射
-        self.type_keywords = {
-            'progress': [
-                '完成', '达成', '实现', '达到', '获得', '取得', '进步', '提升', '改善',
-                '跑了', '读了', '学了', '做了', '写了', '画了', '练了', '减了', '增了',
-                '今天', '这周', '这个月', '已经', '终于', '成功'
-            ],
-            'milestone': [
-                '里程碑', '重要', '突破', '第一次', '首次', '终于', '成功', '达成',
-                '完成目标', '达到预期', '超越', '创纪录', '历史性', '意义重大'
-            ],
-            'difficulty': [
-                '困难', '问题', '挑战', '障碍', '阻碍', '卡住', '停滞', '退步',
-                '失败', '挫折', '沮丧', '焦虑', '压力', '疲惫', '累', '难',
-                '不会', '不懂', '不明白', '搞不定', '解决不了'
-            ],
-            'method': [
-                '方法', '技巧', '策略', '方式', '做法', '经验', '心得', '体会',
-                '发现', '学会', '掌握', '总结', '改进', '优化', '调整', '改变',
-                '有效', '有用', '好用', '推荐', '建议'
-            ],
-            'reflection': [
-                '反思', '思考', '总结', '回顾', '分析', '感悟', '体会', '感受',
-                '觉得', '认为', '感觉', '意识到', '明白', '理解', '领悟',
-                '收获', '成长', '进步', '改变', '影响'
-            ],
-            'adjustment': [
-                '调整', '修改', '改变', '优化', '改进', '重新', '重新开始',
-                '计划', '安排', '安排时间', '时间管理', '优先级', '重点'
-            ],
-            'achievement': [
-                '成就', '成功', '胜利', '获奖', '认可', '表扬', '称赞', '满意',
-                '骄傲', '自豪', '开心', '高兴', '兴奋', '激动'
-            ],
-            'insight': [
-                '洞察', '发现', '领悟', '明白', '理解', '意识到', '认识到',
-                '启发', '灵感', '创意', '想法', '观点', '看法'
-            ]
-        }
-        
-        # 情感关键词
-        self.sentiment_keywords = {
-            'positive': [
-                '好', '棒', '优秀', '完美', '成功', '开心', '高兴', '满意', '兴奋',
-                '激动', '自豪', '骄傲', '轻松', '愉快', '顺利', '有效', '有用',
-                '进步', '提升', '改善', '突破', '成就', '胜利', '完成', '达成'
-            ],
-            'negative': [
-                '差', '糟糕', '失败', '困难', '问题', '挑战', '沮丧', '焦虑',
-                '压力', '疲惫', '累', '难', '卡住', '停滞', '退步', '挫折',
-                '失望', '担心', '害怕', '紧张', '困惑', '迷茫'
-            ]
-        }
+    def __init__(self, dictionaries: Optional[KeywordDictionaries] = None):
+        """
+        初始化分析器
         
-        # 精力水平关键词
-        self.energy_keywords = {
-            'high': ['精力充沛', '活力满满', '精神很好', '状态很好', '充满活力'],
-            'medium': ['一般', '正常', '还可以', '还行', '过得去'],
-            'low': ['疲惫', '累', '没精神', '状态不好', '困', '乏力']
-        }
+        Args:
+            dictionaries: 使用的关键词词典，默认为当前生效的词典
+        """
+        self._dictionaries = self.compile_dictionaries(dictionaries or keyword_dictionaries.current)
         
-        # 困难程度关键词
-        self.difficulty_keywords = {
-            'high': ['很难', '非常难', '极其困难', '挑战很大', '压力很大'],
-            'medium': ['有点难', '不太容易', '需要努力', '有一定挑战'],
-            'low': ['简单', '容易', '轻松', '不难', '小菜一碟']
-        }
+        # 结果缓存：键包含词典版本，词典变化后旧结果自然失效
+        self.cache = ResultCache('analyze_content')
+    
+    def compile_dictionaries(self, dictionaries: KeywordDictionaries) -> AnalyzerDictionaries:
+        """用新词典编译自动机（不影响正在使用的词典）"""
+        return AnalyzerDictionaries(dictionaries.version, dictionaries.section('process_analyzer'))
+    
+    def install_dictionaries(self, compiled: AnalyzerDictionaries) -> None:
+        """切换到已编译的词典，一次赋值完成替换"""
+        self._dictionaries = compiled
+    
+    @property
+    def version(self) -> int:
+        """词典版本号，保存在过程记录的 analyzer_version 上"""
+        return self._dictionaries.version
+    
+    @property
+    def dictionary_version(self) -> str:
+        return self._dictionaries.dictionary_version
+    
+    @property
+    def type_keywords(self) -> Dict[str, List[str]]:
+        return self._dictionaries.type_keywords
+    
+    @property
+    def sentiment_keywords(self) -> Dict[str, List[str]]:
+        return self._dictionaries.sentiment_keywords
+    
+    @property
+    def energy_keywords(self) -> Dict[str, List[str]]:
+        return self._dictionaries.energy_keywords
+    
+    @property
+    def difficulty_keywords(self) -> Dict[str, List[str]]:
+        return self._dictionaries.difficulty_keywords
+    
+    @property
+    def important_words(self) -> List[str]:
+        return self._dictionaries.important_words
+    
+    @property
+    def tag_keywords(self) -> Dict[str, List[str]]:
+        return self._dictionaries.tag_keywords
+    
+    @property
+    def flag_keywords(self) -> Dict[str, List[str]]:
+        return self._dictionaries.flag_keywords
+    
+    @property
+    def _labels(self) -> Dict[str, List[Tuple[str, str]]]:
+        return self._dictionaries.labels
+    
+    def _match(self, content: str, d: AnalyzerDictionaries) -> Tuple[Dict[Tuple[str, str], int], set]:
+        """
+        扫描一遍文本，返回各分组命中的关键词数和命中的关键词集合
+        """
+        hits = d.automaton.find_all(content.lower())
+        counts: Dict[Tuple[str, str], int] = {}
+        for word in hits:
+            for label in d.labels[word]:
+                counts[label] = counts.get(label, 0) + 1
+        return counts, hits
     
     def analyze_content(self, content: str) -> Dict[str, Any]:
         """
         分析过程记录内容
         
+        相同内容（同一词典版本下）直接返回缓存结果
+        
         Args:
             content: 记录内容
             
         Returns:
             分析结果字典
         """
+        key = self.cache_key(content)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        
+        analysis = self._analyze_content(content)
+        if analysis is not None:
+            self.cache.put(key, analysis)
+            return analysis
+        return self._get_default_analysis()
+    
+    def cache_key(self, content: str) -> str:
+        """内容分析结果的缓存键"""
+        return content_digest('analyze_content', self.dictionary_version, content)
+    
+    def _analyze_content(self, content: str) -> Optional[Dict[str, Any]]:
+        """分析过程记录内容（不经过缓存），失败返回 None"""
+        # 整个分析过程使用同一份词典，期间发生的热更新只影响后续分析
+        d = self._dictionaries
         try:
-            # 基础分析
+            # 一次扫描得到全部词典的命中，各字段都从命中结果推导
+            counts, hits = self._match(content, d)
+            sentiment = self._analyze_sentiment(counts)
+            
             analysis = {
-                'record_type': self._classify_record_type(content),
-                'sentiment': self._analyze_sentiment(content),
-                'energy_level': self._analyze_energy_level(content),
-                'difficulty_level': self._analyze_difficulty_level(content),
-                'keywords': self._extract_keywords(content),
-                'tags': self._generate_tags(content),
-                'is_important': self._is_important(content),
-                'is_milestone': self._is_milestone(content),
-                'is_breakthrough': self._is_breakthrough(content),
-                'confidence_score': self._calculate_confidence(content)
+                'record_type': self._classify_record_type(counts, d),
+                'sentiment': sentiment,
+                'energy_level': self._analyze_energy_level(counts, d),
+                'difficulty_level': self._analyze_difficulty_level(counts, d),
+                'keywords': self._extract_keywords(content, hits, d),
+                'tags': self._generate_tags(counts, sentiment, d),
+                'is_important': counts.get(('flag', 'is_important'), 0) > 0,
+                'is_milestone': counts.get(('flag', 'is_milestone'), 0) > 0,
+                'is_breakthrough': counts.get(('flag', 'is_breakthrough'), 0) > 0,
+                'confidence_score': self._calculate_confidence(content, counts, d),
+                'analyzer_version': d.version
             }
             
             logger.info(f"内容分析完成: {analysis}")
@@ -114,17 +181,27 @@ class ProcessRecordAnalyzer:
             
         except Exception as e:
             logger.error(f"内容分析失败: {e}")
-            return self._get_default_analysis()
+            return None
     
-    def _classify_record_type(self, content: str) -> str:
-        """分类记录类型"""
-        content_lower = content.lower()
+    def analyze_batch(self, contents: List[str]) -> List[Dict[str, Any]]:
+        """
+        批量分析过程记录内容
         
+        Args:
+            contents: 记录内容列表
+            
+        Returns:
+            与输入顺序一致的分析结果列表
+        """
+        return [self.analyze_content(content) for content in contents]
+    
+    def _classify_record_type(self, counts: Dict[Tuple[str, str], int], d: AnalyzerDictionaries) -> str:
+        """分类记录类型"""
         # 计算每种类型的匹配分数
-        type_scores = {}
-        for record_type, keywords in self.type_keywords.items():
-            score = sum(1 for keyword in keywords if keyword in content_lower)
-            type_scores[record_type] = score
+        type_scores = {
+            record_type: counts.get(('type', record_type), 0)
+            for record_type in d.type_keywords
+        }
         
         # 返回得分最高的类型
         if type_scores:
@@ -134,12 +211,10 @@ class ProcessRecordAnalyzer:
         
         return 'process'  # 默认类型
     
-    def _analyze_sentiment(self, content: str) -> str:
+    def _analyze_sentiment(self, counts: Dict[Tuple[str, str], int]) -> str:
         """分析情感倾向"""
-        content_lower = content.lower()
-        
-        positive_score = sum(1 for keyword in self.sentiment_keywords['positive'] if keyword in content_lower)
-        negative_score = sum(1 for keyword in self.sentiment_keywords['negative'] if keyword in content_lower)
+        positive_score = counts.get(('sentiment', 'positive'), 0)
+        negative_score = counts.get(('sentiment', 'negative'), 0)
         
         if positive_score > negative_score:
             return 'positive'
@@ -148,37 +223,25 @@ class ProcessRecordAnalyzer:
         else:
             return 'neutral'
     
-    def _analyze_energy_level(self, content: str) -> Optional[int]:
+    def _analyze_energy_level(self, counts: Dict[Tuple[str, str], int], d: AnalyzerDictionaries) -> Optional[int]:
         """分析精力水平"""
-        content_lower = content.lower()
-        
-        for level, keywords in self.energy_keywords.items():
-            if any(keyword in content_lower for keyword in keywords):
-                if level == 'high':
-                    return 8
-                elif level == 'medium':
-                    return 5
-                elif level == 'low':
-                    return 3
+        levels = {'high': 8, 'medium': 5, 'low': 3}
+        for level in d.energy_keywords:
+            if counts.get(('energy', level)):
+                return levels.get(level)
         
         return None
     
-    def _analyze_difficulty_level(self, content: str) -> Optional[int]:
+    def _analyze_difficulty_level(self, counts: Dict[Tuple[str, str], int], d: AnalyzerDictionaries) -> Optional[int]:
         """分析困难程度"""
-        content_lower = content.lower()
-        
-        for level, keywords in self.difficulty_keywords.items():
-            if any(keyword in content_lower for keyword in keywords):
-                if level == 'high':
-                    return 8
-                elif level == 'medium':
-                    return 5
-                elif level == 'low':
-                    return 2
+        levels = {'high': 8, 'medium': 5, 'low': 2}
+        for level in d.difficulty_keywords:
+            if counts.get(('difficulty', level)):
+                return levels.get(level)
         
         return None
     
-    def _extract_keywords(self, content: str) -> List[str]:
+    def _extract_keywords(self, content: str, hits: set, d: AnalyzerDictionaries) -> List[str]:
         """提取关键词"""
         # 简单的关键词提取，可以后续优化为更复杂的NLP算法
         keywords = []
@@ -188,33 +251,16 @@ class ProcessRecordAnalyzer:
         keywords.extend(numbers)
         
         # 提取常见动词和名词
-        important_words = [
-            '完成', '学习', '练习', '跑步', '读书', '工作', '项目', '目标',
-            '进步', '提升', '改善', '突破', '成功', '失败', '困难', '挑战'
-        ]
-        
-        for word in important_words:
-            if word in content:
-                keywords.append(word)
+        keywords.extend(word for word in d.important_words if word in hits)
         
         return list(set(keywords))  # 去重
     
-    def _generate_tags(self, content: str) -> List[str]:
+    def _generate_tags(self, counts: Dict[Tuple[str, str], int], sentiment: str, d: AnalyzerDictionaries) -> List[str]:
         """生成标签"""
-        tags = []
-        
         # 基于内容生成标签
-        if '跑步' in content or '运动' in content:
-            tags.append('运动')
-        if '学习' in content or '读书' in content:
-            tags.append('学习')
-        if '工作' in content or '项目' in content:
-            tags.append('工作')
-        if '健康' in content or '减肥' in content:
-            tags.append('健康')
+        tags = [tag for tag in d.tag_keywords if counts.get(('tag', tag))]
         
         # 基于情感生成标签
-        sentiment = self._analyze_sentiment(content)
         if sentiment == 'positive':
             tags.append('积极')
         elif sentiment == 'negative':
@@ -222,34 +268,7 @@ class ProcessRecordAnalyzer:
         
         return tags
     
-    def _is_important(self, content: str) -> bool:
-        """判断是否重要"""
-        important_indicators = [
-            '重要', '关键', '里程碑', '突破', '第一次', '首次', '成功',
-            '完成目标', '达到预期', '创纪录', '历史性', '意义重大'
-        ]
-        
-        return any(indicator in content for indicator in important_indicators)
-    
-    def _is_milestone(self, content: str) -> bool:
-        """判断是否里程碑"""
-        milestone_indicators = [
-            '里程碑', '重要节点', '关键节点', '阶段性', '第一次', '首次',
-            '完成目标', '达到预期', '突破', '创纪录'
-        ]
-        
-        return any(indicator in content for indicator in milestone_indicators)
-    
-    def _is_breakthrough(self, content: str) -> bool:
-        """判断是否突破"""
-        breakthrough_indicators = [
-            '突破', '超越', '创新', '新发现', '新方法', '新技巧',
-            '突然明白', '豁然开朗', '灵感', '创意'
-        ]
-        
-        return any(indicator in content for indicator in breakthrough_indicators)
-    
-    def _calculate_confidence(self, content: str) -> int:
+    def _calculate_confidence(self, content: str, counts: Dict[Tuple[str, str], int], d: AnalyzerDictionaries) -> int:
         """计算置信度分数"""
         confidence = 50  # 基础分数
         
@@ -259,10 +278,8 @@ class ProcessRecordAnalyzer:
         elif len(content) > 20:
             confidence += 10
         
-        # 关键词匹配影响置信度
-        total_keywords = sum(len(keywords) for keywords in self.type_keywords.values())
-        matched_keywords = sum(1 for keywords in self.type_keywords.values() 
-                             for keyword in keywords if keyword in content.lower())
+        # 关键词匹配影响置信度（同一个词属于多个类型时分别计数）
+        matched_keywords = sum(counts.get(('type', record_type), 0) for record_type in d.type_keywords)
         
         if matched_keywords > 0:
             confidence += min(30, matched_keywords * 5)
@@ -281,9 +298,11 @@ class ProcessRecordAnalyzer:
             'is_important': False,
             'is_milestone': False,
             'is_breakthrough': False,
-            'confidence_score': 50
+            'confidence_score': 50,
+            'analyzer_version': None  # 分析失败，重新分析任务会再次处理
         }
 
 
 # 全局分析器实例
 process_analyzer = ProcessRecordAnalyzer()
+keyword_dictionaries.register(process_analyzer)
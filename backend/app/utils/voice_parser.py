@@ -5,15 +5,40 @@
 import re
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
+
+from .keyword_dictionaries import KeywordDictionaries, KeywordDictionaryError, keyword_dictionaries
+from .result_cache import ResultCache, content_digest
 
 logger = logging.getLogger(__name__)
 
+class ParserDictionaries:
+    """编译后的语音解析词典（加载后只读，重新加载词典时整体替换）"""
+    
+    def __init__(self, version: int, tables: Dict[str, Any], time_patterns: List[str]):
+        self.version = version
+        self.quantification_patterns: List[Tuple[str, str, str]] = []
+        for pattern, action, goal_type in tables['quantification_patterns']:
+            # 提前编译，正则写错时加载失败而不是在解析时报错
+            if re.compile(pattern).groups < 1:
+                raise KeywordDictionaryError(f"量化指标模式缺少数值分组: {pattern}")
+            self.quantification_patterns.append((pattern, action, goal_type))
+        self.category_keywords: Dict[str, List[str]] = tables['category_keywords']
+        self.dictionary_version = content_digest(
+            version, time_patterns, self.quantification_patterns, self.category_keywords
+        )[:12]
+
+
 class VoiceGoalParser:
     """语音目标解析器"""
     
-    def __init__(self):
-        """初始化解析器"""
+    def __init__(self, dictionaries: Optional[KeywordDictionaries] = None):
+        """
+        初始化解析器
+        
+        Args:
+            dictionaries: 使用的关键词词典，默认为当前生效的词典
+        """
         # 时间表达式模式
         self.time_patterns = {
             r'(\d+)个月内': self._parse_months,
@@ -26,36 +51,52 @@ class VoiceGoalParser:
             r'明天': self._parse_tomorrow,
         }
         
-        # 量化指标模式
-        self.quantification_patterns = [
-            (r'减重(\d+)(斤|公斤|kg)', '减重', 'weight'),
-            (r'增重(\d+)(斤|公斤|kg)', '增重', 'weight'),
-            (r'学习(\d+)(本书|门课程|个技能)', '学习', 'study'),
-            (r'读完(\d+)(本书|篇文章)', '阅读', 'reading'),
-            (r'完成(\d+)(个项目|个任务)', '工作', 'work'),
-            (r'跑(\d+)(公里|km)', '运动', 'exercise'),
-            (r'存(\d+)(万|千)元', '理财', 'finance'),
-            (r'去(\d+)个地方', '旅行', 'travel'),
-        ]
-        
-        # 类别关键词映射
-        self.category_keywords = {
-            '健康': ['减重', '增重', '跑步', '健身', '减肥', '运动', '锻炼', '减肥', '增肌'],
-            '学习': ['学习', '读书', '考试', '技能', '编程', '语言', '证书', '培训'],
-            '工作': ['项目', '任务', '业绩', '升职', '工作', '创业', '客户', '销售'],
-            '生活': ['旅行', '理财', '兴趣', '爱好', '生活', '存钱', '投资', '购物']
-        }
+        # 量化指标模式和类别关键词来自词典文件
+        self._dictionaries = self.compile_dictionaries(dictionaries or keyword_dictionaries.current)
+        self.cache = ResultCache('parse_voice_to_goal')
+    
+    def compile_dictionaries(self, dictionaries: KeywordDictionaries) -> ParserDictionaries:
+        """用新词典编译解析表（不影响正在使用的词典）"""
+        return ParserDictionaries(
+            dictionaries.version, dictionaries.section('voice_parser'), list(self.time_patterns)
+        )
+    
+    def install_dictionaries(self, compiled: ParserDictionaries) -> None:
+        """切换到已编译的词典"""
+        self._dictionaries = compiled
+    
+    @property
+    def dictionary_version(self) -> str:
+        return self._dictionaries.dictionary_version
+    
+    @property
+    def quantification_patterns(self) -> List[Tuple[str, str, str]]:
+        return self._dictionaries.quantification_patterns
+    
+    @property
+    def category_keywords(self) -> Dict[str, List[str]]:
+        return self._dictionaries.category_keywords
     
     def parse_voice_to_goal(self, voice_text: str) -> Dict[str, Any]:
         """
         解析语音文本为目标数据
         
+        "下个月""3个月内"等时间表达依赖当天日期，缓存键包含日期，
+        同一天内相同文本（如先 parse-voice 再 create-from-voice）只解析一次
+        
         Args:
             voice_text: 语音识别的文本内容
         
         Returns:
             解析后的目标数据结构，包含解析提示信息
         """
+        key = content_digest(
+            'parse_voice_to_goal', self.dictionary_version, datetime.now().date(), voice_text
+        )
+        return self.cache.get_or_compute(key, lambda: self._parse_voice_to_goal(voice_text))
+    
+    def _parse_voice_to_goal(self, voice_text: str) -> Dict[str, Any]:
+        """解析语音文本为目标数据（不经过缓存）"""
         logger.info(f"开始解析语音文本: {voice_text}")
         
         # 清理文本
@@ -275,3 +316,4 @@ class VoiceGoalParser:
 
 # 创建全局实例
 voice_goal_parser = VoiceGoalParser()
+keyword_dictionaries.register(voice_goal_parser)
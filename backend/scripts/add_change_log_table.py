@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+添加数据变更日志表的数据库迁移脚本
+增量同步接口 /api/sync 依赖此表
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import get_db
+from sqlalchemy import text
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def create_change_log_table():
+    """创建数据变更日志表"""
+    try:
+        db = next(get_db())
+
+        # 检查表是否已存在
+        result = db.execute(text("SHOW TABLES LIKE 'change_log'"))
+        if result.fetchone():
+            logger.info("change_log表已存在，跳过创建")
+            return
+
+        # 创建变更日志表，自增主键即同步游标
+        create_table_sql = """
+        CREATE TABLE change_log (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY COMMENT '同步游标',
+            user_id VARCHAR(36) NOT NULL COMMENT '用户ID',
+            entity_type VARCHAR(30) NOT NULL COMMENT '实体类型：goal, process_record',
+            entity_id VARCHAR(36) NOT NULL COMMENT '实体ID',
+            operation VARCHAR(10) NOT NULL COMMENT '操作：upsert, delete',
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+            INDEX idx_change_log_user_cursor (user_id, id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='数据变更日志表';
+        """
+
+        db.execute(text(create_table_sql))
+        db.commit()
+
+        logger.info("✅ change_log表创建成功")
+
+    except Exception as e:
+        logger.error(f"❌ 创建change_log表失败: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def main():
+    """主函数"""
+    logger.info("🚀 开始创建数据变更日志表...")
+    create_change_log_table()
+    logger.info("🎉 数据变更日志表创建完成！")
+
+if __name__ == "__main__":
+    main()
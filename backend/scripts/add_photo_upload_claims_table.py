@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+添加直传照片使用记录表的数据库迁移脚本
+/api/photo-records/recognize-and-create-by-key 依赖此表保证每个直传对象键只创建一条记录
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import get_db
+from sqlalchemy import text
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def create_photo_upload_claims_table():
+    """创建直传照片使用记录表"""
+    try:
+        db = next(get_db())
+
+        # 检查表是否已存在
+        result = db.execute(text("SHOW TABLES LIKE 'photo_upload_claims'"))
+        if result.fetchone():
+            logger.info("photo_upload_claims表已存在，跳过创建")
+            return
+
+        # object_key 唯一索引：并发提交同一对象键时只有一个请求插入成功
+        create_table_sql = """
+        CREATE TABLE photo_upload_claims (
+            id INT AUTO_INCREMENT PRIMARY KEY COMMENT '主键ID',
+            object_key VARCHAR(255) NOT NULL COMMENT '客户端直传的对象键',
+            user_id VARCHAR(36) NOT NULL COMMENT '用户ID',
+            stored_key VARCHAR(255) NOT NULL COMMENT '照片移动后的对象键',
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+            UNIQUE KEY uk_photo_upload_claims_object_key (object_key)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='直传照片使用记录表';
+        """
+
+        db.execute(text(create_table_sql))
+        db.commit()
+
+        logger.info("✅ photo_upload_claims表创建成功")
+
+    except Exception as e:
+        logger.error(f"❌ 创建photo_upload_claims表失败: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def main():
+    """主函数"""
+    logger.info("🚀 开始创建直传照片使用记录表...")
+    create_photo_upload_claims_table()
+    logger.info("🎉 直传照片使用记录表创建完成！")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+为过程记录添加分析词典版本字段的数据库迁移脚本
+已有记录的 analyzer_version 为空，之后运行 scripts/reanalyze_process_records.py 用当前词典重新分析
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import get_db
+from sqlalchemy import text
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def add_analyzer_version_column():
+    """添加 analyzer_version 字段"""
+    try:
+        db = next(get_db())
+
+        result = db.execute(text("SHOW COLUMNS FROM process_records LIKE 'analyzer_version'"))
+        if result.fetchone():
+            logger.info("analyzer_version字段已存在，跳过")
+            return
+
+        db.execute(text("""
+            ALTER TABLE process_records
+            ADD COLUMN analyzer_version INT NULL COMMENT '分析时使用的关键词词典版本'
+        """))
+        db.commit()
+
+        logger.info("✅ 添加字段: analyzer_version")
+
+    except Exception as e:
+        logger.error(f"❌ 添加analyzer_version字段失败: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def main():
+    """主函数"""
+    logger.info("🚀 开始添加分析词典版本字段...")
+    add_analyzer_version_column()
+    logger.info("🎉 分析词典版本字段添加完成！")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+为过程记录内容添加中文全文索引的数据库迁移脚本
+使用 MySQL 内置 ngram 解析器（MySQL 5.7.6+），搜索接口 /api/process-records/search 依赖此索引
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import get_db
+from sqlalchemy import text
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def add_fulltext_index():
+    """添加 title + content 的 ngram 全文索引"""
+    try:
+        db = next(get_db())
+
+        # 检查索引是否已存在
+        result = db.execute(text("""
+            SHOW INDEX FROM process_records WHERE Key_name = 'ft_process_records_content'
+        """))
+        if result.fetchone():
+            logger.info("ft_process_records_content索引已存在，跳过创建")
+            return
+
+        # ngram_token_size 默认为2，正好适合中文二元切分
+        db.execute(text("""
+            ALTER TABLE process_records
+            ADD FULLTEXT INDEX ft_process_records_content (title, content) WITH PARSER ngram
+        """))
+        db.commit()
+
+        logger.info("✅ ft_process_records_content全文索引创建成功")
+
+    except Exception as e:
+        logger.error(f"❌ 创建全文索引失败: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def main():
+    """主函数"""
+    logger.info("🚀 开始创建过程记录全文索引...")
+    add_fulltext_index()
+    logger.info("🎉 过程记录全文索引创建完成！")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+为过程记录添加最近动态索引的数据库迁移脚本
+接口 /api/records/recent 按 (user_id, is_deleted, recorded_at) 读取用户最新的记录
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import get_db
+from sqlalchemy import text
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def add_recent_index():
+    """添加 (user_id, is_deleted, recorded_at) 复合索引"""
+    try:
+        db = next(get_db())
+
+        # 检查索引是否已存在
+        result = db.execute(text("""
+            SHOW INDEX FROM process_records WHERE Key_name = 'idx_process_records_user_recent'
+        """))
+        if result.fetchone():
+            logger.info("idx_process_records_user_recent索引已存在，跳过创建")
+            return
+
+        # 等值条件在前、排序列在后，ORDER BY recorded_at DESC LIMIT 10 可直接反向扫描索引
+        db.execute(text("""
+            CREATE INDEX idx_process_records_user_recent
+            ON process_records (user_id, is_deleted, recorded_at)
+        """))
+        db.commit()
+
+        logger.info("✅ idx_process_records_user_recent索引创建成功")
+
+    except Exception as e:
+        logger.error(f"❌ 创建最近动态索引失败: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def main():
+    """主函数"""
+    logger.info("🚀 开始创建过程记录最近动态索引...")
+    add_recent_index()
+    logger.info("🎉 过程记录最近动态索引创建完成！")
+
+if __name__ == "__main__":
+    main()
@@ -50,6 +50,7 @@ def create_process_records_table():
             weather VARCHAR(50) COMMENT '天气情况',
             source_data JSON COMMENT '源数据详情',
             confidence_score INT COMMENT '置信度分数：0-100',
+            analyzer_version INT COMMENT '分析时使用的关键词词典版本',
             user_id INT NOT NULL COMMENT '用户ID',
             goal_id INT COMMENT '目标ID',
             parent_record_id INT COMMENT '父记录ID',
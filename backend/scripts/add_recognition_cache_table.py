@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+添加识别结果缓存表的数据库迁移脚本
+语音/OCR识别结果缓存的持久层依赖此表（RECOGNITION_CACHE_PERSISTENT=false 时不需要）
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import get_db
+from sqlalchemy import text
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def create_recognition_cache_table():
+    """创建识别结果缓存表"""
+    try:
+        db = next(get_db())
+
+        # 检查表是否已存在
+        result = db.execute(text("SHOW TABLES LIKE 'recognition_cache'"))
+        if result.fetchone():
+            logger.info("recognition_cache表已存在，跳过创建")
+            return
+
+        # 按 cache_key 唯一索引查找，按 expires_at 清理过期条目
+        create_table_sql = """
+        CREATE TABLE recognition_cache (
+            id INT AUTO_INCREMENT PRIMARY KEY COMMENT '主键ID',
+            cache_key VARCHAR(64) NOT NULL COMMENT '媒体内容和识别参数的SHA-256',
+            kind VARCHAR(40) NOT NULL COMMENT '识别类型，如 asr、ocr.GeneralBasicOCR',
+            result JSON NULL COMMENT '识别结果',
+            expires_at DATETIME NOT NULL COMMENT '过期时间',
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+            UNIQUE KEY uk_recognition_cache_key (cache_key),
+            INDEX idx_recognition_cache_expires (expires_at)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='识别结果缓存表';
+        """
+
+        db.execute(text(create_table_sql))
+        db.commit()
+
+        logger.info("✅ recognition_cache表创建成功")
+
+    except Exception as e:
+        logger.error(f"❌ 创建recognition_cache表失败: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def main():
+    """主函数"""
+    logger.info("🚀 开始创建识别结果缓存表...")
+    create_recognition_cache_table()
+    logger.info("🎉 识别结果缓存表创建完成！")
+
+if __name__ == "__main__":
+    main()
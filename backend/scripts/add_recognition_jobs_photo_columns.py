@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+为识别任务表添加拍照记录任务字段的数据库迁移脚本
+recognition_jobs 表新增 params / stage_timings，拍照记录任务接口 /api/photo-records/jobs 依赖这两个字段
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import get_db
+from sqlalchemy import text
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def add_photo_job_columns():
+    """添加任务参数和阶段耗时字段"""
+    try:
+        db = next(get_db())
+
+        columns_to_add = [
+            ('params', "params JSON NULL COMMENT '任务参数，例如照片记录关联的目标ID' AFTER input_size"),
+            ('stage_timings', "stage_timings JSON NULL COMMENT '各处理阶段耗时（毫秒）' AFTER completed_at")
+        ]
+
+        for column_name, column_definition in columns_to_add:
+            result = db.execute(text(f"SHOW COLUMNS FROM recognition_jobs LIKE '{column_name}'"))
+            if result.fetchone():
+                logger.info(f"{column_name}字段已存在，跳过")
+                continue
+            db.execute(text(f"ALTER TABLE recognition_jobs ADD COLUMN {column_definition}"))
+            logger.info(f"✅ 添加字段: {column_name}")
+
+        db.execute(text(
+            "ALTER TABLE recognition_jobs MODIFY COLUMN kind VARCHAR(20) NOT NULL "
+            "COMMENT '任务类型：voice, photo_record'"
+        ))
+        db.commit()
+
+    except Exception as e:
+        logger.error(f"❌ 添加拍照记录任务字段失败: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def main():
+    """主函数"""
+    logger.info("🚀 开始添加拍照记录任务字段...")
+    add_photo_job_columns()
+    logger.info("🎉 拍照记录任务字段添加完成！")
+
+if __name__ == "__main__":
+    main()
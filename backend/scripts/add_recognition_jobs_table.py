@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+添加识别任务表的数据库迁移脚本
+长录音异步识别接口 /api/voice-jobs 和拍照记录任务接口 /api/photo-records/jobs 依赖此表
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import get_db
+from sqlalchemy import text
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def create_recognition_jobs_table():
+    """创建识别任务表"""
+    try:
+        db = next(get_db())
+
+        # 检查表是否已存在
+        result = db.execute(text("SHOW TABLES LIKE 'recognition_jobs'"))
+        if result.fetchone():
+            logger.info("recognition_jobs表已存在，跳过创建")
+            return
+
+        # 创建识别任务表，后台 worker 按 (status, next_poll_at) 取到期任务
+        create_table_sql = """
+        CREATE TABLE recognition_jobs (
+            id INT AUTO_INCREMENT PRIMARY KEY COMMENT '主键ID',
+            user_id VARCHAR(36) NOT NULL COMMENT '用户ID',
+            kind VARCHAR(20) NOT NULL COMMENT '任务类型：voice, photo_record',
+            status VARCHAR(20) NOT NULL DEFAULT 'pending' COMMENT '状态：pending, processing, succeeded, failed',
+            input_path VARCHAR(500) NULL COMMENT '待识别文件的本地路径，完成后删除',
+            input_format VARCHAR(20) NULL COMMENT '文件格式',
+            input_size INT NULL COMMENT '文件字节数',
+            params JSON NULL COMMENT '任务参数，例如照片记录关联的目标ID',
+            task_id BIGINT NULL COMMENT '腾讯云识别任务ID',
+            attempts INT NOT NULL DEFAULT 0 COMMENT '提交/查询次数，用于计算退避间隔',
+            next_poll_at DATETIME NULL COMMENT '下一次提交或查询的时间',
+            result JSON NULL COMMENT '识别结果',
+            error VARCHAR(500) NULL COMMENT '失败原因',
+            completed_at DATETIME NULL COMMENT '完成时间',
+            stage_timings JSON NULL COMMENT '各处理阶段耗时（毫秒）',
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+            INDEX idx_recognition_jobs_due (status, next_poll_at),
+            INDEX idx_recognition_jobs_user (user_id, id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='识别任务表';
+        """
+
+        db.execute(text(create_table_sql))
+        db.commit()
+
+        logger.info("✅ recognition_jobs表创建成功")
+
+    except Exception as e:
+        logger.error(f"❌ 创建recognition_jobs表失败: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def main():
+    """主函数"""
+    logger.info("🚀 开始创建识别任务表...")
+    create_recognition_jobs_table()
+    logger.info("🎉 识别任务表创建完成！")
+
+if __name__ == "__main__":
+    main()
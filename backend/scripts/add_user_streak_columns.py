@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+添加连续打卡状态字段的数据库迁移脚本
+users 表新增 longest_streak / last_active_day，并从 process_records 回填历史连续天数
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import get_db
+from app.services.streak_service import StreakService
+from sqlalchemy import text
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def add_streak_columns():
+    """添加连续打卡状态字段和滚动任务使用的索引"""
+    try:
+        db = next(get_db())
+
+        columns_to_add = [
+            ('longest_streak', "longest_streak INT NOT NULL DEFAULT 0 COMMENT '最长连续打卡天数'"),
+            ('last_active_day', "last_active_day DATE NULL COMMENT '最近一次活跃日期'")
+        ]
+
+        for column_name, column_definition in columns_to_add:
+            result = db.execute(text(f"SHOW COLUMNS FROM users LIKE '{column_name}'"))
+            if result.fetchone():
+                logger.info(f"{column_name}字段已存在，跳过")
+                continue
+            db.execute(text(f"ALTER TABLE users ADD COLUMN {column_definition}"))
+            logger.info(f"✅ 添加字段: {column_name}")
+
+        result = db.execute(text("SHOW INDEX FROM users WHERE Key_name = 'idx_users_last_active_day'"))
+        if not result.fetchone():
+            db.execute(text("CREATE INDEX idx_users_last_active_day ON users (last_active_day)"))
+            logger.info("✅ 添加索引: idx_users_last_active_day")
+
+        db.commit()
+
+    except Exception as e:
+        logger.error(f"❌ 添加连续打卡字段失败: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def backfill_streaks():
+    """从历史记录回填连续打卡状态"""
+    db = next(get_db())
+    try:
+        updated = StreakService(db).backfill()
+        logger.info(f"✅ 已回填 {updated} 个用户的连续打卡状态")
+    finally:
+        db.close()
+
+def main():
+    """主函数"""
+    logger.info("🚀 开始添加连续打卡状态字段...")
+    add_streak_columns()
+    backfill_streaks()
+    logger.info("🎉 连续打卡状态迁移完成！")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+过程记录批量分析吞吐基准测试
+
+分别用 1/4/8 个进程分析同一批长文本（模拟拍照OCR结果），输出每秒分析条数。
+并行加速比受机器核数限制，进程数超过核数后不会继续提升。
+
+用法：
+  python scripts/benchmark_analysis_executor.py
+  python scripts/benchmark_analysis_executor.py --records 2000 --length 3000 --workers 1 2 4 8
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import logging
+import random
+import time
+
+from app.services.analysis_executor import AnalysisExecutor
+from app.utils.process_analyzer import process_analyzer
+
+# 分析器每次调用都会打印 info 日志，基准测试时关闭
+logging.disable(logging.INFO)
+
+SENTENCES = [
+    "今天终于第一次跑完了十公里", "遇到了很多困难但是坚持下来了", "学习了新的方法效果很好",
+    "状态很好精力充沛", "这道题非常难压力很大", "总结一下这周的收获和反思",
+    "会议讨论了下个季度的计划安排", "读完了第三章做了笔记", "感觉有点累需要调整作息",
+]
+
+
+def generate_texts(count, length, seed=42):
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        parts, size = [], 0
+        while size < length:
+            sentence = rng.choice(SENTENCES) + str(rng.randint(1, 99)) + "，"
+            parts.append(sentence)
+            size += len(sentence)
+        texts.append("".join(parts)[:length])
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="过程记录批量分析吞吐基准测试")
+    parser.add_argument("--records", type=int, default=1000)
+    parser.add_argument("--length", type=int, default=3000, help="每条内容的字数")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    texts = generate_texts(args.records, args.length)
+    print(f"🧪 批量分析 {args.records} 条 x {args.length} 字，CPU核数 {os.cpu_count()}")
+
+    start = time.perf_counter()
+    expected = process_analyzer.analyze_batch(texts)
+    elapsed = time.perf_counter() - start
+    print(f"  {'当前线程顺序执行':<16} {elapsed:7.2f}s  {args.records / elapsed:8.1f} 条/秒")
+
+    for workers in args.workers:
+        executor = AnalysisExecutor(enabled=True, workers=workers, batch_min_size=1)
+        try:
+            # 预热：启动子进程并完成模块导入，不计入耗时
+            executor.analyze_batch(texts[:workers * 2])
+
+            start = time.perf_counter()
+            results = executor.analyze_batch(texts)
+            elapsed = time.perf_counter() - start
+        finally:
+            executor.shutdown()
+
+        assert [r['record_type'] for r in results] == [r['record_type'] for r in expected]
+        print(f"  {f'进程池 {workers} 进程':<16} {elapsed:7.2f}s  {args.records / elapsed:8.1f} 条/秒")
+
+
+if __name__ == "__main__":
+    main()
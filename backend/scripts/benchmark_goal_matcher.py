@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+目标匹配打分基准测试
+
+对比逐目标打分与 NumPy 向量化打分在不同目标数下的耗时，并校验两者排名和分数一致。
+索引构建只在用户目标变化时发生，单独统计。
+
+用法：
+  python scripts/benchmark_goal_matcher.py
+  python scripts/benchmark_goal_matcher.py --goals 10 100 1000 5000 --iterations 200
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import logging
+import random
+import statistics
+import time
+
+from app.services.goal_match_index import np
+from app.services.goal_matcher import GoalMatcher
+
+# 匹配器每次调用都会打印 info 日志，基准测试时关闭
+logging.disable(logging.INFO)
+
+
+class BenchmarkGoal:
+    """模拟目标对象"""
+
+    def __init__(self, id, title, category, description, unit):
+        self.id = id
+        self.title = title
+        self.category = category
+        self.description = description
+        self.unit = unit
+
+
+def generate_goals(rng, count, matcher, vocabulary):
+    categories = list(matcher.keyword_categories) + ["其他"]
+    units = list(matcher.unit_variants) + ["个", ""]
+    return [
+        BenchmarkGoal(
+            str(i),
+            "".join(rng.sample(vocabulary, 2)) + rng.choice(["计划", "目标", ""]),
+            rng.choice(categories),
+            "".join(rng.sample(vocabulary, rng.randint(0, 5))),
+            rng.choice(units)
+        )
+        for i in range(count)
+    ]
+
+
+def generate_contents(rng, count, vocabulary):
+    return [
+        "今天" + "，".join(rng.sample(vocabulary, rng.randint(2, 8))) + f"，一共{rng.randint(1, 50)}公里"
+        for _ in range(count)
+    ]
+
+
+def timed(func, contents):
+    samples = []
+    for content in contents:
+        start = time.perf_counter()
+        func(content)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.mean(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="目标匹配打分基准测试")
+    parser.add_argument("--goals", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    if np is None:
+        print("❌ 未安装 NumPy，无法测试向量化打分")
+        sys.exit(1)
+
+    scalar = GoalMatcher(vectorized_min_goals=0)
+    vectorized = GoalMatcher(vectorized_min_goals=1)
+    vocabulary = sorted({
+        word
+        for tiers in scalar.keyword_categories.values()
+        for words in tiers.values()
+        for word in words
+    })
+    rng = random.Random(42)
+
+    for count in args.goals:
+        goals = generate_goals(rng, count, scalar, vocabulary)
+        contents = generate_contents(rng, args.iterations, vocabulary)
+
+        start = time.perf_counter()
+        index = scalar.get_index(goals, user_id=f"bench-{count}")
+        build_ms = (time.perf_counter() - start) * 1000
+        # 稀疏矩阵在第一次向量化打分时构建，计入构建时间
+        start = time.perf_counter()
+        index.score_vector(contents[0])
+        build_ms += (time.perf_counter() - start) * 1000
+
+        for content in contents:
+            expected = scalar.rank_goals(content, goals, user_id=f"bench-{count}", top_k=args.top_k)
+            actual = vectorized.rank_goals(content, goals, user_id=f"bench-{count}", top_k=args.top_k)
+            assert [(c['matched_goal'].id, c['score']) for c in actual] == \
+                [(c['matched_goal'].id, c['score']) for c in expected], content
+
+        scalar_ms = timed(
+            lambda content: scalar.rank_goals(content, goals, user_id=f"bench-{count}", top_k=args.top_k),
+            contents
+        )
+        vector_ms = timed(
+            lambda content: vectorized.rank_goals(content, goals, user_id=f"bench-{count}", top_k=args.top_k),
+            contents
+        )
+        print(
+            f"  {count:>5} 个目标  索引构建 {build_ms:8.2f}ms  逐目标 {scalar_ms:7.3f}ms  "
+            f"向量化 {vector_ms:7.3f}ms  加速 {scalar_ms / vector_ms:5.2f}x"
+        )
+
+    print("✅ 两种打分方式结果一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+拍照识别图片预处理基准测试
+
+对一组照片执行预处理，输出压缩前后的大小、分辨率和预处理耗时；加 --ocr 时分别用原图和
+预处理后的图片调用通用印刷体识别，对比识别耗时和识别出的文字数。
+
+未指定 --corpus 时生成一组模拟手机照片（4032x3024 彩色 JPEG，带 EXIF 方向）。
+--ocr 使用 .env 中的腾讯云凭证；设置 TENCENT_CLOUD_STUB_URL 时改为调用本地模拟服务
+（scripts/tencent_cloud_stub.py），模拟服务的延迟与图片大小无关，只用于验证调用路径。
+
+用法：
+  python scripts/benchmark_image_preprocess.py
+  python scripts/benchmark_image_preprocess.py --corpus ~/photos --max-side 1600 --quality 80
+  python scripts/benchmark_image_preprocess.py --corpus ~/photos --ocr
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import base64
+import io
+import logging
+import random
+import statistics
+import time
+
+from app.services.image_preprocessor import ImagePreprocessor, sniff_image_format
+
+# 预处理和OCR每次调用都会打印 info 日志，基准测试时关闭
+logging.disable(logging.INFO)
+
+LINES = [
+    "今天完成了Python学习任务，进度80%", "学习了装饰器和生成器的使用", "晨跑5公里用时28分钟",
+    "读完了第三章做了笔记", "本周目标：完成项目文档", "英语单词背诵100个",
+]
+
+
+def generate_corpus(count, width=4032, height=3024, seed=42):
+    """模拟手机照片：偏色的纸张背景、传感器噪点、几行深色文字，一半是竖拍（EXIF 方向 6）"""
+    from PIL import Image, ImageDraw, ImageFont
+
+    rng = random.Random(seed)
+    try:
+        font = ImageFont.load_default(size=width // 40)
+    except TypeError:
+        font = ImageFont.load_default()
+
+    photos = []
+    for i in range(count):
+        paper = (rng.randint(200, 245), rng.randint(195, 235), rng.randint(170, 220))
+        noise = Image.effect_noise((width, height), rng.randint(20, 50)).convert("RGB")
+        photo = Image.blend(Image.new("RGB", (width, height), paper), noise, 0.25)
+        draw = ImageDraw.Draw(photo)
+        for row in range(rng.randint(6, 12)):
+            draw.text((width // 10, height // 14 * (row + 1)), rng.choice(LINES), fill=(30, 30, 40), font=font)
+
+        exif = Image.Exif()
+        exif[0x0112] = 6 if i % 2 else 1
+        output = io.BytesIO()
+        photo.save(output, format="JPEG", quality=92, exif=exif)
+        photos.append((f"synthetic-{i + 1}.jpg", output.getvalue()))
+    return photos
+
+
+def load_corpus(directory):
+    photos = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not os.path.isfile(path):
+            continue
+        with open(path, "rb") as f:
+            data = f.read()
+        if sniff_image_format(data[:16]):
+            photos.append((name, data))
+    return photos
+
+
+def image_size(data):
+    from PIL import Image
+
+    return "x".join(str(side) for side in Image.open(io.BytesIO(data)).size)
+
+
+async def run_ocr(photos):
+    """分别用原图和预处理后的图片调用OCR，不经过识别结果缓存"""
+    from app.services.recognition_cache import RecognitionCache
+    from app.services.tencent_ocr_service import ocr_service
+
+    ocr_service.cache = RecognitionCache("ocr-benchmark", enabled=False)
+    if not ocr_service.client:
+        print("❌ OCR客户端未初始化，请配置腾讯云凭证或 TENCENT_CLOUD_STUB_URL")
+        return
+
+    print(f"\n  {'照片':<24} {'原图OCR':>10} {'预处理后OCR':>12} {'原图字数':>8} {'处理后字数':>10}")
+    totals = {"original": [], "processed": []}
+    for name, original, processed in photos:
+        row = {}
+        for label, data in (("original", original), ("processed", processed)):
+            start = time.perf_counter()
+            blocks = await ocr_service.general_basic_ocr(base64.b64encode(data).decode())
+            elapsed = (time.perf_counter() - start) * 1000
+            totals[label].append(elapsed)
+            row[label] = (elapsed, sum(len(block["text"]) for block in blocks or []))
+        print(
+            f"  {name:<24} {row['original'][0]:8.0f}ms {row['processed'][0]:10.0f}ms "
+            f"{row['original'][1]:8d} {row['processed'][1]:10d}"
+        )
+    print(
+        f"  {'中位数':<24} {statistics.median(totals['original']):8.0f}ms "
+        f"{statistics.median(totals['processed']):10.0f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="拍照识别图片预处理基准测试")
+    parser.add_argument("--corpus", help="照片目录，不指定时生成模拟照片")
+    parser.add_argument("--count", type=int, default=8, help="生成的模拟照片数")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--max-side", type=int, default=2048)
+    parser.add_argument("--quality", type=int, default=85)
+    parser.add_argument("--max-bytes", type=int, default=1024 * 1024)
+    parser.add_argument("--color", action="store_true", help="保留颜色，不转灰度")
+    parser.add_argument("--crop-borders", action="store_true")
+    parser.add_argument("--ocr", action="store_true", help="对比原图和预处理后图片的OCR耗时")
+    args = parser.parse_args()
+
+    photos = load_corpus(args.corpus) if args.corpus else generate_corpus(args.count)
+    if not photos:
+        print("❌ 没有可用的照片")
+        return
+
+    preprocessor = ImagePreprocessor(
+        workers=args.workers, timeout=60, max_side=args.max_side, quality=args.quality,
+        max_bytes=args.max_bytes, grayscale=not args.color, crop_borders=args.crop_borders
+    )
+    if not preprocessor.enabled:
+        print("❌ 未安装 Pillow")
+        return
+
+    async def scenario():
+        # 预热：启动子进程并完成 Pillow 导入，不计入耗时
+        await asyncio.gather(*(preprocessor.prepare(data) for _, data in photos[:args.workers]))
+
+        results, latencies = [], []
+        for name, data in photos:
+            start = time.perf_counter()
+            processed = await preprocessor.prepare(data)
+            latencies.append((time.perf_counter() - start) * 1000)
+            results.append((name, data, processed))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(preprocessor.prepare(data) for _, data in photos))
+        throughput = len(photos) / (time.perf_counter() - start)
+        return results, latencies, throughput
+
+    try:
+        results, latencies, throughput = asyncio.run(scenario())
+    finally:
+        preprocessor.shutdown()
+
+    print(f"🧪 图片预处理 {len(photos)} 张，进程数 {args.workers}，CPU核数 {os.cpu_count()}")
+    print(f"  {'照片':<24} {'原图':>12} {'大小':>10} {'处理后':>12} {'大小':>10} {'耗时':>8}")
+    for (name, original, processed), elapsed in zip(results, latencies):
+        print(
+            f"  {name:<24} {image_size(original):>12} {len(original) / 1024:8.0f}KB "
+            f"{image_size(processed):>12} {len(processed) / 1024:8.0f}KB {elapsed:6.0f}ms"
+        )
+
+    bytes_in = sum(len(original) for _, original, _ in results)
+    bytes_out = sum(len(processed) for _, _, processed in results)
+    print(
+        f"\n  合计 {bytes_in / 1024 / 1024:.1f}MB -> {bytes_out / 1024 / 1024:.1f}MB"
+        f"（{bytes_out / bytes_in:.0%}），单张耗时中位数 {statistics.median(latencies):.0f}ms，"
+        f"并发吞吐 {throughput:.1f} 张/秒"
+    )
+
+    if args.ocr:
+        asyncio.run(run_ocr(results))
+
+
+if __name__ == "__main__":
+    main()
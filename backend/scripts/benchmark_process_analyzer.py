@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+过程记录分析器基准测试
+
+对比单次扫描的 Aho-Corasick 实现与原来逐词典、逐关键词 `keyword in content` 的实现，
+并校验两者在随机文本上的分析结果一致。
+
+用法：
+  python scripts/benchmark_process_analyzer.py
+  python scripts/benchmark_process_analyzer.py --lengths 50 500 5000 20000 --iterations 200
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import logging
+import random
+import re
+import statistics
+import time
+
+from app.utils.process_analyzer import ProcessRecordAnalyzer
+
+# 分析器每次调用都会打印 info 日志，基准测试时关闭
+logging.disable(logging.INFO)
+
+FILLER = (
+    "今天上午参加了部门例会讨论了下个季度的安排下午继续整理资料晚上回家做饭看了一会儿电视"
+    "第二章主要介绍了函数式编程的基本概念包括高阶函数闭包和不可变数据结构作者举了很多例子"
+)
+
+
+class LegacyAnalyzer:
+    """原实现：每个字段分别遍历各自的关键词列表"""
+
+    def __init__(self, analyzer: ProcessRecordAnalyzer):
+        self.a = analyzer
+
+    def analyze_content(self, content):
+        return {
+            'record_type': self._classify_record_type(content),
+            'sentiment': self._analyze_sentiment(content),
+            'energy_level': self._level(content, self.a.energy_keywords, {'high': 8, 'medium': 5, 'low': 3}),
+            'difficulty_level': self._level(content, self.a.difficulty_keywords, {'high': 8, 'medium': 5, 'low': 2}),
+            'keywords': self._extract_keywords(content),
+            'tags': self._generate_tags(content),
+            'is_important': any(k in content for k in self.a.flag_keywords['is_important']),
+            'is_milestone': any(k in content for k in self.a.flag_keywords['is_milestone']),
+            'is_breakthrough': any(k in content for k in self.a.flag_keywords['is_breakthrough']),
+            'confidence_score': self._calculate_confidence(content)
+        }
+
+    def _classify_record_type(self, content):
+        content_lower = content.lower()
+        type_scores = {
+            t: sum(1 for k in keywords if k in content_lower)
+            for t, keywords in self.a.type_keywords.items()
+        }
+        best_type = max(type_scores, key=type_scores.get)
+        return best_type if type_scores[best_type] > 0 else 'process'
+
+    def _analyze_sentiment(self, content):
+        content_lower = content.lower()
+        positive = sum(1 for k in self.a.sentiment_keywords['positive'] if k in content_lower)
+        negative = sum(1 for k in self.a.sentiment_keywords['negative'] if k in content_lower)
+        if positive > negative:
+            return 'positive'
+        if negative > positive:
+            return 'negative'
+        return 'neutral'
+
+    @staticmethod
+    def _level(content, keywords_by_level, scores):
+        content_lower = content.lower()
+        for level, keywords in keywords_by_level.items():
+            if any(k in content_lower for k in keywords):
+                return scores[level]
+        return None
+
+    def _extract_keywords(self, content):
+        keywords = re.findall(r'\d+', content)
+        keywords.extend(w for w in self.a.important_words if w in content)
+        return list(set(keywords))
+
+    def _generate_tags(self, content):
+        tags = [tag for tag, words in self.a.tag_keywords.items() if any(w in content for w in words)]
+        sentiment = self._analyze_sentiment(content)
+        if sentiment == 'positive':
+            tags.append('积极')
+        elif sentiment == 'negative':
+            tags.append('消极')
+        return tags
+
+    def _calculate_confidence(self, content):
+        confidence = 50
+        if len(content) > 50:
+            confidence += 20
+        elif len(content) > 20:
+            confidence += 10
+        matched = sum(1 for keywords in self.a.type_keywords.values()
+                      for k in keywords if k in content.lower())
+        if matched > 0:
+            confidence += min(30, matched * 5)
+        return min(100, confidence)
+
+
+def generate_text(rng, length, vocabulary):
+    """生成夹杂词典关键词的随机文本，模拟 OCR 识别出的长段落"""
+    parts = []
+    size = 0
+    while size < length:
+        if rng.random() < 0.3:
+            piece = rng.choice(vocabulary)
+        else:
+            start = rng.randrange(len(FILLER) - 10)
+            piece = FILLER[start:start + rng.randint(3, 10)]
+        if rng.random() < 0.1:
+            piece += str(rng.randint(1, 100))
+        parts.append(piece)
+        size += len(piece)
+    return "".join(parts)[:length]
+
+
+def normalize(result):
+    result = dict(result)
+    result['keywords'] = sorted(result['keywords'])
+    result.pop('analyzer_version', None)
+    return result
+
+
+def timed(func, texts):
+    samples = []
+    for text in texts:
+        start = time.perf_counter()
+        func(text)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="过程记录分析器基准测试")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[50, 500, 5000, 20000])
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args()
+
+    analyzer = ProcessRecordAnalyzer()
+    legacy = LegacyAnalyzer(analyzer)
+    vocabulary = sorted(analyzer._labels)
+    rng = random.Random(42)
+
+    print(f"🧪 词典关键词 {len(vocabulary)} 个")
+    for length in args.lengths:
+        texts = [generate_text(rng, length, vocabulary) for _ in range(args.iterations)]
+
+        for text in texts:
+            assert normalize(analyzer._analyze_content(text)) == normalize(legacy.analyze_content(text)), text
+
+        # 绕过结果缓存，只比较分析本身的耗时
+        new_samples = timed(analyzer._analyze_content, texts)
+        old_samples = timed(legacy.analyze_content, texts)
+        new_mean, old_mean = statistics.mean(new_samples), statistics.mean(old_samples)
+        print(
+            f"  {length:>6} 字  自动机 {new_mean:8.3f}ms  逐词扫描 {old_mean:8.3f}ms  "
+            f"加速 {old_mean / new_mean:5.2f}x"
+        )
+
+    print("✅ 两种实现结果一致")
+
+
+if __name__ == "__main__":
+    main()
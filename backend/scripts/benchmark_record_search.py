@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+过程记录全文搜索基准测试
+
+两种模式：
+  memory  在进程内倒排索引上测试（默认100万条记录），和逐条 `in` 子串扫描对比
+  mysql   向当前配置的数据库灌入数据，对比 MATCH ... AGAINST 与 LIKE '%...%'
+
+用法：
+  python scripts/benchmark_record_search.py --records 1000000 --users 100
+  python scripts/benchmark_record_search.py --mode mysql --records 1000000 --users 100
+  python scripts/benchmark_record_search.py --mode mysql --skip-seed
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import statistics
+import time
+
+from app.services.record_search_service import RecordSearchIndex
+
+PHRASES = [
+    "今天跑了{n}公里", "读完了《活着》第{n}章", "学习了Python装饰器", "背了{n}个英语单词",
+    "完成了项目需求文档", "修复了{n}个bug", "练了{n}分钟瑜伽", "整理了房间",
+    "感觉状态很好", "遇到了一些困难", "终于突破了瓶颈", "复习了算法题",
+    "做了{n}个俯卧撑", "写了{n}字的文章", "和朋友聚会聊天", "存了{n}元",
+    "总结了本周的收获", "调整了学习计划", "有点累但是坚持下来了", "首次完成半程马拉松",
+]
+
+QUERIES = ["跑步", "公里", "英语单词", "装饰器", "项目需求", "马拉松", "瓶颈", "学习计划"]
+
+BENCH_USER_PREFIX = "bench-user-"
+
+
+def generate_content(rng: random.Random) -> str:
+    parts = rng.sample(PHRASES, rng.randint(2, 5))
+    return "，".join(p.format(n=rng.randint(1, 100)) for p in parts) + "。"
+
+
+def generate_rows(records: int, users: int, seed: int = 42):
+    """生成 (id, user_id, goal_id, content) 行"""
+    rng = random.Random(seed)
+    for record_id in range(1, records + 1):
+        user_index = record_id % users
+        goal_id = f"bench-goal-{user_index}-{rng.randint(0, 9)}"
+        yield record_id, f"{BENCH_USER_PREFIX}{user_index}", goal_id, generate_content(rng)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def report(name, samples_ms):
+    print(
+        f"  {name:<28} p50={percentile(samples_ms, 50):8.2f}ms  "
+        f"p95={percentile(samples_ms, 95):8.2f}ms  mean={statistics.mean(samples_ms):8.2f}ms"
+    )
+
+
+def bench_memory(args):
+    print(f"🧪 进程内倒排索引: {args.records} 条记录, {args.users} 个用户")
+
+    by_user = {}
+    for record_id, user_id, goal_id, content in generate_rows(args.records, args.users):
+        by_user.setdefault(user_id, []).append((record_id, goal_id, None, content))
+
+    index = RecordSearchIndex(max_users=args.users)
+    start = time.perf_counter()
+    for user_id, rows in by_user.items():
+        index.load_user(user_id, rows)
+    build_seconds = time.perf_counter() - start
+    print(f"  构建索引耗时: {build_seconds:.1f}s ({args.records / build_seconds:,.0f} 条/秒)")
+
+    rng = random.Random(7)
+    user_ids = list(by_user)
+    indexed, scanned = [], []
+    for _ in range(args.iterations):
+        user_id = rng.choice(user_ids)
+        query = rng.choice(QUERIES)
+
+        start = time.perf_counter()
+        hits = index.search(user_id, query)[:20]
+        indexed.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        matched = [row for row in by_user[user_id] if query in row[3]]
+        scanned.append((time.perf_counter() - start) * 1000)
+
+        assert hits or not matched
+
+    report("倒排索引 + BM25排序", indexed)
+    report("逐条子串扫描（无排序）", scanned)
+
+
+def bench_mysql(args):
+    from sqlalchemy import text
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if not args.skip_seed:
+            print(f"🔨 灌入 {args.records} 条记录...")
+            db.execute(text("DELETE FROM process_records WHERE user_id LIKE :prefix"),
+                       {"prefix": f"{BENCH_USER_PREFIX}%"})
+            batch = []
+            for _, user_id, goal_id, content in generate_rows(args.records, args.users):
+                batch.append({"user_id": user_id, "goal_id": goal_id, "content": content})
+                if len(batch) >= 5000:
+                    db.execute(text("""
+                        INSERT INTO process_records (user_id, goal_id, content, record_type, source)
+                        VALUES (:user_id, :goal_id, :content, 'process', 'import')
+                    """), batch)
+                    db.commit()
+                    batch = []
+            if batch:
+                db.execute(text("""
+                    INSERT INTO process_records (user_id, goal_id, content, record_type, source)
+                    VALUES (:user_id, :goal_id, :content, 'process', 'import')
+                """), batch)
+                db.commit()
+
+        print("🧪 MySQL 全文索引 vs LIKE")
+        rng = random.Random(7)
+        fulltext, like = [], []
+        for _ in range(args.iterations):
+            params = {
+                "user_id": f"{BENCH_USER_PREFIX}{rng.randrange(args.users)}",
+                "query": rng.choice(QUERIES)
+            }
+
+            start = time.perf_counter()
+            db.execute(text("""
+                SELECT id, MATCH(title, content) AGAINST (:query IN NATURAL LANGUAGE MODE) AS score
+                FROM process_records
+                WHERE user_id = :user_id
+                AND MATCH(title, content) AGAINST (:query IN NATURAL LANGUAGE MODE)
+                ORDER BY score DESC LIMIT 20
+            """), params).fetchall()
+            fulltext.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            db.execute(text("""
+                SELECT id FROM process_records
+                WHERE user_id = :user_id AND content LIKE CONCAT('%', :query, '%')
+                ORDER BY recorded_at DESC LIMIT 20
+            """), params).fetchall()
+            like.append((time.perf_counter() - start) * 1000)
+
+        report("FULLTEXT ngram", fulltext)
+        report("LIKE '%...%'", like)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="过程记录全文搜索基准测试")
+    parser.add_argument("--mode", choices=["memory", "mysql"], default="memory")
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--skip-seed", action="store_true", help="mysql模式下复用已灌入的数据")
+    args = parser.parse_args()
+
+    if args.mode == "memory":
+        bench_memory(args)
+    else:
+        bench_mysql(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+把用户统计字段从 VARCHAR 改为 INT 的数据库迁移脚本
+total_goals / completed_goals / streak_days 由 UserStatsService 增量维护
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import get_db
+from app.services.user_stats_service import UserStatsService
+from sqlalchemy import text
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STAT_COLUMNS = ['total_goals', 'completed_goals', 'streak_days']
+
+def convert_columns():
+    """把统计字段改为 INT NOT NULL DEFAULT 0"""
+    try:
+        db = next(get_db())
+
+        for column in STAT_COLUMNS:
+            result = db.execute(text(f"SHOW COLUMNS FROM users LIKE '{column}'"))
+            row = result.fetchone()
+            if row and str(row[1]).lower().startswith('int'):
+                logger.info(f"{column}字段已是INT，跳过")
+                continue
+
+            # 先清理无法转换的值，严格模式下 MODIFY 会因非数字字符串失败
+            db.execute(text(f"""
+                UPDATE users SET {column} = '0'
+                WHERE {column} IS NULL OR {column} NOT REGEXP '^[0-9]+$'
+            """))
+            db.execute(text(f"ALTER TABLE users MODIFY COLUMN {column} INT NOT NULL DEFAULT 0"))
+            db.commit()
+            logger.info(f"✅ {column}字段已改为INT")
+
+    except Exception as e:
+        logger.error(f"❌ 修改统计字段失败: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def reconcile_stats():
+    """从明细数据重算一次计数器"""
+    db = next(get_db())
+    try:
+        updated = UserStatsService(db).reconcile()
+        logger.info(f"✅ 已重算 {updated} 个用户的统计数据")
+    finally:
+        db.close()
+
+def main():
+    """主函数"""
+    logger.info("🚀 开始迁移用户统计字段...")
+    convert_columns()
+    reconcile_stats()
+    logger.info("🎉 用户统计字段迁移完成！")
+
+if __name__ == "__main__":
+    main()
@@ -136,9 +136,9 @@ def create_initial_data():
             email="test@example.com",
             notification_enabled=True,
             privacy_level="public",
-            total_goals="0",
-            completed_goals="0",
-            streak_days="0",
+            total_goals=0,
+            completed_goals=0,
+            streak_days=0,
             is_verified=True,
             is_active=True,
             created_at=datetime.utcnow(),
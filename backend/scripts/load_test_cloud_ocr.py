@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+OCR 高负载下快速接口延迟压测
+
+启动一个只有两个接口的本地服务：/ocr 走 TencentOCRService.general_basic_ocr，
+/ping 立即返回。OCR 客户端替换为按固定耗时阻塞的模拟客户端（模拟腾讯云往返），
+持续发送 OCR 请求的同时测量 /ping 的 p50/p99 延迟，对比两种模式：
+- blocking：在 async 接口里直接调用 SDK（改造前的行为），整个事件循环被 OCR 阻塞
+- executor：通过云服务执行器调用，OCR 满载时多余请求快速返回 503
+
+用法：
+  python scripts/load_test_cloud_ocr.py
+  python scripts/load_test_cloud_ocr.py --ocr-latency 0.5 --ocr-clients 16 --duration 10
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import base64
+import logging
+import socket
+import statistics
+import threading
+import time
+
+import requests
+import uvicorn
+from fastapi import FastAPI, HTTPException
+
+# 压测不会访问腾讯云，未配置凭证时使用占位值，避免创建客户端失败
+os.environ.setdefault("TENCENT_SECRET_ID", "load-test")
+os.environ.setdefault("TENCENT_SECRET_KEY", "load-test")
+
+from app.services.cloud_executor import CloudServiceLimiter, CloudServiceBusy, CloudCallTimeout
+from app.services.tencent_ocr_service import TencentOCRService
+
+# OCR 服务每次调用都会打印日志，繁忙拒绝时还有 warning，压测时关闭
+logging.disable(logging.WARNING)
+
+
+class SimulatedPoint:
+    def __init__(self, x, y):
+        self.X = x
+        self.Y = y
+
+
+class SimulatedDetection:
+    def __init__(self, text):
+        self.DetectedText = text
+        self.Confidence = 95
+        self.Polygon = [SimulatedPoint(0, 0), SimulatedPoint(100, 0), SimulatedPoint(100, 20), SimulatedPoint(0, 20)]
+
+
+class SimulatedResponse:
+    def __init__(self):
+        self.TextDetections = [SimulatedDetection("今天完成了Python学习任务，进度80%")]
+
+
+class SimulatedOcrClient:
+    """按固定耗时阻塞的 OCR 客户端，模拟一次腾讯云往返"""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def GeneralBasicOCR(self, req):
+        time.sleep(self.latency)
+        return SimulatedResponse()
+
+
+def build_app(ocr_service, mode):
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.post("/ocr")
+    async def ocr(payload: dict):
+        if mode == "blocking":
+            # 改造前：在事件循环中直接调用阻塞的 SDK
+            resp = ocr_service.client.GeneralBasicOCR(payload)
+            return {"blocks": len(resp.TextDetections)}
+        try:
+            results = await ocr_service.general_basic_ocr(payload["image"])
+        except CloudServiceBusy:
+            raise HTTPException(status_code=503, detail="busy")
+        except CloudCallTimeout:
+            raise HTTPException(status_code=504, detail="timeout")
+        return {"blocks": len(results)}
+
+    return app
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app):
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def run_mode(mode, args):
+    ocr_service = TencentOCRService()
+    ocr_service.client = SimulatedOcrClient(args.ocr_latency)
+    ocr_service.limiter = CloudServiceLimiter(
+        "ocr", max_concurrency=args.max_concurrency, timeout=args.ocr_latency * 4, max_queue=args.max_queue
+    )
+    server, thread, base_url = start_server(build_app(ocr_service, mode))
+
+    stop = threading.Event()
+    ocr_status = {}
+    lock = threading.Lock()
+    image = base64.b64encode(b"\x89PNG" + b"\x00" * 1024).decode("utf-8")
+
+    def ocr_worker():
+        session = requests.Session()
+        while not stop.is_set():
+            try:
+                status = session.post(f"{base_url}/ocr", json={"image": image}, timeout=60).status_code
+            except requests.RequestException:
+                status = "error"
+            with lock:
+                ocr_status[status] = ocr_status.get(status, 0) + 1
+            if status == 503:
+                # 客户端按 Retry-After 退避
+                time.sleep(args.ocr_latency)
+
+    workers = [threading.Thread(target=ocr_worker, daemon=True) for _ in range(args.ocr_clients)]
+    for worker in workers:
+        worker.start()
+    time.sleep(args.ocr_latency)
+
+    session = requests.Session()
+    samples = []
+    deadline = time.perf_counter() + args.duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        session.get(f"{base_url}/ping", timeout=60)
+        samples.append((time.perf_counter() - start) * 1000)
+        time.sleep(args.ping_interval)
+
+    stop.set()
+    for worker in workers:
+        worker.join()
+    server.should_exit = True
+    thread.join()
+    ocr_service.limiter.shutdown()
+
+    print(
+        f"  {mode:>8}  /ping p50 {statistics.median(samples):8.2f}ms  p99 {percentile(samples, 0.99):8.2f}ms  "
+        f"样本 {len(samples):4d}  OCR 响应 {dict(sorted(ocr_status.items(), key=str))}"
+    )
+    return percentile(samples, 0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR 高负载下快速接口延迟压测")
+    parser.add_argument("--ocr-latency", type=float, default=0.3, help="模拟的OCR单次耗时（秒）")
+    parser.add_argument("--ocr-clients", type=int, default=16, help="持续发送OCR请求的并发数")
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    parser.add_argument("--max-queue", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=5.0, help="每种模式的测量时长（秒）")
+    parser.add_argument("--ping-interval", type=float, default=0.01)
+    args = parser.parse_args()
+
+    print(
+        f"🧪 OCR 单次 {args.ocr_latency}s，{args.ocr_clients} 个并发 OCR 客户端，"
+        f"执行器并发 {args.max_concurrency} + 排队 {args.max_queue}"
+    )
+    blocking_p99 = run_mode("blocking", args)
+    executor_p99 = run_mode("executor", args)
+    print(f"🎉 /ping p99: 直接调用 {blocking_p99:.2f}ms -> 执行器 {executor_p99:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
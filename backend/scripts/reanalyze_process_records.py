@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+关键词词典升级后重新分析过程记录
+按主键顺序分块处理 analyzer_version 落后于当前词典版本的记录，每块提交后写入检查点：
+  python scripts/reanalyze_process_records.py
+  python scripts/reanalyze_process_records.py --chunk-size 200 --checkpoint /tmp/reanalyze.json
+中断后使用相同命令重新运行即可从检查点继续；检查点属于旧词典版本时自动从头开始
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import logging
+
+from app.database import get_db
+from app.services.analysis_executor import analysis_executor
+from app.services.reanalysis_service import ReanalysisService
+from app.utils.process_analyzer import process_analyzer
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".reanalyze_checkpoint.json")
+
+def load_checkpoint(path, version):
+    """读取检查点，返回上次处理到的主键"""
+    if not os.path.exists(path):
+        return 0
+    with open(path, "r", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("version") != version:
+        logger.info(f"检查点属于词典版本 {checkpoint.get('version')}，从头开始")
+        return 0
+    return checkpoint.get("last_id", 0)
+
+def save_checkpoint(path, version, last_id):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": version, "last_id": last_id}, f)
+    os.replace(tmp_path, path)
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="重新分析过程记录")
+    parser.add_argument("--chunk-size", type=int, default=500, help="每块处理的记录数")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="检查点文件路径")
+    parser.add_argument("--restart", action="store_true", help="忽略检查点从头开始")
+    args = parser.parse_args()
+
+    version = process_analyzer.version
+    start_after_id = 0 if args.restart else load_checkpoint(args.checkpoint, version)
+
+    db = next(get_db())
+    try:
+        service = ReanalysisService(db)
+        logger.info(
+            f"🚀 开始重新分析过程记录 - 词典版本: {version}，"
+            f"待处理: {service.pending_count(version)} 条，从主键 {start_after_id} 之后开始"
+        )
+        processed = service.run(
+            chunk_size=args.chunk_size,
+            start_after_id=start_after_id,
+            on_chunk=lambda last_id, _: save_checkpoint(args.checkpoint, version, last_id)
+        )
+        logger.info(f"🎉 重新分析完成，共 {processed} 条记录！")
+    except Exception as e:
+        logger.error(f"❌ 重新分析失败: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+        analysis_executor.shutdown()
+
+if __name__ == "__main__":
+    main()
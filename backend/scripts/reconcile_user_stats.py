@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+用户统计对账任务
+从 goals / process_records 批量重算 users 表上的计数器，修正增量更新可能产生的偏差。
+可由 cron 定期执行，例如每天凌晨：
+  0 3 * * * cd /app/backend && python scripts/reconcile_user_stats.py
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import logging
+
+from app.database import get_db
+from app.services.user_stats_service import UserStatsService
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="重算用户统计计数器")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批更新的用户数")
+    args = parser.parse_args()
+
+    logger.info("🚀 开始重算用户统计...")
+    db = next(get_db())
+    try:
+        updated = UserStatsService(db).reconcile(batch_size=args.batch_size)
+    except Exception as e:
+        logger.error(f"❌ 重算用户统计失败: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    logger.info(f"🎉 用户统计重算完成，共 {updated} 个用户！")
+
+if __name__ == "__main__":
+    main()
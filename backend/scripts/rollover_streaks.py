@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+连续打卡每日滚动任务
+把昨天没有任何记录的用户的当前连续天数清零，应在每天 UTC 零点之后执行：
+  10 0 * * * cd /app/backend && python scripts/rollover_streaks.py
+使用 --backfill 从 process_records 全量重算（修复数据时使用）
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import logging
+
+from app.database import get_db
+from app.services.streak_service import StreakService
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="连续打卡每日滚动")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="每批处理的用户数")
+    parser.add_argument("--backfill", action="store_true", help="从历史记录全量重算")
+    args = parser.parse_args()
+
+    db = next(get_db())
+    try:
+        streak_service = StreakService(db)
+        if args.backfill:
+            logger.info("🚀 开始回填连续打卡状态...")
+            updated = streak_service.backfill(batch_size=args.chunk_size)
+            logger.info(f"🎉 回填完成，共 {updated} 个用户！")
+        else:
+            logger.info("🚀 开始连续打卡每日滚动...")
+            reset = streak_service.rollover(chunk_size=args.chunk_size)
+            logger.info(f"🎉 滚动完成，{reset} 个用户的连续天数已清零！")
+    except Exception as e:
+        logger.error(f"❌ 连续打卡任务失败: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
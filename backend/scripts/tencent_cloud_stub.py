@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+本地模拟腾讯云服务（ASR / OCR / COS）
+
+实现现有客户端用到的接口，供压测和性能测试走真实的 SDK 调用路径，而不访问腾讯云：
+- ASR：SentenceRecognition、CreateRecTask、DescribeTaskStatus（POST /，按 X-TC-Action 分发）
+- OCR：GeneralBasicOCR、GeneralAccurateOCR、GeneralHandwritingOCR（ImageBase64 或指向本服务COS对象的 ImageUrl）
+- COS：PUT/GET/HEAD/DELETE /{key}（包括预签名地址），GET / 列出对象（单个存储桶，数据保存在内存中）
+
+每个服务的延迟按对数正态分布注入（由中位数和P99确定），可配置错误率；
+开启 echo 时识别结果为请求数据的字节数和SHA-256前缀，便于确认数据原样到达。
+延迟用 asyncio.sleep 注入，模拟服务本身不会成为瓶颈。
+
+后端设置 TENCENT_CLOUD_STUB_URL=http://127.0.0.1:9100 后，所有客户端都指向这里。
+
+用法：
+  python scripts/tencent_cloud_stub.py
+  python scripts/tencent_cloud_stub.py --port 9100 --asr-latency 400:1500 --ocr-latency 300:1200 --ocr-error-rate 0.02
+  curl -X PUT localhost:9100/_stub/config -d '{"ocr": {"median_ms": 2000, "p99_ms": 8000}}'
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import math
+import random
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import unquote, urlparse
+from xml.sax.saxutils import escape
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# P99 对应标准正态分布的分位点
+Z_99 = 2.326
+
+OCR_ACTIONS = ("GeneralBasicOCR", "GeneralAccurateOCR", "GeneralHandwritingOCR")
+
+
+class ServiceProfile:
+    """单个服务的延迟分布和错误率"""
+
+    def __init__(self, median_ms: float = 0, p99_ms: float = 0, error_rate: float = 0):
+        self.median_ms = median_ms
+        self.p99_ms = p99_ms
+        self.error_rate = error_rate
+
+    def sample_latency(self, rng: random.Random) -> float:
+        """按对数正态分布采样延迟（秒）"""
+        if self.median_ms <= 0:
+            return 0.0
+        p99 = max(self.p99_ms, self.median_ms)
+        sigma = (math.log(p99) - math.log(self.median_ms)) / Z_99
+        return rng.lognormvariate(math.log(self.median_ms), sigma) / 1000
+
+    def update(self, values: Dict[str, Any]) -> None:
+        for name in ("median_ms", "p99_ms", "error_rate"):
+            if name in values:
+                setattr(self, name, float(values[name]))
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"median_ms": self.median_ms, "p99_ms": self.p99_ms, "error_rate": self.error_rate}
+
+
+class StubState:
+    """模拟服务的配置、COS对象和识别任务"""
+
+    def __init__(
+        self,
+        profiles: Optional[Dict[str, ServiceProfile]] = None,
+        echo: bool = False,
+        asr_text: str = "今天跑步5公里",
+        ocr_text: str = "今天完成了Python学习任务，进度80%",
+        seed: Optional[int] = None
+    ):
+        self.profiles = profiles or {name: ServiceProfile() for name in ("asr", "ocr", "cos")}
+        self.echo = echo
+        self.asr_text = asr_text
+        self.ocr_text = ocr_text
+        self.rng = random.Random(seed)
+        self.objects: Dict[str, Tuple[bytes, str, datetime]] = {}
+        self.tasks: Dict[int, Dict[str, Any]] = {}
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+
+    async def delay(self, service: str, action: str) -> bool:
+        """注入延迟，返回本次是否模拟失败"""
+        profile = self.profiles[service]
+        self.counts[action] = self.counts.get(action, 0) + 1
+        await asyncio.sleep(profile.sample_latency(self.rng))
+        if self.rng.random() < profile.error_rate:
+            self.errors[action] = self.errors.get(action, 0) + 1
+            return True
+        return False
+
+    def recognized_text(self, default: str, payload: bytes) -> str:
+        if not self.echo:
+            return default
+        return f"echo:{len(payload)}:{hashlib.sha256(payload).hexdigest()[:16]}"
+
+    def config(self) -> Dict[str, Any]:
+        return {
+            **{name: profile.to_dict() for name, profile in self.profiles.items()},
+            "echo": self.echo,
+            "asr_text": self.asr_text,
+            "ocr_text": self.ocr_text
+        }
+
+    def update_config(self, values: Dict[str, Any]) -> None:
+        for name, profile in self.profiles.items():
+            if isinstance(values.get(name), dict):
+                profile.update(values[name])
+        for name in ("echo", "asr_text", "ocr_text"):
+            if name in values:
+                setattr(self, name, values[name])
+
+
+def api_response(data: Dict[str, Any]) -> JSONResponse:
+    return JSONResponse({"Response": {**data, "RequestId": str(uuid.uuid4())}})
+
+
+def api_error(code: str, message: str) -> JSONResponse:
+    # 云API的业务错误同样返回 200，错误信息在 Response.Error 中
+    return api_response({"Error": {"Code": code, "Message": message}})
+
+
+def decode_data(params: Dict[str, Any]) -> bytes:
+    try:
+        return base64.b64decode(params.get("Data") or params.get("ImageBase64") or "")
+    except ValueError:
+        return b""
+
+
+def build_app(state: StubState) -> FastAPI:
+    app = FastAPI(title="腾讯云模拟服务")
+
+    @app.get("/_stub/config")
+    async def get_config():
+        return state.config()
+
+    @app.put("/_stub/config")
+    async def put_config(request: Request):
+        state.update_config(await request.json())
+        logger.info(f"🔧 更新模拟配置: {state.config()}")
+        return state.config()
+
+    @app.get("/_stub/stats")
+    async def stats():
+        return {"requests": state.counts, "errors": state.errors, "objects": len(state.objects), "tasks": len(state.tasks)}
+
+    @app.post("/")
+    async def cloud_api(request: Request):
+        action = request.headers.get("X-TC-Action", "")
+        params = json.loads(await request.body() or b"{}")
+
+        if action == "SentenceRecognition":
+            if await state.delay("asr", action):
+                return api_error("InternalError", "模拟的服务端错误")
+            audio = decode_data(params)
+            return api_response({
+                "Result": state.recognized_text(state.asr_text, audio),
+                "AudioDuration": max(1, len(audio) // 4),
+                "WordSize": 0,
+                "WordList": None
+            })
+
+        if action == "CreateRecTask":
+            # 识别耗时同样按 asr 延迟分布采样，到时间后查询才返回结果
+            if await state.delay("asr", action):
+                return api_error("InternalError", "模拟的服务端错误")
+            audio = decode_data(params)
+            task_id = len(state.tasks) + 1
+            failed = state.rng.random() < state.profiles["asr"].error_rate
+            state.tasks[task_id] = {
+                "ready_at": time.monotonic() + state.profiles["asr"].sample_latency(state.rng),
+                "failed": failed,
+                "text": state.recognized_text(state.asr_text, audio if audio else (params.get("Url") or "").encode()),
+                "duration": max(1, len(audio) // 4)
+            }
+            return api_response({"Data": {"TaskId": task_id}})
+
+        if action == "DescribeTaskStatus":
+            task = state.tasks.get(int(params.get("TaskId", 0)))
+            state.counts[action] = state.counts.get(action, 0) + 1
+            if task is None:
+                return api_error("InvalidParameterValue", "任务不存在")
+            if time.monotonic() < task["ready_at"]:
+                status, status_str, result, error_msg = 1, "doing", "", ""
+            elif task["failed"]:
+                status, status_str, result, error_msg = 3, "failed", "", "模拟的识别失败"
+            else:
+                status, status_str, result, error_msg = 2, "success", f"[0:0.000,0:1.000]  {task['text']}\n", ""
+            return api_response({"Data": {
+                "TaskId": int(params["TaskId"]),
+                "Status": status,
+                "StatusStr": status_str,
+                "Result": result,
+                "ErrorMsg": error_msg,
+                "AudioDuration": task["duration"] / 1000
+            }})
+
+        if action in OCR_ACTIONS:
+            if await state.delay("ocr", action):
+                return api_error("InternalError", "模拟的服务端错误")
+            if params.get("ImageUrl"):
+                # 只能下载本服务COS中的对象
+                stored = state.objects.get(unquote(urlparse(params["ImageUrl"]).path.lstrip("/")))
+                if stored is None:
+                    return api_error("FailedOperation.DownLoadError", "文件下载失败")
+                image = stored[0]
+            else:
+                image = decode_data(params)
+            text = state.recognized_text(state.ocr_text, image)
+            return api_response({
+                "TextDetections": [{
+                    "DetectedText": text,
+                    "Confidence": 95,
+                    "Polygon": [{"X": 0, "Y": 0}, {"X": 100, "Y": 0}, {"X": 100, "Y": 20}, {"X": 0, "Y": 20}],
+                    "AdvancedInfo": "{}"
+                }],
+                "Language": "zh",
+                "Angel": 0
+            })
+
+        return api_error("InvalidAction", f"模拟服务不支持 {action}")
+
+    def cos_error(status_code: int, code: str) -> Response:
+        body = f"<?xml version='1.0' encoding='utf-8' ?><Error><Code>{code}</Code><Message>{code}</Message></Error>"
+        return Response(body, status_code=status_code, media_type="application/xml")
+
+    @app.get("/")
+    async def list_objects(prefix: str = "", max_keys: int = 1000):
+        if await state.delay("cos", "ListObjects"):
+            return cos_error(503, "ServiceUnavailable")
+        keys = [key for key in sorted(state.objects) if key.startswith(prefix)][:max_keys]
+        contents = "".join(
+            f"<Contents><Key>{escape(key)}</Key><LastModified>{state.objects[key][2].isoformat()}Z</LastModified>"
+            f"<ETag>\"{hashlib.md5(state.objects[key][0]).hexdigest()}\"</ETag><Size>{len(state.objects[key][0])}</Size></Contents>"
+            for key in keys
+        )
+        body = (
+            "<?xml version='1.0' encoding='utf-8' ?><ListBucketResult><Name>stub</Name>"
+            f"<Prefix>{escape(prefix)}</Prefix><MaxKeys>{max_keys}</MaxKeys><IsTruncated>false</IsTruncated>"
+            f"{contents}</ListBucketResult>"
+        )
+        return Response(body, media_type="application/xml")
+
+    @app.put("/{key:path}")
+    async def put_object(key: str, request: Request):
+        data = await request.body()
+        if await state.delay("cos", "PutObject"):
+            return cos_error(503, "ServiceUnavailable")
+        state.objects[key] = (data, request.headers.get("Content-Type", "application/octet-stream"), datetime.utcnow())
+        return Response(status_code=200, headers={"ETag": f"\"{hashlib.md5(data).hexdigest()}\""})
+
+    @app.get("/{key:path}")
+    async def get_object(key: str):
+        if await state.delay("cos", "GetObject"):
+            return cos_error(503, "ServiceUnavailable")
+        if key not in state.objects:
+            return cos_error(404, "NoSuchKey")
+        data, content_type, _ = state.objects[key]
+        return Response(data, media_type=content_type, headers={"ETag": f"\"{hashlib.md5(data).hexdigest()}\""})
+
+    @app.head("/{key:path}")
+    async def head_object(key: str):
+        if await state.delay("cos", "HeadObject"):
+            return Response(status_code=503)
+        if key not in state.objects:
+            return Response(status_code=404)
+        data, content_type, _ = state.objects[key]
+        return Response(headers={
+            "Content-Length": str(len(data)),
+            "Content-Type": content_type,
+            "ETag": f"\"{hashlib.md5(data).hexdigest()}\""
+        })
+
+    @app.delete("/{key:path}")
+    async def delete_object(key: str):
+        if await state.delay("cos", "DeleteObject"):
+            return cos_error(503, "ServiceUnavailable")
+        state.objects.pop(key, None)
+        return Response(status_code=204)
+
+    return app
+
+
+def parse_latency(value: str) -> Tuple[float, float]:
+    """'中位数:P99'（毫秒），只写一个数时为固定延迟"""
+    median, _, p99 = value.partition(":")
+    return float(median), float(p99 or median)
+
+
+def main():
+    """主函数"""
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="本地模拟腾讯云服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    for name, latency in (("asr", "400:1500"), ("ocr", "300:1200"), ("cos", "30:200")):
+        parser.add_argument(f"--{name}-latency", default=latency, help=f"{name} 延迟 中位数:P99（毫秒）")
+        parser.add_argument(f"--{name}-error-rate", type=float, default=0.0, help=f"{name} 错误率")
+    parser.add_argument("--echo", action="store_true", help="识别结果返回请求数据的字节数和摘要")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子，便于复现")
+    args = parser.parse_args()
+
+    profiles = {}
+    for name in ("asr", "ocr", "cos"):
+        median, p99 = parse_latency(getattr(args, f"{name}_latency"))
+        profiles[name] = ServiceProfile(median, p99, getattr(args, f"{name}_error_rate"))
+    state = StubState(profiles, echo=args.echo, seed=args.seed)
+
+    logger.info(f"🚀 启动腾讯云模拟服务: http://{args.host}:{args.port}")
+    logger.info(f"🔧 配置: {state.config()}")
+    uvicorn.run(build_app(state), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
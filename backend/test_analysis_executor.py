@@ -0,0 +1,63 @@
+"""
+测试过程记录分析执行器
+Test process pool analysis executor
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import asyncio
+
+from app.services.analysis_executor import AnalysisExecutor
+from app.utils.process_analyzer import process_analyzer
+
+CONTENTS = [
+    "今天终于第一次跑步5公里，状态很好",
+    "这道题非常难，压力很大",
+    "总结了本周的学习方法，很有收获",
+    "项目遇到了问题，有点沮丧",
+] * 5
+
+
+def test_batch_in_process_pool():
+    """测试大批量分发到进程池，结果顺序与输入一致"""
+    print("\n🧪 测试进程池批量分析")
+    executor = AnalysisExecutor(enabled=True, workers=2, batch_min_size=4)
+    try:
+        results = executor.analyze_batch(CONTENTS)
+    finally:
+        executor.shutdown()
+
+    expected = process_analyzer.analyze_batch(CONTENTS)
+    assert len(results) == len(CONTENTS)
+    assert [r['record_type'] for r in results] == [r['record_type'] for r in expected]
+    assert [r['sentiment'] for r in results] == [r['sentiment'] for r in expected]
+    print(f"✅ 批量分析 {len(results)} 条，顺序正确")
+
+
+def test_single_content_offload():
+    """测试单条长文本提交到进程池、短文本和关闭开关时直接分析"""
+    print("\n🧪 测试单条内容分析")
+    executor = AnalysisExecutor(enabled=True, workers=1, offload_min_chars=100)
+    long_content = "今天跑步很顺利，" * 50
+    try:
+        result = asyncio.run(executor.analyze_content(long_content))
+        assert executor._pool is not None
+    finally:
+        executor.shutdown()
+    assert result == process_analyzer.analyze_content(long_content)
+
+    executor = AnalysisExecutor(enabled=True, workers=1, offload_min_chars=100)
+    asyncio.run(executor.analyze_content("今天跑步很顺利"))
+    assert executor._pool is None
+
+    disabled = AnalysisExecutor(enabled=False, batch_min_size=1)
+    assert len(disabled.analyze_batch(CONTENTS)) == len(CONTENTS)
+    assert disabled._pool is None
+    print("✅ 长文本进入进程池，短文本和关闭开关时在当前线程分析")
+
+
+if __name__ == "__main__":
+    test_batch_in_process_pool()
+    test_single_content_offload()
+    print("\n🎉 分析执行器测试通过！")
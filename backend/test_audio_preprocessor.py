@@ -0,0 +1,105 @@
+"""
+测试语音识别前的音频预处理
+Test audio normalization before ASR
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import asyncio
+import io
+import math
+import struct
+import tempfile
+import wave
+
+from app.services.audio_preprocessor import AudioPreprocessor, AudioPreprocessError, sniff_audio_format
+
+
+def build_wav(seconds_silence: float, seconds_tone: float, rate: int = 44100, channels: int = 2) -> bytes:
+    """前后各一段静音、中间一段 440Hz 正弦波的 wav"""
+    frames = []
+    silence = int(seconds_silence * rate)
+    tone = int(seconds_tone * rate)
+    for i in range(silence * 2 + tone):
+        value = int(12000 * math.sin(2 * math.pi * 440 * i / rate)) if silence <= i < silence + tone else 0
+        frames.append(struct.pack("<" + "h" * channels, *([value] * channels)))
+    output = io.BytesIO()
+    with wave.open(output, "wb") as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(b"".join(frames))
+    return output.getvalue()
+
+
+def test_sniff_audio_format():
+    """测试按文件头识别格式"""
+    print("\n🧪 测试音频格式识别")
+    assert sniff_audio_format(build_wav(0, 0.01)[:64]) == "wav"
+    assert sniff_audio_format(b"ID3\x04\x00") == "mp3"
+    assert sniff_audio_format(b"\xff\xfb\x90\x00") == "mp3"
+    assert sniff_audio_format(b"\xff\xf1\x50\x80") == "aac"
+    assert sniff_audio_format(b"\x00\x00\x00\x20ftypM4A ") == "m4a"
+    assert sniff_audio_format(b"#!AMR\n") == "amr"
+    assert sniff_audio_format(b"#!SILK_V3") == "silk"
+    assert sniff_audio_format(b"<html>") is None
+    print("✅ 格式识别正确")
+
+
+def test_normalize_and_reject():
+    """测试归一化为16kHz单声道并裁掉静音，无法识别和全程静音的音频在本地拒绝"""
+    print("\n🧪 测试音频归一化")
+    preprocessor = AudioPreprocessor(workers=1, timeout=60)
+    if not preprocessor.enabled:
+        print("⚠️ 未安装 pydub/librosa，跳过")
+        return
+
+    original = build_wav(seconds_silence=1.0, seconds_tone=1.0)
+    temp_files = set(os.listdir(tempfile.gettempdir()))
+
+    async def scenario():
+        # 内存中的上传按块复制到临时文件；已在磁盘上的文件由子进程直接打开
+        spooled = tempfile.SpooledTemporaryFile(max_size=1024)
+        named = tempfile.NamedTemporaryFile(prefix="upload-")
+        for upload in (spooled, named):
+            upload.write(original)
+        for audio in (io.BytesIO(original), spooled, named):
+            normalized, voice_format = await preprocessor.prepare(audio)
+            # 归一化结果以文件对象返回，不整体读入内存
+            assert not isinstance(normalized, bytes)
+            data = normalized.read()
+            normalized.close()
+            if voice_format == "wav":
+                with wave.open(io.BytesIO(data)) as f:
+                    assert (f.getnchannels(), f.getframerate(), f.getsampwidth()) == (1, 16000, 2)
+                    # 首尾各1秒静音被裁掉
+                    assert 0.9 < f.getnframes() / 16000 < 1.2
+            assert len(data) < len(original) / 5
+            audio.close()
+
+        for audio, message in ((b"<html></html>", "不支持"), (build_wav(0.5, 0), "没有检测到声音")):
+            try:
+                await preprocessor.prepare(audio)
+                assert False, "应该拒绝"
+            except AudioPreprocessError as e:
+                assert message in str(e)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        preprocessor.shutdown()
+
+    # 输入和输出的临时文件都已删除
+    assert not {name for name in set(os.listdir(tempfile.gettempdir())) - temp_files if name.startswith("asr-")}
+
+    stats = preprocessor.stats()
+    assert (stats['normalized'], stats['rejected']) == (3, 2)
+    assert stats['bytes_in'] == 3 * len(original)
+    print(f"✅ {stats['bytes_in']}字节 -> {stats['bytes_out']}字节")
+
+
+if __name__ == "__main__":
+    test_sniff_audio_format()
+    test_normalize_and_reject()
+    print("\n🎉 音频预处理测试通过！")
@@ -0,0 +1,108 @@
+"""
+测试音频上传接收
+Test streaming audio upload handling
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import asyncio
+import base64
+import io
+
+from fastapi import HTTPException, Request
+
+from app.services.audio_upload import receive_audio_upload
+from app.services.voice_recognition import encode_audio_base64, audio_size
+
+BOUNDARY = "----targetmanage"
+CHUNK = 16 * 1024
+
+
+def build_body(audio: bytes, filename: str = "voice.mp3") -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="audio"; filename="{filename}"\r\n'
+        f"Content-Type: audio/mpeg\r\n\r\n"
+    ).encode() + audio + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def build_request(body: bytes, content_length: bool = True):
+    """按 CHUNK 大小分块发送请求体，返回请求对象和已发送块数"""
+    sent = {"chunks": 0}
+    chunks = [body[i:i + CHUNK] for i in range(0, len(body), CHUNK)]
+
+    async def receive():
+        index = sent["chunks"]
+        sent["chunks"] += 1
+        return {"type": "http.request", "body": chunks[index], "more_body": index + 1 < len(chunks)}
+
+    headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    if content_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+    scope = {"type": "http", "method": "POST", "path": "/", "headers": headers, "query_string": b""}
+    return Request(scope, receive), sent, len(chunks)
+
+
+def test_receive_within_limit():
+    """测试限制内的音频保存到临时文件"""
+    print("\n🧪 测试接收音频")
+    audio_bytes = os.urandom(200 * 1024)
+    request, _, _ = build_request(build_body(audio_bytes))
+
+    async def scenario():
+        audio = await receive_audio_upload(request, 1024 * 1024, "too large")
+        try:
+            assert audio.filename == "voice.mp3"
+            assert audio.size == len(audio_bytes)
+            assert audio_size(audio.file) == len(audio_bytes)
+            assert audio.file.read() == audio_bytes
+        finally:
+            await audio.close()
+
+    asyncio.run(scenario())
+    print("✅ 接收完整")
+
+
+def test_reject_as_soon_as_limit_crossed():
+    """测试超过大小限制时立即中止，不再读取剩余请求体"""
+    print("\n🧪 测试超限提前拒绝")
+    request, sent, total = build_request(build_body(os.urandom(2 * 1024 * 1024)), content_length=False)
+
+    async def scenario():
+        try:
+            await receive_audio_upload(request, 256 * 1024, "音频文件过大")
+            assert False, "应该拒绝"
+        except HTTPException as e:
+            assert e.status_code == 400 and e.detail == "音频文件过大"
+
+    asyncio.run(scenario())
+    assert sent["chunks"] <= 256 * 1024 // CHUNK + 2 < total
+    print(f"✅ 读取 {sent['chunks']}/{total} 块后拒绝")
+
+    # 声明的长度超限时一块都不读取
+    request, sent, _ = build_request(build_body(os.urandom(2 * 1024 * 1024)))
+    try:
+        asyncio.run(receive_audio_upload(request, 256 * 1024, "音频文件过大"))
+        assert False, "应该拒绝"
+    except HTTPException:
+        pass
+    assert sent["chunks"] == 0
+
+
+def test_chunked_base64():
+    """测试分段编码与一次性编码结果一致"""
+    print("\n🧪 测试分段base64编码")
+    for size in (0, 1, 2, 3, 3 * 64 * 1024, 3 * 64 * 1024 + 1, 1000001):
+        data = os.urandom(size)
+        encoded, length = encode_audio_base64(io.BytesIO(data))
+        assert encoded == base64.b64encode(data).decode("ascii") and length == size
+        assert encode_audio_base64(data) == (encoded, size)
+    print("✅ 编码结果一致")
+
+
+if __name__ == "__main__":
+    test_receive_within_limit()
+    test_reject_as_soon_as_limit_crossed()
+    test_chunked_base64()
+    print("\n🎉 音频上传测试通过！")
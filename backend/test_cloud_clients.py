@@ -0,0 +1,137 @@
+"""
+测试腾讯云客户端注册表
+Test lazy Tencent Cloud client registry
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.config.settings import settings
+from app.config.tencent_cloud import TencentCloudConfig, PooledConnection
+
+
+def test_import_does_not_build_clients():
+    """测试导入应用时不创建任何SDK客户端"""
+    print("\n🧪 测试导入时不创建客户端")
+    code = (
+        "import sys, app.main\n"
+        "from app.config.tencent_cloud import tencent_cloud\n"
+        "assert not any(item['created'] or item['build_ms'] is not None for item in tencent_cloud.stats())\n"
+        "assert 'tencentcloud.ocr.v20181119.ocr_client' not in sys.modules\n"
+        "assert 'tencentcloud.asr.v20190614.asr_client' not in sys.modules\n"
+    )
+    env = dict(os.environ, TENCENT_SECRET_ID="test-id", TENCENT_SECRET_KEY="test-key")
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    print("✅ 导入 app.main 不加载SDK客户端")
+
+
+def test_lazy_clients_and_endpoints():
+    """测试客户端按需创建、复用，并使用各自的接入点"""
+    print("\n🧪 测试按需创建客户端")
+    original = (settings.TENCENT_SECRET_ID, settings.TENCENT_SECRET_KEY)
+    settings.TENCENT_SECRET_ID, settings.TENCENT_SECRET_KEY = "test-id", "test-key"
+    try:
+        registry = TencentCloudConfig()
+        asr = registry.get_asr_client()
+        ocr = registry.get_ocr_client()
+        assert asr.profile.httpProfile.endpoint == "asr.tencentcloudapi.com"
+        assert ocr.profile.httpProfile.endpoint == "ocr.tencentcloudapi.com"
+        assert asr.profile.httpProfile.reqTimeout == settings.ASR_TIMEOUT_SECONDS
+        assert isinstance(asr.request.conn, PooledConnection)
+        assert registry.get_asr_client() is asr
+    finally:
+        settings.TENCENT_SECRET_ID, settings.TENCENT_SECRET_KEY = original
+
+    stats = {item["name"]: item for item in registry.stats()}
+    assert stats["asr"]["created"] and stats["asr"]["build_ms"] is not None
+    assert not stats["cos"]["created"] and stats["cos"]["build_ms"] is None
+    print(f"✅ 创建耗时: asr={stats['asr']['build_ms']}ms, ocr={stats['ocr']['build_ms']}ms")
+
+
+def test_missing_credentials():
+    """测试未配置凭证时返回 None，退避期内不重复尝试，之后重试并在配置恢复后创建成功"""
+    print("\n🧪 测试未配置凭证")
+    original = (settings.TENCENT_SECRET_ID, settings.TENCENT_SECRET_KEY)
+    settings.TENCENT_SECRET_ID, settings.TENCENT_SECRET_KEY = "", ""
+    try:
+        registry = TencentCloudConfig(retry_initial=0.2)
+        assert registry.get_ocr_client() is None
+        first = registry.stats()[0]
+        assert first["error"] and first["build_ms"] is not None
+        assert registry.get_ocr_client() is None
+        assert registry.stats()[0]["build_ms"] == first["build_ms"]
+        print("✅ 缺少凭证时服务降级为不可用")
+
+        # 退避期结束后再次尝试，失败次数越多间隔越长
+        time.sleep(0.25)
+        assert registry.get_ocr_client() is None
+        assert registry._retry_at["ocr"] - time.monotonic() > 0.3
+
+        # 凭证恢复后，退避期结束即可创建成功，不需要重启进程
+        settings.TENCENT_SECRET_ID, settings.TENCENT_SECRET_KEY = "test-id", "test-key"
+        registry._retry_at["ocr"] = 0
+        assert registry.get_ocr_client() is not None
+        assert registry.stats()[0]["created"] and registry.stats()[0]["error"] is None
+    finally:
+        settings.TENCENT_SECRET_ID, settings.TENCENT_SECRET_KEY = original
+    print("✅ 退避后重试创建客户端")
+
+
+def test_pooled_connection_reuses_sockets():
+    """测试SDK请求复用同一个HTTP连接"""
+    print("\n🧪 测试连接复用")
+    peers = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            peers.append(self.client_address)
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            body = b'{"Response": {}}'
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    class SdkConnection:
+        request_host = "127.0.0.1"
+        proxy = None
+        certification = None
+        timeout = 5
+
+    try:
+        conn = PooledConnection(SdkConnection(), pool_size=2)
+        url = f"http://127.0.0.1:{server.server_address[1]}/"
+        for _ in range(5):
+            resp = conn.request("POST", url, body=b"{}", headers={})
+            assert resp.content == b'{"Response": {}}'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert len(peers) == 5 and len(set(peers)) == 1
+    print("✅ 5次请求共用1个连接")
+
+
+if __name__ == "__main__":
+    test_import_does_not_build_clients()
+    test_lazy_clients_and_endpoints()
+    test_missing_credentials()
+    test_pooled_connection_reuses_sockets()
+    print("\n🎉 客户端注册表测试通过！")
@@ -0,0 +1,343 @@
+"""
+测试云服务调用执行器
+Test bounded executor for blocking cloud SDK calls
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import asyncio
+import base64
+import io
+import threading
+import time
+
+from app.services.cloud_executor import CloudServiceLimiter, CloudServiceBusy, CloudCallTimeout, CircuitOpen, CircuitBreaker
+from app.services.voice_recognition import VoiceRecognitionService
+from app.services.recognition_cache import RecognitionCache
+
+
+def test_busy_rejection():
+    """测试并发已满时立即拒绝，不排队等待"""
+    print("\n🧪 测试并发满时快速拒绝")
+    limiter = CloudServiceLimiter("test", max_concurrency=1, timeout=5)
+    release = threading.Event()
+
+    async def scenario():
+        first = asyncio.ensure_future(limiter.call(release.wait))
+        await asyncio.sleep(0.05)
+        assert limiter.stats()['in_flight'] == 1
+
+        start = time.perf_counter()
+        try:
+            await limiter.call(lambda: "second")
+            assert False, "应该返回繁忙"
+        except CloudServiceBusy:
+            pass
+        assert time.perf_counter() - start < 0.1
+
+        release.set()
+        assert await first is True
+        assert await limiter.call(lambda: "third") == "third"
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        limiter.shutdown()
+
+    stats = limiter.stats()
+    assert (stats['completed'], stats['rejected'], stats['in_flight']) == (2, 1, 0)
+    print(f"✅ 统计: {stats}")
+
+
+def test_timeout_keeps_slot_until_finished():
+    """测试超时立即返回，但名额在线程结束后才释放"""
+    print("\n🧪 测试调用截止时间")
+    limiter = CloudServiceLimiter("test", max_concurrency=1, timeout=0.05)
+    release = threading.Event()
+
+    async def scenario():
+        try:
+            await limiter.call(release.wait)
+            assert False, "应该超时"
+        except CloudCallTimeout:
+            pass
+
+        # 超时的调用仍在执行，占用名额
+        assert limiter.stats()['running'] == 1
+        try:
+            await limiter.call(lambda: None)
+            assert False, "应该返回繁忙"
+        except CloudServiceBusy:
+            pass
+
+        release.set()
+        await asyncio.sleep(0.05)
+        assert limiter.stats()['in_flight'] == 0
+        assert await limiter.call(lambda: "ok", timeout=1) == "ok"
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        limiter.shutdown()
+
+    stats = limiter.stats()
+    assert (stats['timeouts'], stats['rejected'], stats['completed']) == (1, 1, 2)
+    print("✅ 超时不会让后台调用越积越多")
+
+
+def test_queue_and_failures():
+    """测试排队名额和失败统计"""
+    print("\n🧪 测试排队与失败统计")
+    limiter = CloudServiceLimiter("test", max_concurrency=1, timeout=5, max_queue=1)
+    release = threading.Event()
+
+    def fail():
+        raise ValueError("boom")
+
+    async def scenario():
+        first = asyncio.ensure_future(limiter.call(release.wait))
+        second = asyncio.ensure_future(limiter.call(lambda: "queued"))
+        await asyncio.sleep(0.05)
+        stats = limiter.stats()
+        assert (stats['running'], stats['queued']) == (1, 1)
+
+        release.set()
+        assert await second == "queued"
+        await first
+        try:
+            await limiter.call(fail)
+            assert False, "应该抛出原始异常"
+        except ValueError:
+            pass
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        limiter.shutdown()
+    assert limiter.stats()['failed'] == 1
+    print("✅ 排队调用按顺序执行，异常原样抛出")
+
+
+def test_voice_recognition_busy():
+    """测试语音识别繁忙时返回 busy 标记，事件循环不被阻塞"""
+    print("\n🧪 测试语音识别繁忙")
+    release = threading.Event()
+
+    class SlowResponse:
+        Result = "今天跑步5公里"
+
+    class SlowClient:
+        def SentenceRecognition(self, req):
+            release.wait()
+            return SlowResponse()
+
+    service = VoiceRecognitionService()
+    service.client = SlowClient()
+    service.limiter = CloudServiceLimiter("asr-test", max_concurrency=1, timeout=5)
+    service.cache = RecognitionCache("asr-test", persistent=False)
+
+    async def scenario():
+        # silk 录音不做归一化，直接进入识别
+        audio = b"#!SILK_V3" + b"\x00" * 64
+        first = asyncio.ensure_future(service.recognize_voice(audio))
+        # 事件循环仍能处理其他任务；相同录音会等待同一次识别，这里换一段录音
+        await asyncio.sleep(0.05)
+        busy = await service.recognize_voice(b"#!SILK_V3" + b"\x01" * 64)
+        assert busy['success'] is False and busy['busy'] is True
+
+        release.set()
+        result = await first
+        assert result['success'] and result['text'] == "今天跑步5公里"
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        service.limiter.shutdown()
+    print("✅ 繁忙时快速返回")
+
+
+def test_circuit_breaker():
+    """测试连续失败后熔断、快速失败，熔断期结束后探测恢复"""
+    print("\n🧪 测试熔断")
+    limiter = CloudServiceLimiter("test", max_concurrency=2, timeout=5, failure_threshold=3, open_seconds=0.2)
+    calls = []
+
+    class ServerError(Exception):
+        code = "InternalError"
+
+    class BadRequest(Exception):
+        code = "InvalidParameter"
+
+    def fail(error):
+        calls.append(error)
+        raise error()
+
+    async def scenario():
+        # 参数错误由请求本身导致，不计入熔断
+        for _ in range(5):
+            try:
+                await limiter.call(fail, BadRequest)
+            except BadRequest:
+                pass
+        assert limiter.breaker.state == CircuitBreaker.CLOSED
+
+        for _ in range(3):
+            try:
+                await limiter.call(fail, ServerError)
+            except ServerError:
+                pass
+        assert limiter.breaker.state == CircuitBreaker.OPEN
+
+        # 熔断中不再调用云端，按繁忙处理并给出重试时间
+        try:
+            await limiter.call(fail, ServerError)
+            assert False, "应该熔断"
+        except CloudServiceBusy as e:
+            assert isinstance(e, CircuitOpen) and e.retry_after >= 1
+        assert len(calls) == 8
+
+        await asyncio.sleep(0.25)
+        assert limiter.breaker.state == CircuitBreaker.HALF_OPEN
+        # 探测调用的等待被取消后释放探测名额，下一次调用可以继续探测
+        probe = asyncio.ensure_future(limiter.call(time.sleep, 0.1))
+        await asyncio.sleep(0.02)
+        probe.cancel()
+        try:
+            await probe
+        except asyncio.CancelledError:
+            pass
+        assert limiter.breaker.state == CircuitBreaker.HALF_OPEN
+        assert await limiter.call(lambda: "ok") == "ok"
+        assert limiter.breaker.state == CircuitBreaker.CLOSED
+
+        # 调用方代码的普通异常不计入熔断，网络错误计入
+        for _ in range(5):
+            try:
+                await limiter.call(fail, ValueError)
+            except ValueError:
+                pass
+        assert limiter.breaker.consecutive_failures == 0
+        try:
+            await limiter.call(fail, ConnectionError)
+        except ConnectionError:
+            pass
+        assert limiter.breaker.consecutive_failures == 1
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        limiter.shutdown()
+
+    breaker = limiter.stats()["breaker"]
+    assert (breaker["opened"], breaker["short_circuited"]) == (1, 1)
+    print(f"✅ 熔断统计: {breaker}")
+
+
+def test_adaptive_timeout_and_hedge():
+    """测试截止时间随P99延迟收紧，幂等调用的慢请求被对冲"""
+    print("\n🧪 测试自适应截止时间与对冲")
+    limiter = CloudServiceLimiter(
+        "test", max_concurrency=2, timeout=5, min_timeout=0.05, timeout_multiplier=3, hedge=True
+    )
+    release = threading.Event()
+    attempts = []
+
+    def sometimes_slow():
+        attempts.append(1)
+        # 第一次调用卡住，对冲的第二次调用立即返回
+        if len(attempts) == 1:
+            release.wait()
+            return "slow"
+        return "fast"
+
+    async def scenario():
+        assert limiter.current_timeout() == 5
+        for _ in range(30):
+            await limiter.call(time.sleep, 0.01)
+        assert 0.05 <= limiter.current_timeout() < 0.5
+
+        start = time.perf_counter()
+        assert await limiter.call(sometimes_slow, idempotent=True) == "fast"
+        assert time.perf_counter() - start < 0.3
+        release.set()
+
+        # 非幂等调用不对冲
+        attempts.clear()
+        release.clear()
+        waiting = asyncio.ensure_future(limiter.call(sometimes_slow, timeout=1))
+        await asyncio.sleep(0.1)
+        assert len(attempts) == 1
+        release.set()
+        assert await waiting == "slow"
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        limiter.shutdown()
+
+    stats = limiter.stats()
+    assert (stats["hedged"], stats["hedge_wins"]) == (1, 1)
+    print(f"✅ 当前截止时间: {stats['current_timeout']}秒, P99: {stats['p99_latency_ms']}ms")
+
+
+def test_voice_recognition_hedge_with_file():
+    """测试上传的临时文件在对冲时只编码一次，两次请求发送的数据完整且相同"""
+    print("\n🧪 测试语音识别对冲")
+    audio = b"#!SILK_V3" + os.urandom(1024 * 1024)
+    release = threading.Event()
+    sent = []
+
+    class Response:
+        Result = "今天跑步5公里"
+
+    class SlowFirstClient:
+        def SentenceRecognition(self, req):
+            sent.append(req.Data)
+            # 第一次请求卡住，对冲的第二次请求立即返回
+            if len(sent) == 1:
+                release.wait()
+            return Response()
+
+    service = VoiceRecognitionService()
+    service.client = SlowFirstClient()
+    service.limiter = CloudServiceLimiter("asr-hedge-test", max_concurrency=2, timeout=5, min_timeout=0.05, hedge=True)
+    service.cache = RecognitionCache("asr-hedge-test", persistent=False)
+
+    class SlowUpload(io.BytesIO):
+        """每次读取都慢一些，对冲请求发出时第一次请求可能仍在读取"""
+
+        def read(self, size=-1):
+            time.sleep(0.02)
+            return super().read(size)
+
+    upload = SlowUpload(audio)
+
+    async def scenario():
+        for _ in range(30):
+            await service.limiter.call(time.sleep, 0.01)
+        result = await service.recognize_voice(upload, "silk")
+        release.set()
+        assert result['success'] and result['text'] == "今天跑步5公里"
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        service.limiter.shutdown()
+        upload.close()
+
+    assert len(sent) == 2 and sent[0] == sent[1] and base64.b64decode(sent[0]) == audio
+    print("✅ 对冲请求发送相同的完整数据")
+
+
+if __name__ == "__main__":
+    test_busy_rejection()
+    test_timeout_keeps_slot_until_finished()
+    test_queue_and_failures()
+    test_voice_recognition_busy()
+    test_circuit_breaker()
+    test_adaptive_timeout_and_hedge()
+    test_voice_recognition_hedge_with_file()
+    print("\n🎉 云服务调用执行器测试通过！")
@@ -0,0 +1,141 @@
+"""
+测试目标匹配索引
+Test the precompiled per-user goal matching index
+"""
+import sys
+import os
+import random
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.goal_match_index import GoalMatchIndexCache, match_terms, np
+from app.services.goal_matcher import GoalMatcher
+
+
+class MockGoal:
+    """模拟目标对象"""
+    def __init__(self, id, title, category, description="", unit=""):
+        self.id = id
+        self.title = title
+        self.category = category
+        self.description = description
+        self.unit = unit
+
+
+def test_match_terms():
+    """测试中文按二元组、英文按整词切分"""
+    print("\n🧪 测试匹配词切分")
+    assert match_terms("Python学习") == {"python", "学习"}
+    assert match_terms("每周读一本书") == {"每周", "周读", "读一", "一本", "本书"}
+    assert match_terms("跑 5 km") == {"km"}
+    assert match_terms(None) == set()
+    print("✅ 切分正确")
+
+
+def test_rank_top_k():
+    """测试一次打分返回按分数排序的候选目标"""
+    print("\n🧪 测试候选目标排序")
+    matcher = GoalMatcher()
+    goals = [
+        MockGoal("1", "英语学习", "学习", "每天背单词"),
+        MockGoal("2", "马拉松训练", "健身", "每周跑步三次", "公里"),
+        MockGoal("3", "整理房间", "生活"),
+        MockGoal("4", "健身计划", "健身"),
+    ]
+
+    ranked = matcher.rank_goals("今天跑步10km，为马拉松做准备", goals, top_k=2)
+    assert [c['matched_goal'].id for c in ranked] == ["2", "4"]
+    assert ranked[0]['score'] > ranked[1]['score']
+    assert "标题词×2" in ranked[0]['reason']
+
+    # 单位变体：目标单位是公里，内容里写的是 km
+    assert "单位'km'" in ranked[0]['reason'] and "单位" not in ranked[1]['reason']
+
+    # 中文标题不需要在内容中原样出现
+    assert matcher.match_goal("背了50个英语单词", goals)['matched_goal'].id == "1"
+    assert matcher.rank_goals("天气不错", goals) == []
+
+    # 推荐接口的 top_k 来自请求体，转换并限制范围后才传给 rank_goals
+    from app.api.process_records import _suggest_top_k
+    assert [_suggest_top_k(v) for v in (2, "5", 0, -3, 1000, 10 ** 9, "abc", None, 1e400)] == \
+        [2, 5, 1, 1, 10, 10, 3, 3, 3]
+    print(f"✅ 前两名: {[(c['matched_goal'].title, round(c['score'], 2)) for c in ranked]}")
+
+
+def test_index_cache():
+    """测试按用户缓存索引，目标变化、显式失效或词典切换后重建"""
+    print("\n🧪 测试匹配索引缓存")
+    matcher = GoalMatcher()
+    cache = GoalMatchIndexCache(max_users=2)
+    dictionaries = matcher._dictionaries
+    goals = [MockGoal("1", "英语学习", "学习"), MockGoal("2", "健身计划", "健身")]
+
+    index = cache.get_or_build("u1", goals, dictionaries)
+    assert cache.get_or_build("u1", list(reversed(goals)), dictionaries) is index
+
+    goals[0].title = "日语学习"
+    rebuilt = cache.get_or_build("u1", goals, dictionaries)
+    assert rebuilt is not index
+    assert cache.get_or_build("u1", goals, dictionaries) is rebuilt
+
+    cache.invalidate("u1")
+    assert cache.get_or_build("u1", goals, dictionaries) is not rebuilt
+
+    reloaded = (dictionaries[0] + 1, dictionaries[1], dictionaries[2])
+    assert cache.get_or_build("u1", goals, reloaded) is not cache.get_or_build("u1", goals, dictionaries)
+
+    # LRU 淘汰最久未使用的用户
+    first = cache.get_or_build("u2", goals, dictionaries)
+    cache.get_or_build("u3", goals, dictionaries)
+    cache.get_or_build("u1", goals, dictionaries)
+    assert cache.get_or_build("u2", goals, dictionaries) is not first
+    print("✅ 索引缓存按目标和词典失效")
+
+
+def test_vectorized_parity():
+    """测试向量化打分与逐目标打分的结果完全一致"""
+    print("\n🧪 测试向量化打分一致性")
+    if np is None:
+        print("⚠️ 未安装 NumPy，跳过")
+        return
+
+    scalar = GoalMatcher(vectorized_min_goals=0)
+    vectorized = GoalMatcher(vectorized_min_goals=1)
+    categories = scalar.keyword_categories
+    vocabulary = sorted({word for tiers in categories.values() for words in tiers.values() for word in words})
+    units = list(scalar.unit_variants) + ["km", "个", ""]
+    rng = random.Random(7)
+
+    goals = [
+        MockGoal(
+            str(i),
+            "".join(rng.sample(vocabulary, 2)) + rng.choice(["计划", "目标", ""]),
+            rng.choice(list(categories) + ["其他", None]),
+            "".join(rng.sample(vocabulary, rng.randint(0, 4))),
+            rng.choice(units)
+        )
+        for i in range(300)
+    ]
+
+    for _ in range(50):
+        content = "今天" + "，".join(rng.sample(vocabulary, rng.randint(1, 6))) + f"{rng.randint(1, 50)}公里"
+        expected = scalar.rank_goals(content, goals, top_k=len(goals))
+        actual = vectorized.rank_goals(content, goals, top_k=len(goals))
+        assert [(c['matched_goal'].id, c['score'], c['reason']) for c in actual] == \
+            [(c['matched_goal'].id, c['score'], c['reason']) for c in expected], content
+
+    # 历史记录加成向量
+    index = scalar.get_index(goals)
+    position = {goal.id: i for i, goal in enumerate(goals)}
+    history_counts = {str(rng.randrange(len(goals))): rng.randint(1, 20) for _ in range(30)}
+    content = "今天跑步10公里，读完一本书"
+    assert vectorized._rank_vectorized(index, content, history_counts, position, 20) == \
+        scalar._rank_scalar(index, content, history_counts, position, 20)
+    print("✅ 300 个目标的排名、分数和原因完全一致")
+
+
+if __name__ == "__main__":
+    test_match_terms()
+    test_rank_top_k()
+    test_index_cache()
+    test_vectorized_parity()
+    print("\n🎉 目标匹配索引测试通过！")
@@ -6,6 +6,13 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.models.base import Base
+from app.models.process_record import ProcessRecord
 from app.services.goal_matcher import goal_matcher
 
 
@@ -192,6 +199,44 @@ def test_edge_cases():
     return True
 
 
+def test_history_single_query():
+    """测试历史记录加成只查询一次数据库"""
+    print("\n" + "="*60)
+    print("🧪 测试5: 历史记录加成查询次数")
+    print("="*60)
+    
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=[ProcessRecord.__table__])
+    db = sessionmaker(bind=engine)()
+    
+    goals = [MockGoal(str(i), f"目标{i}", "学习") for i in range(40)]
+    old = datetime.utcnow() - timedelta(days=60)
+    for goal_id, count in (("3", 4), ("7", 20), ("9", 1)):
+        for _ in range(count):
+            db.add(ProcessRecord(content="学习", user_id="u1", goal_id=goal_id))
+    db.add(ProcessRecord(content="学习", user_id="u1", goal_id="9", created_at=old))
+    db.add(ProcessRecord(content="学习", user_id="u2", goal_id="3"))
+    db.commit()
+    
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    
+    counts = goal_matcher._load_history_counts("u1", goals, db)
+    assert counts == {"3": 4, "7": 20, "9": 1}
+    assert len(statements) == 1
+    
+    statements.clear()
+    result = goal_matcher.match_goal("今天学习了两个小时", goals, user_id="u1", db=db)
+    assert len(statements) == 1, f"{len(goals)} 个目标执行了 {len(statements)} 条查询"
+    
+    # 记录最多的目标得到最高的历史加成（上限0.5分）
+    assert result['matched_goal'].id == "7"
+    assert "历史记录×20" in result['reason']
+    print(f"✅ {len(goals)} 个候选目标只执行 {len(statements)} 条查询")
+    
+    return True
+
+
 def run_all_tests():
     """运行所有测试"""
     print("\n" + "🚀"*30)
@@ -205,6 +250,7 @@ def run_all_tests():
     results.append(("类别匹配", test_category_matching()))
     results.append(("单位匹配", test_unit_matching()))
     results.append(("边界情况", test_edge_cases()))
+    results.append(("历史查询", test_history_single_query()))
     
     # 汇总结果
     print("\n" + "="*60)
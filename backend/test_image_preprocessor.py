@@ -0,0 +1,130 @@
+"""
+测试拍照识别前的图片预处理
+Test image downscale and recompression before OCR
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import asyncio
+import io
+
+from app.services.image_preprocessor import (
+    ImagePreprocessor, ImagePreprocessError, sniff_image_format, _preprocess_worker
+)
+
+
+def build_photo(width: int, height: int, orientation: int = 1, border: int = 0) -> bytes:
+    """带噪点背景和几行深色“文字”的彩色 JPEG，模拟手机拍摄的照片"""
+    from PIL import Image, ImageDraw
+
+    noise = Image.effect_noise((width, height), 40).convert("RGB")
+    photo = Image.blend(Image.new("RGB", (width, height), (235, 225, 200)), noise, 0.3)
+    draw = ImageDraw.Draw(photo)
+    for i in range(5):
+        top = height // 6 * (i + 1)
+        draw.rectangle((width // 8, top, width * 7 // 8, top + height // 30), fill=(30, 30, 30))
+
+    if border:
+        framed = Image.new("RGB", (width + border * 2, height + border * 2), (255, 255, 255))
+        framed.paste(photo, (border, border))
+        photo = framed
+
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    output = io.BytesIO()
+    photo.save(output, format="JPEG", quality=95, exif=exif)
+    return output.getvalue()
+
+
+def open_image(data: bytes):
+    from PIL import Image
+
+    return Image.open(io.BytesIO(data))
+
+
+def test_sniff_image_format():
+    """测试按文件头识别格式"""
+    print("\n🧪 测试图片格式识别")
+    assert sniff_image_format(b"\xff\xd8\xff\xe0\x00\x10JFIF") == "jpeg"
+    assert sniff_image_format(b"\x89PNG\r\n\x1a\n\x00\x00") == "png"
+    assert sniff_image_format(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "webp"
+    assert sniff_image_format(b"GIF89a") == "gif"
+    assert sniff_image_format(b"<html>") is None
+    print("✅ 格式识别正确")
+
+
+def test_downscale_and_recompress():
+    """测试按 EXIF 方向摆正、缩小到长边上限、转灰度，体积明显缩小"""
+    print("\n🧪 测试图片缩放和压缩")
+    preprocessor = ImagePreprocessor(workers=1, timeout=60, max_side=1024)
+    if not preprocessor.enabled:
+        print("⚠️ 未安装 Pillow，跳过")
+        return
+
+    # 传感器按横向存储、EXIF 标记需要顺时针旋转90度的竖拍照片
+    original = build_photo(3000, 2000, orientation=6)
+
+    async def scenario():
+        processed = await preprocessor.prepare(original)
+        image = open_image(processed)
+        assert (image.format, image.mode, image.size) == ("JPEG", "L", (683, 1024))
+        assert len(processed) < len(original) / 5
+
+        for data, message in ((b"<html></html>", "不支持"), (b"\xff\xd8\xff" + b"\x00" * 64, "无法解码")):
+            try:
+                await preprocessor.prepare(data)
+                assert False, "应该拒绝"
+            except ImagePreprocessError as e:
+                assert message in str(e)
+
+        # 已经很小的图片重新编码没有收益，原样发送
+        from PIL import Image
+
+        small = io.BytesIO()
+        Image.new("L", (64, 64), 255).save(small, format="PNG")
+        assert await preprocessor.prepare(small.getvalue()) == small.getvalue()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        preprocessor.shutdown()
+
+    stats = preprocessor.stats()
+    assert (stats["processed"], stats["rejected"], stats["skipped"]) == (1, 2, 1)
+    print(f"✅ 统计: {stats}")
+
+
+def test_crop_borders_and_quality():
+    """测试裁掉纯色边框，超过目标大小时降低质量"""
+    print("\n🧪 测试裁边和质量调节")
+    preprocessor = ImagePreprocessor(workers=1, timeout=60, max_side=4096, crop_borders=True)
+    if not preprocessor.enabled:
+        print("⚠️ 未安装 Pillow，跳过")
+        return
+
+    original = build_photo(1200, 800, border=300)
+
+    async def scenario():
+        processed = await preprocessor.prepare(original)
+        width, height = open_image(processed).size
+        # 内容区域 1200x800 加 2% 边距
+        assert 1200 <= width <= 1260 and 800 <= height <= 840
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        preprocessor.shutdown()
+
+    # 目标大小达不到时降到最低质量为止
+    best, _, _ = _preprocess_worker(original, 4096, 85, 60, 1 << 30, True, True)
+    capped, _, _ = _preprocess_worker(original, 4096, 85, 60, 1, True, True)
+    assert len(capped) < len(best)
+    print(f"✅ 质量 85: {len(best)} 字节, 质量 60: {len(capped)} 字节")
+
+
+if __name__ == "__main__":
+    test_sniff_image_format()
+    test_downscale_and_recompress()
+    test_crop_borders_and_quality()
+    print("\n🎉 图片预处理测试通过！")
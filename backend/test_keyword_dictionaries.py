@@ -0,0 +1,134 @@
+"""
+测试关键词词典热更新和重新分析
+Test versioned keyword dictionaries and the re-analysis backfill
+"""
+import sys
+import os
+import json
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.base import Base
+from app.models.change_log import ChangeLog
+from app.models.process_record import ProcessRecord, ProcessRecordSource, ProcessRecordType
+from app.services.goal_matcher import GoalMatcher
+from app.services.reanalysis_service import ReanalysisService
+from app.utils.keyword_dictionaries import DEFAULT_DICTIONARY_PATH, DictionaryRegistry
+from app.utils.process_analyzer import ProcessRecordAnalyzer, process_analyzer
+from app.utils.voice_parser import VoiceGoalParser
+
+
+def _write(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def test_hot_reload():
+    """测试修改词典文件后热更新，格式错误时保留旧词典"""
+    print("\n🧪 测试词典热更新")
+    with open(DEFAULT_DICTIONARY_PATH, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "dictionaries.json")
+        _write(path, data)
+
+        registry = DictionaryRegistry(path)
+        analyzer = ProcessRecordAnalyzer(registry.current)
+        matcher = GoalMatcher(registry.current)
+        parser = VoiceGoalParser(registry.current)
+        for consumer in (analyzer, matcher, parser):
+            registry.register(consumer)
+
+        assert analyzer.analyze_content("今天打了一场羽毛球")['tags'] == []
+        assert registry.check_for_update() is False
+
+        data["version"] = 2
+        data["process_analyzer"]["tag_keywords"]["运动"].append("羽毛球")
+        data["goal_matcher"]["unit_variants"]["公里"].append("公里数")
+        _write(path, data)
+        assert registry.reload() is True
+        assert analyzer.version == matcher.version == 2
+        assert "公里数" in matcher.unit_variants["公里"]
+        result = analyzer.analyze_content("今天打了一场羽毛球")
+        assert result['tags'] == ['运动'] and result['analyzer_version'] == 2
+
+        # 版本号非法：全部使用方都保留旧词典
+        data["version"] = "3"
+        _write(path, data)
+        assert registry.reload() is False
+        assert registry.version == analyzer.version == 2
+
+        # 正则无法编译：分析器已编译成功也不会切换
+        data["version"] = 3
+        data["voice_parser"]["quantification_patterns"].append(["跑(\\d+", "运动", "exercise"])
+        patterns = parser.quantification_patterns
+        _write(path, data)
+        assert registry.reload() is False
+        assert analyzer.version == matcher.version == 2
+        assert parser.quantification_patterns is patterns
+    print("✅ 词典切换是原子的")
+
+
+def _make_session():
+    """创建内存数据库会话"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=[ChangeLog.__table__, ProcessRecord.__table__])
+    return sessionmaker(bind=engine)()
+
+
+def test_reanalysis_backfill():
+    """测试只重新分析版本落后的记录，可从检查点继续"""
+    print("\n🧪 测试重新分析过程记录")
+    db = _make_session()
+    version = process_analyzer.version
+
+    rows = [
+        ("今天终于第一次跑完10公里，很开心", ProcessRecordSource.voice, None),
+        ("读书的方法很有效", ProcessRecordSource.manual, version - 1),
+        ("已经分析过的记录", ProcessRecordSource.voice, version),
+        ("项目遇到困难，压力很大", ProcessRecordSource.photo, None),
+        ("学习进步了", ProcessRecordSource.manual, None),
+    ]
+    for content, source, analyzer_version in rows:
+        db.add(ProcessRecord(
+            content=content, source=source, record_type=ProcessRecordType.process,
+            tags=['手动'], user_id='u1', analyzer_version=analyzer_version
+        ))
+    db.commit()
+
+    service = ReanalysisService(db)
+    assert service.pending_count() == 4
+
+    checkpoints = []
+    assert service.run(chunk_size=2, on_chunk=lambda last_id, done: checkpoints.append(last_id)) == 4
+    assert checkpoints == [2, 5]
+    assert service.pending_count() == 0
+
+    records = {record.content: record for record in db.query(ProcessRecord).all()}
+    voice = records["今天终于第一次跑完10公里，很开心"]
+    assert voice.analyzer_version == version
+    assert voice.record_type != ProcessRecordType.process and voice.is_milestone
+    assert voice.sentiment == 'positive' and '手动' not in voice.tags
+
+    # 手动记录的类型和标签是用户选的，只更新分析字段
+    manual = records["读书的方法很有效"]
+    assert manual.record_type == ProcessRecordType.process and manual.tags == ['手动']
+    assert manual.sentiment == 'positive'
+    assert records["已经分析过的记录"].sentiment is None
+
+    # 只有可见字段变化的记录写变更日志
+    assert db.query(ChangeLog).count() == 4
+
+    # 从检查点继续：之后没有待处理的记录
+    assert service.run(chunk_size=2, start_after_id=checkpoints[-1]) == 0
+    print(f"✅ 重新分析 {len(rows) - 1} 条记录，检查点 {checkpoints}")
+
+
+if __name__ == "__main__":
+    test_hot_reload()
+    test_reanalysis_backfill()
+    print("\n🎉 关键词词典测试通过！")
@@ -0,0 +1,261 @@
+"""
+测试拍照记录异步任务
+Test asynchronous photo-record jobs and per-stage timings
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import asyncio
+import base64
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.config.settings import settings
+from app.models import Base, User, Goal, ProcessRecord, ChangeLog
+from app.models.recognition_job import RecognitionJob, RecognitionJobKind
+from app.services.cloud_executor import CloudServiceBusy
+from app.services.image_preprocessor import image_preprocessor
+from app.services.photo_storage import PhotoUploader
+from app.services.recognition_cache import RecognitionCache
+from app.services.recognition_job_service import RecognitionJobService, PhotoRecordJobWorker
+from app.services.tencent_ocr_service import ocr_service
+
+
+class Detection:
+    def __init__(self, text):
+        self.DetectedText = text
+        self.Confidence = 95
+        self.Polygon = []
+
+
+class FakeOcrClient:
+    """按照片内容返回文字，内容以 blank 结尾的照片没有文字"""
+
+    def GeneralBasicOCR(self, req):
+        class Response:
+            TextDetections = [] if base64.b64decode(req.ImageBase64).endswith(b"blank") else [Detection("今天跑步5公里")]
+        return Response()
+
+
+class FlakyLimiter:
+    """前 busy 次调用返回繁忙，之后直接执行"""
+
+    def __init__(self, busy=0):
+        self.busy = busy
+
+    async def call(self, func, *args, idempotent=False, **kwargs):
+        if self.busy:
+            self.busy -= 1
+            raise CloudServiceBusy("ocr")
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+
+def make_session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine, tables=[
+        User.__table__, Goal.__table__, ProcessRecord.__table__, ChangeLog.__table__, RecognitionJob.__table__
+    ])
+    session_factory = sessionmaker(bind=engine)
+    db = session_factory()
+    db.add(User(id="user-1", wechat_id="wx1", nickname="测试用户"))
+    db.commit()
+    db.close()
+    return session_factory
+
+
+def make_job(session_factory, content, goal_id=None):
+    fd, path = tempfile.mkstemp(suffix=".jpg")
+    with os.fdopen(fd, "wb") as f:
+        f.write(content)
+    db = session_factory()
+    try:
+        job = RecognitionJobService(db).create_photo_record_job("user-1", path, "jpeg", len(content), goal_id)
+        return job.id, path
+    finally:
+        db.close()
+
+
+def make_due(session_factory, job_id):
+    """把下一次处理时间拨到现在，模拟退避间隔已过"""
+    db = session_factory()
+    try:
+        db.query(RecognitionJob).filter(RecognitionJob.id == job_id).update(
+            {RecognitionJob.next_poll_at: datetime.utcnow() - timedelta(seconds=1)}
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def load(session_factory, job_id, kind=RecognitionJobKind.photo_record):
+    db = session_factory()
+    try:
+        return RecognitionJobService(db).get_job("user-1", job_id, kind=kind)
+    finally:
+        db.close()
+
+
+def run_with_fake_ocr(scenario, limiter):
+    """替换OCR客户端、限流器和缓存，关闭图片预处理，执行后恢复"""
+    original = (ocr_service._client, ocr_service.limiter, ocr_service.cache, settings.OCR_DEV_MODE, image_preprocessor.enabled)
+    ocr_service.client = FakeOcrClient()
+    ocr_service.limiter = limiter
+    ocr_service.cache = RecognitionCache("ocr-job-test", persistent=False)
+    settings.OCR_DEV_MODE = False
+    image_preprocessor.enabled = False
+    try:
+        asyncio.run(scenario())
+    finally:
+        (ocr_service._client, ocr_service.limiter, ocr_service.cache, settings.OCR_DEV_MODE, image_preprocessor.enabled) = original
+
+
+def test_photo_job_busy_then_succeed():
+    """测试OCR繁忙时退避重试，成功后创建记录、记录各阶段耗时并把照片移入上传暂存目录"""
+    print("\n🧪 测试拍照记录任务完整流程")
+    session_factory = make_session_factory()
+    spool_dir = tempfile.mkdtemp()
+    uploader = PhotoUploader(session_factory=session_factory, spool_dir=spool_dir)
+    worker = PhotoRecordJobWorker(session_factory=session_factory, poll_initial=2, poll_max=30, uploader=uploader)
+    job_id, path = make_job(session_factory, b"\xff\xd8\xff\xe0" + b"photo" * 16)
+
+    async def scenario():
+        assert await worker.run_once() == 1
+        job = load(session_factory, job_id)
+        # 繁忙不计入尝试次数
+        assert (job.status, job.attempts) == ("processing", 0)
+        assert job.next_poll_at - datetime.utcnow() > timedelta(seconds=1)
+        assert await worker.run_once() == 0
+
+        make_due(session_factory, job_id)
+        assert await worker.run_once() == 1
+
+    run_with_fake_ocr(scenario, FlakyLimiter(busy=1))
+
+    job = load(session_factory, job_id)
+    assert job.status == "succeeded" and job.result["text"] == "今天跑步5公里"
+    assert job.input_path is None and not os.path.exists(path)
+    assert {"load", "ocr", "analysis", "match", "save"} <= set(job.stage_timings)
+    # 上传 worker 未启动，照片留在暂存目录，文件名带记录ID
+    assert [name.split("-")[0] for name in os.listdir(spool_dir)] == [str(job.result["record_id"])]
+
+    db = session_factory()
+    try:
+        record = db.query(ProcessRecord).filter(ProcessRecord.id == job.result["record_id"]).one()
+        assert record.user_id == "user-1" and record.content == "今天跑步5公里"
+        assert db.query(ProcessRecord).count() == 1
+    finally:
+        db.close()
+
+    # 录音任务接口查不到拍照记录任务
+    assert load(session_factory, job_id, kind=RecognitionJobKind.voice) is None
+    stats = worker.stats()
+    assert (stats["succeeded"], stats["retried"]) == (1, 1) and "ocr" in stats["stage_avg_ms"]
+    print(f"✅ 各阶段耗时: {job.stage_timings}")
+
+
+def test_photo_job_without_text_fails():
+    """测试未检测到文字的照片直接失败，不重试也不创建记录"""
+    print("\n🧪 测试无文字照片")
+    session_factory = make_session_factory()
+    uploader = PhotoUploader(session_factory=session_factory, spool_dir=tempfile.mkdtemp())
+    worker = PhotoRecordJobWorker(session_factory=session_factory, uploader=uploader)
+    job_id, path = make_job(session_factory, b"\xff\xd8\xff\xe0blank", goal_id="goal-1")
+
+    async def scenario():
+        assert await worker.run_once() == 1
+
+    run_with_fake_ocr(scenario, FlakyLimiter())
+
+    job = load(session_factory, job_id)
+    assert job.params == {"goal_id": "goal-1"}
+    assert job.status == "failed" and "未检测到文字" in job.error
+    assert "ocr" in job.stage_timings and not os.path.exists(path)
+
+    db = session_factory()
+    try:
+        assert db.query(ProcessRecord).count() == 0
+    finally:
+        db.close()
+    print("✅ 无文字照片标记为失败")
+
+
+def test_photo_job_lease_lost():
+    """测试租期被其他实例取走后不再更新任务，已开始的事务回滚，不会重复创建记录"""
+    print("\n🧪 测试租期失效")
+    session_factory = make_session_factory()
+    uploader = PhotoUploader(session_factory=session_factory, spool_dir=tempfile.mkdtemp())
+    worker = PhotoRecordJobWorker(session_factory=session_factory, uploader=uploader)
+    stolen_until = (datetime.utcnow() + timedelta(hours=1)).replace(microsecond=0)
+
+    def steal(job_id):
+        """模拟租期过期后另一个实例重新取走任务"""
+        db = session_factory()
+        try:
+            db.query(RecognitionJob).filter(RecognitionJob.id == job_id).update(
+                {RecognitionJob.next_poll_at: stolen_until}
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    class StealingLimiter(FlakyLimiter):
+        """OCR期间租期被取走，内容分析前续租失败"""
+
+        def __init__(self, job_id):
+            super().__init__()
+            self.job_id = job_id
+
+        async def call(self, func, *args, **kwargs):
+            steal(self.job_id)
+            return await super().call(func, *args, **kwargs)
+
+    renew_lease = worker._renew_lease
+
+    def renew_then_steal(job, **fields):
+        """续租成功后立即被取走，保存记录时才发现"""
+        renew_lease(job, **fields)
+        if not fields:
+            steal(job["id"])
+
+    first_id, first_path = make_job(session_factory, b"\xff\xd8\xff\xe0" + b"photo" * 16)
+    second_id, second_path = make_job(session_factory, b"\xff\xd8\xff\xe0" + b"image" * 16)
+
+    async def ocr_scenario():
+        jobs = await asyncio.to_thread(worker._claim_due_jobs)
+        await worker._process(next(job for job in jobs if job["id"] == first_id))
+
+    run_with_fake_ocr(ocr_scenario, StealingLimiter(first_id))
+
+    async def save_scenario():
+        make_due(session_factory, second_id)
+        worker._renew_lease = renew_then_steal
+        jobs = await asyncio.to_thread(worker._claim_due_jobs)
+        await worker._process(next(job for job in jobs if job["id"] == second_id))
+
+    run_with_fake_ocr(save_scenario, FlakyLimiter())
+
+    for job_id, path in ((first_id, first_path), (second_id, second_path)):
+        job = load(session_factory, job_id)
+        # 任务保持被接管后的状态，输入照片留给接管的实例
+        assert job.status == "processing" and job.next_poll_at == stolen_until
+        assert job.attempts == 0 and job.result is None and os.path.exists(path)
+
+    db = session_factory()
+    try:
+        assert db.query(ProcessRecord).count() == 0
+    finally:
+        db.close()
+    assert worker.stats()["succeeded"] == 0
+    print("✅ 租期失效时不保存记录")
+
+
+if __name__ == "__main__":
+    test_photo_job_busy_then_succeed()
+    test_photo_job_without_text_fails()
+    test_photo_job_lease_lost()
+    print("\n🎉 拍照记录任务测试通过！")
@@ -0,0 +1,453 @@
+"""
+测试照片存储和后台上传
+Test photo persistence with background upload and thumbnails
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import asyncio
+import io
+import tempfile
+from urllib.parse import parse_qs, unquote, urlparse
+
+from fastapi import HTTPException, Request, UploadFile
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.api import photo_records
+from app.config.settings import settings
+from app.models import Base, User, Goal, ProcessRecord, ChangeLog, PhotoUploadClaim
+from app.services.image_preprocessor import image_preprocessor
+from app.services.photo_record_pipeline import PhotoRecordPipeline
+from app.services.photo_storage import (
+    LocalPhotoStorage, CosPhotoStorage, PhotoUploader, PhotoStorageError, photo_uploader, MAX_PHOTO_SIZE
+)
+from app.services.recognition_cache import RecognitionCache
+from app.services.tencent_ocr_service import ocr_service
+
+
+class FlakyStorage(LocalPhotoStorage):
+    """前 failures 次写入失败，之后写入本地目录"""
+
+    def __init__(self, root, failures=0):
+        super().__init__(root, "/media/photos")
+        self.failures = failures
+
+    async def put(self, key, data, content_type=None):
+        if self.failures:
+            self.failures -= 1
+            raise PhotoStorageError("模拟COS上传失败")
+        return await super().put(key, data, content_type)
+
+
+class Detection:
+    def __init__(self, text):
+        self.DetectedText = text
+        self.Confidence = 95
+        self.Polygon = []
+
+
+class FakeOcrClient:
+    """记录收到的请求，按URL识别时返回地址中的文件名"""
+
+    def __init__(self):
+        self.requests = []
+
+    def GeneralBasicOCR(self, req):
+        self.requests.append(req)
+        text = f"照片 {req.ImageUrl.split('?')[0].rsplit('/', 1)[-1]}" if req.ImageUrl else "今天跑步5公里"
+
+        class Response:
+            TextDetections = [Detection(text)]
+        return Response()
+
+
+class FailingOnceOcrClient(FakeOcrClient):
+    """第一次请求失败"""
+
+    def GeneralBasicOCR(self, req):
+        if not self.requests:
+            self.requests.append(req)
+            raise RuntimeError("模拟OCR失败")
+        return super().GeneralBasicOCR(req)
+
+
+class DirectLimiter:
+    async def call(self, func, *args, idempotent=False, **kwargs):
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+
+class FakeCos:
+    """COS服务的替身：对象保存在内存中"""
+
+    def __init__(self, objects):
+        self.objects = objects
+
+    async def head_file(self, key):
+        return {"size": len(self.objects[key]), "content_type": "image/jpeg"} if key in self.objects else None
+
+    async def get_file_url(self, key, expires=3600):
+        return f"https://bucket.cos.example.com/{key}?sign=abc"
+
+    async def download_file(self, key):
+        raise AssertionError("按URL识别时不应下载照片")
+
+    async def copy_file(self, source_key, key):
+        if source_key not in self.objects:
+            return False
+        # 让出事件循环：并发的复制都能在任何一个删除原对象之前完成
+        await asyncio.sleep(0.01)
+        self.objects[key] = self.objects[source_key]
+        return True
+
+    async def delete_file(self, key):
+        return self.objects.pop(key, None) is not None
+
+
+def make_request(method="POST", body=b"", headers=None):
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    raw_headers = [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    scope = {
+        "type": "http", "method": method, "path": "/", "headers": raw_headers, "query_string": b"",
+        "scheme": "http", "server": ("testserver", 80), "root_path": ""
+    }
+    return Request(scope, receive)
+
+
+def run_with_fake_ocr(scenario, client):
+    """替换OCR客户端、限流器和缓存，执行后恢复"""
+    original = (ocr_service._client, ocr_service.limiter, ocr_service.cache, settings.OCR_DEV_MODE)
+    ocr_service.client = client
+    ocr_service.limiter = DirectLimiter()
+    ocr_service.cache = RecognitionCache("ocr-direct-upload-test", persistent=False)
+    settings.OCR_DEV_MODE = False
+    try:
+        return asyncio.run(scenario())
+    finally:
+        (ocr_service._client, ocr_service.limiter, ocr_service.cache, settings.OCR_DEV_MODE) = original
+
+
+def make_photo(width=1200, height=900):
+    from PIL import Image
+
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 180, 160)).save(output, format="JPEG", quality=90)
+    return output.getvalue()
+
+
+def make_session_factory(records=1):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine, tables=[
+        User.__table__, Goal.__table__, ProcessRecord.__table__, ChangeLog.__table__, PhotoUploadClaim.__table__
+    ])
+    session_factory = sessionmaker(bind=engine)
+    db = session_factory()
+    db.add(User(id="user-1", wechat_id="wx1", nickname="测试用户"))
+    for i in range(records):
+        db.add(ProcessRecord(content=f"拍照记录{i + 1}", user_id="user-1", attachments={"note": "保留"}))
+    db.commit()
+    db.close()
+    return session_factory
+
+
+def load_record(session_factory, record_id):
+    db = session_factory()
+    try:
+        return db.query(ProcessRecord).filter(ProcessRecord.id == record_id).first()
+    finally:
+        db.close()
+
+
+def make_uploader(session_factory, storage, spool_dir, **kwargs):
+    return PhotoUploader(
+        storage=storage, session_factory=session_factory, spool_dir=spool_dir,
+        retry_initial=0.01, retry_max=0.05, **kwargs
+    )
+
+
+def test_local_storage():
+    """测试本地存储的写入、删除和非法对象键"""
+    print("\n🧪 测试本地照片存储")
+    root = tempfile.mkdtemp()
+    storage = LocalPhotoStorage(root, "/media/photos/")
+
+    async def scenario():
+        stored = await storage.put("photos/2026/01/01/1-abc.jpg", b"photo")
+        assert stored == {"key": "photos/2026/01/01/1-abc.jpg", "url": "/media/photos/photos/2026/01/01/1-abc.jpg", "size": 5}
+        with open(os.path.join(root, "photos/2026/01/01/1-abc.jpg"), "rb") as f:
+            assert f.read() == b"photo"
+        assert await storage.delete("photos/2026/01/01/1-abc.jpg")
+        assert not await storage.delete("photos/2026/01/01/1-abc.jpg")
+
+        try:
+            await storage.put("../outside.jpg", b"photo")
+            assert False, "对象键不能跳出存储目录"
+        except ValueError:
+            pass
+
+    asyncio.run(scenario())
+    print("✅ 本地存储正常")
+
+
+def test_upload_with_thumbnail_and_retry():
+    """测试照片暂存后在后台上传，失败重试，生成缩略图并写入记录附件"""
+    print("\n🧪 测试照片后台上传和缩略图")
+    session_factory = make_session_factory()
+    root, spool_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+    uploader = make_uploader(session_factory, FlakyStorage(root, failures=1), spool_dir, thumbnail_size=320)
+
+    async def scenario():
+        uploader.start()
+        assert await uploader.submit(1, make_photo()) is not None
+        # 不是图片的数据不保存
+        assert await uploader.submit(1, b"not a photo") is None
+        await uploader.join()
+        await uploader.stop()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        image_preprocessor.shutdown()
+
+    record = load_record(session_factory, 1)
+    photo, thumbnail = record.attachments["photo"], record.attachments["thumbnail"]
+    assert record.attachments["note"] == "保留"
+    assert photo["content_type"] == "image/jpeg" and photo["url"].startswith("/media/photos/photos/")
+    assert (thumbnail["width"], thumbnail["height"]) == (320, 240) and thumbnail["key"].endswith("-thumb.jpg")
+    assert os.path.getsize(os.path.join(root, thumbnail["key"])) == thumbnail["size"] < photo["size"]
+    assert os.listdir(spool_dir) == []
+
+    db = session_factory()
+    try:
+        assert db.query(ChangeLog).filter(ChangeLog.entity_id == "1").count() == 1
+    finally:
+        db.close()
+
+    stats = uploader.stats()
+    assert (stats["uploaded"], stats["retried"], stats["failed"], stats["thumbnails"]) == (1, 1, 0, 1)
+    print(f"✅ 上传完成: {stats}")
+
+
+def test_resume_spooled_and_deleted_record():
+    """测试重启后继续上传暂存的照片，上传期间记录已删除时清理已上传的对象"""
+    print("\n🧪 测试重启后继续上传")
+    session_factory = make_session_factory()
+    root, spool_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+    photo = make_photo(400, 300)
+
+    async def scenario():
+        # worker 未启动时只写入暂存目录
+        stopped = make_uploader(session_factory, LocalPhotoStorage(root, "/media/photos"), spool_dir)
+        await stopped.submit(1, photo)
+        await stopped.submit(99, photo)
+        assert len(os.listdir(spool_dir)) == 2
+
+        uploader = make_uploader(session_factory, LocalPhotoStorage(root, "/media/photos"), spool_dir)
+        uploader.start()
+        await uploader.join()
+        await uploader.stop()
+        return uploader
+
+    try:
+        uploader = asyncio.run(scenario())
+    finally:
+        image_preprocessor.shutdown()
+
+    assert "thumbnail" in load_record(session_factory, 1).attachments
+    assert os.listdir(spool_dir) == []
+    # 只剩记录 1 的原图和缩略图
+    stored = [name for _, _, names in os.walk(root) for name in names]
+    assert len(stored) == 2 and all(name.startswith("1-") for name in stored)
+    assert uploader.stats()["uploaded"] == 2
+    print("✅ 暂存照片在重启后上传")
+
+
+def test_direct_upload_with_local_storage():
+    """测试本地存储的直传流程：签发地址 -> 验签上传 -> 按对象键识别并创建记录 -> 后台生成缩略图"""
+    print("\n🧪 测试照片直传（本地存储）")
+    session_factory = make_session_factory(records=0)
+    root, spool_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+    storage = LocalPhotoStorage(root, "/media/photos", upload_url="/api/photo-records/uploads", secret="test-secret")
+    original = (photo_uploader._storage, photo_uploader._session_factory, photo_uploader.spool_dir)
+    photo_uploader._storage, photo_uploader._session_factory, photo_uploader.spool_dir = storage, session_factory, spool_dir
+    user, photo = User(id="user-1"), make_photo(800, 600)
+
+    async def put(upload, body, content_type="image/jpeg"):
+        url = urlparse(upload.upload_url)
+        query = parse_qs(url.query)
+        request = make_request("PUT", body, {"Content-Type": content_type, "Content-Length": str(len(body))})
+        object_key = unquote(url.path[len("/api/photo-records/uploads/"):])
+        return await photo_records.put_local_photo(
+            request, object_key=object_key, expires=int(query["expires"][0]), signature=query["signature"][0]
+        )
+
+    async def expect_error(status_code, coro):
+        try:
+            await coro
+            assert False, f"应该返回 {status_code}"
+        except HTTPException as e:
+            assert e.status_code == status_code, e.detail
+
+    async def scenario():
+        await expect_error(400, photo_records.create_photo_upload(make_request(), "image/gif", current_user=user))
+        upload = await photo_records.create_photo_upload(make_request(), "image/jpeg", current_user=user)
+        assert upload.upload_url.startswith("http://testserver/api/photo-records/uploads/incoming/user-1/")
+        assert upload.method == "PUT" and upload.headers == {"Content-Type": "image/jpeg"}
+
+        # 上传前识别返回 404；类型与签名不一致时拒绝
+        db = session_factory()
+        try:
+            await expect_error(404, photo_records.recognize_and_create_photo_record_by_key(
+                upload.object_key, None, current_user=user, db=db
+            ))
+        finally:
+            db.close()
+        await expect_error(403, put(upload, photo, content_type="image/png"))
+        # Content-Length 与实际大小不符时按实际读取的大小拒绝
+        url = urlparse(upload.upload_url)
+        query = parse_qs(url.query)
+        await expect_error(413, photo_records.put_local_photo(
+            make_request("PUT", b"\xff" * (MAX_PHOTO_SIZE + 1), {"Content-Type": "image/jpeg", "Content-Length": "10"}),
+            object_key=upload.object_key, expires=int(query["expires"][0]), signature=query["signature"][0]
+        ))
+        assert (await put(upload, photo))["object_key"] == upload.object_key
+
+        db = session_factory()
+        try:
+            # 其他用户的对象键无效
+            await expect_error(400, photo_records.recognize_and_create_photo_record_by_key(
+                upload.object_key, None, current_user=User(id="user-2"), db=db
+            ))
+            # 识别失败时照片放回原对象键，可以用同一对象键重试
+            await expect_error(500, photo_records.recognize_and_create_photo_record_by_key(
+                upload.object_key, None, current_user=user, db=db
+            ))
+            assert os.path.exists(storage.path(upload.object_key))
+            photo_uploader.start()
+            response = await photo_records.recognize_and_create_photo_record_by_key(
+                upload.object_key, None, current_user=user, db=db
+            )
+            await photo_uploader.join()
+            await photo_uploader.stop()
+            # 对象键只能使用一次
+            await expect_error(404, photo_records.recognize_and_create_photo_record_by_key(
+                upload.object_key, None, current_user=user, db=db
+            ))
+            assert db.query(ProcessRecord).count() == 1
+        finally:
+            db.close()
+        return upload, response
+
+    try:
+        upload, response = run_with_fake_ocr(scenario, FailingOnceOcrClient())
+    finally:
+        image_preprocessor.shutdown()
+        photo_uploader._storage, photo_uploader._session_factory, photo_uploader.spool_dir = original
+
+    assert response.record.content == "今天跑步5公里"
+    attachments = load_record(session_factory, response.record.id).attachments
+    # 原图是从直传对象键移过来的独立对象，后台只上传缩略图
+    assert attachments["photo"]["key"].startswith("photos/") and attachments["photo"]["size"] == len(photo)
+    assert os.path.exists(storage.path(attachments["photo"]["key"])) and not os.path.exists(storage.path(upload.object_key))
+    assert attachments["thumbnail"]["width"] == 320 and os.path.exists(os.path.join(root, attachments["thumbnail"]["key"]))
+    assert os.listdir(spool_dir) == []
+    print("✅ 本地存储直传流程正常")
+
+
+def test_recognize_stored_photo_by_url():
+    """测试COS存储时OCR按预签名地址识别，照片不经过应用服务器"""
+    print("\n🧪 测试按地址识别直传照片")
+    client = FakeOcrClient()
+    storage = CosPhotoStorage(cos=FakeCos({"incoming/user-1/a.jpg": b"\xff\xd8\xff\xe0photo"}))
+    pipeline = PhotoRecordPipeline(db=None)
+
+    async def scenario():
+        text = await pipeline.recognize_stored(storage, "incoming/user-1/a.jpg")
+        # 同一对象再次识别命中缓存（缓存键不含签名参数）
+        assert await PhotoRecordPipeline(db=None).recognize_stored(storage, "incoming/user-1/a.jpg") == text
+
+        # COS没有改名操作，移动为复制后删除；原对象已移走时返回 False
+        assert await storage.move("incoming/user-1/a.jpg", "photos/a.jpg")
+        assert not await storage.move("incoming/user-1/a.jpg", "photos/b.jpg")
+        assert list(storage.cos.objects) == ["photos/a.jpg"]
+        return text
+
+    assert run_with_fake_ocr(scenario, client) == "照片 a.jpg"
+    assert len(client.requests) == 1 and client.requests[0].ImageBase64 is None
+    assert client.requests[0].ImageUrl.startswith("https://bucket.cos.example.com/incoming/user-1/a.jpg")
+    assert "ocr" in pipeline.timings and "load" not in pipeline.timings
+    print("✅ OCR 直接从COS下载照片")
+
+
+def test_create_photo_record_limits():
+    """测试创建照片记录前检查照片大小，记录提交后照片暂存失败不影响返回结果"""
+    print("\n🧪 测试创建照片记录")
+    session_factory = make_session_factory(records=0)
+    # 暂存目录是一个普通文件，写入暂存文件必然失败
+    spool_file = tempfile.NamedTemporaryFile(delete=False)
+    original = (photo_uploader._session_factory, photo_uploader.spool_dir)
+    photo_uploader._session_factory, photo_uploader.spool_dir = session_factory, spool_file.name
+    user = User(id="user-1")
+
+    async def create(content):
+        db = session_factory()
+        try:
+            photo = UploadFile(file=io.BytesIO(content), filename="photo.jpg")
+            return await photo_records.create_photo_record("今天跑步5公里", None, photo, current_user=user, db=db)
+        finally:
+            db.close()
+
+    try:
+        try:
+            asyncio.run(create(b"\xff\xd8\xff\xe0" + b"0" * MAX_PHOTO_SIZE))
+            assert False, "应该拒绝过大的照片"
+        except HTTPException as e:
+            assert e.status_code == 400
+        db = session_factory()
+        try:
+            assert db.query(ProcessRecord).count() == 0
+        finally:
+            db.close()
+
+        response = asyncio.run(create(make_photo(80, 60)))
+        assert response.success and load_record(session_factory, response.record.id) is not None
+    finally:
+        photo_uploader._session_factory, photo_uploader.spool_dir = original
+        spool_file.close()
+        os.remove(spool_file.name)
+    print("✅ 过大的照片不创建记录，暂存失败仍返回已创建的记录")
+
+
+def test_concurrent_claim_with_cos():
+    """测试并发提交同一直传对象键时只有一个请求取得照片（COS移动是复制后删除，不是原子的）"""
+    print("\n🧪 测试并发使用同一对象键")
+    session_factory = make_session_factory(records=0)
+    cos = FakeCos({"incoming/user-1/a.jpg": b"\xff\xd8\xff\xe0photo"})
+    uploader = make_uploader(session_factory, CosPhotoStorage(cos=cos), tempfile.mkdtemp())
+
+    async def scenario():
+        return await asyncio.gather(*(uploader.claim_stored("incoming/user-1/a.jpg", "user-1") for _ in range(3)))
+
+    claimed = [key for key in asyncio.run(scenario()) if key]
+    assert len(claimed) == 1 and list(cos.objects) == claimed
+
+    # 失败后放回原对象键并删除使用记录，可以再次使用
+    asyncio.run(uploader.release_stored(claimed[0], "incoming/user-1/a.jpg"))
+    assert list(cos.objects) == ["incoming/user-1/a.jpg"]
+    assert asyncio.run(uploader.claim_stored("incoming/user-1/a.jpg", "user-1"))
+    print("✅ 只有一个请求取得照片")
+
+
+if __name__ == "__main__":
+    test_local_storage()
+    test_upload_with_thumbnail_and_retry()
+    test_resume_spooled_and_deleted_record()
+    test_direct_upload_with_local_storage()
+    test_recognize_stored_photo_by_url()
+    test_create_photo_record_limits()
+    test_concurrent_claim_with_cos()
+    print("\n🎉 照片存储测试通过！")
@@ -0,0 +1,60 @@
+"""
+测试过程记录分析器
+Test process record analyzer keyword automaton
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import random
+
+from app.utils.keyword_automaton import KeywordAutomaton
+from app.utils.process_analyzer import process_analyzer
+
+
+def test_automaton_matches_substring_search():
+    """测试自动机与逐个 `in` 判断结果一致"""
+    print("\n🧪 测试多模式匹配")
+    rng = random.Random(7)
+    alphabet = "跑步学习难ab"
+    for _ in range(500):
+        patterns = ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4)))
+                    for _ in range(rng.randint(1, 12))]
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+        automaton = KeywordAutomaton(patterns)
+        assert automaton.find_all(text) == {p for p in patterns if p in text}, (patterns, text)
+
+    # 重叠和互为后缀的关键词都能命中
+    automaton = KeywordAutomaton(["终于", "于是", "是", "终于成功"])
+    assert automaton.find_all("终于是") == {"终于", "于是", "是"}
+    print("✅ 匹配结果正确")
+
+
+def test_analyze_content():
+    """测试单次扫描得到的分析结果"""
+    print("\n🧪 测试内容分析")
+    analysis = process_analyzer.analyze_content("今天终于第一次跑步5公里，状态很好，很开心！")
+    # progress 命中"今天""终于"，milestone 命中"终于""第一次"，同分时取先定义的类型
+    assert analysis['record_type'] == 'progress'
+    assert analysis['sentiment'] == 'positive'
+    assert analysis['energy_level'] == 8
+    assert analysis['tags'] == ['运动', '积极']
+    assert analysis['is_important'] and analysis['is_milestone']
+    assert not analysis['is_breakthrough']
+    assert sorted(analysis['keywords']) == ['5', '跑步']
+    print(f"✅ 分析结果: {analysis}")
+
+    analysis = process_analyzer.analyze_content("这道题非常难，压力很大，好累")
+    assert analysis['record_type'] == 'difficulty'
+    assert analysis['sentiment'] == 'negative'
+    assert analysis['difficulty_level'] == 8
+    assert analysis['tags'] == ['消极']
+
+    analysis = process_analyzer.analyze_content("")
+    assert analysis['record_type'] == 'process' and analysis['confidence_score'] == 50
+
+
+if __name__ == "__main__":
+    test_automaton_matches_substring_search()
+    test_analyze_content()
+    print("\n🎉 分析器测试通过！")
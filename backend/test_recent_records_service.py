@@ -0,0 +1,127 @@
+"""
+测试最近记录服务
+Test per-user recent records feed
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.models.change_log import ChangeLog
+from app.services.recent_records_service import RecentRecordsCache, RecentRecordsService
+
+
+def _make_session():
+    """创建内存数据库会话（ORM模型没有 is_deleted 字段，直接建表）"""
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE process_records (
+                id INTEGER PRIMARY KEY,
+                user_id VARCHAR(36) NOT NULL,
+                content TEXT NOT NULL,
+                record_type VARCHAR(20),
+                source VARCHAR(20),
+                sentiment VARCHAR(20),
+                recorded_at DATETIME,
+                is_deleted BOOLEAN DEFAULT FALSE
+            )
+        """))
+    ChangeLog.__table__.create(bind=engine)
+    return sessionmaker(bind=engine)()
+
+
+def _insert(db, record_id, user_id, recorded_at, is_deleted=False):
+    db.execute(text("""
+        INSERT INTO process_records (id, user_id, content, record_type, source, recorded_at, is_deleted)
+        VALUES (:id, :user_id, :content, 'process', 'manual', :recorded_at, :is_deleted)
+    """), {
+        "id": record_id, "user_id": user_id, "content": f"记录{record_id}",
+        "recorded_at": recorded_at, "is_deleted": is_deleted
+    })
+
+
+def test_recent_feed_per_user():
+    """测试只返回当前用户的最近记录，并且新建记录后缓存随游标更新"""
+    print("\n🧪 测试最近动态")
+    db = _make_session()
+    cache = RecentRecordsCache(per_user=3)
+    service = RecentRecordsService(db, cache)
+
+    base = datetime(2024, 1, 1, 8, 0, 0)
+    for i in range(1, 6):
+        _insert(db, i, "u1", base + timedelta(hours=i))
+    _insert(db, 6, "u1", base + timedelta(hours=10), is_deleted=True)
+    _insert(db, 7, "u2", base + timedelta(hours=20))
+    db.commit()
+
+    items = service.get_recent("u1")
+    assert [item["id"] for item in items] == ["5", "4", "3"]
+    print("✅ 只返回当前用户未删除的最新记录")
+
+    # 新建记录写入变更日志，游标前进后重新查询
+    _insert(db, 8, "u1", base + timedelta(hours=30))
+    db.add(ChangeLog(user_id="u1", entity_type="process_record", entity_id="8", operation="upsert"))
+    db.commit()
+    items = service.get_recent("u1")
+    assert [item["id"] for item in items] == ["8", "5", "4"]
+    print("✅ 新建记录后缓存随游标更新")
+
+    db.execute(text("DELETE FROM process_records"))
+    db.commit()
+    cache.invalidate("u1")
+    assert service.get_recent("u1") == []
+    print("✅ 缓存失效后重新查询")
+
+
+def test_other_process_write():
+    """测试其他进程写入后，按 change_log 游标发现缓存过期"""
+    print("\n🧪 测试多进程写入后的缓存")
+    db = _make_session()
+    service = RecentRecordsService(db, RecentRecordsCache())
+    base = datetime(2024, 1, 1, 8, 0, 0)
+    _insert(db, 1, "u1", base)
+    db.commit()
+    assert [item["id"] for item in service.get_recent("u1")] == ["1"]
+
+    # 没有新的变更时命中缓存
+    db.execute(text("DELETE FROM process_records"))
+    db.commit()
+    assert [item["id"] for item in service.get_recent("u1")] == ["1"]
+
+    # 另一个进程新建记录并写入变更日志
+    _insert(db, 2, "u1", base + timedelta(hours=1))
+    db.add(ChangeLog(user_id="u1", entity_type="process_record", entity_id="2", operation="upsert"))
+    db.commit()
+    assert [item["id"] for item in service.get_recent("u1")] == ["2"]
+
+    # 其他用户的变更不影响
+    db.add(ChangeLog(user_id="u2", entity_type="process_record", entity_id="3", operation="upsert"))
+    db.commit()
+    db.execute(text("DELETE FROM process_records"))
+    db.commit()
+    assert [item["id"] for item in service.get_recent("u1")] == ["2"]
+    print("✅ 游标变化后重新查询")
+
+
+def test_cache_bounded():
+    """测试缓存用户数有上限"""
+    cache = RecentRecordsCache(max_users=2)
+    cache.set("a", [])
+    cache.set("b", [])
+    cache.get("a")
+    cache.set("c", [])
+    assert cache.get("b") is None
+    assert cache.get("a") == [] and cache.get("c") == []
+    print("✅ 缓存按LRU淘汰")
+
+
+if __name__ == "__main__":
+    test_recent_feed_per_user()
+    test_other_process_write()
+    test_cache_bounded()
+    print("\n🎉 最近动态测试通过！")
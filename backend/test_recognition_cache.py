@@ -0,0 +1,175 @@
+"""
+测试识别结果缓存
+Test content-addressed ASR/OCR result cache with single-flight
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import asyncio
+import io
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models import Base
+from app.models.recognition_cache import RecognitionCacheEntry
+from app.services.cloud_executor import CloudServiceBusy, CloudServiceLimiter
+from app.services.recognition_cache import RecognitionCache, recognition_cache_key
+from app.services.voice_recognition import VoiceRecognitionService
+
+
+def make_session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine, tables=[RecognitionCacheEntry.__table__])
+    return sessionmaker(bind=engine)
+
+
+class CountingCall:
+    """记录调用次数的模拟云端识别"""
+
+    def __init__(self, result=None, error=None, delay=0.05):
+        self.result = result if result is not None else {"success": True, "text": "今天跑步5公里"}
+        self.error = error
+        self.delay = delay
+        self.count = 0
+
+    async def __call__(self):
+        self.count += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return dict(self.result)
+
+
+def test_cache_key():
+    """测试缓存键由内容和参数决定，文件对象与字节结果一致"""
+    print("\n🧪 测试缓存键")
+    audio = b"#!SILK_V3" + b"\x00" * 4096
+    key = recognition_cache_key(audio, "asr", voice_format="silk")
+    stream = io.BytesIO(audio)
+    assert recognition_cache_key(stream, "asr", voice_format="silk") == key
+    assert stream.tell() == 0
+    assert recognition_cache_key(audio, "asr", voice_format="mp3") != key
+    assert recognition_cache_key(audio + b"\x00", "asr", voice_format="silk") != key
+    assert recognition_cache_key(audio, "ocr.GeneralBasicOCR", voice_format="silk") != key
+    print("✅ 缓存键正确")
+
+
+def test_single_flight():
+    """测试同时到达的相同请求只调用一次云端，各自拿到独立的结果副本"""
+    print("\n🧪 测试单飞合并")
+    cache = RecognitionCache("test", persistent=False)
+    call = CountingCall()
+
+    async def scenario():
+        results = await asyncio.gather(*(cache.get_or_call("k", "asr", call) for _ in range(5)))
+        assert call.count == 1
+        assert all(result == results[0] for result in results)
+        results[0]["text"] = "被调用方修改"
+        assert (await cache.get_or_call("k", "asr", call))["text"] == "今天跑步5公里"
+        assert call.count == 1
+
+    asyncio.run(scenario())
+    stats = cache.stats()
+    assert (stats["calls"], stats["coalesced"], stats["inflight"]) == (1, 4, 0)
+    print(f"✅ 统计: {stats}")
+
+
+def test_failures_not_cached():
+    """测试异常传给所有等待者，失败结果不缓存"""
+    print("\n🧪 测试失败不缓存")
+    cache = RecognitionCache("test", persistent=False)
+    busy = CountingCall(error=CloudServiceBusy("asr"))
+    empty = CountingCall(result={"success": False, "text": ""})
+
+    async def scenario():
+        results = await asyncio.gather(
+            *(cache.get_or_call("busy", "asr", busy) for _ in range(3)),
+            return_exceptions=True
+        )
+        assert busy.count == 1
+        assert all(isinstance(result, CloudServiceBusy) for result in results)
+
+        for _ in range(2):
+            await cache.get_or_call("empty", "asr", empty, cacheable=lambda result: result["success"])
+        assert empty.count == 2
+
+    asyncio.run(scenario())
+    print("✅ 繁忙和空结果不会写入缓存")
+
+
+def test_persistent_tier():
+    """测试持久层跨实例共享，过期后重新识别"""
+    print("\n🧪 测试持久层")
+    session_factory = make_session_factory()
+    call = CountingCall()
+
+    async def scenario():
+        first = RecognitionCache("test", session_factory=session_factory)
+        await first.get_or_call("k", "asr", call)
+
+        # 模拟另一个实例或重启后：内存为空，从数据库命中
+        second = RecognitionCache("test", session_factory=session_factory)
+        assert (await second.get_or_call("k", "asr", call))["text"] == "今天跑步5公里"
+        assert call.count == 1 and second.persistent_hits == 1
+
+        # 已过期的条目不再命中，重新识别后覆盖
+        expired = RecognitionCache("test", ttl_seconds=-1, session_factory=session_factory)
+        await expired.get_or_call("old", "asr", call)
+        third = RecognitionCache("test", session_factory=session_factory)
+        await third.get_or_call("old", "asr", call)
+        assert call.count == 3
+
+    asyncio.run(scenario())
+
+    db = session_factory()
+    try:
+        assert db.query(RecognitionCacheEntry).count() == 2
+    finally:
+        db.close()
+    print("✅ 持久层命中和过期正确")
+
+
+def test_voice_recognition_cached():
+    """测试重复提交的录音不再调用语音识别接口"""
+    print("\n🧪 测试语音识别缓存")
+
+    class Response:
+        Result = "今天跑步5公里"
+
+    class Client:
+        calls = 0
+
+        def SentenceRecognition(self, req):
+            Client.calls += 1
+            return Response()
+
+    service = VoiceRecognitionService()
+    service.client = Client()
+    service.limiter = CloudServiceLimiter("asr-cache-test", max_concurrency=2, timeout=5)
+    service.cache = RecognitionCache("asr-test", persistent=False)
+
+    async def scenario():
+        audio = b"#!SILK_V3" + b"\x00" * 64
+        for _ in range(3):
+            result = await service.recognize_voice(audio)
+            assert result["success"] and result["text"] == "今天跑步5公里"
+        await service.recognize_voice(io.BytesIO(audio))
+        assert Client.calls == 1
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        service.limiter.shutdown()
+    print("✅ 相同录音只识别一次")
+
+
+if __name__ == "__main__":
+    test_cache_key()
+    test_single_flight()
+    test_failures_not_cached()
+    test_persistent_tier()
+    test_voice_recognition_cached()
+    print("\n🎉 识别结果缓存测试通过！")
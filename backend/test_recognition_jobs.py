@@ -0,0 +1,230 @@
+"""
+测试长录音异步识别任务
+Test asynchronous recognition jobs and the polling worker
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import asyncio
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models import Base
+from app.models.recognition_job import RecognitionJob
+from app.services.cloud_executor import CloudServiceBusy
+from app.services.recognition_job_service import RecognitionJobService, RecognitionJobWorker, backoff_seconds
+
+
+class FakeAsr:
+    """按预设序列返回任务状态的录音文件识别服务"""
+
+    def __init__(self, statuses, busy_submits=0):
+        self.statuses = list(statuses)
+        self.busy_submits = busy_submits
+        self.created = []
+        self.described = []
+
+    async def create_rec_task(self, audio_url=None, callback_url=None, audio_data=None):
+        if self.busy_submits:
+            self.busy_submits -= 1
+            raise CloudServiceBusy("asr_task")
+        self.created.append(audio_data)
+        return {"task_id": 1000 + len(self.created), "request_id": "req"}
+
+    async def describe_task_status(self, task_id):
+        self.described.append(task_id)
+        return self.statuses.pop(0)
+
+
+class FakeCos:
+    """记录上传和删除的对象存储"""
+
+    def __init__(self):
+        self.uploaded = []
+        self.deleted = []
+
+    async def upload_from_local(self, local_path):
+        object_key = f"voice/{len(self.uploaded) + 1}.amr"
+        self.uploaded.append(object_key)
+        return {"object_key": object_key}
+
+    async def get_file_url(self, object_key, expires=3600):
+        return f"https://cos.example.com/{object_key}?expires={expires}"
+
+    async def delete_file(self, object_key):
+        self.deleted.append(object_key)
+        return True
+
+
+def make_session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine, tables=[RecognitionJob.__table__])
+    return sessionmaker(bind=engine)
+
+
+def make_job(session_factory, content=b"#!AMR\n" + b"\x00" * 32):
+    fd, path = tempfile.mkstemp(suffix=".amr")
+    with os.fdopen(fd, "wb") as f:
+        f.write(content)
+    db = session_factory()
+    try:
+        job = RecognitionJobService(db).create_voice_job("user-1", path, "amr", len(content))
+        return job.id, path
+    finally:
+        db.close()
+
+
+def make_due(session_factory, job_id):
+    """把下一次处理时间拨到现在，模拟退避间隔已过"""
+    db = session_factory()
+    try:
+        db.query(RecognitionJob).filter(RecognitionJob.id == job_id).update(
+            {RecognitionJob.next_poll_at: datetime.utcnow() - timedelta(seconds=1)}
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def load(session_factory, job_id):
+    db = session_factory()
+    try:
+        return RecognitionJobService(db).get_job("user-1", job_id)
+    finally:
+        db.close()
+
+
+def test_backoff_seconds():
+    """测试查询间隔指数增长并有上限"""
+    print("\n🧪 测试退避间隔")
+    assert [backoff_seconds(n, 2, 60) for n in range(6)] == [2, 4, 8, 16, 32, 60]
+    print("✅ 退避间隔正确")
+
+
+def test_submit_poll_succeed():
+    """测试提交 -> 识别中 -> 退避查询 -> 成功，完成后删除录音文件"""
+    print("\n🧪 测试识别任务完整流程")
+    session_factory = make_session_factory()
+    running = {"status": 1, "result": "", "text": ""}
+    done = {"status": 2, "result": "[0:0.000,0:1.500]  今天跑步5公里\n", "text": "今天跑步5公里", "audio_duration": 1.5}
+    asr = FakeAsr([running, done])
+    worker = RecognitionJobWorker(session_factory=session_factory, asr=asr, poll_initial=2, poll_max=60)
+    job_id, path = make_job(session_factory)
+
+    async def scenario():
+        assert await worker.run_once() == 1
+        job = load(session_factory, job_id)
+        assert (job.status, job.task_id, job.attempts) == ("processing", 1001, 0)
+        # 首次查询时间未到
+        assert await worker.run_once() == 0
+
+        make_due(session_factory, job_id)
+        assert await worker.run_once() == 1
+        job = load(session_factory, job_id)
+        assert (job.status, job.attempts) == ("processing", 1)
+        assert job.next_poll_at - datetime.utcnow() > timedelta(seconds=3)
+
+        make_due(session_factory, job_id)
+        assert await worker.run_once() == 1
+
+    asyncio.run(scenario())
+
+    job = load(session_factory, job_id)
+    assert job.status == "succeeded" and job.result["text"] == "今天跑步5公里"
+    assert job.input_path is None and job.completed_at is not None
+    assert not os.path.exists(path)
+    assert asr.described == [1001, 1001]
+    assert RecognitionJobService.to_dict(job)["result"]["audio_duration"] == 1.5
+    print(f"✅ 统计: {worker.stats()}")
+
+
+def test_busy_and_failure():
+    """测试云端繁忙时稍后重试且不计次数，识别失败时记录原因"""
+    print("\n🧪 测试繁忙重试与识别失败")
+    session_factory = make_session_factory()
+    asr = FakeAsr([{"status": 3, "error_msg": "音频解码失败", "result": "", "text": ""}], busy_submits=1)
+    worker = RecognitionJobWorker(session_factory=session_factory, asr=asr)
+    job_id, path = make_job(session_factory)
+
+    async def scenario():
+        await worker.run_once()
+        job = load(session_factory, job_id)
+        assert (job.status, job.attempts) == ("pending", 0)
+
+        make_due(session_factory, job_id)
+        await worker.run_once()
+        make_due(session_factory, job_id)
+        await worker.run_once()
+
+    asyncio.run(scenario())
+
+    job = load(session_factory, job_id)
+    assert (job.status, job.error) == ("failed", "音频解码失败")
+    assert not os.path.exists(path)
+    print("✅ 繁忙不计入尝试次数，失败原因已记录")
+
+
+def test_large_audio_cos_cleanup():
+    """测试超过直传上限的录音经COS提交，重试时复用对象，任务成功或失败后都删除COS对象"""
+    print("\n🧪 测试大录音的COS对象清理")
+    done = {"status": 2, "result": "", "text": "好", "audio_duration": 600}
+    failed = {"status": 3, "error_msg": "音频解码失败", "result": "", "text": ""}
+    for final, expected in ((done, "succeeded"), (failed, "failed")):
+        session_factory = make_session_factory()
+        cos = FakeCos()
+        worker = RecognitionJobWorker(session_factory=session_factory, asr=FakeAsr([final], busy_submits=1), cos=cos)
+        job_id, path = make_job(session_factory)
+        db = session_factory()
+        db.query(RecognitionJob).filter(RecognitionJob.id == job_id).update(
+            {RecognitionJob.input_size: 6 * 1024 * 1024}
+        )
+        db.commit()
+        db.close()
+
+        async def scenario():
+            # 第一次提交时云端繁忙，对象键已记入任务
+            await worker.run_once()
+            assert load(session_factory, job_id).params == {"cos_key": "voice/1.amr"}
+            make_due(session_factory, job_id)
+            await worker.run_once()
+            make_due(session_factory, job_id)
+            await worker.run_once()
+
+        asyncio.run(scenario())
+
+        job = load(session_factory, job_id)
+        assert job.status == expected
+        assert cos.uploaded == ["voice/1.amr"]
+        assert cos.deleted == ["voice/1.amr"]
+        assert not os.path.exists(path)
+    print("✅ COS对象只上传一次，任务结束后删除")
+
+
+def test_claim_lease():
+    """测试同一任务不会被两个 worker 同时取走"""
+    print("\n🧪 测试任务租约")
+    session_factory = make_session_factory()
+    first = RecognitionJobWorker(session_factory=session_factory, asr=FakeAsr([]))
+    second = RecognitionJobWorker(session_factory=session_factory, asr=FakeAsr([]))
+    job_id, path = make_job(session_factory)
+
+    claimed = first._claim_due_jobs()
+    assert [job["id"] for job in claimed] == [job_id]
+    assert second._claim_due_jobs() == []
+    assert load(session_factory, job_id).next_poll_at > datetime.utcnow() + timedelta(seconds=60)
+    os.remove(path)
+    print("✅ 租期内任务不会被重复处理")
+
+
+if __name__ == "__main__":
+    test_backoff_seconds()
+    test_submit_poll_succeed()
+    test_busy_and_failure()
+    test_large_audio_cos_cleanup()
+    test_claim_lease()
+    print("\n🎉 识别任务测试通过！")
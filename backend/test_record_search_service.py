@@ -0,0 +1,140 @@
+"""
+测试过程记录全文搜索
+Test process record full-text search
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.base import Base
+from app.models.change_log import ChangeLog, ChangeEntityType, ChangeOperation
+from app.models.process_record import ProcessRecord
+from app.services import record_search_service
+from app.services.record_search_service import (
+    RecordSearchIndex, RecordSearchService, tokenize
+)
+from app.services.sync_service import SyncService
+
+
+def _make_session():
+    """创建内存数据库会话"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine, tables=[ProcessRecord.__table__, ChangeLog.__table__])
+    return sessionmaker(bind=engine)()
+
+
+def _add(db, user_id, goal_id, content):
+    record = ProcessRecord(content=content, user_id=user_id, goal_id=goal_id)
+    db.add(record)
+    db.flush()
+    SyncService(db).record_change(user_id, ChangeEntityType.process_record, record.id)
+    return record
+
+
+def test_tokenize():
+    """测试中文二元切分"""
+    print("\n🧪 测试分词")
+    assert tokenize("跑步5公里") == ["跑步", "步5", "5公", "公里"]
+    assert tokenize("读书，学习") == ["读书", "学习"]
+    assert tokenize("") == []
+    print("✅ 分词正确")
+
+
+def test_search_ranking_and_filters():
+    """测试相关度排序、目标过滤、分页和增量维护"""
+    print("\n🧪 测试全文搜索")
+    db = _make_session()
+    index = RecordSearchIndex()
+    service = RecordSearchService(db, index)
+
+    running = _add(db, "u1", "g1", "今天跑步5公里，跑步感觉很好")
+    _add(db, "u1", "g1", "跑了3公里")
+    _add(db, "u1", "g2", "读完了一本书")
+    _add(db, "u2", "g3", "跑步10公里")
+    db.commit()
+
+    result = service.search("u1", "跑步")
+    assert [r.id for r in result["records"]] == [running.id]
+    assert result["total"] == 1
+    print("✅ 只返回当前用户的命中记录")
+
+    result = service.search("u1", "公里")
+    assert result["total"] == 2
+    assert all(r.user_id == "u1" for r in result["records"])
+
+    result = service.search("u1", "公里", goal_id="g2")
+    assert result["total"] == 0
+    print("✅ 目标过滤正确")
+
+    result = service.search("u1", "公里", page=1, page_size=1)
+    assert len(result["records"]) == 1 and result["has_next"] is True
+    result = service.search("u1", "公里", page=2, page_size=1)
+    assert len(result["records"]) == 1 and result["has_next"] is False
+    print("✅ 分页正确")
+
+    # 分区已加载后，新记录和删除通过增量维护生效
+    swimming = _add(db, "u1", "g1", "游泳1000米")
+    db.commit()
+    index.index_record(swimming)
+    assert [r.id for r in service.search("u1", "游泳")["records"]] == [swimming.id]
+
+    index.remove_record("u1", swimming.id)
+    assert service.search("u1", "游泳")["total"] == 0
+    print("✅ 增量更新索引正确")
+
+    assert service.search("u1", "跑")["total"] == 0
+    print("✅ 过短的查询返回空结果")
+
+
+def test_catch_up_other_process_writes():
+    """测试其他进程的写入（本进程没有调用 index_record）在搜索前按 change_log 追赶"""
+    print("\n🧪 测试多进程写入后的索引追赶")
+    db = _make_session()
+    index = RecordSearchIndex()
+    service = RecordSearchService(db, index)
+
+    running = _add(db, "u1", "g1", "今天跑步5公里")
+    db.commit()
+    assert service.search("u1", "跑步")["total"] == 1
+    version = index.version("u1")
+    assert version > 0
+
+    # 另一个进程：新增一条、修改一条，本进程的索引没有收到通知
+    swimming = _add(db, "u1", "g1", "游泳1000米")
+    running.content = "今天骑车20公里"
+    SyncService(db).record_change("u1", ChangeEntityType.process_record, running.id)
+    db.commit()
+    assert [r.id for r in service.search("u1", "游泳")["records"]] == [swimming.id]
+    assert service.search("u1", "跑步")["total"] == 0 and service.search("u1", "骑车")["total"] == 1
+    assert index.version("u1") > version
+    print("✅ 新增和修改已追赶")
+
+    # 另一个进程删除记录
+    db.delete(swimming)
+    SyncService(db).record_change("u1", ChangeEntityType.process_record, swimming.id, ChangeOperation.delete)
+    db.commit()
+    assert service.search("u1", "游泳")["total"] == 0
+    print("✅ 删除已追赶")
+
+    # 落后太多时整体重建
+    original_limit = record_search_service.CATCH_UP_LIMIT
+    record_search_service.CATCH_UP_LIMIT = 1
+    try:
+        _add(db, "u1", "g2", "读完一本书")
+        _add(db, "u1", "g2", "又读完一本书")
+        db.commit()
+        assert service.search("u1", "读完")["total"] == 2
+        assert index.version("u1") == SyncService(db).get_latest_cursor("u1")
+    finally:
+        record_search_service.CATCH_UP_LIMIT = original_limit
+    print("✅ 落后过多时重建分区")
+
+
+if __name__ == "__main__":
+    test_tokenize()
+    test_search_ranking_and_filters()
+    test_catch_up_other_process_writes()
+    print("\n🎉 全文搜索测试通过！")
@@ -0,0 +1,79 @@
+"""
+测试分析结果缓存
+Test content-digest memoization of analysis results
+"""
+import sys
+import os
+import copy
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils.keyword_dictionaries import keyword_dictionaries
+from app.utils.result_cache import ResultCache, content_digest
+from app.utils.process_analyzer import ProcessRecordAnalyzer
+from app.utils.voice_parser import VoiceGoalParser
+from app.utils.goal_validator import GoalValidator
+
+
+def test_lru_and_stats():
+    """测试LRU淘汰和命中统计"""
+    print("\n🧪 测试LRU缓存")
+    cache = ResultCache('test', max_size=2)
+    cache.put('a', {'v': 1})
+    cache.put('b', {'v': 2})
+    assert cache.get('a') == {'v': 1}
+    cache.put('c', {'v': 3})
+    assert cache.get('b') is None
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['size']) == (1, 1, 1, 2)
+    assert stats['hit_rate'] == 0.5
+    print(f"✅ 统计: {stats}")
+
+    # 修改返回值不影响缓存内容
+    value = cache.get('a')
+    value['v'] = 100
+    assert cache.get('a') == {'v': 1}
+
+    assert content_digest('x', {'b': 1, 'a': 2}) == content_digest('x', {'a': 2, 'b': 1})
+
+
+def test_analyzer_cache():
+    """测试内容分析命中缓存，词典变化后键随之变化"""
+    print("\n🧪 测试内容分析缓存")
+    analyzer = ProcessRecordAnalyzer()
+    first = analyzer.analyze_content("今天跑步5公里，状态很好")
+    second = analyzer.analyze_content("今天跑步5公里，状态很好")
+    assert first == second
+    assert analyzer.cache.hits == 1 and analyzer.cache.misses == 1
+
+    dictionaries = copy.deepcopy(keyword_dictionaries.current)
+    dictionaries.section('process_analyzer')['type_keywords']['progress'].append('公里')
+    other = ProcessRecordAnalyzer(dictionaries)
+    assert other.dictionary_version != analyzer.dictionary_version
+    print("✅ 相同内容只分析一次")
+
+
+def test_voice_parse_and_validate_cache():
+    """测试语音解析和目标验证缓存，调用方修改结果不影响缓存"""
+    print("\n🧪 测试语音解析和验证缓存")
+    parser = VoiceGoalParser()
+    validator = GoalValidator()
+
+    parsed = parser.parse_voice_to_goal("3个月内减重10斤")
+    hints = parsed.pop('parsing_hints')
+    assert hints
+    again = parser.parse_voice_to_goal("3个月内减重10斤")
+    assert again['parsing_hints'] == hints
+    assert parser.cache.hits == 1
+
+    validator.validate_goal(again)
+    validator.validate_goal(again)
+    assert validator.cache.hits == 1 and validator.cache.misses == 1
+    print("✅ parse-voice 与 create-from-voice 共享解析结果")
+
+
+if __name__ == "__main__":
+    test_lru_and_stats()
+    test_analyzer_cache()
+    test_voice_parse_and_validate_cache()
+    print("\n🎉 结果缓存测试通过！")
@@ -0,0 +1,129 @@
+"""
+测试连续打卡引擎
+Test incremental streak engine
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime, date, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.models.user import User
+from app.services.streak_service import StreakService, effective_streak
+
+
+def _make_session(user_ids=("u1",)):
+    """创建内存数据库会话"""
+    engine = create_engine("sqlite://")
+    User.__table__.create(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE process_records (
+                id INTEGER PRIMARY KEY,
+                user_id VARCHAR(36) NOT NULL,
+                content TEXT NOT NULL,
+                recorded_at DATETIME,
+                is_deleted BOOLEAN DEFAULT FALSE
+            )
+        """))
+    db = sessionmaker(bind=engine)()
+    for user_id in user_ids:
+        db.add(User(id=user_id, wechat_id=f"wx-{user_id}", nickname=user_id))
+    db.commit()
+    return db
+
+
+def _user(db, user_id="u1"):
+    db.expire_all()
+    return db.query(User).filter(User.id == user_id).one()
+
+
+def test_record_activity():
+    """测试增量更新"""
+    print("\n🧪 测试增量更新连续天数")
+    db = _make_session()
+    service = StreakService(db)
+    day = date(2024, 3, 1)
+
+    for offset in [0, 0, 1, 2]:
+        service.record_activity("u1", day + timedelta(days=offset))
+    db.commit()
+    user = _user(db)
+    assert (user.streak_days, user.longest_streak, user.last_active_day) == (3, 3, date(2024, 3, 3))
+    print("✅ 连续三天: 3")
+
+    # 补录更早的记录不影响状态
+    service.record_activity("u1", day)
+    db.commit()
+    assert _user(db).streak_days == 3
+
+    # 中断后重新开始，最长记录保留
+    service.record_activity("u1", day + timedelta(days=5))
+    db.commit()
+    user = _user(db)
+    assert (user.streak_days, user.longest_streak) == (1, 3)
+    print("✅ 中断后重置，最长连续保留")
+
+    assert effective_streak(user, today=date(2024, 3, 7)) == 1
+    assert effective_streak(user, today=date(2024, 3, 8)) == 0
+
+
+def test_rollover():
+    """测试每日滚动分块清零"""
+    print("\n🧪 测试每日滚动")
+    db = _make_session(user_ids=("a", "b", "c"))
+    service = StreakService(db)
+    today = date(2024, 3, 10)
+    service.record_activity("a", today - timedelta(days=1))
+    service.record_activity("b", today - timedelta(days=3))
+    service.record_activity("c", today - timedelta(days=5))
+    db.commit()
+
+    assert service.rollover(today=today, chunk_size=1) == 2
+    assert [_user(db, u).streak_days for u in ("a", "b", "c")] == [1, 0, 0]
+    assert _user(db, "c").longest_streak == 1
+    assert service.rollover(today=today) == 0
+    print("✅ 只清零昨天没有活跃的用户")
+
+
+def test_backfill():
+    """测试流式回填"""
+    print("\n🧪 测试回填")
+    db = _make_session(user_ids=("a", "b", "c"))
+    base = datetime(2024, 3, 1, 12, 0, 0)
+    rows = [
+        ("a", 0), ("a", 1), ("a", 1), ("a", 2), ("a", 5), ("a", 8), ("a", 9),
+        ("b", 0), ("b", 1),
+    ]
+    for i, (user_id, offset) in enumerate(rows):
+        db.execute(text("""
+            INSERT INTO process_records (id, user_id, content, recorded_at)
+            VALUES (:id, :user_id, '记录', :recorded_at)
+        """), {"id": i + 1, "user_id": user_id, "recorded_at": base + timedelta(days=offset)})
+    # c 没有任何记录，但有残留的状态
+    db.execute(text("UPDATE users SET streak_days = 5, longest_streak = 7, last_active_day = '2024-03-09' WHERE id = 'c'"))
+    db.commit()
+
+    assert StreakService(db).backfill(today=date(2024, 3, 10), batch_size=1) == 3
+    a, b, c = (_user(db, u) for u in ("a", "b", "c"))
+    assert (a.streak_days, a.longest_streak, a.last_active_day) == (2, 3, date(2024, 3, 10))
+    assert (b.streak_days, b.longest_streak) == (0, 2)
+    assert (c.streak_days, c.longest_streak, c.last_active_day) == (0, 0, None)
+
+    # 回填期间 b 今天有了新记录（增量更新已写入），重算结果不覆盖它
+    StreakService(db).record_activity("b", date(2024, 3, 10))
+    db.commit()
+    StreakService(db)._write([{"user_id": "b", "last_active_day": date(2024, 3, 2), "streak_days": 0, "longest_streak": 2}], date(2024, 3, 10))
+    b = _user(db, "b")
+    assert (b.streak_days, b.last_active_day) == (1, date(2024, 3, 10))
+    print("✅ 回填结果正确")
+
+
+if __name__ == "__main__":
+    test_record_activity()
+    test_rollover()
+    test_backfill()
+    print("\n🎉 连续打卡测试通过！")
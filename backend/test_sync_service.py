@@ -0,0 +1,113 @@
+"""
+测试增量同步服务
+Test incremental sync service
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.models.base import Base
+from app.models.change_log import ChangeLog, ChangeEntityType, ChangeOperation
+from app.models.process_record import ProcessRecord
+from app.services.sync_service import SyncService
+
+
+def _make_session():
+    """创建内存数据库会话"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(
+        bind=engine,
+        tables=[ChangeLog.__table__, ProcessRecord.__table__]
+    )
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE goals (
+                id VARCHAR(36) PRIMARY KEY,
+                user_id VARCHAR(36) NOT NULL,
+                title VARCHAR(200) NOT NULL,
+                description TEXT,
+                category VARCHAR(50),
+                priority VARCHAR(20),
+                status VARCHAR(20),
+                target_date DATE,
+                start_date DATE,
+                end_date DATE,
+                target_value VARCHAR(100),
+                current_value VARCHAR(100),
+                unit VARCHAR(50),
+                daily_reminder BOOLEAN,
+                deadline_reminder BOOLEAN,
+                created_at DATETIME,
+                updated_at DATETIME
+            )
+        """))
+    return sessionmaker(bind=engine)()
+
+
+def _insert_goal(db, goal_id, user_id, title):
+    db.execute(text("""
+        INSERT INTO goals (id, user_id, title, category, status)
+        VALUES (:id, :user_id, :title, '学习', 'active')
+    """), {"id": goal_id, "user_id": user_id, "title": title})
+
+
+def test_changes_since_cursor():
+    """测试游标之后的变更、墓碑和分页"""
+    print("\n🧪 测试增量同步")
+    db = _make_session()
+    sync_service = SyncService(db)
+
+    _insert_goal(db, "g1", "u1", "Python学习计划")
+    sync_service.record_change("u1", ChangeEntityType.goal, "g1")
+    record = ProcessRecord(content="今天学习了装饰器", user_id="u1", goal_id="g1")
+    db.add(record)
+    db.flush()
+    sync_service.record_change("u1", ChangeEntityType.process_record, record.id)
+    # 其他用户的变更不应被看到
+    _insert_goal(db, "g2", "u2", "别人的目标")
+    sync_service.record_change("u2", ChangeEntityType.goal, "g2")
+    db.commit()
+
+    changes = sync_service.get_changes("u1", since=0)
+    assert [goal["id"] for goal in changes["goals"]] == ["g1"]
+    assert [r.id for r in changes["process_records"]] == [record.id]
+    assert changes["tombstones"] == []
+    assert changes["has_more"] is False
+    cursor = changes["cursor"]
+    assert cursor == sync_service.get_latest_cursor("u1")
+    print(f"✅ 首次同步游标: {cursor}")
+
+    # 游标之后没有变更时返回空结果，游标不变
+    empty = sync_service.get_changes("u1", since=cursor)
+    assert empty["goals"] == [] and empty["process_records"] == [] and empty["tombstones"] == []
+    assert empty["cursor"] == cursor
+
+    # 修改后删除同一条记录，只返回墓碑
+    record_id = record.id
+    sync_service.record_change("u1", ChangeEntityType.process_record, record_id)
+    db.delete(record)
+    sync_service.record_change(
+        "u1", ChangeEntityType.process_record, record_id, ChangeOperation.delete
+    )
+    db.commit()
+
+    changes = sync_service.get_changes("u1", since=cursor)
+    assert changes["process_records"] == []
+    assert changes["tombstones"] == [
+        {"entity_type": "process_record", "id": str(record_id)}
+    ]
+    print("✅ 删除生成墓碑")
+
+    # 分页：每页只读一条变更日志
+    page = sync_service.get_changes("u1", since=0, limit=1)
+    assert page["has_more"] is True
+    assert len(page["goals"]) == 1
+    print("✅ 分页游标正确")
+
+
+if __name__ == "__main__":
+    test_changes_since_cursor()
+    print("\n🎉 增量同步测试通过！")
@@ -0,0 +1,149 @@
+"""
+测试本地模拟腾讯云服务
+Test the local Tencent Cloud stand-in against the real SDK clients
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import asyncio
+import base64
+import hashlib
+import socket
+import threading
+import time
+
+import requests
+import uvicorn
+from tencentcloud.asr.v20190614 import models as asr_models
+from tencentcloud.ocr.v20181119 import models as ocr_models
+from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
+
+from app.config.settings import settings
+from app.config.tencent_cloud import TencentCloudConfig
+from app.services.cloud_executor import CloudServiceLimiter
+from app.services.recognition_cache import RecognitionCache
+from app.services.voice_recognition import VoiceRecognitionService
+from scripts.tencent_cloud_stub import ServiceProfile, StubState, build_app
+
+
+class StubServer:
+    """在后台线程中运行模拟服务，并让客户端注册表指向它"""
+
+    def __init__(self, state: StubState):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.state = state
+        self.server = uvicorn.Server(uvicorn.Config(build_app(state), host="127.0.0.1", port=self.port, log_level="error"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self) -> TencentCloudConfig:
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        self._original = settings.TENCENT_CLOUD_STUB_URL
+        settings.TENCENT_CLOUD_STUB_URL = self.url
+        return TencentCloudConfig()
+
+    def __exit__(self, *exc):
+        settings.TENCENT_CLOUD_STUB_URL = self._original
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def test_sdk_clients_against_stub():
+    """测试SDK客户端可以直接调用模拟服务，echo 返回请求数据的摘要"""
+    print("\n🧪 测试SDK调用模拟服务")
+    audio = b"#!SILK_V3" + os.urandom(256)
+    digest = f"echo:{len(audio)}:{hashlib.sha256(audio).hexdigest()[:16]}"
+
+    with StubServer(StubState(echo=True, seed=1)) as registry:
+        req = asr_models.SentenceRecognitionRequest()
+        req.EngSerViceType, req.SourceType, req.VoiceFormat = "16k_zh", 1, "silk"
+        req.Data, req.DataLen = base64.b64encode(audio).decode(), len(audio)
+        assert registry.get_asr_client().SentenceRecognition(req).Result == digest
+
+        req = ocr_models.GeneralBasicOCRRequest()
+        req.ImageBase64 = base64.b64encode(audio).decode()
+        assert registry.get_ocr_client().GeneralBasicOCR(req).TextDetections[0].DetectedText == digest
+
+        cos = registry.get_cos_client()
+        cos.put_object(Bucket="stub", Key="uploads/a.jpg", Body=audio, ContentType="image/jpeg")
+        assert cos.get_object(Bucket="stub", Key="uploads/a.jpg")["Body"].get_raw_stream().read() == audio
+        assert [item["Key"] for item in cos.list_objects(Bucket="stub", Prefix="uploads/")["Contents"]] == ["uploads/a.jpg"]
+        url = cos.get_presigned_download_url(Bucket="stub", Key="uploads/a.jpg")
+        assert requests.get(url, timeout=5).content == audio
+        cos.delete_object(Bucket="stub", Key="uploads/a.jpg")
+
+        # 客户端直传：预签名 PUT 上传后，OCR 按地址下载识别
+        url = cos.get_presigned_url(Bucket="stub", Key="incoming/b.jpg", Method="PUT", Headers={"Content-Type": "image/jpeg"})
+        assert requests.put(url, data=audio, headers={"Content-Type": "image/jpeg"}, timeout=5).status_code == 200
+        assert int(cos.head_object(Bucket="stub", Key="incoming/b.jpg")["content-length"]) == len(audio)
+        req = ocr_models.GeneralBasicOCRRequest()
+        req.ImageUrl = cos.get_presigned_download_url(Bucket="stub", Key="incoming/b.jpg")
+        assert registry.get_ocr_client().GeneralBasicOCR(req).TextDetections[0].DetectedText == digest
+
+        req = asr_models.CreateRecTaskRequest()
+        req.EngineModelType, req.ChannelNum, req.ResTextFormat, req.SourceType = "16k_zh", 1, 0, 1
+        req.Data, req.DataLen = base64.b64encode(audio).decode(), len(audio)
+        task_id = registry.get_asr_client().CreateRecTask(req).Data.TaskId
+        req = asr_models.DescribeTaskStatusRequest()
+        req.TaskId = task_id
+        data = registry.get_asr_client().DescribeTaskStatus(req).Data
+        assert data.Status == 2 and digest in data.Result
+    print("✅ ASR、OCR、COS、录音文件识别接口均可用")
+
+
+def test_latency_and_errors():
+    """测试延迟注入和错误率，并通过语音识别服务的完整调用路径验证"""
+    print("\n🧪 测试延迟和错误注入")
+    state = StubState({
+        "asr": ServiceProfile(median_ms=100, p99_ms=100),
+        "ocr": ServiceProfile(error_rate=1),
+        "cos": ServiceProfile()
+    })
+
+    with StubServer(state) as registry:
+        service = VoiceRecognitionService()
+        service.client = registry.get_asr_client()
+        service.limiter = CloudServiceLimiter("asr-stub-test", max_concurrency=4, timeout=5)
+        service.cache = RecognitionCache("asr-stub-test", persistent=False)
+
+        async def scenario():
+            start = time.perf_counter()
+            results = await asyncio.gather(*(
+                service.recognize_voice(b"#!SILK_V3" + bytes([i]) * 64) for i in range(4)
+            ))
+            elapsed = time.perf_counter() - start
+            assert all(result["success"] and result["text"] == "今天跑步5公里" for result in results)
+            # 4 个请求并发执行，总耗时接近一次延迟
+            assert 0.1 <= elapsed < 0.35, elapsed
+
+        try:
+            asyncio.run(scenario())
+        finally:
+            service.limiter.shutdown()
+
+        req = ocr_models.GeneralBasicOCRRequest()
+        req.ImageBase64 = base64.b64encode(b"image").decode()
+        try:
+            registry.get_ocr_client().GeneralBasicOCR(req)
+            assert False, "应该返回错误"
+        except TencentCloudSDKException as e:
+            assert e.code == "InternalError"
+
+        # 运行时调整配置
+        response = requests.put(f"{settings.TENCENT_CLOUD_STUB_URL}/_stub/config", json={"ocr": {"error_rate": 0}}, timeout=5)
+        assert response.json()["ocr"]["error_rate"] == 0
+        assert registry.get_ocr_client().GeneralBasicOCR(req).TextDetections
+        stats = requests.get(f"{settings.TENCENT_CLOUD_STUB_URL}/_stub/stats", timeout=5).json()
+        assert stats["requests"]["SentenceRecognition"] == 4 and stats["errors"]["GeneralBasicOCR"] == 1
+    print("✅ 延迟、错误率和运行时配置生效")
+
+
+if __name__ == "__main__":
+    test_sdk_clients_against_stub()
+    test_latency_and_errors()
+    print("\n🎉 模拟腾讯云服务测试通过！")
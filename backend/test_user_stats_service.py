@@ -0,0 +1,133 @@
+"""
+测试用户统计计数器
+Test incrementally maintained user statistics
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import asyncio
+from datetime import datetime, date, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.models.user import User
+from app.models.process_record import ProcessRecord
+from app.services.user_stats_service import UserStatsService
+
+
+def _make_session():
+    """创建内存数据库会话"""
+    engine = create_engine("sqlite://")
+    User.__table__.create(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE goals (
+                id VARCHAR(36) PRIMARY KEY,
+                user_id VARCHAR(36) NOT NULL,
+                title VARCHAR(200) NOT NULL,
+                status VARCHAR(20)
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE process_records (
+                id INTEGER PRIMARY KEY,
+                user_id VARCHAR(36) NOT NULL,
+                content TEXT NOT NULL,
+                recorded_at DATETIME,
+                is_deleted BOOLEAN DEFAULT FALSE
+            )
+        """))
+    db = sessionmaker(bind=engine)()
+    db.add(User(id="u1", wechat_id="wx1", nickname="测试用户"))
+    db.commit()
+    return db
+
+
+def _insert_record(db, record_id, recorded_at):
+    db.execute(text("""
+        INSERT INTO process_records (id, user_id, content, recorded_at)
+        VALUES (:id, 'u1', '记录', :recorded_at)
+    """), {"id": record_id, "recorded_at": recorded_at})
+    return ProcessRecord(id=record_id, user_id="u1", content="记录", recorded_at=recorded_at)
+
+
+def _user(db):
+    db.expire_all()
+    return db.query(User).filter(User.id == "u1").one()
+
+
+def test_goal_counters():
+    """测试目标创建、完成、删除时的计数器"""
+    print("\n🧪 测试目标计数器")
+    db = _make_session()
+    service = UserStatsService(db)
+
+    service.goal_created("u1")
+    service.goal_created("u1")
+    service.goal_completed("u1")
+    db.commit()
+    stats = UserStatsService.get_stats(_user(db))
+    assert stats["totalGoals"] == 2 and stats["completedGoals"] == 1
+    assert stats["activeGoals"] == 1 and stats["completionRate"] == 50
+    print(f"✅ 统计数据: {stats}")
+
+    service.goal_deleted("u1", was_completed=True)
+    service.goal_deleted("u1")
+    service.goal_deleted("u1")
+    db.commit()
+    user = _user(db)
+    assert user.total_goals == 0 and user.completed_goals == 0
+    print("✅ 删除后计数器不会小于0")
+
+
+def test_streak_on_record_created():
+    """测试新建记录时的连续天数"""
+    print("\n🧪 测试连续天数")
+    db = _make_session()
+    service = UserStatsService(db)
+    day1 = datetime(2024, 3, 1, 9, 0, 0)
+
+    service.record_created("u1", _insert_record(db, 1, day1))
+    service.record_created("u1", _insert_record(db, 2, day1 + timedelta(hours=5)))
+    assert _user(db).streak_days == 1
+
+    service.record_created("u1", _insert_record(db, 3, day1 + timedelta(days=1)))
+    assert _user(db).streak_days == 2
+
+    service.record_created("u1", _insert_record(db, 4, day1 + timedelta(days=4)))
+    assert _user(db).streak_days == 1
+
+    # 滚动任务运行前库里仍是旧值，/api/auth/me 返回按最后活跃日修正后的连续天数
+    from app.api.auth import get_current_user_info
+    assert asyncio.run(get_current_user_info(current_user=_user(db))).streak_days == 0
+    print("✅ 同日不变、隔日+1、中断后重置")
+
+
+def test_reconcile():
+    """测试批量重算"""
+    print("\n🧪 测试对账重算")
+    db = _make_session()
+    db.execute(text("""
+        INSERT INTO goals (id, user_id, title, status) VALUES
+        ('g1', 'u1', '目标1', 'completed'),
+        ('g2', 'u1', '目标2', 'active'),
+        ('g3', 'u1', '目标3', 'active')
+    """))
+    today = date(2024, 3, 10)
+    for i, days_ago in enumerate([0, 1, 1, 2, 5]):
+        _insert_record(db, i + 1, datetime(2024, 3, 10, 12, 0, 0) - timedelta(days=days_ago))
+    db.commit()
+
+    assert UserStatsService(db).reconcile(batch_size=1, today=today) == 1
+    user = _user(db)
+    assert (user.total_goals, user.completed_goals, user.streak_days) == (3, 1, 3)
+    print("✅ 重算结果正确")
+
+
+if __name__ == "__main__":
+    test_goal_counters()
+    test_streak_on_record_created()
+    test_reconcile()
+    print("\n🎉 用户统计测试通过！")
@@ -36,9 +36,11 @@ def init_database():
             email VARCHAR(100),
             notification_enabled BOOLEAN DEFAULT TRUE,
             privacy_level VARCHAR(20) DEFAULT 'public',
-            total_goals VARCHAR(10) DEFAULT '0',
-            completed_goals VARCHAR(10) DEFAULT '0',
-            streak_days VARCHAR(10) DEFAULT '0',
+            total_goals INT NOT NULL DEFAULT 0,
+            completed_goals INT NOT NULL DEFAULT 0,
+            streak_days INT NOT NULL DEFAULT 0,
+            longest_streak INT NOT NULL DEFAULT 0,
+            last_active_day DATE NULL,
             is_verified BOOLEAN DEFAULT FALSE,
             is_active BOOLEAN DEFAULT TRUE,
             is_locked BOOLEAN DEFAULT FALSE,